@@ -4,19 +4,19 @@ Anthropic Claude API 兼容接口
 让客户端可以像使用官方API一样使用Smart AI Router
 """
 
-import json
 import time
 import uuid
 from typing import Any, Optional, Union
 
-from fastapi import APIRouter, Body, Header, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Body, Header, HTTPException, Request
 from pydantic import BaseModel, Field, field_validator
 
 from core.exceptions import RoutingException
 from core.handlers.chat_handler import ChatCompletionHandler, ChatCompletionRequest
 from core.json_router import JSONRouter
+from core.utils.client_disconnect import DisconnectAwareStreamingResponse
 from core.utils.logger import get_logger
+from core.utils.stream_translator import AnthropicStreamTranslator
 from core.yaml_config import YAMLConfigLoader
 
 logger = get_logger(__name__)
@@ -65,9 +65,7 @@ class AnthropicMessagesRequest(BaseModel):
     top_k: Optional[int] = Field(None, description="Top-k参数", ge=0)
     stop_sequences: Optional[list[str]] = Field(None, description="停止序列")
     stream: Optional[bool] = Field(False, description="是否流式输出")
-    system: Optional[Union[str, list[dict[str, Any]]]] = Field(
-        None, description="系统提示"
-    )
+    system: Optional[Union[str, list[dict[str, Any]]]] = Field(None, description="系统提示")
 
     @field_validator("system", mode="before")
     @classmethod
@@ -97,9 +95,7 @@ class AnthropicMessagesRequest(BaseModel):
         raise ValueError(f"System must be string or list, got {type(v)}")
 
     tools: Optional[list[AnthropicTool]] = Field(None, description="工具列表")
-    tool_choice: Optional[Union[str, dict[str, Any]]] = Field(
-        None, description="工具选择"
-    )
+    tool_choice: Optional[Union[str, dict[str, Any]]] = Field(None, description="工具选择")
 
 
 class AnthropicUsage(BaseModel):
@@ -107,12 +103,8 @@ class AnthropicUsage(BaseModel):
 
     input_tokens: int = Field(0, description="输入token数")
     output_tokens: int = Field(0, description="输出token数")
-    cache_creation_input_tokens: Optional[int] = Field(
-        None, description="缓存创建输入token"
-    )
-    cache_read_input_tokens: Optional[int] = Field(
-        None, description="缓存读取输入token"
-    )
+    cache_creation_input_tokens: Optional[int] = Field(None, description="缓存创建输入token")
+    cache_read_input_tokens: Optional[int] = Field(None, description="缓存读取输入token")
 
 
 class AnthropicContentBlock(BaseModel):
@@ -148,6 +140,7 @@ def create_anthropic_router(
 
     @router.post("/messages")
     async def create_message(
+        http_request: Request,
         request_data: dict[str, Any] = Body(...),
         authorization: Optional[str] = Header(None, alias="Authorization"),
         x_api_key: Optional[str] = Header(None, alias="x-api-key"),
@@ -257,7 +250,7 @@ def create_anthropic_router(
 
             if request_obj.stream:
                 # 流式响应
-                return StreamingResponse(
+                return DisconnectAwareStreamingResponse(
                     stream_anthropic_response(chat_handler, chat_request),
                     media_type="text/event-stream",
                     headers={
@@ -269,7 +262,9 @@ def create_anthropic_router(
                 )
             else:
                 # 非流式响应
-                response = await chat_handler.handle_request(chat_request)
+                response = await chat_handler.handle_request(
+                    chat_request, http_request=http_request
+                )
                 return convert_to_anthropic_response(response, request_obj.model)
 
         except RoutingException as e:
@@ -418,29 +413,11 @@ def convert_to_anthropic_response(
 async def stream_anthropic_response(
     chat_handler: ChatCompletionHandler, request: ChatCompletionRequest
 ):
-    """流式生成Anthropic格式响应"""
+    """流式生成Anthropic格式响应（逐事件转换，上游为Anthropic时原样透传）"""
 
     # 生成消息ID
     message_id = f"msg_{uuid.uuid4().hex}"
-
-    # 发送消息开始事件
-    message_start_data = {
-        "type": "message_start",
-        "message": {
-            "id": message_id,
-            "type": "message",
-            "role": "assistant",
-            "content": [],
-            "model": request.model,
-            "stop_reason": None,
-            "usage": {"input_tokens": 0, "output_tokens": 0},
-        },
-    }
-    yield f"data: {json.dumps(message_start_data)}\n\n"
-
-    # 获取流式响应
-    content_buffer = ""
-    total_output_tokens = 0
+    translator = AnthropicStreamTranslator(message_id, request.model)
 
     try:
         # 使用chat_handler的流式处理 - 获取异步生成器而不是StreamingResponse
@@ -451,69 +428,30 @@ async def stream_anthropic_response(
 
         # 检查路由结果
         if not routing_result.candidates:
-            error_data = {
-                "type": "error",
-                "error": {
-                    "type": "no_channels_available",
-                    "message": "No available channels for the requested model",
-                },
-            }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield translator.error(
+                "No available channels for the requested model", "not_found_error"
+            )
             return
 
-        async for chunk in chat_handler._execute_stream_request_with_retry(
+        stream = chat_handler._execute_stream_request_with_retry(
             request, routing_result, start_time, f"anthropic_{message_id}"
-        ):
-            # 处理不同类型的chunk
-            if isinstance(chunk, str):
-                # 如果是字符串，尝试解析为JSON
-                try:
-                    chunk_data = json.loads(chunk)
-                    if chunk_data.get("type") == "error":
-                        # 错误消息
-                        yield f"data: {json.dumps(chunk_data)}\n\n"
-                        return
-                except (json.JSONDecodeError, ValueError):
-                    # 如果不是JSON，当作文本内容处理
-                    content = chunk
-            else:
-                # 如果是字典，提取内容
-                content = ""
-                if chunk.get("choices"):
-                    delta = chunk["choices"][0].get("delta", {})
-                    content = delta.get("content", "")
-
-            if content:
-                content_buffer += content
-                total_output_tokens += len(content.split())  # 简单估算
-
-                # 发送内容块增量
-                content_delta_data = {
-                    "type": "content_block_delta",
-                    "delta": {"type": "text_delta", "text": content},
-                }
-                yield f"data: {json.dumps(content_delta_data)}\n\n"
+        )
+        try:
+            async for chunk in stream:
+                for frame in translator.feed(chunk):
+                    yield frame
+        finally:
+            # 客户端断开时立即关闭上游流
+            await stream.aclose()
 
     except Exception as e:
         logger.error(f"Stream error: {e}")
-        error_data = {
-            "type": "error",
-            "error": {"type": "stream_error", "message": "Stream processing error"},
-        }
-        yield f"data: {json.dumps(error_data)}\n\n"
+        yield translator.error("Stream processing error")
         return
 
-    # 发送消息结束事件
-    message_delta_data = {
-        "type": "message_delta",
-        "delta": {"stop_reason": "end_turn"},
-        "usage": {"output_tokens": total_output_tokens},
-    }
-    yield f"data: {json.dumps(message_delta_data)}\n\n"
-
-    # 发送消息停止事件
-    message_stop_data = {"type": "message_stop"}
-    yield f"data: {json.dumps(message_stop_data)}\n\n"
+    # 关闭内容块并发送 message_delta / message_stop
+    for frame in translator.finish():
+        yield frame
 
 
 # --- 错误处理 ---
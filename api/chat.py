@@ -3,7 +3,9 @@ Chat completion API endpoints
 聊天完成API接口
 """
 
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Header, Request
 
 from core.handlers.chat_handler import ChatCompletionHandler, ChatCompletionRequest
 from core.utils.logger import get_logger
@@ -13,17 +15,38 @@ from core.utils.logger import get_logger
 logger = get_logger(__name__)
 
 
+def _parse_flag_header(value: Optional[str]) -> Optional[bool]:
+    """解析开关类请求头：未设置返回None，由服务端按默认规则决定"""
+    if value is None:
+        return None
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 def create_chat_router(chat_handler: ChatCompletionHandler) -> APIRouter:
     """创建聊天相关的API路由"""
 
     router = APIRouter(prefix="/v1", tags=["chat"])
 
     @router.post("/chat/completions")
-    async def chat_completions(request: ChatCompletionRequest):
+    async def chat_completions(
+        request: ChatCompletionRequest,
+        http_request: Request,
+        x_router_coalesce: Optional[str] = Header(None, alias="X-Router-Coalesce"),
+        x_router_cache: Optional[str] = Header(None, alias="X-Router-Cache"),
+        cache_control: Optional[str] = Header(None, alias="Cache-Control"),
+    ):
         """聊天完成API - 核心功能"""
         # 统一异常处理现在由 ExceptionHandlerMiddleware 处理
         # 无需在这里手动捕获异常，中间件会自动处理并记录到状态监控
-        response = await chat_handler.handle_request(request)
+        cache = _parse_flag_header(x_router_cache)
+        if cache_control and "no-store" in cache_control.lower():
+            cache = False
+        response = await chat_handler.handle_request(
+            request,
+            coalesce=_parse_flag_header(x_router_coalesce),
+            cache=cache,
+            http_request=http_request,
+        )
         return response
 
     return router
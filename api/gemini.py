@@ -4,17 +4,19 @@ Google Gemini API 兼容接口
 让客户端可以像使用官方API一样使用Smart AI Router
 """
 
-import json
+import time
+import uuid
 from typing import Any, Optional
 
-from fastapi import APIRouter, Header, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Header, HTTPException, Query, Request
 from pydantic import BaseModel, Field
 
 from core.exceptions import RoutingException
 from core.handlers.chat_handler import ChatCompletionHandler, ChatCompletionRequest
 from core.json_router import JSONRouter
+from core.utils.client_disconnect import DisconnectAwareStreamingResponse
 from core.utils.logger import get_logger
+from core.utils.stream_translator import GeminiStreamTranslator
 from core.yaml_config import YAMLConfigLoader
 
 logger = get_logger(__name__)
@@ -58,9 +60,7 @@ class GeminiGenerationConfig(BaseModel):
     top_k: Optional[int] = Field(None, description="Top-k参数", ge=1)
     max_output_tokens: Optional[int] = Field(None, description="最大输出token数", ge=1)
     stop_sequences: Optional[list[str]] = Field(None, description="停止序列")
-    presence_penalty: Optional[float] = Field(
-        None, description="存在惩罚", ge=-2.0, le=2.0
-    )
+    presence_penalty: Optional[float] = Field(None, description="存在惩罚", ge=-2.0, le=2.0)
     frequency_penalty: Optional[float] = Field(
         None, description="频率惩罚", ge=-2.0, le=2.0
     )
@@ -117,6 +117,7 @@ def create_gemini_router(
         async def generate_content(
             model: str,
             request: GeminiRequest,
+            http_request: Request,
             authorization: Optional[str] = Header(None, alias="Authorization"),
             x_goog_api_key: Optional[str] = Header(None, alias="x-goog-api-key"),
         ):
@@ -148,7 +149,9 @@ def create_gemini_router(
             chat_request = convert_to_chat_request(request, model, api_key)
 
             try:
-                response = await chat_handler.handle_request(chat_request)
+                response = await chat_handler.handle_request(
+                    chat_request, http_request=http_request
+                )
                 return convert_to_gemini_response(response, model, request)
 
             except RoutingException as e:
@@ -182,6 +185,7 @@ def create_gemini_router(
         async def stream_generate_content(
             model: str,
             request: GeminiRequest,
+            alt: Optional[str] = Query(None, description="sse 或省略（JSON数组）"),
             authorization: Optional[str] = Header(None, alias="Authorization"),
             x_goog_api_key: Optional[str] = Header(None, alias="x-goog-api-key"),
         ):
@@ -214,10 +218,11 @@ def create_gemini_router(
             chat_request.stream = True
 
             try:
-                # 流式响应
-                return StreamingResponse(
-                    stream_gemini_response(chat_handler, chat_request, model),
-                    media_type="text/event-stream",
+                # 流式响应：alt=sse 为SSE帧，否则为逐步写出的JSON数组
+                sse = alt == "sse"
+                return DisconnectAwareStreamingResponse(
+                    stream_gemini_response(chat_handler, chat_request, model, sse),
+                    media_type="text/event-stream" if sse else "application/json",
                     headers={
                         "Cache-Control": "no-cache",
                         "Connection": "keep-alive",
@@ -410,24 +415,41 @@ def convert_to_gemini_response(
 
 
 async def stream_gemini_response(
-    chat_handler: ChatCompletionHandler, request: ChatCompletionRequest, model: str
+    chat_handler: ChatCompletionHandler,
+    request: ChatCompletionRequest,
+    model: str,
+    sse: bool = True,
 ):
-    """流式生成Gemini格式响应"""
+    """流式生成Gemini格式响应（逐事件转换为GenerateContentResponse帧）"""
+
+    translator = GeminiStreamTranslator(model, sse=sse)
+    request_id = f"gemini_{uuid.uuid4().hex}"
 
     try:
-        # 使用chat_handler的流式处理
-        async for chunk in chat_handler.handle_stream_request(request):
-            yield chunk
+        start_time = time.time()
+        routing_result = await chat_handler._route_request_with_fallback(
+            request, start_time
+        )
+        if not routing_result.candidates:
+            yield translator.error("No available channels for the requested model", 404)
+        else:
+            stream = chat_handler._execute_stream_request_with_retry(
+                request, routing_result, start_time, request_id
+            )
+            try:
+                async for chunk in stream:
+                    for frame in translator.feed(chunk):
+                        yield frame
+            finally:
+                # 客户端断开时立即关闭上游流
+                await stream.aclose()
     except Exception as e:
         logger.error(f"Stream error: {e}")
-        error_chunk = {
-            "error": {
-                "code": 500,
-                "message": "Stream processing error",
-                "status": "FAILED",
-            }
-        }
-        yield f"data: {json.dumps(error_chunk)}\n\n"
+        yield translator.error("Stream processing error")
+
+    # 最后一帧带 finishReason 和 usageMetadata（JSON数组模式同时写出结尾）
+    for frame in translator.finish():
+        yield frame
 
 
 # --- 错误处理 ---
@@ -15,8 +15,16 @@ from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 
 from core.json_router import JSONRouter
+from core.router.prefix_affinity import get_prefix_affinity
+from core.utils.api_key_pool import get_api_key_pool
+from core.utils.client_disconnect import get_disconnect_monitor
+from core.utils.concurrency_limiter import get_concurrency_limiter
+from core.utils.latency_sketch import ALL_MODELS, get_latency_tracker
 from core.utils.model_capabilities import get_model_capabilities_from_openrouter
 from core.utils.model_channel_blacklist import get_model_blacklist_manager
+from core.utils.price_table import get_price_table
+from core.utils.response_cache import get_response_cache
+from core.utils.stream_failover import get_stream_failover_policy
 from core.yaml_config import YAMLConfigLoader
 
 logger = logging.getLogger(__name__)
@@ -83,6 +91,9 @@ def create_status_monitor_router(
         """获取所有渠道状态"""
         channels = config_loader.get_enabled_channels()
         blacklist_manager = get_model_blacklist_manager()
+        concurrency_limiter = get_concurrency_limiter()
+        latency_tracker = get_latency_tracker()
+        api_key_pool = get_api_key_pool()
 
         channels_data = []
         for channel in channels:
@@ -114,6 +125,7 @@ def create_status_monitor_router(
                     "provider": channel.provider,
                     "enabled": channel.enabled,
                     "has_api_key": bool(channel.api_key),
+                    "api_keys": api_key_pool.get_channel_status(channel.id),
                     "health_score": health_score,
                     "status": (
                         "healthy"
@@ -124,6 +136,10 @@ def create_status_monitor_router(
                     "blacklisted_models": len(blacklisted_models),
                     "available_models": total_models - len(blacklisted_models),
                     "priority": channel.priority,
+                    "concurrency": concurrency_limiter.get_channel_status(channel.id),
+                    "latency": latency_tracker.get_channel_summary(channel.id).get(
+                        ALL_MODELS
+                    ),
                     "last_updated": datetime.now().isoformat(),
                 }
             )
@@ -155,10 +171,9 @@ def create_status_monitor_router(
 
                 # 🔧 修复：为字符串格式的模型获取pricing信息
                 try:
-                    from core.utils.cost_estimator import CostEstimator
-
-                    estimator = CostEstimator()
-                    model_pricing = estimator._get_model_pricing(channel_id, model_name)
+                    model_pricing = get_price_table().get_pricing(
+                        channel_id, model_name
+                    )
                     if (
                         model_pricing
                         and "input" in model_pricing
@@ -302,14 +317,13 @@ def create_status_monitor_router(
                 try:
                     # 使用路由器的成本估算，这会正确应用汇率折扣
                     estimated_cost = router._estimate_cost_for_channel(
-                        channel, routing_request
+                        channel, routing_request, score.matched_model
                     )
 
                     # 获取实际定价信息（如果可用）
-                    from core.utils.cost_estimator import CostEstimator
-
-                    estimator = CostEstimator()
-                    model_pricing = estimator._get_model_pricing(channel.id, model_name)
+                    model_pricing = get_price_table().get_pricing(
+                        channel.id, model_name
+                    )
 
                     # 检查汇率折扣信息
                     currency_discount_info = None
@@ -468,6 +482,69 @@ def create_status_monitor_router(
             "timestamp": datetime.now().isoformat(),
         }
 
+    @api_router.get("/api/concurrency")
+    async def get_concurrency_status() -> dict[str, Any]:
+        """获取各渠道自适应并发上限与在途请求数"""
+        return {
+            **get_concurrency_limiter().get_stats(),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    @api_router.get("/api/keys")
+    async def get_api_key_status() -> dict[str, Any]:
+        """获取多Key渠道的Key池状态（Key以摘要显示）"""
+        return {
+            **get_api_key_pool().get_stats(),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    @api_router.get("/api/response-cache")
+    async def get_response_cache_status() -> dict[str, Any]:
+        """获取响应缓存命中率、条目数与节省的成本"""
+        return {
+            **get_response_cache().get_stats(),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    @api_router.get("/api/prefix-affinity")
+    async def get_prefix_affinity_status() -> dict[str, Any]:
+        """获取前缀亲和路由命中情况与上游提示词缓存命中的token比例"""
+        return {
+            **get_prefix_affinity().get_stats(),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    @api_router.get("/api/stream-failover")
+    async def get_stream_failover_status() -> dict[str, Any]:
+        """获取流式请求首字节前故障转移的次数（TTFB超时、错误状态、错误事件、连接失败）"""
+        return {
+            **get_stream_failover_policy().get_stats(),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    @api_router.get("/api/client-disconnect")
+    async def get_client_disconnect_status() -> dict[str, Any]:
+        """获取因客户端断开而取消的上游请求数、部分用量与估算节省的输出token"""
+        return {
+            **get_disconnect_monitor().get_stats(),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    @api_router.get("/api/latency")
+    async def get_latency_status(channel_id: Optional[str] = None) -> dict[str, Any]:
+        """获取各渠道/模型的 TTFB 与完整耗时分位数（p50/p95/p99，秒）"""
+        latency_tracker = get_latency_tracker()
+        if channel_id:
+            return {
+                "channel_id": channel_id,
+                "models": latency_tracker.get_channel_summary(channel_id),
+                "timestamp": datetime.now().isoformat(),
+            }
+        return {
+            **latency_tracker.get_stats(),
+            "timestamp": datetime.now().isoformat(),
+        }
+
     @api_router.websocket("/ws")
     async def websocket_endpoint(websocket: WebSocket) -> None:
         """WebSocket连接用于实时更新"""
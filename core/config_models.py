@@ -25,6 +25,9 @@ class Channel(BaseModel):
     provider: str
     model_name: str
     api_key: str
+    # Additional keys pooled with api_key; requests rotate across all of them
+    api_keys: list[str] = Field(default_factory=list)
+    key_rotation: str = "round_robin"  # "round_robin" or "least_loaded"
     base_url: Optional[str] = None
     enabled: bool = True
     priority: int = 1
@@ -57,6 +60,129 @@ class Channel(BaseModel):
     min_request_interval: int = Field(
         default=0, description="Minimum seconds between requests (0 = no limit)"
     )  # 最小请求间隔(秒)
+    rpm: Optional[int] = Field(default=None, description="Requests per minute limit")
+    tpm: Optional[int] = Field(default=None, description="Tokens per minute limit")
+    # Seconds to wait for the first valid streamed event before failing over;
+    # None derives the deadline from the channel's TTFB history
+    ttfb_timeout: Optional[float] = None
+
+
+class CircuitBreakerConfig(BaseModel):
+    """Per (channel, model) circuit breaker settings."""
+
+    enabled: bool = True
+    window_size: int = 20  # Sliding window of recent outcomes
+    min_requests: int = 5  # Outcomes needed before the failure rate applies
+    failure_rate_threshold: float = 0.5
+    consecutive_failure_threshold: int = 3
+    open_timeout: float = 30.0  # Seconds before the first half-open trial
+    max_open_timeout: float = 300.0  # Cap for the doubling open timeout
+    half_open_max_calls: int = 1  # Live trial requests allowed concurrently
+    half_open_success_threshold: int = 2  # Trial successes needed to close
+    trial_timeout: float = 120.0  # Reclaim trial slots that never report
+
+
+class HedgingConfig(BaseModel):
+    """Hedged non-streaming requests (opt-in)."""
+
+    enabled: bool = False
+    latency_quantile: float = 0.9  # Hedge once the primary exceeds this quantile
+    min_samples: int = 20  # Channel latency samples needed before hedging
+    min_delay: float = 0.5  # Seconds; lower bound for the hedge trigger
+    max_delay: float = 30.0  # Seconds; upper bound for the hedge trigger
+    budget_ratio: float = 0.05  # Hedges allowed per eligible request
+    budget_burst: float = 10.0  # Maximum accumulated hedge budget
+
+
+class ConcurrencyConfig(BaseModel):
+    """Adaptive (AIMD) per-channel concurrency limits."""
+
+    enabled: bool = True
+    initial_limit: int = 10
+    min_limit: int = 1
+    max_limit: int = 100  # Matches the HTTP pool's per-host connection limit
+    backoff_ratio: float = 0.5  # Multiplicative decrease on 429/503
+    latency_backoff_ratio: float = 0.9  # Decrease when latency grows
+    latency_tolerance: float = 2.0  # Recent TTFB above long-run avg * tolerance
+    decrease_cooldown: float = 1.0  # Seconds; one decrease per burst
+    lease_timeout: float = 300.0  # Reclaim permits that were never released
+
+
+class RateLimitConfig(BaseModel):
+    """Token-bucket rate limiting per channel and per API key."""
+
+    enabled: bool = True
+    max_queue_wait: float = 2.0  # Seconds a request may wait for capacity
+    respect_upstream_headers: bool = True  # Sync key buckets from x-ratelimit-*
+    header_window: float = 60.0  # Seconds; window assumed for upstream limits
+
+
+class LoadBalancingConfig(BaseModel):
+    """Power-of-two-choices spreading across near-equal candidates."""
+
+    enabled: bool = True
+    score_epsilon: float = 0.02  # Candidates within this total score are equal
+    max_group_size: int = 6  # Matches the primary + backups kept per route
+    metric: str = "in_flight"  # "in_flight" or "latency"; the other breaks ties
+
+
+class KeyPoolConfig(BaseModel):
+    """Per-channel API key pools."""
+
+    enabled: bool = True
+    quota_cooldown: float = 3600.0  # Seconds a key is retired after 402/quota
+    rate_limit_cooldown: float = 60.0  # Seconds after 429 without Retry-After
+    load_half_life: float = 60.0  # Seconds; decay of least_loaded key load
+
+
+class PrefixAffinityConfig(BaseModel):
+    """Sticky routing of shared prompt prefixes to keep upstream caches warm."""
+
+    enabled: bool = True
+    score_tolerance: float = 0.05  # Max score gap to still prefer the affine channel
+    ttl: float = 300.0  # Seconds; roughly the upstream prompt-cache lifetime
+    max_entries: int = 10000
+    prefix_messages: int = 1  # Non-system messages hashed with the system prompt
+    min_prompt_chars: int = 4000  # Shorter prompts fall below cache thresholds
+
+
+class StreamFailoverConfig(BaseModel):
+    """Transparent failover for streams that fail before the first byte."""
+
+    enabled: bool = True
+    ttfb_timeout: float = 30.0  # Seconds; deadline without TTFB history, and cap
+    min_ttfb_timeout: float = 5.0  # Lower bound for the adaptive deadline
+    latency_quantile: float = 0.95  # TTFB quantile the deadline is based on
+    latency_multiplier: float = 3.0  # Deadline = quantile * multiplier
+
+
+class ClientDisconnectConfig(BaseModel):
+    """Cancel upstream requests when the downstream client goes away."""
+
+    enabled: bool = True
+    poll_interval: float = 1.0  # Seconds between disconnect checks (non-streaming)
+    default_completion_tokens: int = 1024  # Output budget when max_tokens is unset
+
+
+class CoalescingConfig(BaseModel):
+    """Single-flight coalescing of identical non-streaming requests (opt-in)."""
+
+    enabled: bool = False
+
+
+class ResponseCacheConfig(BaseModel):
+    """Exact-match cache for deterministic non-streaming responses (opt-in)."""
+
+    enabled: bool = False
+    default_ttl: float = 3600.0  # Seconds
+    max_entries: int = 1000  # In-memory LRU entry limit
+    max_memory_mb: float = 64.0  # In-memory LRU size limit
+    disk_enabled: bool = False  # Persist entries under disk_dir
+    disk_dir: str = "cache/responses"
+    disk_max_entries: int = 10000
+    # TTL overrides in seconds; a model entry wins over tags, 0 disables caching
+    ttl_by_model: dict[str, float] = Field(default_factory=dict)
+    ttl_by_tag: dict[str, float] = Field(default_factory=dict)
 
 
 class Routing(BaseModel):
@@ -65,6 +191,19 @@ class Routing(BaseModel):
     max_retry_attempts: int = 3
     health_check_interval: int = 300
     error_cooldown_period: int = 60
+    circuit_breaker: CircuitBreakerConfig = Field(default_factory=CircuitBreakerConfig)
+    hedging: HedgingConfig = Field(default_factory=HedgingConfig)
+    concurrency: ConcurrencyConfig = Field(default_factory=ConcurrencyConfig)
+    rate_limit: RateLimitConfig = Field(default_factory=RateLimitConfig)
+    load_balancing: LoadBalancingConfig = Field(default_factory=LoadBalancingConfig)
+    key_pool: KeyPoolConfig = Field(default_factory=KeyPoolConfig)
+    prefix_affinity: PrefixAffinityConfig = Field(default_factory=PrefixAffinityConfig)
+    stream_failover: StreamFailoverConfig = Field(default_factory=StreamFailoverConfig)
+    client_disconnect: ClientDisconnectConfig = Field(
+        default_factory=ClientDisconnectConfig
+    )
+    coalescing: CoalescingConfig = Field(default_factory=CoalescingConfig)
+    response_cache: ResponseCacheConfig = Field(default_factory=ResponseCacheConfig)
 
 
 class TaskConfig(BaseModel):
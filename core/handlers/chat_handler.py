@@ -3,11 +3,13 @@ Chat completion request handler with improved architecture
 """
 
 import asyncio
+import contextlib
+import itertools
 import json
 import logging
 import time
 import uuid
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Iterable
 from dataclasses import dataclass
 from typing import Any, Optional, Union, cast
 
@@ -17,31 +19,56 @@ from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 from ..json_router import JSONRouter, RoutingRequest, RoutingScore, TagNotFoundError
+from ..router.prefix_affinity import get_prefix_affinity
+from ..router.ranking import RankedCandidates
 from ..utils.adapter_manager import get_adapter_manager
+from ..utils.api_key_pool import get_api_key_pool
+from ..utils.channel_health import get_health_tracker
 from ..utils.channel_monitor import check_api_error_and_alert
+from ..utils.circuit_breaker import get_circuit_breakers
+from ..utils.client_disconnect import (
+    ClientDisconnected,
+    DisconnectAwareStreamingResponse,
+    get_disconnect_monitor,
+)
+from ..utils.concurrency_limiter import ConcurrencyPermit, get_concurrency_limiter
+from ..utils.hedging import get_hedging_policy
 from ..utils.http_client_pool import get_http_pool
+from ..utils.latency_sketch import get_latency_tracker
 from ..utils.logging_integration import (
     get_enhanced_logger,
     log_api_request,
     log_channel_operation,
 )
 from ..utils.model_channel_blacklist import get_model_blacklist_manager
+from ..utils.price_table import get_price_table
+from ..utils.rate_limiter import estimate_request_tokens, get_rate_limiter
 from ..utils.request_cache import get_request_cache
-from ..utils.request_interval_manager import get_request_interval_manager
+from ..utils.request_coalescer import get_request_coalescer
 from ..utils.response_aggregator import RequestMetadata, get_response_aggregator
+from ..utils.response_cache import CachedResponse, get_response_cache
 from ..utils.session_manager import get_session_manager
-from ..utils.smart_cache import cache_get, cache_set
+from ..utils.sse_parser import SSEEvent, SSEParser
+from ..utils.stream_failover import StreamFailoverError, get_stream_failover_policy
 from ..utils.text_processor import clean_model_response
 from ..utils.token_counter import get_cost_tracker
 from ..utils.token_estimator import (
     get_model_optimizer,
     get_token_estimator,
 )
-from ..utils.usage_tracker import create_usage_record, get_usage_tracker
+from ..utils.usage_tracker import (
+    CACHE_HIT_STATUS,
+    COALESCED_STATUS,
+    create_usage_record,
+    get_usage_tracker,
+)
 from ..yaml_config import YAMLConfigLoader
 
 logger = logging.getLogger(__name__)
 
+# 即发即弃的后台任务（如对冲落败方的用量记录），保留引用直到完成
+_background_tasks: set[asyncio.Task] = set()
+
 
 # Status logging is now handled at the API level
 def status_log_request(*args: Any, **kwargs: Any) -> None:
@@ -79,9 +106,10 @@ class ChatCompletionRequest(BaseModel):
 class RoutingResult:
     """路由结果包装"""
 
-    candidates: list[RoutingScore]
+    candidates: RankedCandidates  # 头部已排序，其余候选在故障转移用尽头部后才排序
     execution_time: float
     total_candidates: int
+    prefix_key: Optional[str] = None  # 提示词前缀哈希，成功后记录前缀亲和
 
 
 @dataclass
@@ -108,9 +136,21 @@ class ChatCompletionHandler:
         self.router = router
 
     async def handle_request(
-        self, request: ChatCompletionRequest
+        self,
+        request: ChatCompletionRequest,
+        coalesce: Optional[bool] = None,
+        cache: Optional[bool] = None,
+        http_request: Optional[Any] = None,
     ) -> Union[JSONResponse, StreamingResponse]:
-        """处理聊天完成请求的主入口"""
+        """
+        处理聊天完成请求的主入口
+
+        Args:
+            request: 聊天完成请求
+            coalesce: 客户端显式开启/关闭请求合并（None时按温度判断）
+            cache: 客户端显式开启/关闭响应缓存（None时按温度判断）
+            http_request: Starlette请求对象，用于在客户端断开时取消非流式上游请求
+        """
         start_time = time.time()
         request_id = f"req_{uuid.uuid4().hex[:8]}"
 
@@ -130,6 +170,55 @@ class ChatCompletionHandler:
             f"REQUEST DETAILS: [{request_id}] {len(request.messages)} messages, max_tokens: {request.max_tokens}, temperature: {request.temperature}"
         )
 
+        # 确定性非流式请求先查响应缓存
+        response_cache = get_response_cache()
+        cache_key = None
+        if not request.stream:
+            cache_ttl = response_cache.ttl_for(
+                request.model, self._extract_request_tags(request)
+            )
+            if response_cache.is_cacheable(request.temperature, cache_ttl, cache):
+                cache_key = response_cache.request_key(request.model_dump())
+                cached = await response_cache.get(cache_key)
+                if cached is not None:
+                    return await self._create_cached_response(
+                        cached, request, request_id, start_time
+                    )
+
+        # 相同的确定性非流式请求同时在途时只转发一次
+        coalescer = get_request_coalescer()
+        if not request.stream and coalescer.is_eligible(request.temperature, coalesce):
+            response, executed = await coalescer.run(
+                coalescer.request_key(request.model_dump()),
+                lambda: self._process_request(
+                    request, start_time, request_id, cache_key
+                ),
+            )
+            if executed:
+                return response
+            return await self._create_coalesced_response(
+                response, request, request_id, start_time
+            )
+
+        # 合并请求的结果可能还有其他等待者，只对独立请求传递客户端断开
+        try:
+            return await get_disconnect_monitor().run(
+                self._process_request(request, start_time, request_id, cache_key),
+                None if request.stream else http_request,
+            )
+        except ClientDisconnected:
+            return self._create_client_disconnected_response(
+                request.model, time.time() - start_time
+            )
+
+    async def _process_request(
+        self,
+        request: ChatCompletionRequest,
+        start_time: float,
+        request_id: str,
+        cache_key: Optional[str] = None,
+    ) -> Union[JSONResponse, StreamingResponse]:
+        """路由、成本估算并执行请求（cache_key 非空时成功响应写入响应缓存）"""
         try:
             # 步骤1: 路由请求获取候选渠道
             routing_result = await self._route_request_with_fallback(
@@ -146,8 +235,21 @@ class ChatCompletionHandler:
             )
 
             # 步骤3: 执行请求并处理重试
+            if request.stream:
+                # 流式请求走带TTFB截止与故障转移的重试循环，首字节前可切换渠道
+                return DisconnectAwareStreamingResponse(
+                    self._execute_stream_request_with_retry(
+                        request, routing_result, start_time, request_id, cost_preview
+                    ),
+                    media_type="text/event-stream",
+                )
             return await self._execute_request_with_retry(
-                request, routing_result, start_time, request_id, cost_preview
+                request,
+                routing_result,
+                start_time,
+                request_id,
+                cost_preview,
+                cache_key=cache_key,
             )
 
         except TagNotFoundError as e:
@@ -161,6 +263,139 @@ class ChatCompletionHandler:
                 e, request.model, time.time() - start_time
             )
 
+    async def _create_coalesced_response(
+        self,
+        response: JSONResponse,
+        request: ChatCompletionRequest,
+        request_id: str,
+        start_time: float,
+    ) -> JSONResponse:
+        """为合并的重复请求复制在途请求的响应，使用量按零成本命中记录"""
+        content = json.loads(response.body)
+        summary = content.get("smart_ai_router") if isinstance(content, dict) else None
+        if response.status_code != 200 or not summary:
+            return JSONResponse(content=content, status_code=response.status_code)
+
+        leader_request_id = summary["request_id"]
+        summary["request_id"] = request_id
+        summary["coalesced_with"] = leader_request_id
+        summary["cost"]["request"] = dict.fromkeys(
+            summary["cost"]["request"], "$0.000000"
+        )
+        logger.info(
+            f"COALESCED: [{request_id}] Shared the response of identical in-flight request [{leader_request_id}]"
+        )
+
+        routing_channel = summary["routing"]["channel"]
+        channel = self.config.get_channel_by_id(routing_channel["id"])
+        if channel:
+            usage = content.get("usage") or {}
+            await self._record_usage_async(
+                request_id,
+                request,
+                channel,
+                content.get("model", "unknown"),
+                usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0),
+                {"input_cost": 0.0, "output_cost": 0.0, "total_cost": 0.0},
+                time.time() - start_time,
+                COALESCED_STATUS,
+            )
+
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name.lower().startswith("x-router-")
+            and name.lower() != "x-router-request-id"
+        }
+        headers["X-Router-Request-ID"] = request_id
+        headers["X-Router-Coalesced-With"] = leader_request_id
+
+        self._log_status_request(request, routing_channel["name"], start_time)
+        return JSONResponse(content=content, headers=headers)
+
+    async def _create_cached_response(
+        self,
+        entry: CachedResponse,
+        request: ChatCompletionRequest,
+        request_id: str,
+        start_time: float,
+    ) -> JSONResponse:
+        """由响应缓存直接返回，使用量按零成本命中记录，原始成本计为节省"""
+        age = time.time() - entry.created_at
+        logger.info(
+            f"CACHE HIT: [{request_id}] Serving cached response from channel '{entry.channel_name}' (age: {age:.0f}s, saved: ${entry.cost:.6f})"
+        )
+
+        aggregator = get_response_aggregator()
+        aggregator.create_request_metadata(
+            request_id=request_id,
+            model_requested=request.model,
+            model_used=entry.model_used,
+            channel_name=entry.channel_name,
+            channel_id=entry.channel_id,
+            provider=entry.provider,
+            attempt_count=0,
+            is_streaming=False,
+            routing_reason="CACHE_HIT",
+        )
+        aggregator.update_tokens(
+            request_id,
+            entry.prompt_tokens,
+            entry.completion_tokens,
+            entry.prompt_tokens + entry.completion_tokens,
+        )
+        aggregator.update_cache(request_id, "HIT", age)
+        debug_headers = aggregator.get_headers_summary(request_id)
+        final_metadata = aggregator.finish_request(request_id)
+
+        channel = self.config.get_channel_by_id(entry.channel_id)
+        if channel:
+            await self._record_usage_async(
+                request_id,
+                request,
+                channel,
+                entry.model_used,
+                entry.prompt_tokens,
+                entry.completion_tokens,
+                {
+                    "input_cost": 0.0,
+                    "output_cost": 0.0,
+                    "total_cost": 0.0,
+                    "saved_cost": entry.cost,
+                },
+                time.time() - start_time,
+                CACHE_HIT_STATUS,
+            )
+
+        self._log_status_request(request, entry.channel_name, start_time)
+        return JSONResponse(
+            content=aggregator.enhance_response_with_summary(
+                entry.response, final_metadata
+            ),
+            headers=debug_headers,
+        )
+
+    def _log_status_request(
+        self, request: ChatCompletionRequest, channel_name: str, start_time: float
+    ) -> None:
+        """记录未经过上游转发的成功请求到状态监控"""
+        try:
+            from api.status_monitor import log_request, set_request_channel
+
+            set_request_channel(channel_name)
+            log_request(
+                method="POST",
+                path="/v1/chat/completions",
+                status_code=200,
+                duration_ms=(time.time() - start_time) * 1000,
+                model=request.model,
+                channel=None,  # Will get from thread-local storage
+                error=None,
+            )
+        except ImportError:
+            pass
+
     async def handle_stream_request(
         self, request: ChatCompletionRequest
     ) -> StreamingResponse:
@@ -187,7 +422,7 @@ class ChatCompletionHandler:
                 )
 
             # 步骤2: 执行流式请求
-            return StreamingResponse(
+            return DisconnectAwareStreamingResponse(
                 self._execute_stream_request_with_retry(
                     request, routing_result, start_time, request_id
                 ),
@@ -207,10 +442,14 @@ class ChatCompletionHandler:
         routing_result: RoutingResult,
         start_time: float,
         request_id: str,
+        cost_preview: Optional[dict[str, Any]] = None,
     ) -> AsyncGenerator[str, None]:
         """执行流式请求并处理重试逻辑"""
         last_error = None
         failed_channels = set()
+        rate_limiter = get_rate_limiter()
+        request_tokens = self._estimate_request_tokens(request)
+        failover_policy = get_stream_failover_policy()
 
         for attempt_num, routing_score in enumerate(routing_result.candidates, 1):
             channel = routing_score.channel
@@ -222,32 +461,50 @@ class ChatCompletionHandler:
             if not provider:
                 continue
 
-            # 检查渠道间隔限制，如果需要等待则跳过
-            interval_manager = get_request_interval_manager()
-            min_interval = getattr(channel, "min_request_interval", 0)
-            logger.info(
-                f"🔍 STREAM INTERVAL CHECK: Channel '{channel.name}' min_interval={min_interval}s"
-            )
-            if min_interval > 0:
-                is_ready = interval_manager.is_channel_ready(channel.id, min_interval)
+            # 多Key渠道：按轮询/最低负载选择本次使用的Key
+            channel = get_api_key_pool().select(channel, request_tokens)
+
+            # 限流检查：预计等待超过排队截止时间则跳过
+            wait_time = rate_limiter.estimate_wait(channel, request_tokens)
+            if wait_time > rate_limiter.max_queue_wait:
                 logger.info(
-                    f"🔍 STREAM INTERVAL CHECK: Channel '{channel.name}' is_ready={is_ready}"
+                    f"⏭️ STREAM SKIP #{attempt_num}: Channel '{channel.name}' needs to wait {wait_time:.1f}s for rate limit capacity, trying next channel"
                 )
-                if not is_ready:
-                    wait_time = interval_manager.get_remaining_wait_time(
-                        channel.id, min_interval
-                    )
-                    logger.info(
-                        f"⏭️ STREAM SKIP #{attempt_num}: Channel '{channel.name}' needs to wait {wait_time:.1f}s (min_interval={min_interval}s), trying next channel"
-                    )
-                    continue
+                continue
+
+            # 并发上限检查：渠道已满时直接溢出到下一个候选，不排队
+            permit = get_concurrency_limiter().try_acquire(channel.id)
+            if permit is None:
+                logger.info(
+                    f"⏭️ STREAM SKIP #{attempt_num}: Channel '{channel.name}' is at its concurrency limit, trying next channel"
+                )
+                continue
+
+            # 熔断器只读检查：打开状态跳过（试探名额在限流预约成功后才占用）
+            model_name = routing_score.matched_model or channel.model_name
+            circuit_breakers = get_circuit_breakers()
+            if not circuit_breakers.can_attempt(channel.id, model_name):
+                permit.release()
+                logger.info(
+                    f"⏭️ STREAM SKIP #{attempt_num}: Circuit open for '{model_name}' on channel '{channel.name}', trying next channel"
+                )
+                continue
 
-            # 在发送流式请求前记录时间（用于间隔控制）
-            if min_interval > 0:
-                interval_manager.record_request(channel.id)
+            # 预约限流额度，需要时短暂排队
+            if not await rate_limiter.acquire(channel, request_tokens):
+                permit.release()
                 logger.info(
-                    f"🔍 STREAM INTERVAL RECORDED: Channel '{channel.name}' request time recorded"
+                    f"⏭️ STREAM SKIP #{attempt_num}: Channel '{channel.name}' rate limit capacity taken, trying next channel"
                 )
+                continue
+
+            # 最后占用熔断器名额：半开状态只放行少量试探请求
+            if not circuit_breakers.allow_request(channel.id, model_name):
+                permit.release()
+                logger.info(
+                    f"⏭️ STREAM SKIP #{attempt_num}: Circuit trial for '{model_name}' on channel '{channel.name}' already in flight, trying next channel"
+                )
+                continue
 
             try:
                 channel_info = self._prepare_channel_request_info(
@@ -270,37 +527,65 @@ class ChatCompletionHandler:
                     ),
                     routing_score=routing_score.total_score,
                     routing_reason=routing_score.reason,
+                    cost_preview=cost_preview,
                 )
+                metadata.prefix_key = routing_result.prefix_key
 
                 # 执行流式请求 - 直接yield流式响应的内容
-                async for chunk in self._stream_channel_api_with_summary(
+                stream = self._stream_channel_api_with_summary(
                     channel_info.url,
                     channel_info.headers,
                     channel_info.request_data,
                     channel_info.channel.id,
                     metadata,
-                ):
-                    yield chunk
+                    model_name,
+                    permit,
+                    channel_info.channel.api_key,
+                    ttfb_deadline=failover_policy.ttfb_deadline(channel, model_name),
+                    failover=failover_policy.enabled,
+                )
+                try:
+                    async for chunk in stream:
+                        yield chunk
+                finally:
+                    # 本生成器被关闭（客户端断开）时立即关闭上游流，不等垃圾回收
+                    await stream.aclose()
 
                 return  # 成功则退出
 
+            except StreamFailoverError as e:
+                # 尚未向客户端输出任何字节，透明切换到下一个候选渠道
+                last_error = e
+                failed_channels.add(channel.id)
+                logger.warning(
+                    f"STREAM FAILOVER #{attempt_num}: {e.message}, trying next channel"
+                )
+                continue
             except Exception as e:
                 last_error = e
                 failed_channels.add(channel.id)
                 logger.error(f"Stream attempt {attempt_num} failed: {e}")
                 continue
+            finally:
+                permit.release()
 
         # 所有渠道都失败
         yield self._create_stream_error(
-            "all_channels_failed", str(last_error or "All channels failed")
+            "all_channels_failed",
+            str(last_error or "All channels failed"),
+            getattr(last_error, "status_code", None),
         )
 
-    def _create_stream_error(self, error_type: str, message: str) -> str:
-        """创建流式错误消息"""
-        error_data = {
+    def _create_stream_error(
+        self, error_type: str, message: str, code: Optional[int] = None
+    ) -> str:
+        """创建流式错误消息（code 为最后一个上游的状态码）"""
+        error_data: dict[str, Any] = {
             "type": "error",
             "error": {"type": error_type, "message": message},
         }
+        if code is not None:
+            error_data["error"]["code"] = code
         return f"data: {json.dumps(error_data)}\n\n"
 
     async def _error_stream_generator(
@@ -313,42 +598,53 @@ class ChatCompletionHandler:
         self, request: ChatCompletionRequest, start_time: float
     ) -> RoutingResult:
         """执行路由请求和智能预检"""
+        messages = [msg.dict() for msg in request.messages]
+        # 共享长前缀的请求优先路由到上次服务的渠道，命中上游提示词缓存
+        prefix_key = get_prefix_affinity().prefix_key(messages, request.system)
         routing_request = RoutingRequest(
             model=request.model,
-            messages=[msg.dict() for msg in request.messages],
+            messages=messages,
             stream=request.stream,
             required_capabilities=self._infer_capabilities(request),
             data=request.dict(),  # 传递完整的请求数据用于能力检测
+            prefix_key=prefix_key,
         )
 
         logger.info(
             f"CHANNEL ROUTING: Starting routing process for model '{request.model}'"
         )
-        candidate_channels = await self.router.route_request(routing_request)
+        candidate_channels = await self.router.route_request_ranked(routing_request)
 
         if not candidate_channels:
             return RoutingResult(
-                candidates=[],
+                candidates=RankedCandidates([]),
                 execution_time=time.time() - start_time,
                 total_candidates=0,
+                prefix_key=prefix_key,
             )
 
         logger.info(
             f"CHANNEL SELECTION: Processing {len(candidate_channels)} channels with intelligent routing"
         )
 
-        # 智能渠道预检 - 如果有多个渠道，先并发检查前3个
+        # 智能渠道预检 - 如果有多个渠道，根据被动健康状态调整前3个的顺序（不等待探测）
         if len(candidate_channels) > 1:
-            await self._perform_concurrent_channel_check(candidate_channels)
+            head = candidate_channels.top(candidate_channels.head_size)
+            self._prioritize_available_channel(head)
+            candidate_channels = candidate_channels.with_head(head)
 
         return RoutingResult(
             candidates=candidate_channels,
             execution_time=time.time() - start_time,
             total_candidates=len(candidate_channels),
+            prefix_key=prefix_key,
         )
 
     async def _perform_cost_estimation(
-        self, request: ChatCompletionRequest, candidate_channels: list, request_id: str
+        self,
+        request: ChatCompletionRequest,
+        candidate_channels: RankedCandidates,
+        request_id: str,
     ) -> Optional[dict[str, Any]]:
         """执行Token预估和智能模型推荐"""
         try:
@@ -364,24 +660,28 @@ class ChatCompletionHandler:
 
             # 进行Token预估
             token_estimate = token_estimator.estimate_tokens(messages)
+            price_table = get_price_table()
 
             # 准备候选渠道信息（包含定价）
             available_channels = []
-            for channel_score in candidate_channels[:15]:  # 分析前15个候选
+            # 分析已排序头部中的前15个候选，不为预估触发其余候选的排序
+            for channel_score in candidate_channels.top(
+                min(15, candidate_channels.head_size)
+            ):
                 channel = channel_score.channel
 
                 # 尝试获取定价信息
                 input_price = getattr(channel, "input_price", 0.0)
                 output_price = getattr(channel, "output_price", 0.0)
 
-                # 如果没有定价信息，尝试从定价数据中获取
+                # 如果没有定价信息，从价格表获取（与路由成本评分同源，每百万token价格）
                 if input_price == 0.0 and output_price == 0.0:
-                    pricing_info = self._get_model_pricing(
-                        channel.model_name, channel.provider
+                    prices = price_table.get_prices(
+                        channel.id, channel_score.matched_model or request.model
                     )
-                    if pricing_info:
-                        input_price = pricing_info.get("input_price", 0.0)
-                        output_price = pricing_info.get("output_price", 0.0)
+                    if prices:
+                        input_price = prices[0] * 1000000
+                        output_price = prices[1] * 1000000
 
                 available_channels.append(
                     {
@@ -479,105 +779,73 @@ class ChatCompletionHandler:
             logger.warning(f"🧠 TOKEN ESTIMATION FAILED: [{request_id}] {e}")
             return None
 
-    def _get_model_pricing(
-        self, model_name: str, provider: str
-    ) -> Optional[dict[str, float]]:
-        """获取模型定价信息"""
-        try:
-            # 尝试从静态定价加载器获取
-            from ..utils.static_pricing import get_static_pricing_loader
-
-            pricing_loader = get_static_pricing_loader()
-
-            if provider == "siliconflow":
-                pricing_result = pricing_loader.get_model_pricing(provider, model_name)
-                if pricing_result:
-                    return {
-                        "input_price": pricing_result.input_price,
-                        "output_price": pricing_result.output_price,
-                    }
-            elif provider == "doubao":
-                pricing_result = pricing_loader._query_doubao_pricing(
-                    model_name, 1000, 100
-                )
-                if pricing_result:
-                    return {
-                        "input_price": pricing_result.input_price,
-                        "output_price": pricing_result.output_price,
-                    }
-
-            return None
-        except Exception as e:
-            logger.warning(f"获取模型定价失败 {model_name}: {e}")
-            return None
+    def _estimate_request_tokens(self, request: ChatCompletionRequest) -> int:
+        """估算请求消耗的Token数，用于TPM限流"""
+        return estimate_request_tokens(
+            [{"content": msg.content} for msg in request.messages], request.max_tokens
+        )
 
-    async def _perform_concurrent_channel_check(
+    def _prioritize_available_channel(
         self, candidate_channels: list[RoutingScore]
     ) -> None:
-        """执行并发渠道可用性检查"""
-        logger.info(
-            f"FAST CHECK: Pre-checking availability of top {min(3, len(candidate_channels))} channels"
-        )
+        """根据真实流量学到的健康状态，将前3个中第一个可用的渠道移到首位"""
+        health_tracker = get_health_tracker()
+        rate_limiter = get_rate_limiter()
+        top_candidates = candidate_channels[:3]
 
-        check_tasks = []
-        for i, routing_score in enumerate(candidate_channels[:3]):
+        # 近期无流量的渠道在后台探测，本次请求按未知状态处理
+        for routing_score in top_candidates:
+            if health_tracker.needs_probe(routing_score.channel.id):
+                self._schedule_channel_probe(routing_score)
+
+        for index, routing_score in enumerate(top_candidates):
             channel = routing_score.channel
-            provider = self.config.get_provider(channel.provider)
-            if provider:
-                channel_info = self._prepare_channel_request_info(
-                    channel, provider, None, routing_score.matched_model
-                )
-                check_tasks.append(
-                    (
-                        i,
-                        channel,
-                        self._fast_channel_check(
-                            channel_info.url, channel_info.headers
-                        ),
-                    )
+            available = health_tracker.is_available(channel.id)
+
+            if available is False:
+                state = health_tracker.get_state(channel.id)
+                logger.info(
+                    f"FAST CHECK: Channel '{channel.name}' unavailable "
+                    f"({state.last_status if state else None}: "
+                    f"{state.last_error if state else 'unknown'}), skipping"
                 )
+                continue
 
-        if check_tasks:
-            check_results = await asyncio.gather(
-                *[task[2] for task in check_tasks], return_exceptions=True
-            )
+            if health_tracker.is_throttled(channel.id):
+                logger.info(
+                    f"FAST CHECK SKIP: Channel '{channel.name}' was recently throttled (429), not prioritizing"
+                )
+                continue
 
-            # 找出第一个可用且符合间隔要求的渠道并移到首位
-            interval_manager = get_request_interval_manager()
-            for i, (original_index, channel, _result) in enumerate(check_tasks):
-                if i < len(check_results) and not isinstance(
-                    check_results[i], Exception
-                ):
-                    is_available, status_code, message = check_results[i]
-                    if is_available:
-                        # 检查间隔限制
-                        min_interval = getattr(channel, "min_request_interval", 0)
-                        logger.info(
-                            f"FAST CHECK DEBUG: Channel '{channel.name}' min_interval={min_interval} (id={channel.id}) type={type(channel)}"
-                        )
-                        if min_interval > 0:
-                            is_ready = interval_manager.is_channel_ready(
-                                channel.id, min_interval
-                            )
-                            if not is_ready:
-                                wait_time = interval_manager.get_remaining_wait_time(
-                                    channel.id, min_interval
-                                )
-                                logger.info(
-                                    f"🔍 FAST CHECK SKIP: Channel '{channel.name}' needs to wait {wait_time:.1f}s (min_interval={min_interval}s), not prioritizing"
-                                )
-                                continue
+            # 检查限流额度
+            wait_time = rate_limiter.estimate_wait(channel)
+            if wait_time > 0:
+                logger.info(
+                    f"🔍 FAST CHECK SKIP: Channel '{channel.name}' needs to wait {wait_time:.1f}s for rate limit capacity, not prioritizing"
+                )
+                continue
 
-                        logger.info(
-                            f"FAST CHECK: Channel '{channel.name}' is available (HTTP {status_code}), prioritizing"
-                        )
-                        priority_channel = candidate_channels.pop(original_index)
-                        candidate_channels.insert(0, priority_channel)
-                        break
-                    else:
-                        logger.info(
-                            f"FAST CHECK: Channel '{channel.name}' unavailable ({status_code}: {message})"
-                        )
+            if index > 0:
+                logger.info(
+                    f"FAST CHECK: Channel '{channel.name}' is available (passive health: {available}), prioritizing"
+                )
+                candidate_channels.insert(0, candidate_channels.pop(index))
+            break
+
+    def _schedule_channel_probe(self, routing_score: RoutingScore) -> None:
+        """为近期无流量的渠道安排后台可用性探测"""
+        channel = routing_score.channel
+        provider = self.config.get_provider(channel.provider)
+        if not provider:
+            return
+
+        channel_info = self._prepare_channel_request_info(
+            channel, provider, None, routing_score.matched_model
+        )
+        get_health_tracker().schedule_probe(
+            channel.id,
+            lambda: self._fast_channel_check(channel_info.url, channel_info.headers),
+        )
 
     async def _execute_request_with_retry(
         self,
@@ -586,10 +854,13 @@ class ChatCompletionHandler:
         start_time: float,
         request_id: str,
         cost_preview: Optional[dict[str, Any]] = None,
+        cache_key: Optional[str] = None,
     ) -> Union[JSONResponse, StreamingResponse]:
         """执行请求并处理重试逻辑"""
         last_error = None
         failed_channels: set[int] = set()  # 智能渠道黑名单
+        rate_limiter = get_rate_limiter()
+        request_tokens = self._estimate_request_tokens(request)
 
         for attempt_num, routing_score in enumerate(routing_result.candidates, 1):
             channel = routing_score.channel
@@ -608,25 +879,34 @@ class ChatCompletionHandler:
                 )
                 continue
 
-            # 检查渠道间隔限制，如果需要等待则跳过
-            interval_manager = get_request_interval_manager()
-            min_interval = getattr(channel, "min_request_interval", 0)
-            logger.info(
-                f"🔍 INTERVAL CHECK: [{request_id}] Channel '{channel.name}' min_interval={min_interval}s"
-            )
-            if min_interval > 0:
-                is_ready = interval_manager.is_channel_ready(channel.id, min_interval)
+            # 多Key渠道：按轮询/最低负载选择本次使用的Key
+            channel = get_api_key_pool().select(channel, request_tokens)
+
+            # 限流检查：预计等待超过排队截止时间则跳过
+            wait_time = rate_limiter.estimate_wait(channel, request_tokens)
+            if wait_time > rate_limiter.max_queue_wait:
                 logger.info(
-                    f"🔍 INTERVAL CHECK: [{request_id}] Channel '{channel.name}' is_ready={is_ready}"
+                    f"⏭️ SKIP #{attempt_num}: [{request_id}] Channel '{channel.name}' needs to wait {wait_time:.1f}s for rate limit capacity, trying next channel"
                 )
-                if not is_ready:
-                    wait_time = interval_manager.get_remaining_wait_time(
-                        channel.id, min_interval
-                    )
-                    logger.info(
-                        f"⏭️ SKIP #{attempt_num}: Channel '{channel.name}' needs to wait {wait_time:.1f}s (min_interval={min_interval}s), trying next channel"
-                    )
-                    continue
+                continue
+
+            # 并发上限检查：渠道已满时直接溢出到下一个候选，不排队
+            permit = get_concurrency_limiter().try_acquire(channel.id)
+            if permit is None:
+                logger.info(
+                    f"⏭️ SKIP #{attempt_num}: [{request_id}] Channel '{channel.name}' is at its concurrency limit, trying next channel"
+                )
+                continue
+
+            # 熔断器只读检查：打开状态跳过（试探名额在限流预约成功后才占用）
+            model_name = routing_score.matched_model or channel.model_name
+            circuit_breakers = get_circuit_breakers()
+            if not circuit_breakers.can_attempt(channel.id, model_name):
+                permit.release()
+                logger.info(
+                    f"⏭️ SKIP #{attempt_num}: [{request_id}] Circuit open for '{model_name}' on channel '{channel.name}', trying next channel"
+                )
+                continue
 
             logger.info(
                 f"ATTEMPT #{attempt_num}: [{request_id}] Trying channel '{channel.name}' (ID: {channel.id}) with score {routing_score.total_score:.3f}"
@@ -635,12 +915,21 @@ class ChatCompletionHandler:
                 f"ATTEMPT #{attempt_num}: [{request_id}] Score breakdown - {routing_score.reason}"
             )
 
-            # 在发送请求前记录时间（用于间隔控制）
-            if min_interval > 0:
-                interval_manager.record_request(channel.id)
+            # 预约限流额度，需要时短暂排队
+            if not await rate_limiter.acquire(channel, request_tokens):
+                permit.release()
                 logger.info(
-                    f"🔍 INTERVAL RECORDED: [{request_id}] Channel '{channel.name}' request time recorded"
+                    f"⏭️ SKIP #{attempt_num}: [{request_id}] Channel '{channel.name}' rate limit capacity taken, trying next channel"
                 )
+                continue
+
+            # 最后占用熔断器名额：半开状态只放行少量试探请求
+            if not circuit_breakers.allow_request(channel.id, model_name):
+                permit.release()
+                logger.info(
+                    f"⏭️ SKIP #{attempt_num}: [{request_id}] Circuit trial for '{model_name}' on channel '{channel.name}' already in flight, trying next channel"
+                )
+                continue
 
             try:
                 channel_info = self._prepare_channel_request_info(
@@ -672,29 +961,32 @@ class ChatCompletionHandler:
                     routing_reason=routing_score.reason,
                     cost_preview=cost_preview,
                 )
+                metadata.prefix_key = routing_result.prefix_key
 
                 # 存储元数据到请求中，供后续使用
                 request._metadata = metadata
 
-                if request.stream:
-                    return cast(
-                        Union[JSONResponse, StreamingResponse],
-                        self._handle_streaming_request(
-                            request, channel_info, routing_score, attempt_num, metadata
-                        ),
-                    )
-                else:
-                    return cast(
-                        Union[JSONResponse, StreamingResponse],
-                        await self._handle_regular_request(
-                            request,
-                            channel_info,
-                            routing_score,
-                            attempt_num,
-                            start_time,
-                            metadata,
+                return cast(
+                    Union[JSONResponse, StreamingResponse],
+                    await self._handle_regular_request(
+                        request,
+                        channel_info,
+                        routing_score,
+                        attempt_num,
+                        start_time,
+                        metadata,
+                        # 惰性切片：只有对冲选择越过头部时才排序其余候选
+                        hedge_candidates=(
+                            itertools.islice(
+                                routing_result.candidates, attempt_num, None
+                            )
+                            if attempt_num < len(routing_result.candidates)
+                            else None
                         ),
-                    )
+                        failed_channels=failed_channels,
+                        cache_key=cache_key,
+                    ),
+                )
 
             except httpx.HTTPStatusError as e:
                 last_error = e
@@ -713,6 +1005,8 @@ class ChatCompletionHandler:
                     e, channel, attempt_num, routing_result.candidates
                 )
                 continue
+            finally:
+                permit.release()
 
         # 所有渠道都失败了
         return self._create_all_channels_failed_error(
@@ -722,31 +1016,6 @@ class ChatCompletionHandler:
             time.time() - start_time,
         )
 
-    def _handle_streaming_request(
-        self,
-        request: ChatCompletionRequest,
-        channel_info: ChannelRequestInfo,
-        routing_score: RoutingScore,
-        attempt_num: int,
-        metadata: RequestMetadata,
-    ) -> StreamingResponse:
-        """处理流式请求"""
-        logger.info(
-            f"STREAMING: [{metadata.request_id}] Starting streaming response for channel '{channel_info.channel.name}'"
-        )
-
-        # 返回StreamingResponse对象
-        return StreamingResponse(
-            self._stream_channel_api_with_summary(
-                channel_info.url,
-                channel_info.headers,
-                channel_info.request_data,
-                channel_info.channel.id,
-                metadata,
-            ),
-            media_type="text/event-stream",
-        )
-
     async def _handle_regular_request(
         self,
         request: ChatCompletionRequest,
@@ -755,15 +1024,57 @@ class ChatCompletionHandler:
         attempt_num: int,
         start_time: float,
         metadata: RequestMetadata,
+        hedge_candidates: Optional[Iterable[RoutingScore]] = None,
+        failed_channels: Optional[set] = None,
+        cache_key: Optional[str] = None,
     ) -> JSONResponse:
-        """处理常规请求"""
+        """处理常规请求（启用对冲时主渠道过慢会向下一候选发送相同请求）"""
         logger.info(
             f"⏳ REQUEST: [{metadata.request_id}] Sending optimized request to channel '{channel_info.channel.name}'"
         )
 
-        response_json, ttfb = await self._call_channel_api(
-            channel_info.url, channel_info.headers, channel_info.request_data
-        )
+        hedge_policy = get_hedging_policy()
+        hedge_delay = None
+        if hedge_policy.enabled and hedge_candidates:
+            hedge_policy.record_eligible()
+            hedge_delay = hedge_policy.hedge_delay(channel_info.channel.id)
+
+        try:
+            if hedge_delay is not None:
+                channel_info, routing_score, response_json, ttfb = (
+                    await self._call_channel_api_hedged(
+                        request,
+                        channel_info,
+                        routing_score,
+                        hedge_candidates or [],
+                        hedge_delay,
+                        metadata,
+                        failed_channels if failed_channels is not None else set(),
+                    )
+                )
+            else:
+                response_json, ttfb = await self._call_channel_api(
+                    channel_info.url,
+                    channel_info.headers,
+                    channel_info.request_data,
+                    channel_info.channel.id,
+                    routing_score.matched_model or channel_info.channel.model_name,
+                    channel_info.channel.api_key,
+                )
+        except asyncio.CancelledError:
+            # 客户端断开：上游连接已随任务取消关闭，按预估输入记录部分用量
+            self._record_client_cancellation(
+                metadata, channel_info.request_data, streaming=False
+            )
+            record = asyncio.ensure_future(
+                self._record_cancelled_usage(
+                    request, metadata.request_id, channel_info, start_time
+                )
+            )
+            # 保留引用，避免后台任务在完成前被回收
+            _background_tasks.add(record)
+            record.add_done_callback(_background_tasks.discard)
+            raise
 
         # 成功，更新健康度并返回
         latency = time.time() - start_time
@@ -799,6 +1110,9 @@ class ChatCompletionHandler:
         # 更新元数据
         aggregator = get_response_aggregator()
         usage = response_json.get("usage", {})
+        get_prefix_affinity().record_success(
+            metadata.prefix_key, channel_info.channel.id, usage
+        )
         prompt_tokens = usage.get("prompt_tokens", 0)
         completion_tokens = usage.get("completion_tokens", 0)
         total_tokens = usage.get("total_tokens", prompt_tokens + completion_tokens)
@@ -834,6 +1148,12 @@ class ChatCompletionHandler:
         aggregator.update_performance(
             metadata.request_id, ttfb=ttfb
         )  # TTFB已经是秒为单位
+        if cache_key:
+            aggregator.update_cache(metadata.request_id, "MISS")
+
+        # 获取汇总头信息（虽然非流式主要在响应体中，但保留头信息用于调试）
+        # 需在完成请求前获取，完成后元数据不再保留在活跃请求中
+        debug_headers = aggregator.get_headers_summary(metadata.request_id)
 
         # 完成请求并获取最终元数据
         final_metadata = aggregator.finish_request(metadata.request_id)
@@ -854,14 +1174,26 @@ class ChatCompletionHandler:
         # [BOOST] 思维链清理处理 (AIRouter功能集成)
         cleaned_response_json = self._clean_response_content(response_json)
 
+        if cache_key:
+            response_cache = get_response_cache()
+            await response_cache.store(
+                cache_key,
+                cleaned_response_json,
+                channel_info.channel,
+                response_json.get("model", "unknown"),
+                prompt_tokens,
+                completion_tokens,
+                cost_info["total_cost"],
+                response_cache.ttl_for(
+                    request.model, self._extract_request_tags(request)
+                ),
+            )
+
         # 使用新的响应汇总格式
         enhanced_response = aggregator.enhance_response_with_summary(
             cleaned_response_json, final_metadata
         )
 
-        # 获取汇总头信息（虽然非流式主要在响应体中，但保留头信息用于调试）
-        debug_headers = aggregator.get_headers_summary(metadata.request_id)
-
         # Record successful request with channel info
         try:
             from api.status_monitor import log_request, set_request_channel
@@ -884,6 +1216,289 @@ class ChatCompletionHandler:
 
         return JSONResponse(content=enhanced_response, headers=debug_headers)
 
+    async def _call_channel_api_hedged(
+        self,
+        request: ChatCompletionRequest,
+        channel_info: ChannelRequestInfo,
+        routing_score: RoutingScore,
+        hedge_candidates: Iterable[RoutingScore],
+        hedge_delay: float,
+        metadata: RequestMetadata,
+        failed_channels: set,
+    ) -> tuple[ChannelRequestInfo, RoutingScore, dict, float]:
+        """
+        对冲调用：主渠道超过 hedge_delay 未返回时向下一候选发送相同请求，
+        先成功者胜出，另一个被取消（已完成则照常计费）
+
+        Returns:
+            (胜出渠道信息, 胜出渠道评分, 响应JSON, TTFB)
+        """
+        request_id = metadata.request_id
+        request_start = time.time()
+
+        def launch(info: ChannelRequestInfo, score: RoutingScore) -> asyncio.Task:
+            return asyncio.ensure_future(
+                self._call_channel_api(
+                    info.url,
+                    info.headers,
+                    info.request_data,
+                    info.channel.id,
+                    score.matched_model or info.channel.model_name,
+                    info.channel.api_key,
+                )
+            )
+
+        primary = launch(channel_info, routing_score)
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+            hedge = None
+            # 先申请对冲预算，再选择目标（选择时会占用熔断试探名额与限流额度）
+            if not done and get_hedging_policy().try_acquire():
+                hedge = self._select_hedge_candidate(
+                    request, hedge_candidates, channel_info.channel.id, failed_channels
+                )
+                if hedge is None:
+                    get_hedging_policy().release()
+            if hedge is None:
+                response_json, ttfb = await primary
+                return channel_info, routing_score, response_json, ttfb
+        except BaseException:
+            primary.cancel()
+            raise
+
+        hedge_info, hedge_score, hedge_permit = hedge
+        logger.info(
+            f"HEDGE: [{request_id}] Channel '{channel_info.channel.name}' exceeded {hedge_delay:.2f}s, "
+            f"hedging on '{hedge_info.channel.name}'"
+        )
+        hedge_task = launch(hedge_info, hedge_score)
+        hedge_task.add_done_callback(lambda _: hedge_permit.release())
+        attempts = {
+            primary: (channel_info, routing_score),
+            hedge_task: (hedge_info, hedge_score),
+        }
+
+        pending = set(attempts)
+        winner = None
+        primary_error: Optional[BaseException] = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # 同时完成时优先主渠道
+                for task in sorted(done, key=lambda t: t is not primary):
+                    error = task.exception()
+                    if error is None:
+                        winner = task
+                        break
+                    info = attempts[task][0]
+                    logger.warning(
+                        f"HEDGE: [{request_id}] Channel '{info.channel.name}' failed: {error}"
+                    )
+                    if task is primary:
+                        primary_error = error
+                    else:
+                        # 对冲渠道已失败，本次请求不再重试
+                        failed_channels.add(info.channel.id)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # 未胜出的一方同样可能在上游产生费用，单独记录
+        for task, (info, _score) in attempts.items():
+            if task is winner:
+                continue
+            if task.done() and not task.cancelled() and task.exception():
+                continue
+            record = asyncio.ensure_future(
+                self._record_hedge_loser_usage(
+                    request, request_id, info, task, request_start
+                )
+            )
+            # 保留引用，避免后台任务在完成前被回收
+            _background_tasks.add(record)
+            record.add_done_callback(_background_tasks.discard)
+
+        if winner is None:
+            raise cast(BaseException, primary_error)
+
+        winner_info, winner_score = attempts[winner]
+        response_json, ttfb = winner.result()
+        if winner is not primary:
+            get_hedging_policy().record_hedge_win()
+            failed_channels.add(channel_info.channel.id)
+            metadata.channel_name = winner_info.channel.name
+            metadata.channel_id = winner_info.channel.id
+            metadata.provider = winner_info.channel.provider
+            metadata.model_used = winner_info.request_data["model"]
+            metadata.routing_score = winner_score.total_score
+            metadata.routing_reason = f"HEDGE: {winner_score.reason}"
+            logger.info(
+                f"HEDGE WIN: [{request_id}] Channel '{winner_info.channel.name}' answered first"
+            )
+        return winner_info, winner_score, response_json, ttfb
+
+    def _select_hedge_candidate(
+        self,
+        request: ChatCompletionRequest,
+        candidates: Iterable[RoutingScore],
+        primary_channel_id: str,
+        failed_channels: set,
+    ) -> Optional[tuple[ChannelRequestInfo, RoutingScore, ConcurrencyPermit]]:
+        """选择对冲目标：下一个可立即请求的其他渠道（返回已占用的并发名额）"""
+        rate_limiter = get_rate_limiter()
+        request_tokens = self._estimate_request_tokens(request)
+        for routing_score in candidates:
+            channel = routing_score.channel
+            if channel.id == primary_channel_id or channel.id in failed_channels:
+                continue
+            provider = self.config.get_provider(channel.provider)
+            if not provider:
+                continue
+            channel = get_api_key_pool().select(channel, request_tokens)
+            # 对冲请求不排队，只选择有空闲限流额度的渠道
+            if rate_limiter.estimate_wait(channel, request_tokens) > 0:
+                continue
+            permit = get_concurrency_limiter().try_acquire(channel.id)
+            if permit is None:
+                continue
+            model_name = routing_score.matched_model or channel.model_name
+            circuit_breakers = get_circuit_breakers()
+            if not circuit_breakers.can_attempt(channel.id, model_name):
+                permit.release()
+                continue
+            if rate_limiter.reserve(channel, request_tokens, max_wait=0) is None:
+                permit.release()
+                continue
+            # 限流预约成功后才占用半开试探名额
+            if not circuit_breakers.allow_request(channel.id, model_name):
+                permit.release()
+                continue
+
+            return (
+                self._prepare_channel_request_info(
+                    channel, provider, request, routing_score.matched_model
+                ),
+                routing_score,
+                permit,
+            )
+        return None
+
+    async def _record_hedge_loser_usage(
+        self,
+        request: ChatCompletionRequest,
+        request_id: str,
+        channel_info: ChannelRequestInfo,
+        task: asyncio.Future,
+        request_start: float,
+    ) -> None:
+        """记录对冲中未胜出请求的用量：已完成按实际用量，被取消按预估输入计"""
+        # 被取消的任务可能仍在清理（如关闭连接），等其真正结束后再检查结果
+        await asyncio.wait({task})
+        model_used = channel_info.request_data["model"]
+        if task.cancelled() or task.exception() is not None:
+            messages = [
+                {"role": msg.role, "content": str(msg.content)}
+                for msg in request.messages
+            ]
+            prompt_tokens = get_token_estimator().estimate_tokens(messages).input_tokens
+            completion_tokens = 0
+            status = "hedge_cancelled"
+        else:
+            response_json, _ttfb = task.result()
+            usage = response_json.get("usage", {})
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+            model_used = response_json.get("model", model_used)
+            status = "hedge_loser"
+
+        cost_info = self._calculate_request_cost(
+            channel_info.channel, prompt_tokens, completion_tokens, model_used
+        )
+        await self._record_usage_async(
+            request_id,
+            request,
+            channel_info.channel,
+            model_used,
+            prompt_tokens,
+            completion_tokens,
+            cost_info,
+            time.time() - request_start,
+            status,
+        )
+
+    def _record_client_cancellation(
+        self,
+        metadata: RequestMetadata,
+        request_data: dict,
+        streaming: bool,
+        completion_tokens: int = 0,
+        usage: Optional[dict] = None,
+    ) -> None:
+        """
+        客户端断开导致上游请求被取消：记录部分用量与节省的输出token
+
+        上游已返回usage时按实际值，否则输入按预估、输出按已生成部分计
+        """
+        if usage:
+            prompt_tokens = usage.get("prompt_tokens") or 0
+            completion_tokens = usage.get("completion_tokens") or completion_tokens
+        else:
+            messages = [
+                {"role": msg.get("role", "user"), "content": str(msg.get("content"))}
+                for msg in request_data.get("messages", [])
+            ]
+            prompt_tokens = get_token_estimator().estimate_tokens(messages).input_tokens
+        saved = get_disconnect_monitor().record_cancelled(
+            streaming,
+            prompt_tokens,
+            completion_tokens,
+            request_data.get("max_tokens"),
+        )
+
+        aggregator = get_response_aggregator()
+        aggregator.update_tokens(
+            metadata.request_id,
+            prompt_tokens,
+            completion_tokens,
+            prompt_tokens + completion_tokens,
+        )
+        aggregator.set_error(metadata.request_id, "499", "Client disconnected")
+        aggregator.finish_request(metadata.request_id)
+        logger.info(
+            f"CLIENT DISCONNECTED: [{metadata.request_id}] Cancelled upstream request on channel '{metadata.channel_name}' "
+            f"after {completion_tokens} completion tokens, ~{saved} tokens saved"
+        )
+
+    async def _record_cancelled_usage(
+        self,
+        request: ChatCompletionRequest,
+        request_id: str,
+        channel_info: ChannelRequestInfo,
+        request_start: float,
+    ) -> None:
+        """记录因客户端断开而取消的非流式请求用量（按预估输入计）"""
+        messages = [
+            {"role": msg.role, "content": str(msg.content)} for msg in request.messages
+        ]
+        prompt_tokens = get_token_estimator().estimate_tokens(messages).input_tokens
+        model_used = channel_info.request_data["model"]
+        cost_info = self._calculate_request_cost(
+            channel_info.channel, prompt_tokens, 0, model_used
+        )
+        await self._record_usage_async(
+            request_id,
+            request,
+            channel_info.channel,
+            model_used,
+            prompt_tokens,
+            0,
+            cost_info,
+            time.time() - request_start,
+            "client_cancelled",
+        )
+
     def _prepare_channel_request_info(
         self,
         channel: Any,
@@ -1092,7 +1707,7 @@ class ChatCompletionHandler:
         routing_score,
         attempt_num: int,
         failed_channels: set,
-        total_candidates: list,
+        total_candidates: RankedCandidates,
     ) -> None:
         """增强的HTTP错误处理，支持模型级别黑名单"""
         error_text = (
@@ -1110,6 +1725,13 @@ class ChatCompletionHandler:
             channel.id, channel.name, error.response.status_code, error_text
         )
 
+        # 多Key渠道：失败的Key已退役且仍有其他可用Key时，不把失败计入渠道
+        if get_api_key_pool().absorbs_failure(channel.id, channel.api_key):
+            logger.warning(
+                f"🔑 KEY RETIRED: Channel '{channel.name}' key failed with HTTP {error.response.status_code}, channel stays available with its remaining keys"
+            )
+            return
+
         # 更新渠道健康分数
         self.router.update_channel_health(channel.id, False)
 
@@ -1261,6 +1883,7 @@ class ChatCompletionHandler:
                 error_message=error_message,
                 response_time_ms=int(response_time_ms * 1000),  # 转换为毫秒
                 tags=self._extract_request_tags(request),
+                saved_cost=cost_info.get("saved_cost", 0.0),
             )
 
             # 异步记录
@@ -1296,7 +1919,7 @@ class ChatCompletionHandler:
         error: httpx.RequestError,
         channel: Any,
         attempt_num: int,
-        total_candidates: list,
+        total_candidates: RankedCandidates,
     ) -> None:
         """处理请求错误"""
         logger.warning(
@@ -1345,6 +1968,26 @@ class ChatCompletionHandler:
             headers=headers,
         )
 
+    def _create_client_disconnected_response(
+        self, model: str, execution_time: float
+    ) -> JSONResponse:
+        """客户端已断开时的占位响应（不会被读取，仅用于日志与中间件）"""
+        logger.info(
+            f"CLIENT DISCONNECTED: Request for model '{model}' cancelled after {execution_time:.3f}s"
+        )
+
+        headers = {
+            "X-Router-Status": "client-disconnected",
+            "X-Router-Time": f"{execution_time:.3f}s",
+            "X-Router-Model-Requested": model,
+        }
+
+        return JSONResponse(
+            status_code=499,
+            content={"detail": "Client closed request."},
+            headers=headers,
+        )
+
     def _handle_tag_not_found_error(
         self, error: TagNotFoundError, model: str, execution_time: float
     ) -> JSONResponse:
@@ -1377,7 +2020,7 @@ class ChatCompletionHandler:
     def _create_all_channels_failed_error(
         self,
         model: str,
-        candidates: list,
+        candidates: RankedCandidates,
         last_error: Optional[Exception],
         execution_time: float,
     ) -> JSONResponse:
@@ -1407,19 +2050,8 @@ class ChatCompletionHandler:
 
     async def _fast_channel_check(
         self, url: str, headers: dict
-    ) -> tuple[bool, int, str]:
-        """快速检查渠道是否可用"""
-        cache_key = f"{url}:{hash(str(headers))}"
-
-        cached_result = await cache_get("channel_availability", cache_key)
-        if cached_result:
-            logger.debug(f"使用缓存的渠道可用性结果: {url}")
-            return (
-                cached_result["available"],
-                cached_result["status_code"],
-                cached_result["message"],
-            )
-
+    ) -> tuple[Optional[int], Optional[str]]:
+        """后台探测渠道是否可用，返回 (状态码, 错误信息)，连接失败时状态码为None"""
         try:
             http_pool = get_http_pool()
 
@@ -1432,53 +2064,121 @@ class ChatCompletionHandler:
             async with http_pool.stream(
                 "POST", url, json=test_data, headers=headers
             ) as response:
-                if response.status_code in [200, 400, 404, 422]:
-                    result = {
-                        "available": True,
-                        "status_code": response.status_code,
-                        "message": "OK",
-                    }
-                    await cache_set("channel_availability", cache_key, result)
-                    return True, response.status_code, "OK"
-                else:
-                    result = {
-                        "available": False,
-                        "status_code": response.status_code,
-                        "message": "Service error",
-                    }
-                    await cache_set("channel_availability", cache_key, result)
-                    return False, response.status_code, "Service error"
+                return response.status_code, None
         except Exception as e:
-            result = {"available": False, "status_code": 0, "message": str(e)}
-            await cache_set("channel_availability", cache_key, result)
-            return False, 0, str(e)
+            return None, str(e)
 
-    async def _call_channel_api(self, url: str, headers: dict, request_data: dict):
-        """优化的API调用 - 返回响应和TTFB时间"""
+    async def _call_channel_api(
+        self,
+        url: str,
+        headers: dict,
+        request_data: dict,
+        channel_id: Optional[str] = None,
+        model_name: Optional[str] = None,
+        api_key: Optional[str] = None,
+    ):
+        """优化的API调用 - 返回响应和TTFB时间，结果同时记入被动健康状态和熔断器"""
         http_pool = get_http_pool()
 
         # 记录开始时间
         request_start = time.time()
 
-        async with http_pool.stream(
-            "POST", url, json=request_data, headers=headers
-        ) as response:
-            # 记录首字节时间 (TTFB)
-            ttfb = time.time() - request_start
+        try:
+            async with http_pool.stream(
+                "POST", url, json=request_data, headers=headers
+            ) as response:
+                # 记录首字节时间 (TTFB)
+                ttfb = time.time() - request_start
+                error_content = None
+                if response.status_code != 200:
+                    # 读取错误内容，限制大小以避免内存问题
+                    error_content = await response.aread()
+                    if len(error_content) > 1024:
+                        error_content = error_content[:1024]
+                    response._content = error_content
+                else:
+                    # 响应体读取完成后才记录结果：读取或解析失败只由下方异常分支记录一次
+                    await response.aread()
+                    result = response.json()
+
+                if channel_id:
+                    self._record_channel_outcome(
+                        channel_id,
+                        model_name,
+                        response.status_code,
+                        ttfb=ttfb,
+                        error=(
+                            error_content.decode("utf-8", errors="ignore")[:200]
+                            if error_content is not None
+                            else None
+                        ),
+                        response_headers=response.headers,
+                        api_key=api_key,
+                    )
+
+                if error_content is not None:
+                    response.raise_for_status()
+
+                if channel_id:
+                    total_latency = time.time() - request_start
+                    get_health_tracker().record_latency(channel_id, total_latency)
+                    # 非流式的"首字节"是响应头到达时间，约等于整个生成耗时，
+                    # 不计入真正的流式首字节分布，只记完整耗时
+                    get_latency_tracker().record(
+                        channel_id, model_name, total=total_latency
+                    )
 
-            if response.status_code != 200:
-                # 读取错误内容，限制大小以避免内存问题
-                error_content = await response.aread()
-                if len(error_content) > 1024:
-                    error_content = error_content[:1024]
-                response._content = error_content
-                response.raise_for_status()
+                # 返回响应和TTFB时间 (不修改原始响应)
+                return result, ttfb
+        except (httpx.RequestError, ValueError) as e:
+            # 连接错误、超时等网络层失败，或响应体不是有效JSON
+            if channel_id:
+                self._record_channel_outcome(
+                    channel_id, model_name, None, error=str(e), api_key=api_key
+                )
+            raise
+        except asyncio.CancelledError:
+            # 客户端断开或对冲落败被取消：没有结果可记录，归还半开试探名额
+            if channel_id and model_name:
+                get_circuit_breakers().release_trial(channel_id, model_name)
+            raise
 
-            await response.aread()
-            result = response.json()
+    def _record_channel_outcome(
+        self,
+        channel_id: str,
+        model_name: Optional[str],
+        status_code: Optional[int],
+        ttfb: Optional[float] = None,
+        error: Optional[str] = None,
+        response_headers: Optional[httpx.Headers] = None,
+        api_key: Optional[str] = None,
+    ) -> bool:
+        """
+        将真实请求结果记入Key池、被动健康追踪、(渠道, 模型) 熔断器、并发限制和限流器
 
-            # 返回响应和TTFB时间 (不修改原始响应)
-            return result, ttfb
+        Returns:
+            失败是否只归因于所用Key（Key已退役且渠道仍有其他可用Key），
+            此时不计入渠道健康状态和熔断器
+        """
+        key_failure = get_api_key_pool().record_outcome(
+            channel_id, api_key, status_code, response_headers, error
+        )
+        if response_headers is not None:
+            get_rate_limiter().update_from_headers(
+                channel_id, response_headers, status_code, api_key=api_key
+            )
+        if key_failure:
+            # 不计入熔断器，但需归还可能占用的半开试探名额
+            if model_name:
+                get_circuit_breakers().release_trial(channel_id, model_name)
+            return True
+        get_health_tracker().record_outcome(
+            channel_id, status_code, ttfb=ttfb, error=error
+        )
+        if model_name:
+            get_circuit_breakers().record_outcome(channel_id, model_name, status_code)
+        get_concurrency_limiter().on_outcome(channel_id, status_code, ttfb)
+        return False
 
     async def _stream_channel_api(
         self, url: str, headers: dict, request_data: dict, channel_id: str
@@ -1850,6 +2550,115 @@ class ChatCompletionHandler:
             "currency": "USD",
         }
 
+    def _inspect_stream_event(
+        self, event: SSEEvent, request_id: str, channel_id: str
+    ) -> Optional[dict[str, Any]]:
+        """检查一个流式事件：记录内容中的速率限制错误，返回其中的usage信息"""
+        data = event.data
+        # 先做字节查找，绝大多数内容事件无需JSON解码
+        # （开启 include_usage 时每个内容事件都带 "usage": null）
+        has_usage = (
+            b'"usage"' in data
+            and b'"usage":null' not in data
+            and b'"usage": null' not in data
+        )
+        if event.is_done or not (has_usage or b'"error"' in data):
+            return None
+        payload = event.json()
+        if not isinstance(payload, dict):
+            return None
+
+        error_obj = payload.get("error")
+        if isinstance(error_obj, dict):
+            error_code = error_obj.get("code")
+            error_message = str(error_obj.get("message", ""))
+            # 检测速率限制错误
+            if (
+                error_code == 429
+                or "rate limit" in error_message.lower()
+                or "temporarily rate-limited" in error_message.lower()
+            ):
+                wait_time = self._extract_rate_limit_wait_time(json.dumps(payload))
+                if wait_time:
+                    logger.warning(
+                        f"CONTENT RATE LIMIT: [{request_id}] Channel '{channel_id}' content suggests waiting {wait_time}s"
+                    )
+                else:
+                    logger.warning(
+                        f"CONTENT RATE LIMIT: [{request_id}] Channel '{channel_id}' rate limited in streaming content"
+                    )
+
+        usage = payload.get("usage")
+        return usage if isinstance(usage, dict) else None
+
+    async def _open_stream(
+        self,
+        stack: contextlib.AsyncExitStack,
+        http_pool: Any,
+        url: str,
+        headers: dict,
+        request_data: dict,
+        sse_parser: SSEParser,
+        ttfb_deadline: Optional[float] = None,
+    ) -> tuple[Any, Any, list[bytes], list[SSEEvent], Optional[float]]:
+        """
+        打开上游流并读取到首个完整SSE事件（或流结束）
+
+        ttfb_deadline 只约束响应头和首个数据块；SSE注释/保活行（如
+        ": OPENROUTER PROCESSING"）也算上游存活，之后等待首个事件不再计时，
+        避免放弃正在推理或预填充长提示词的上游
+
+        Returns:
+            (响应, 剩余字节迭代器, 已读取的原始块, 已解析的事件, 首个数据块到达时间)
+
+        Raises:
+            asyncio.TimeoutError: 截止时间内未收到响应头或任何字节
+        """
+
+        async def read_first_chunk() -> tuple[Any, Any, Optional[bytes]]:
+            response = await stack.enter_async_context(
+                http_pool.stream("POST", url, json=request_data, headers=headers)
+            )
+            chunks = response.aiter_bytes(chunk_size=8192)
+            if response.status_code == 200:
+                async for chunk in chunks:
+                    if chunk:
+                        return response, chunks, chunk
+            return response, chunks, None
+
+        response, chunks, chunk = await asyncio.wait_for(
+            read_first_chunk(), ttfb_deadline
+        )
+        prefix: list[bytes] = []
+        events: list[SSEEvent] = []
+        if chunk is None:
+            return response, chunks, prefix, events, None
+
+        first_data_time = time.time()
+        prefix.append(chunk)
+        events.extend(sse_parser.feed(chunk))
+        if events:
+            return response, chunks, prefix, events, first_data_time
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            prefix.append(chunk)
+            events.extend(sse_parser.feed(chunk))
+            if events:
+                break
+        return response, chunks, prefix, events, first_data_time
+
+    @staticmethod
+    def _stream_error_payload(event: SSEEvent) -> Optional[dict[str, Any]]:
+        """事件为错误时返回其error对象（OpenAI与Anthropic格式）"""
+        if b'"error"' not in event.data:
+            return None
+        payload = event.json()
+        if not isinstance(payload, dict):
+            return None
+        error = payload.get("error")
+        return error if isinstance(error, dict) else None
+
     async def _stream_channel_api_with_summary(
         self,
         url: str,
@@ -1857,11 +2666,28 @@ class ChatCompletionHandler:
         request_data: dict,
         channel_id: str,
         metadata: RequestMetadata,
+        model_name: Optional[str] = None,
+        permit: Optional[ConcurrencyPermit] = None,
+        api_key: Optional[str] = None,
+        ttfb_deadline: Optional[float] = None,
+        failover: bool = False,
     ):
-        """优化的流式API调用，在结束时添加汇总信息"""
+        """
+        优化的流式API调用，在结束时添加汇总信息
+
+        failover=True 时，首个有效数据事件之前的失败（错误状态、错误事件、连接异常、
+        超过 ttfb_deadline 未收到数据）抛出 StreamFailoverError，由调用方切换渠道；
+        在此之前读取的字节暂存，不提交给客户端
+        """
         chunk_count = 0
         stream_start_time = time.time()
         aggregator = get_response_aggregator()
+        failover_policy = get_stream_failover_policy()
+        committed = False  # 是否已向客户端输出上游字节
+        if not failover:
+            ttfb_deadline = None
+        sse_parser = SSEParser()
+        stream_usage = None
 
         logger.info(
             f"STREAM START: [{metadata.request_id}] Initiating optimized streaming request to channel '{channel_id}'"
@@ -1870,9 +2696,35 @@ class ChatCompletionHandler:
         try:
             http_pool = get_http_pool()
 
-            async with http_pool.stream(
-                "POST", url, json=request_data, headers=headers
-            ) as response:
+            async with contextlib.AsyncExitStack() as stack:
+                # 打开上游流并读取到首个有效数据事件，首个字节受TTFB截止时间约束
+                try:
+                    response, chunks, prefix, events, first_data_time = (
+                        await self._open_stream(
+                            stack,
+                            http_pool,
+                            url,
+                            headers,
+                            request_data,
+                            sse_parser,
+                            ttfb_deadline,
+                        )
+                    )
+                except asyncio.TimeoutError:
+                    # 只有 failover 模式设置了截止时间
+                    logger.warning(
+                        f"STREAM TTFB TIMEOUT: [{metadata.request_id}] Channel '{channel_id}' sent no data within {ttfb_deadline:.1f}s"
+                    )
+                    self.router.update_channel_health(channel_id, False)
+                    self._record_channel_outcome(
+                        channel_id, model_name, None, error="ttfb timeout", api_key=api_key
+                    )
+                    failover_policy.record_failover("ttfb_timeouts")
+                    aggregator.finish_request(metadata.request_id)
+                    raise StreamFailoverError(
+                        f"Channel '{channel_id}' sent no data within {ttfb_deadline:.1f}s"
+                    ) from None
+
                 if response.status_code != 200:
                     # 读取错误内容，限制大小以避免内存问题
                     error_body = await response.aread()
@@ -1886,7 +2738,24 @@ class ChatCompletionHandler:
                     logger.error(
                         f"STREAM ERROR DETAILS: [{metadata.request_id}] {error_text[:200]}"
                     )
-                    self.router.update_channel_health(channel_id, False)
+                    key_failure = self._record_channel_outcome(
+                        channel_id,
+                        model_name,
+                        response.status_code,
+                        error=error_text[:200],
+                        response_headers=response.headers,
+                        api_key=api_key,
+                    )
+                    if not key_failure:
+                        self.router.update_channel_health(channel_id, False)
+
+                    if failover:
+                        failover_policy.record_failover("error_status")
+                        aggregator.finish_request(metadata.request_id)
+                        raise StreamFailoverError(
+                            f"Channel '{channel_id}' returned status {response.status_code}: {error_text[:200]}",
+                            response.status_code,
+                        )
 
                     # 检测流式响应中的速率限制错误
                     if response.status_code == 429:
@@ -1896,11 +2765,11 @@ class ChatCompletionHandler:
                                 f"STREAM RATE LIMIT: [{metadata.request_id}] Channel '{channel_id}' suggests waiting {wait_time}s"
                             )
                             # 在错误响应中包含等待时间信息
-                            yield f"data: {json.dumps({'error': {'message': f'Rate limited: retry after {wait_time}s - {error_text[:100]}', 'code': response.status_code, 'retry_after': wait_time}})}\\n\\n"
+                            yield f"data: {json.dumps({'error': {'message': f'Rate limited: retry after {wait_time}s - {error_text[:100]}', 'code': response.status_code, 'retry_after': wait_time}})}\n\n"
                         else:
-                            yield f"data: {json.dumps({'error': {'message': f'Rate limited - {error_text[:100]}', 'code': response.status_code}})}\\n\\n"
+                            yield f"data: {json.dumps({'error': {'message': f'Rate limited - {error_text[:100]}', 'code': response.status_code}})}\n\n"
                     else:
-                        yield f"data: {json.dumps({'error': {'message': f'Upstream API error: {error_text[:100]}', 'code': response.status_code}})}\\n\\n"
+                        yield f"data: {json.dumps({'error': {'message': f'Upstream API error: {error_text[:100]}', 'code': response.status_code}})}\n\n"
 
                     # 设置错误信息并完成请求
                     aggregator.set_error(
@@ -1910,124 +2779,83 @@ class ChatCompletionHandler:
 
                     # 发送错误情况下的汇总信息
                     yield aggregator.create_sse_summary_event(final_metadata)
-                    yield "data: [DONE]\\n\\n"
+                    yield "data: [DONE]\n\n"
                     return
 
+                error = self._stream_error_payload(events[0]) if events else None
+                if error is not None and failover:
+                    # 首个事件就是错误（如内容中的限流）：尚未提交，切换渠道
+                    error_text = str(error.get("message", ""))[:200]
+                    error_code = error.get("code")
+                    status_code = error_code if isinstance(error_code, int) else None
+                    logger.warning(
+                        f"STREAM ERROR EVENT: [{metadata.request_id}] Channel '{channel_id}' sent an error before any data: {error_text}"
+                    )
+                    key_failure = self._record_channel_outcome(
+                        channel_id,
+                        model_name,
+                        status_code,
+                        error=error_text,
+                        response_headers=response.headers,
+                        api_key=api_key,
+                    )
+                    if not key_failure:
+                        self.router.update_channel_health(channel_id, False)
+                    failover_policy.record_failover("error_events")
+                    aggregator.finish_request(metadata.request_id)
+                    raise StreamFailoverError(
+                        f"Channel '{channel_id}' stream error: {error_text}",
+                        status_code,
+                    )
+
                 logger.info(
                     f"STREAM CONNECTED: [{metadata.request_id}] Successfully connected to channel '{channel_id}', starting optimized data flow"
                 )
 
-                # 记录TTFB时间 - 修正：连接建立后的第一个数据块时间
-                ttfb_recorded = False
-                first_data_time = None
-
                 # 记录token信息的变量
                 total_prompt_tokens = 0
                 total_completion_tokens = 0
                 total_tokens = 0
 
-                async for chunk in response.aiter_bytes(chunk_size=8192):
+                # 记录第一个数据块的时间作为TTFB（真正的首字节时间）
+                if first_data_time is not None:
+                    ttfb = first_data_time - stream_start_time
+                    aggregator.update_performance(metadata.request_id, ttfb=ttfb)
+                    self._record_channel_outcome(
+                        channel_id,
+                        model_name,
+                        200,
+                        ttfb=ttfb,
+                        response_headers=response.headers,
+                        api_key=api_key,
+                    )
+                    logger.info(
+                        f"TTFB: [{metadata.request_id}] First data received in {ttfb:.3f}s"
+                    )
+
+                # 首个有效事件已到达：提交暂存的字节，之后边读边转发
+                for event in events:
+                    usage = self._inspect_stream_event(
+                        event, metadata.request_id, channel_id
+                    )
+                    if usage:
+                        stream_usage = usage
+                committed = True
+                for chunk in prefix:
+                    chunk_count += 1
+                    yield chunk
+
+                async for chunk in chunks:
                     if chunk:
                         chunk_count += 1
 
-                        # 记录第一个数据块的时间作为TTFB（真正的首字节时间）
-                        if not ttfb_recorded:
-                            first_data_time = time.time()
-                            ttfb = first_data_time - stream_start_time
-                            aggregator.update_performance(
-                                metadata.request_id, ttfb=ttfb
-                            )
-                            ttfb_recorded = True
-                            logger.info(
-                                f"TTFB: [{metadata.request_id}] First data received in {ttfb:.3f}s"
+                        # 增量解析SSE事件（跨块边界安全），原始字节原样转发给客户端
+                        for event in sse_parser.feed(chunk):
+                            usage = self._inspect_stream_event(
+                                event, metadata.request_id, channel_id
                             )
-
-                        # 解析响应以提取token信息并检测流式错误（简化版）
-                        try:
-                            chunk_str = chunk.decode("utf-8", errors="ignore")
-
-                            # 检测流式数据中的速率限制错误
-                            if "data: " in chunk_str and '"error"' in chunk_str:
-                                lines = chunk_str.split("\\n")
-                                for line in lines:
-                                    if (
-                                        line.startswith("data: ")
-                                        and line != "data: [DONE]"
-                                    ):
-                                        try:
-                                            data = json.loads(line[6:])  # 去掉 'data: '
-                                            if "error" in data:
-                                                error_obj = data["error"]
-                                                error_code = error_obj.get("code")
-                                                error_message = error_obj.get(
-                                                    "message", ""
-                                                )
-
-                                                # 检测速率限制错误
-                                                if (
-                                                    error_code == 429
-                                                    or "rate limit"
-                                                    in error_message.lower()
-                                                    or "temporarily rate-limited"
-                                                    in error_message.lower()
-                                                ):
-                                                    wait_time = self._extract_rate_limit_wait_time(
-                                                        error_message
-                                                    )
-                                                    if wait_time:
-                                                        logger.warning(
-                                                            f"CONTENT RATE LIMIT: [{metadata.request_id}] Channel '{channel_id}' content suggests waiting {wait_time}s"
-                                                        )
-                                                        # 修改错误信息以包含等待时间
-                                                        error_obj["retry_after"] = (
-                                                            wait_time
-                                                        )
-                                                        data["error"] = error_obj
-
-                                                        # 重新构造修改后的chunk
-                                                        modified_line = (
-                                                            f"data: {json.dumps(data)}"
-                                                        )
-                                                        chunk_str = chunk_str.replace(
-                                                            line, modified_line
-                                                        )
-                                                        chunk = chunk_str.encode(
-                                                            "utf-8"
-                                                        )
-                                                    else:
-                                                        logger.warning(
-                                                            f"CONTENT RATE LIMIT: [{metadata.request_id}] Channel '{channel_id}' rate limited in streaming content"
-                                                        )
-                                        except (json.JSONDecodeError, KeyError):
-                                            pass
-
-                            # 提取token使用信息
-                            if "data: " in chunk_str and '"usage"' in chunk_str:
-                                # 尝试提取最后usage信息
-                                lines = chunk_str.split("\\n")
-                                for line in lines:
-                                    if (
-                                        line.startswith("data: ")
-                                        and line != "data: [DONE]"
-                                    ):
-                                        try:
-                                            data = json.loads(line[6:])  # 去掉 'data: '
-                                            if "usage" in data:
-                                                usage = data["usage"]
-                                                total_prompt_tokens = usage.get(
-                                                    "prompt_tokens", total_prompt_tokens
-                                                )
-                                                total_completion_tokens = usage.get(
-                                                    "completion_tokens",
-                                                    total_completion_tokens,
-                                                )
-                                                total_tokens = usage.get(
-                                                    "total_tokens", total_tokens
-                                                )
-                                        except (json.JSONDecodeError, KeyError):
-                                            pass
-                        except Exception:
-                            pass  # 忽略解析错误
+                            if usage:
+                                stream_usage = usage
 
                         if chunk_count % 20 == 0:
                             logger.debug(
@@ -2036,6 +2864,23 @@ class ChatCompletionHandler:
 
                     yield chunk
 
+                for event in sse_parser.flush():
+                    usage = self._inspect_stream_event(
+                        event, metadata.request_id, channel_id
+                    )
+                    if usage:
+                        stream_usage = usage
+
+                # 提取token使用信息（取最后一个带usage的事件）
+                if stream_usage:
+                    total_prompt_tokens = stream_usage.get("prompt_tokens") or 0
+                    total_completion_tokens = (
+                        stream_usage.get("completion_tokens") or 0
+                    )
+                    total_tokens = stream_usage.get("total_tokens") or (
+                        total_prompt_tokens + total_completion_tokens
+                    )
+
                 # 更新token和成本信息
                 if total_tokens > 0:
                     aggregator.update_tokens(
@@ -2094,20 +2939,62 @@ class ChatCompletionHandler:
 
             stream_duration = time.time() - stream_start_time
             self.router.update_channel_health(channel_id, True, stream_duration)
+            get_prefix_affinity().record_success(
+                metadata.prefix_key, channel_id, stream_usage
+            )
+            get_latency_tracker().record(
+                channel_id,
+                model_name,
+                ttfb=first_data_time - stream_start_time if first_data_time else None,
+                total=stream_duration,
+            )
             logger.info(
                 f"STREAM COMPLETE: [{metadata.request_id}] Channel '{channel_id}' completed optimized streaming {chunk_count} chunks in {stream_duration:.3f}s"
             )
 
             # 在[DONE]之前发送汇总信息
             yield aggregator.create_sse_summary_event(final_metadata)
-            yield "data: [DONE]\\n\\n"
+            yield "data: [DONE]\n\n"
+
+        except StreamFailoverError:
+            raise
+
+        except (asyncio.CancelledError, GeneratorExit):
+            # 客户端断开：退出 async with 时上游流已关闭，这里只记录部分用量
+            # 输出按已转发的数据事件数估算（OpenAI兼容流通常每个增量约一个token）
+            self._record_client_cancellation(
+                metadata,
+                request_data,
+                streaming=True,
+                completion_tokens=sse_parser.events if committed else 0,
+                usage=stream_usage,
+            )
+            if not committed and model_name:
+                # 首个数据事件前断开：没有结果可记录，归还半开试探名额
+                get_circuit_breakers().release_trial(channel_id, model_name)
+            raise
 
         except httpx.HTTPStatusError as e:
             error_text = e.response.text if hasattr(e.response, "text") else str(e)
             logger.error(
                 f"STREAM FAILED: [{metadata.request_id}] Channel '{channel_id}' HTTP error {e.response.status_code}: {error_text[:200]}..."
             )
-            self.router.update_channel_health(channel_id, False)
+            key_failure = self._record_channel_outcome(
+                channel_id,
+                model_name,
+                e.response.status_code,
+                error=error_text[:200],
+                api_key=api_key,
+            )
+            if not key_failure:
+                self.router.update_channel_health(channel_id, False)
+            if failover and not committed:
+                failover_policy.record_failover("error_status")
+                aggregator.finish_request(metadata.request_id)
+                raise StreamFailoverError(
+                    f"Channel '{channel_id}' HTTP error {e.response.status_code}",
+                    e.response.status_code,
+                ) from e
 
             # 设置错误信息并完成请求
             aggregator.set_error(
@@ -2115,9 +3002,9 @@ class ChatCompletionHandler:
             )
             final_metadata = aggregator.finish_request(metadata.request_id)
 
-            yield f"data: {json.dumps({'error': {'message': f'Upstream API error: {error_text}', 'code': e.response.status_code}})}\\n\\n"
+            yield f"data: {json.dumps({'error': {'message': f'Upstream API error: {error_text}', 'code': e.response.status_code}})}\n\n"
             yield aggregator.create_sse_summary_event(final_metadata)
-            yield "data: [DONE]\\n\\n"
+            yield "data: [DONE]\n\n"
 
         except Exception as e:
             logger.error(
@@ -2125,14 +3012,27 @@ class ChatCompletionHandler:
                 exc_info=True,
             )
             self.router.update_channel_health(channel_id, False)
+            self._record_channel_outcome(
+                channel_id, model_name, None, error=str(e), api_key=api_key
+            )
+            if failover and not committed:
+                failover_policy.record_failover("connect_errors")
+                aggregator.finish_request(metadata.request_id)
+                raise StreamFailoverError(
+                    f"Channel '{channel_id}' stream failed: {e}"
+                ) from e
 
             # 设置错误信息并完成请求
             aggregator.set_error(metadata.request_id, "500", str(e))
             final_metadata = aggregator.finish_request(metadata.request_id)
 
-            yield f"data: {json.dumps({'error': {'message': str(e), 'code': 500}})}\\n\\n"
+            yield f"data: {json.dumps({'error': {'message': str(e), 'code': 500}})}\n\n"
             yield aggregator.create_sse_summary_event(final_metadata)
-            yield "data: [DONE]\\n\\n"
+            yield "data: [DONE]\n\n"
+
+        finally:
+            if permit:
+                permit.release()
 
     def _extract_user_identifier(self, request: Any) -> str:
         """从请求中提取用户标识符"""
@@ -6,21 +6,38 @@ import logging
 import threading
 
 from core.exceptions import ParameterComparisonError, TagNotFoundError
+from core.router.load_balancing import LoadBalancer
 from core.router.mixins.candidate import CandidateDiscoveryMixin
 from core.router.mixins.scoring import ScoringMixin
+from core.router.prefix_affinity import get_prefix_affinity
+from core.router.query_plan import compile_query_plan
+from core.router.ranking import DEFAULT_TOP_K, RankedCandidates
 from core.router.types import ChannelCandidate, RoutingRequest, RoutingScore
+from core.utils.api_key_pool import get_api_key_pool
 from core.utils.capability_mapper import get_capability_mapper
 from core.utils.channel_cache_manager import get_channel_cache_manager
+from core.utils.circuit_breaker import get_circuit_breakers
+from core.utils.client_disconnect import get_disconnect_monitor
+from core.utils.concurrency_limiter import get_concurrency_limiter
+from core.utils.hedging import get_hedging_policy
 from core.utils.local_model_capabilities import get_capability_detector
 from core.utils.model_analyzer import get_model_analyzer
 from core.utils.model_channel_blacklist import get_model_blacklist_manager
 from core.utils.parameter_comparator import get_parameter_comparator
+from core.utils.rate_limiter import get_rate_limiter
 from core.utils.request_cache import RequestFingerprint, get_request_cache
+from core.utils.request_coalescer import get_request_coalescer
+from core.utils.response_cache import get_response_cache
+from core.utils.routing_generations import get_routing_generations
+from core.utils.stream_failover import get_stream_failover_policy
 from core.utils.unified_model_registry import get_unified_model_registry
 from core.yaml_config import YAMLConfigLoader, get_yaml_config_loader
 
 logger = logging.getLogger(__name__)
 
+# 缓存路由决策的TTL：依赖代数校验及时失效，TTL只作为兜底
+ROUTING_CACHE_TTL_SECONDS = 600
+
 
 class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
     """基于Pydantic验证后配置的路由器"""
@@ -33,6 +50,7 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
         self._tag_cache_lock = threading.RLock()
         self._available_tags_cache: set | None = None
         self._available_models_cache: list[str] | None = None
+        self._exact_model_index = None
 
         self.unified_registry = get_unified_model_registry()
         self.model_analyzer = get_model_analyzer()
@@ -41,6 +59,18 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
         self.capability_detector = get_capability_detector()
         self.capability_mapper = get_capability_mapper()
         self.blacklist_manager = get_model_blacklist_manager()
+        self.circuit_breakers = get_circuit_breakers()
+        self.circuit_breakers.configure(self.config.routing.circuit_breaker)
+        get_hedging_policy().configure(self.config.routing.hedging)
+        get_concurrency_limiter().configure(self.config.routing.concurrency)
+        get_rate_limiter().configure(self.config.routing.rate_limit)
+        get_api_key_pool().configure(self.config.routing.key_pool)
+        get_stream_failover_policy().configure(self.config.routing.stream_failover)
+        get_disconnect_monitor().configure(self.config.routing.client_disconnect)
+        get_request_coalescer().configure(self.config.routing.coalescing)
+        get_response_cache().configure(self.config.routing.response_cache)
+        self.load_balancer = LoadBalancer(self.config.routing.load_balancing)
+        get_prefix_affinity().configure(self.config.routing.prefix_affinity)
 
         try:
             from core.services.scoring import ScoringService
@@ -51,11 +81,16 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
             self._scoring_service = None
 
     async def route_request(self, request: RoutingRequest) -> list[RoutingScore]:
+        """路由请求，返回按评分排序的完整候选渠道列表（会排序全部候选）"""
+        ranked = await self.route_request_ranked(request)
+        return ranked.top(len(ranked))
+
+    async def route_request_ranked(self, request: RoutingRequest) -> RankedCandidates:
         """
-        路由请求，返回按评分排序的候选渠道列表。
+        路由请求，返回按评分排序的候选渠道（头部已排序，其余候选按需排序）。
 
         支持请求级缓存以提高性能：
-        - 缓存TTL: 60秒
+        - 缓存TTL: 600秒（健康/黑名单/配置/模型缓存代数变化时立即失效）
         - 基于请求指纹的智能缓存键生成
         - 自动故障转移和缓存失效
         """
@@ -63,6 +98,7 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
 
         fingerprint = RequestFingerprint(
             model=request.model,
+            query_plan=compile_query_plan(request.model),
             routing_strategy=getattr(request, "strategy", "cost_first"),
             required_capabilities=getattr(request, "required_capabilities", None),
             min_context_length=getattr(request, "min_context_length", None),
@@ -90,11 +126,13 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
                 cached_result.cost_estimate,
             )
 
+            # 优先使用计算时的真实总评分，前缀亲和的容差比较才有意义
+            primary_score = cached_result.primary_score
             scores: list[RoutingScore] = []
             scores.append(
                 RoutingScore(
                     channel=cached_result.primary_channel,
-                    total_score=1.0,
+                    total_score=1.0 if primary_score is None else primary_score,
                     cost_score=1.0 if cached_result.cost_estimate == 0.0 else 0.8,
                     speed_score=0.9,
                     quality_score=0.8,
@@ -111,20 +149,37 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
                 ):
                     backup_matched_model = cached_result.backup_matched_models[index]
 
+                # 与主渠道等价的备选保持相同评分，按负载轮流作为首选
+                in_group = index + 1 < cached_result.group_size
+                if cached_result.backup_scores and index < len(
+                    cached_result.backup_scores
+                ):
+                    backup_score = cached_result.backup_scores[index]
+                else:
+                    backup_score = 1.0 if in_group else 0.9 - index * 0.1
                 scores.append(
                     RoutingScore(
                         channel=backup_channel,
-                        total_score=0.9 - index * 0.1,
+                        total_score=backup_score,
                         cost_score=0.7,
                         speed_score=0.8,
                         quality_score=0.7,
                         reliability_score=0.8,
-                        reason=f"CACHED_BACKUP_{index + 1}",
+                        reason=(
+                            f"CACHED_GROUP_{index + 1}"
+                            if in_group
+                            else f"CACHED_BACKUP_{index + 1}"
+                        ),
                         matched_model=backup_matched_model or request.model,
                     )
                 )
 
-            return scores
+            return RankedCandidates(
+                get_prefix_affinity().apply(
+                    self.load_balancer.spread(scores, cached_result.group_size),
+                    request.prefix_key,
+                )
+            )
 
         logger.info("CACHE MISS: Computing fresh routing for '%s'", request.model)
         try:
@@ -135,7 +190,7 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
                     "ROUTING FAILED: No suitable channels found for model '%s'",
                     request.model,
                 )
-                return []
+                return RankedCandidates([])
             logger.info("STEP 1 COMPLETE: Found %s candidate channels", len(candidates))
 
             logger.info("STEP 2: Filtering channels by health and availability...")
@@ -145,7 +200,7 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
                     "ROUTING FAILED: No available channels after filtering for model '%s'",
                     request.model,
                 )
-                return []
+                return RankedCandidates([])
 
             logger.info("STEP 2.5: Checking model capabilities...")
             capability_filtered = await self._filter_by_capabilities(
@@ -156,7 +211,7 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
                     "ROUTING FAILED: No channels with required capabilities for model '%s'",
                     request.model,
                 )
-                return []
+                return RankedCandidates([])
             logger.info(
                 "STEP 2.5 COMPLETE: %s channels passed capability check (filtered out %s)",
                 len(capability_filtered),
@@ -185,31 +240,47 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
                     "ROUTING FAILED: Failed to score any channels for model '%s'",
                     request.model,
                 )
-                return []
+                return RankedCandidates([])
             logger.info("STEP 3 COMPLETE: Scored %s channels", len(scored_channels))
 
-            if scored_channels:
-                primary_channel = scored_channels[0].channel
-                backup_channels = [score.channel for score in scored_channels[1:6]]
-                selection_reason = scored_channels[0].reason
+            # 首选、备选、负载分组与前缀亲和只使用已精确排序的头部；
+            # 其余渠道只在故障转移用尽头部后才排序
+            ranked_head = scored_channels.top(DEFAULT_TOP_K)
+
+            # 评分相近的候选视为一组，缓存记录整组而非单个首选
+            group_size = self.load_balancer.group_size(ranked_head)
+            if ranked_head:
+                primary_channel = ranked_head[0].channel
+                backup_channels = [score.channel for score in ranked_head[1:6]]
+                selection_reason = ranked_head[0].reason
                 cost_estimate = self._estimate_cost_for_channel(
-                    primary_channel, request
+                    primary_channel, request, ranked_head[0].matched_model
                 )
-                primary_matched_model = scored_channels[0].matched_model
+                primary_matched_model = ranked_head[0].matched_model
                 backup_matched_models = [
-                    score.matched_model for score in scored_channels[1:6]
+                    score.matched_model for score in ranked_head[1:6]
                 ]
+                backup_scores = [score.total_score for score in ranked_head[1:6]]
 
                 try:
+                    # 代数快照保证健康/黑名单/配置/模型缓存变化后缓存立即失效
+                    generations = get_routing_generations().snapshot(
+                        self.config_loader,
+                        [primary_channel.id] + [c.id for c in backup_channels],
+                    )
                     await cache.cache_selection(
                         fingerprint=fingerprint,
                         primary_channel=primary_channel,
                         backup_channels=backup_channels,
                         selection_reason=selection_reason,
                         cost_estimate=cost_estimate,
-                        ttl_seconds=60,
+                        ttl_seconds=ROUTING_CACHE_TTL_SECONDS,
                         primary_matched_model=primary_matched_model,
                         backup_matched_models=backup_matched_models,
+                        generations=generations,
+                        group_size=group_size,
+                        primary_score=ranked_head[0].total_score,
+                        backup_scores=backup_scores,
                     )
                     logger.debug(
                         "💾 CACHED RESULT: %s -> %s", cache_key, primary_channel.name
@@ -226,7 +297,13 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
                 request.model,
             )
 
-            return scored_channels
+            # 负载分组与前缀亲和只调整头部顺序
+            return scored_channels.with_head(
+                get_prefix_affinity().apply(
+                    self.load_balancer.spread(ranked_head, group_size),
+                    request.prefix_key,
+                )
+            )
 
         except TagNotFoundError:
             raise
@@ -239,13 +316,14 @@ class JSONRouter(CandidateDiscoveryMixin, ScoringMixin):
                 exc,
                 exc_info=True,
             )
-            return []
+            return RankedCandidates([])
 
     def clear_cache(self) -> None:
         """清除所有缓存"""
         self._tag_cache.clear()
         self._available_tags_cache = None
         self._available_models_cache = None
+        self._exact_model_index = None
         logger.info("Router cache cleared")
 
     def update_channel_health(
@@ -0,0 +1,92 @@
+"""Load spreading across near-equal routing candidates (power-of-two-choices)."""
+
+from __future__ import annotations
+
+import logging
+import random
+from typing import Any
+
+from core.utils.concurrency_limiter import get_concurrency_limiter
+from core.utils.latency_sketch import get_latency_tracker
+
+logger = logging.getLogger(__name__)
+
+LOAD_METRIC_IN_FLIGHT = "in_flight"
+LOAD_METRIC_LATENCY = "latency"
+
+
+def equivalent_group_size(scores: list[Any], epsilon: float, max_size: int) -> int:
+    """
+    Length of the leading run of candidates scoring within ``epsilon`` of the top.
+
+    Only the first ``max_size`` entries are inspected, so lazily ranked lists
+    never sort their tail.
+    """
+    if not scores:
+        return 0
+    top = scores[0].total_score
+    size = 1
+    for score in scores[1:max_size]:
+        if abs(top - score.total_score) > epsilon:
+            break
+        size += 1
+    return size
+
+
+class LoadBalancer:
+    """Spreads traffic inside a group of equivalent candidates."""
+
+    def __init__(self, settings: Any = None, rng: random.Random | None = None):
+        self.enabled = True
+        self.score_epsilon = 0.02
+        self.max_group_size = 6
+        self.metric = LOAD_METRIC_IN_FLIGHT
+        self._rng = rng or random.Random()
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """Apply ``routing.load_balancing`` settings."""
+        self.enabled = settings.enabled
+        self.score_epsilon = settings.score_epsilon
+        self.max_group_size = settings.max_group_size
+        self.metric = settings.metric
+
+    def group_size(self, scores: list[Any]) -> int:
+        """Number of leading candidates treated as one load-balancing group."""
+        if not self.enabled:
+            return min(1, len(scores))
+        return equivalent_group_size(scores, self.score_epsilon, self.max_group_size)
+
+    def load_key(self, score: Any) -> tuple[float, float]:
+        """Current load of a candidate; lower is better."""
+        channel_id = score.channel.id
+        in_flight = float(
+            get_concurrency_limiter().get_channel_status(channel_id)["in_flight"]
+        )
+        latency = get_latency_tracker().quantile(channel_id, score.matched_model, 0.5)
+        # Channels without latency samples count as fast so they get explored
+        latency = latency if latency is not None else 0.0
+        if self.metric == LOAD_METRIC_LATENCY:
+            return latency, in_flight
+        return in_flight, latency
+
+    def spread(self, scores: list[Any], group_size: int) -> list[Any]:
+        """
+        Move the power-of-two-choices pick among the first ``group_size``
+        candidates to the front; the rest keep their ranked order as fallbacks.
+        """
+        if group_size < 2:
+            return scores
+        first, second = self._rng.sample(range(group_size), 2)
+        first_load = self.load_key(scores[first])
+        second_load = self.load_key(scores[second])
+        chosen = first if first_load <= second_load else second
+        if chosen:
+            scores.insert(0, scores.pop(chosen))
+        logger.debug(
+            "LOAD BALANCE: picked '%s' from %s equivalent candidates",
+            scores[0].channel.name,
+            group_size,
+        )
+        return scores
@@ -4,8 +4,10 @@ from __future__ import annotations
 
 import logging
 
+from core.config_models import Channel
 from core.router.mixins.parameter import ParameterComparisonMixin
 from core.router.mixins.tag import TagRoutingMixin
+from core.router.query_plan import compile_query_plan
 from core.router.types import ChannelCandidate, RoutingRequest
 
 logger = logging.getLogger(__name__)
@@ -17,6 +19,7 @@ class CandidateDiscoveryMixin(ParameterComparisonMixin, TagRoutingMixin):
     def __init__(self):
         super().__init__()
         self.config_loader = None
+        self._exact_model_index = None
 
     def _get_candidate_channels(
         self, request: RoutingRequest
@@ -29,40 +32,20 @@ class CandidateDiscoveryMixin(ParameterComparisonMixin, TagRoutingMixin):
         if tag_candidates is not None:
             return tag_candidates
 
-        all_enabled_channels = self.config_loader.get_enabled_channels()
-
+        exact_model = compile_query_plan(request.model).exact_model
         physical_candidates: list[ChannelCandidate] = []
-        for channel in all_enabled_channels:
-            try:
-                discovered_info = self._get_discovered_info(channel)  # type: ignore[attr-defined]
-            except AttributeError:
-                discovered_info = self.config_loader.get_model_cache_by_channel(
-                    channel.id
-                )
-
-            models_data = (
-                discovered_info.get("models_data", {})
-                if isinstance(discovered_info, dict)
-                else {}
+        for channel, real_model_id in self._get_exact_model_index().get(
+            exact_model, ()
+        ):
+            logger.debug(
+                "PHYSICAL MODEL: Found '%s' -> '%s' in channel '%s'",
+                exact_model,
+                real_model_id,
+                channel.name,
+            )
+            physical_candidates.append(
+                ChannelCandidate(channel=channel, matched_model=real_model_id)
             )
-
-            if isinstance(
-                discovered_info, dict
-            ) and request.model in discovered_info.get("models", []):
-                real_model_id = request.model
-                if models_data and request.model in models_data:
-                    model_info = models_data[request.model]
-                    real_model_id = model_info.get("id", request.model)
-
-                logger.debug(
-                    "PHYSICAL MODEL: Found '%s' -> '%s' in channel '%s'",
-                    request.model,
-                    real_model_id,
-                    channel.name,
-                )
-                physical_candidates.append(
-                    ChannelCandidate(channel=channel, matched_model=real_model_id)
-                )
 
         complete_segment_candidates = self._get_candidate_channels_by_complete_segment(
             [request.model.lower()]
@@ -102,6 +85,43 @@ class CandidateDiscoveryMixin(ParameterComparisonMixin, TagRoutingMixin):
         )
         return []
 
+    def _get_exact_model_index(self) -> dict[str, list[tuple[Channel, str]]]:
+        """
+        Exact model name -> [(enabled channel, upstream model id)] in channel order.
+
+        Rebuilt only when the config/model-cache generation changes, so the
+        exact-name fast path is a dict lookup instead of a scan over every
+        enabled channel's discovered models.
+        """
+        signature = self.config_loader.get_cache_generation()
+        state = getattr(self, "_exact_model_index", None)
+        if state is not None and state[0] == signature:
+            return state[1]
+
+        index: dict[str, list[tuple[Channel, str]]] = {}
+        for channel in self.config_loader.get_enabled_channels():
+            try:
+                discovered_info = self._get_discovered_info(channel)  # type: ignore[attr-defined]
+            except AttributeError:
+                discovered_info = self.config_loader.get_model_cache_by_channel(
+                    channel.id
+                )
+            if not isinstance(discovered_info, dict):
+                continue
+
+            models_data = discovered_info.get("models_data") or {}
+            for model_name in discovered_info.get("models", []):
+                entries = index.setdefault(model_name, [])
+                if entries and entries[-1][0] is channel:
+                    continue
+                real_model_id = model_name
+                if model_name in models_data:
+                    real_model_id = models_data[model_name].get("id", model_name)
+                entries.append((channel, real_model_id))
+
+        self._exact_model_index = (signature, index)
+        return index
+
     def _lookup_configured_channels(
         self, request: RoutingRequest
     ) -> list[ChannelCandidate] | None:
@@ -5,6 +5,7 @@ from __future__ import annotations
 import logging
 
 from core.exceptions import ParameterComparisonError
+from core.router.query_plan import compile_query_plan
 from core.router.types import ChannelCandidate, RoutingRequest
 
 logger = logging.getLogger(__name__)
@@ -20,11 +21,12 @@ class ParameterComparisonMixin:
     def _get_parameter_comparison_candidates(
         self, request: RoutingRequest
     ) -> list[ChannelCandidate] | None:
-        if not self.parameter_comparator.is_parameter_comparison(request.model):
+        plan = compile_query_plan(request.model)
+        if not plan.is_parameter_comparison:
             return None
 
         logger.info("🔢 PARAMETER COMPARISON: Processing query '%s'", request.model)
-        comparison = self.parameter_comparator.parse_comparison(request.model)
+        comparison = plan.comparison
         if not comparison:
             logger.error(
                 "PARAM PARSE FAILED: Could not parse parameter comparison '%s'",
@@ -2,16 +2,32 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import random
 import re
 from typing import Any, cast
 
 from core.config_models import Channel
+from core.router.ranking import (
+    DEFAULT_TOP_K,
+    RankedCandidates,
+    hierarchical_score,
+    rank_hierarchical,
+)
 from core.router.types import ChannelCandidate, RoutingRequest, RoutingScore
+from core.utils.latency_sketch import get_latency_tracker
+from core.utils.memory_index import get_memory_index
+from core.utils.price_table import get_price_table
+from core.utils.rate_limiter import get_rate_limiter
+from core.utils.routing_generations import get_routing_generations
+from core.utils.token_counter import TokenCounter
 
 logger = logging.getLogger(__name__)
 
+# Max concurrent live capability probes per request (cache hits are not limited)
+CAPABILITY_DETECTION_CONCURRENCY = 8
+
 
 class ScoringMixin:
     """Provides scoring and filtering helpers for the router."""
@@ -19,6 +35,7 @@ class ScoringMixin:
     def __init__(self):
         self.config = None
         self.blacklist_manager = None
+        self.circuit_breakers = None
         self.config_loader = None
         self._scoring_service = None
         self.capability_mapper = None
@@ -86,6 +103,16 @@ class ScoringMixin:
             )
         )
 
+        health_generation = get_routing_generations().health_generation
+        if getattr(self, "_cached_health_generation", None) != health_generation:
+            # 健康档位变化后刷新快照，否则会一直沿用首次过滤时的健康状态
+            self._cached_health_scores = (
+                self.config_loader.runtime_state.health_scores.copy()
+            )
+            self._cached_health_generation = health_generation
+
+        circuit_breakers = getattr(self, "circuit_breakers", None)
+
         for candidate in channels:
             channel = candidate.channel
             if not channel.enabled or not channel.api_key:
@@ -119,10 +146,15 @@ class ScoringMixin:
                     )
                 continue
 
-            if not hasattr(self, "_cached_health_scores"):
-                self._cached_health_scores = (
-                    self.config_loader.runtime_state.health_scores.copy()
+            if circuit_breakers and not circuit_breakers.can_attempt(
+                channel.id, model_name
+            ):
+                logger.debug(
+                    "CIRCUIT FILTER: Skipping %s -> %s (circuit open)",
+                    channel.name,
+                    model_name,
                 )
+                continue
 
             health_score = self._cached_health_scores.get(channel.id, 1.0)
             if health_score < 0.3:
@@ -177,29 +209,32 @@ class ScoringMixin:
 
     async def _score_channels(
         self, channels: list[ChannelCandidate], request: RoutingRequest
-    ) -> list[RoutingScore]:
+    ) -> RankedCandidates:
         """计算渠道评分 - 委托到 ScoringService，保持行为不变。"""
         if getattr(self, "_scoring_service", None) is not None:
             return cast(
-                list[RoutingScore], await self._scoring_service.score(channels, request)
+                RankedCandidates, await self._scoring_service.score(channels, request)
             )
         return await self._score_channels_individual(channels, request)
 
     async def _score_channels_individual(
         self, channels: list[ChannelCandidate], request: RoutingRequest
-    ) -> list[RoutingScore]:
+    ) -> RankedCandidates:
         """单个渠道评分方式（用于小数量渠道）"""
         logger.info(
             "[STATS] SCORING: Using individual scoring for %s channels", len(channels)
         )
 
-        scored_channels: list[RoutingScore] = []
+        scored: list[RoutingScore] = []
         strategy = self._get_routing_strategy(request)
+        token_stats = self._get_request_token_stats(request)
 
         for candidate in channels:
             channel = candidate.channel
-            cost_score = self._calculate_cost_score(channel, request)
-            speed_score = self._calculate_speed_score(channel)
+            cost_score = self._calculate_cost_score(
+                channel, request, candidate.matched_model, token_stats
+            )
+            speed_score = self._calculate_speed_score(channel, candidate.matched_model)
             quality_score = self._calculate_quality_score(
                 channel, candidate.matched_model
             )
@@ -235,7 +270,7 @@ class ScoringMixin:
                     quality_score,
                 )
 
-            scored_channels.append(
+            scored.append(
                 RoutingScore(
                     channel=channel,
                     total_score=total_score,
@@ -254,11 +289,11 @@ class ScoringMixin:
                 )
             )
 
-        scored_channels = self._hierarchical_sort(scored_channels)
+        scored_channels = self._hierarchical_sort(scored, DEFAULT_TOP_K)
 
         if getattr(self, "_scoring_service", None) is not None:
             return cast(
-                list[RoutingScore],
+                RankedCandidates,
                 await self._scoring_service.score_individual(channels, request),
             )
         return scored_channels
@@ -333,52 +368,50 @@ class ScoringMixin:
             strategy_name, predefined_strategies["cost_first"]
         )
 
-    def _calculate_cost_score(self, channel: Channel, request: RoutingRequest) -> float:
-        """计算成本评分(0-1，越低成本越高分)"""
-        logger.info("🔍 COST SCORE CALCULATION: %s | %s", channel.id, request.model)
+    def _calculate_cost_score(
+        self,
+        channel: Channel,
+        request: RoutingRequest,
+        matched_model: str | None = None,
+        token_stats: dict[str, Any] | None = None,
+    ) -> float:
+        """
+        计算成本评分(0-1，越低成本越高分)
 
+        价格按候选渠道实际匹配的模型查询（标签路由时 request.model 只是查询串）；
+        token_stats 由调用方每个请求计算一次后传入
+        """
+        model_name = matched_model or request.model
         try:
-            from core.utils.cost_estimator import CostEstimator
-
-            estimator = CostEstimator()
-            logger.info("  [PASS] CostEstimator created successfully")
-
-            input_tokens = self._estimate_tokens(request.messages)
-            max_output_tokens = request.max_tokens or 1000
-            logger.info(
-                "  [STATS] Tokens: input=%s, max_output=%s",
-                input_tokens,
-                max_output_tokens,
-            )
-
-            cost_result = estimator.estimate_cost(
-                channel=channel,
-                model_name=request.model,
-                messages=request.messages,
-                max_output_tokens=max_output_tokens,
-            )
-            logger.info("  💰 CostEstimator result: %s", cost_result)
+            # 价格表已解析好最终每token价格（含汇率折扣），这里只需查表与乘法
+            prices = get_price_table().get_prices(channel.id, model_name)
+            total_cost = 0.0
+            if prices is not None:
+                if token_stats is None:
+                    token_stats = self._get_request_token_stats(request)
+                total_cost = (
+                    token_stats["prompt_tokens"] * prices[0]
+                    + token_stats["estimated_completion_tokens"] * prices[1]
+                )
 
-            if cost_result and cost_result.total_cost > 0:
-                total_cost = cost_result.total_cost
-                logger.info(
-                    "  [PASS] COST SCORE: Using dynamic pricing for %s: $%.6f",
-                    request.model,
-                    total_cost,
+            if total_cost <= 0:
+                cost_estimate = self._estimate_cost_for_channel(
+                    channel, request, matched_model
                 )
-            else:
-                cost_estimate = self._estimate_cost_for_channel(channel, request)
                 total_cost = max(0.0001, cost_estimate)
-                logger.info(
-                    "  [WARNING] COST SCORE: Fallback to channel pricing for %s: $%.6f",
-                    request.model,
+                logger.debug(
+                    "COST SCORE: Fallback to channel pricing for %s@%s: $%.6f",
+                    model_name,
+                    channel.id,
                     total_cost,
                 )
         except Exception as e:
             logger.warning(
-                "  [WARNING] COST SCORE: Cost estimator failed, fallback applied: %s", e
+                "  [WARNING] COST SCORE: Price lookup failed, fallback applied: %s", e
+            )
+            cost_estimate = self._estimate_cost_for_channel(
+                channel, request, matched_model
             )
-            cost_estimate = self._estimate_cost_for_channel(channel, request)
             total_cost = max(0.0001, cost_estimate)
 
         if total_cost <= 0:
@@ -392,12 +425,18 @@ class ScoringMixin:
         logger.debug(
             "COST SCORE RESULT: Channel=%s, Model=%s, Cost=$%.6f, Score=%.4f",
             channel.name,
-            request.model,
+            model_name,
             total_cost,
             cost_score,
         )
         return float(cost_score)
 
+    def _get_request_token_stats(self, request: RoutingRequest) -> dict[str, Any]:
+        """请求的token统计；评分循环每个请求计算一次，供所有候选渠道共享"""
+        return TokenCounter.get_token_stats(
+            request.messages, request.max_tokens or 1000
+        )
+
     def _calculate_fallback_cost(
         self, channel: Channel, input_tokens: int, max_output_tokens: int
     ) -> float:
@@ -552,8 +591,21 @@ class ScoringMixin:
         model_lower = model_name.lower()
         return "vision-only" in model_lower or model_lower.endswith("-vision")
 
-    def _calculate_speed_score(self, channel: Channel) -> float:
-        response_time = getattr(channel, "avg_response_time", None)
+    def _calculate_speed_score(
+        self, channel: Channel, model_name: str | None = None
+    ) -> float:
+        # 限流预计等待时间折扣速度评分，需要排队的渠道排在后面
+        return self._base_speed_score(
+            channel, model_name
+        ) * get_rate_limiter().speed_factor(channel)
+
+    def _base_speed_score(
+        self, channel: Channel, model_name: str | None = None
+    ) -> float:
+        # 优先使用真实流量的首字节时间分布（时间衰减的 p50/p95）
+        response_time = get_latency_tracker().effective_ttfb(channel.id, model_name)
+        if response_time is None:
+            response_time = getattr(channel, "avg_response_time", None)
         if response_time is None:
             return 0.6
 
@@ -802,62 +854,36 @@ class ScoringMixin:
         return float(total_score / total_weight)
 
     def _hierarchical_sort(
-        self, scored_channels: list[RoutingScore]
-    ) -> list[RoutingScore]:
+        self, scored_channels: list[RoutingScore], top_k: int | None = None
+    ) -> RankedCandidates:
+        """
+        Rank by the 6-digit tier score, then channel name.
+
+        With ``top_k`` only the best K entries are selected (heap) and ordered
+        eagerly; the rest is sorted when the caller asks for ``iter_rest()``.
+        """
         logger.info(
             "HIERARCHICAL SORTING: 6-digit scoring system (Cost|Context|Param|Speed|Quality|Reliability)"
         )
+        sorted_channels = rank_hierarchical(scored_channels, top_k)
+        self._log_hierarchical_ranking(sorted_channels)
+        return sorted_channels
 
-        def sorting_key(score: RoutingScore):
-            cost_tier = min(9, int(score.cost_score * 9))
-            context_tier = min(9, int(score.context_score * 9))
-            parameter_tier = min(9, int(score.parameter_score * 9))
-            speed_tier = min(9, int(score.speed_score * 9))
-            quality_tier = min(9, int(score.quality_score * 9))
-            reliability_tier = min(9, int(score.reliability_score * 9))
-
-            hierarchical_score = (
-                cost_tier * 100000
-                + context_tier * 10000
-                + parameter_tier * 1000
-                + speed_tier * 100
-                + quality_tier * 10
-                + reliability_tier
-            )
-            return (-hierarchical_score, score.channel.name)
-
-        sorted_channels = sorted(scored_channels, key=sorting_key)
-
-        for i, scored in enumerate(sorted_channels[:5]):
-            cost_tier = min(9, int(scored.cost_score * 9))
-            context_tier = min(9, int(scored.context_score * 9))
-            parameter_tier = min(9, int(scored.parameter_score * 9))
-            speed_tier = min(9, int(scored.speed_score * 9))
-            quality_tier = min(9, int(scored.quality_score * 9))
-            reliability_tier = min(9, int(scored.reliability_score * 9))
-
-            hierarchical_score = (
-                cost_tier * 100000
-                + context_tier * 10000
-                + parameter_tier * 1000
-                + speed_tier * 100
-                + quality_tier * 10
-                + reliability_tier
-            )
-
-            score_display = f"{cost_tier}{context_tier}{parameter_tier}{speed_tier}{quality_tier}{reliability_tier}"
+    def _log_hierarchical_ranking(self, sorted_channels: RankedCandidates) -> None:
+        """输出分层排序结果的前5名（不超出已排序的top-k部分）"""
+        limit = min(5, sorted_channels.head_size)
+        for i, scored in enumerate(sorted_channels.top(limit)):
+            score = hierarchical_score(scored)
             is_free = "FREE" if scored.free_score >= 0.9 else "PAID"
             logger.info(
                 "   #%s: '%s' [%s] Score: %s (Total: %s)",
                 i + 1,
                 scored.channel.name,
                 is_free,
-                score_display,
-                f"{hierarchical_score:,}",
+                f"{score:06d}",
+                f"{score:,}",
             )
 
-        return sorted_channels
-
     def _estimate_tokens(self, messages: list[dict[str, Any]]) -> int:
         try:
             import tiktoken
@@ -891,27 +917,23 @@ class ScoringMixin:
         return max(1, estimated_tokens)
 
     def _estimate_cost_for_channel(
-        self, channel: Channel, request: RoutingRequest
+        self,
+        channel: Channel,
+        request: RoutingRequest,
+        matched_model: str | None = None,
     ) -> float:
+        model_name = matched_model or request.model
+        input_tokens = self._estimate_tokens(request.messages)
         try:
-            from core.utils.cost_estimator import CostEstimator
-
-            estimator = CostEstimator()
-            input_tokens = self._estimate_tokens(request.messages)
             max_output_tokens = request.max_tokens or max(50, input_tokens // 4)
-
-            cost_result = estimator.estimate_cost(
-                channel_id=channel.id,
-                model_name=request.model,
-                input_tokens=input_tokens,
-                output_tokens=max_output_tokens,
+            total_cost = get_price_table().estimate_cost(
+                channel.id, model_name, input_tokens, max_output_tokens
             )
-            if cost_result and cost_result.total_cost > 0:
-                return float(cost_result.total_cost)
+            if total_cost and total_cost > 0:
+                return float(total_cost)
         except Exception as e:
             logger.debug("Enhanced cost estimation failed for %s: %s", channel.id, e)
 
-        input_tokens = self._estimate_tokens(request.messages)
         estimated_output_tokens = max(50, input_tokens // 4)
 
         model_cache = self.config_loader.get_model_cache()
@@ -920,8 +942,8 @@ class ScoringMixin:
             models_pricing = discovered_info.get("models_pricing", {})
 
             model_pricing = None
-            for model_name, pricing in models_pricing.items():
-                if model_name == request.model or request.model in model_name:
+            for pricing_model, pricing in models_pricing.items():
+                if pricing_model == model_name or model_name in pricing_model:
                     model_pricing = pricing
                     break
 
@@ -933,7 +955,7 @@ class ScoringMixin:
                 )
                 return float(total_cost)
 
-        free_score = self._calculate_free_score(channel, request.model)
+        free_score = self._calculate_free_score(channel, model_name)
         if free_score >= 0.9:
             return 0.0
         return 0.001
@@ -955,48 +977,73 @@ class ScoringMixin:
 
         logger.info("CAPABILITY REQUIREMENTS: %s", capability_requirements)
 
-        capability_filtered = []
-        fallback_channels = []
+        detector = self.capability_detector
+        # 请求需求只解析一次，而非每个候选都序列化请求体
+        requirements = detector.get_request_requirements(request.data)
+        memory_index = get_memory_index()
+        semaphore = asyncio.Semaphore(CAPABILITY_DETECTION_CONCURRENCY)
 
-        for candidate in channels:
+        async def resolve(candidate: ChannelCandidate) -> Any:
             channel = candidate.channel
             model_name = candidate.matched_model or channel.model_name
+            base_url = channel.base_url or ""
 
-            try:
-                capabilities = await self.capability_detector.detect_model_capabilities(
+            # 热路径优先读取预热结果，只有缺失时才探测
+            capabilities = memory_index.get_detected_capabilities(
+                channel.id, model_name
+            ) or detector.get_cached_capabilities(
+                model_name, channel.provider, base_url
+            )
+            if capabilities is not None:
+                return capabilities
+
+            async with semaphore:
+                capabilities = await detector.detect_model_capabilities(
                     model_name=model_name,
                     provider=channel.provider,
-                    base_url=channel.base_url or "",
+                    base_url=base_url,
                     api_key=channel.api_key,
                 )
+            memory_index.set_detected_capabilities(
+                channel.id,
+                model_name,
+                capabilities,
+                detector.get_cache_ttl(capabilities),
+            )
+            return capabilities
 
-                can_handle = self.capability_detector.can_handle_request(
-                    capabilities, request.data
-                )
+        results = await asyncio.gather(
+            *(resolve(candidate) for candidate in channels), return_exceptions=True
+        )
 
-                if can_handle:
-                    capability_filtered.append(candidate)
-                    logger.debug(
-                        "CAPABILITY MATCH: %s can handle request", channel.name
-                    )
-                else:
-                    if capabilities.is_local:
-                        fallback_channels.append((candidate, capabilities))
-                        logger.debug(
-                            "[WARNING] LOCAL LIMITATION: %s lacks required capabilities",
-                            channel.name,
-                        )
-                    else:
-                        logger.debug(
-                            "CAPABILITY MISMATCH: %s cannot handle request",
-                            channel.name,
-                        )
+        capability_filtered = []
+        fallback_channels = []
+
+        for candidate, capabilities in zip(channels, results):
+            channel = candidate.channel
 
-            except Exception as e:
+            if isinstance(capabilities, BaseException):
+                if not isinstance(capabilities, Exception):
+                    raise capabilities
                 logger.warning(
-                    "Error checking capabilities for %s: %s", channel.name, e
+                    "Error checking capabilities for %s: %s", channel.name, capabilities
                 )
                 capability_filtered.append(candidate)
+                continue
+
+            if detector.meets_requirements(capabilities, requirements):
+                capability_filtered.append(candidate)
+                logger.debug("CAPABILITY MATCH: %s can handle request", channel.name)
+            elif capabilities.is_local:
+                fallback_channels.append((candidate, capabilities))
+                logger.debug(
+                    "[WARNING] LOCAL LIMITATION: %s lacks required capabilities",
+                    channel.name,
+                )
+            else:
+                logger.debug(
+                    "CAPABILITY MISMATCH: %s cannot handle request", channel.name
+                )
 
         if not capability_filtered and fallback_channels:
             logger.info(
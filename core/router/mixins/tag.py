@@ -8,8 +8,10 @@ from typing import cast
 
 from core.config_models import Channel
 from core.exceptions import TagNotFoundError
-from core.router.size_filters import apply_size_filters, parse_size_filter
+from core.router.query_plan import QueryPlan, compile_query_plan
+from core.router.size_filters import apply_size_filters
 from core.router.types import ChannelCandidate, RoutingRequest
+from core.utils.memory_index import MemoryModelIndex, get_memory_index
 
 logger = logging.getLogger(__name__)
 
@@ -41,64 +43,40 @@ class TagRoutingMixin:
     def _handle_tag_queries(
         self, request: RoutingRequest
     ) -> list[ChannelCandidate] | None:
-        if (
-            "," in request.model
-            and not request.model.startswith("tag:")
-            and not request.model.startswith("tags:")
-        ):
-            return self._process_tag_sequence(request.model)
-
-        if request.model.startswith("tag:") or request.model.startswith("tags:"):
-            prefix = "tag:" if request.model.startswith("tag:") else "tags:"
-            tag_query = request.model.split(":", 1)[1]
-            return self._process_explicit_tag_query(tag_query, prefix)
-
-        return None
-
-    def _process_tag_sequence(self, query: str) -> list[ChannelCandidate]:
-        logger.info("IMPLICIT TAG QUERY: Detected comma-separated query '%s'", query)
-        tag_parts = [tag.strip() for tag in query.split(",") if tag.strip()]
-        positive_tags: list[str] = []
-        negative_tags: list[str] = []
-
-        for tag_part in tag_parts:
-            if tag_part.startswith("!"):
-                negative_tags.append(tag_part[1:].lower())
-            else:
-                size_filter = parse_size_filter(tag_part)
-                if not size_filter:
-                    positive_tags.append(tag_part.lower())
+        plan = compile_query_plan(request.model)
+        if not plan.is_tag_query:
+            return None
+        return self._execute_tag_plan(plan)
 
+    def _execute_tag_plan(self, plan: QueryPlan) -> list[ChannelCandidate]:
         logger.info(
-            "IMPLICIT TAG ROUTING: positive=%s, negative=%s",
-            positive_tags,
-            negative_tags,
+            "TAG ROUTING: Executing plan for '%s' -> positive: %s, negative: %s, size filters: %s (prefix: %s)",
+            plan.raw,
+            list(plan.positive_tags),
+            list(plan.negative_tags),
+            len(plan.size_filters),
+            plan.prefix or "implicit",
         )
         candidates = self._get_candidate_channels_by_auto_tags(
-            positive_tags, negative_tags
+            list(plan.positive_tags), list(plan.negative_tags)
         )
-        if not candidates:
+        if not candidates and not plan.size_filters:
             logger.error(
-                "IMPLICIT TAG NOT FOUND: No models for %s excluding %s",
-                positive_tags,
-                negative_tags,
+                "TAG NOT FOUND: No models found matching tags %s excluding %s",
+                list(plan.positive_tags),
+                list(plan.negative_tags),
             )
-            raise TagNotFoundError(positive_tags + [f"!{tag}" for tag in negative_tags])
-
-        size_filters = [
-            sf
-            for tag_part in tag_parts
-            if not tag_part.startswith("!")
-            for sf in [parse_size_filter(tag_part)]
-            if sf
-        ]
-        if size_filters:
+            raise TagNotFoundError(list(plan.not_found_tags))
+
+        if plan.size_filters:
             logger.info(
-                "SIZE FILTERS: Applying %s filters: %s",
-                len(size_filters),
-                [f"{sf.operator}{sf.value}{sf.unit}" for sf in size_filters],
+                "SIZE FILTERS: Applying %s size filters: %s",
+                len(plan.size_filters),
+                [f"{sf.operator}{sf.value}{sf.unit}" for sf in plan.size_filters],
+            )
+            filtered_candidates = apply_size_filters(
+                candidates, list(plan.size_filters)
             )
-            filtered_candidates = apply_size_filters(candidates, size_filters)
             logger.info(
                 "SIZE FILTERS: Filtered from %s to %s candidates",
                 len(candidates),
@@ -106,126 +84,12 @@ class TagRoutingMixin:
             )
             candidates = filtered_candidates
 
-        if not candidates:
-            logger.error("SIZE FILTERS: No candidates left after applying size filters")
-            raise TagNotFoundError(positive_tags + [f"!{tag}" for tag in negative_tags])
-
-        logger.info(
-            "IMPLICIT TAG ROUTING: Found %s candidate channels", len(candidates)
-        )
-        return candidates
-
-    def _process_explicit_tag_query(
-        self, query: str, prefix: str
-    ) -> list[ChannelCandidate]:
-        if "," in query:
-            tag_parts = [tag.strip() for tag in query.split(",") if tag.strip()]
-            positive_tags: list[str] = []
-            negative_tags: list[str] = []
-
-            for tag_part in tag_parts:
-                if tag_part.startswith("!"):
-                    negative_tags.append(tag_part[1:].lower())
-                else:
-                    size_filter = parse_size_filter(tag_part)
-                    if not size_filter:
-                        positive_tags.append(tag_part.lower())
-
-            logger.info(
-                "TAG ROUTING: Processing multi-tag query '%s' -> positive: %s, negative: %s (prefix: %s)",
-                query,
-                positive_tags,
-                negative_tags,
-                prefix,
-            )
-            candidates = self._get_candidate_channels_by_auto_tags(
-                positive_tags, negative_tags
-            )
-            if not candidates:
-                logger.error(
-                    "TAG NOT FOUND: No models found matching tags %s excluding %s",
-                    positive_tags,
-                    negative_tags,
-                )
-                raise TagNotFoundError(
-                    positive_tags + [f"!{tag}" for tag in negative_tags]
-                )
-
-            size_filters = [
-                sf
-                for tag_part in tag_parts
-                if not tag_part.startswith("!")
-                for sf in [parse_size_filter(tag_part)]
-                if sf
-            ]
-            if size_filters:
-                logger.info(
-                    "SIZE FILTERS: Applying %s size filters: %s",
-                    len(size_filters),
-                    [f"{sf.operator}{sf.value}{sf.unit}" for sf in size_filters],
-                )
-                filtered_candidates = apply_size_filters(candidates, size_filters)
-                logger.info(
-                    "SIZE FILTERS: Filtered from %s to %s candidates",
-                    len(candidates),
-                    len(filtered_candidates),
-                )
-                candidates = filtered_candidates
-
             if not candidates:
                 logger.error(
                     "SIZE FILTERS: No candidates left after applying size filters"
                 )
-                raise TagNotFoundError(
-                    positive_tags + [f"!{tag}" for tag in negative_tags]
-                )
+                raise TagNotFoundError(list(plan.not_found_tags))
 
-            logger.info(
-                "TAG ROUTING: Multi-tag query found %s candidate channels",
-                len(candidates),
-            )
-            return candidates
-
-        tag_part = query.strip()
-        if tag_part.startswith("!"):
-            negative_tag = tag_part[1:].lower()
-            logger.info(
-                "TAG ROUTING: Processing negative tag query '%s' -> excluding: '%s' (prefix: %s)",
-                query,
-                negative_tag,
-                prefix,
-            )
-            candidates = self._get_candidate_channels_by_auto_tags([], [negative_tag])
-        else:
-            size_filter = parse_size_filter(tag_part)
-            if size_filter:
-                logger.info(
-                    "TAG ROUTING: Processing size filter query '%s' -> filter: '%s' (prefix: %s)",
-                    query,
-                    tag_part,
-                    prefix,
-                )
-                candidates = self._get_candidate_channels_by_auto_tags([], [])
-                filtered_candidates = apply_size_filters(candidates, [size_filter])
-                logger.info(
-                    "SIZE FILTERS: Filtered from %s to %s candidates",
-                    len(candidates),
-                    len(filtered_candidates),
-                )
-                candidates = filtered_candidates
-            else:
-                tag = tag_part.lower()
-                logger.info(
-                    "TAG ROUTING: Processing single tag query '%s' -> tag: '%s' (prefix: %s)",
-                    query,
-                    tag,
-                    prefix,
-                )
-                candidates = self._get_candidate_channels_by_auto_tags([tag], [])
-
-        if not candidates:
-            logger.error("TAG NOT FOUND: No models found for query '%s'", query)
-            raise TagNotFoundError([query])
         logger.info("TAG ROUTING: Found %s candidate channels", len(candidates))
         return candidates
 
@@ -253,85 +117,28 @@ class TagRoutingMixin:
             normalized_negative,
         )
 
-        model_cache = self.config_loader.get_model_cache()
-        if not model_cache:
+        routing_index = self._get_routing_index()
+        if routing_index is None:
             logger.warning(
                 "TAG MATCHING: Model cache is empty, cannot perform tag routing"
             )
             return []
 
-        has_api_key_format = any(
-            "_" in key and len(key.split("_")[-1]) == 8 for key in model_cache.keys()
+        matches = routing_index.find_routing_models(
+            normalized_positive, normalized_negative
         )
-        if has_api_key_format:
-            logger.info(
-                "TAG MATCHING: Using API key-level cache format with %s entries",
-                len(model_cache),
-            )
-        else:
-            logger.info(
-                "TAG MATCHING: Using legacy cache format with %s entries",
-                len(model_cache),
-            )
-
-        candidates: list[ChannelCandidate] = []
-        matched_models = []
-
-        for cache_key, discovery_data in model_cache.items():
-            if not isinstance(discovery_data, dict):
-                continue
-
-            channel_id = self._extract_channel_id(cache_key)
-            if not channel_id:
-                continue
-
-            channel = self.config_loader.get_channel_by_id(channel_id)
-            if not channel:
-                logger.info(
-                    f"🚫 TAG MATCHING DEBUG: Channel {channel_id} not found in config"
-                )
-                continue
-            if not channel.enabled:
-                logger.info(
-                    f"🚫 TAG MATCHING DEBUG: Channel {channel_id} ({channel.name}) is disabled"
-                )
-                continue
-
-            models = discovery_data.get("models", [])
-            models_data = discovery_data.get("models_data", {})
+        candidates = self._build_candidates_from_matches(matches)
 
-            for model_name in models:
-                if not model_name:
-                    continue
-
-                model_tags = self._extract_tags_with_aliases(model_name, channel)
-                channel_tags = getattr(channel, "tags", []) or []
-                combined_tags = set(
-                    [tag.lower() for tag in channel_tags]
-                    + [tag.lower() for tag in model_tags]
-                )
-
-                if all(tag in combined_tags for tag in normalized_positive) and not any(
-                    tag in combined_tags for tag in normalized_negative
-                ):
-                    matched_models.append((channel.name, model_name))
-                    matched_model_id = model_name
-                    if models_data and model_name in models_data:
-                        model_info = models_data[model_name]
-                        matched_model_id = model_info.get("id", model_name)
-
-                    candidates.append(
-                        ChannelCandidate(
-                            channel=channel, matched_model=matched_model_id
-                        )
-                    )
-
-        if matched_models:
+        if candidates:
+            matched_models = [
+                (candidate.channel.name, candidate.matched_model)
+                for candidate in candidates[:5]
+            ]
             logger.info(
                 "[TARGET] TOTAL MATCHED MODELS: %s models found: %s%s",
-                len(matched_models),
-                matched_models[:5],
-                "..." if len(matched_models) > 5 else "",
+                len(candidates),
+                matched_models,
+                "..." if len(candidates) > 5 else "",
             )
 
         return candidates
@@ -346,50 +153,13 @@ class TagRoutingMixin:
             "COMPLETE SEGMENT MATCHING: Searching for segments %s", normalized_segments
         )
 
-        candidates: list[ChannelCandidate] = []
-        model_cache = self.config_loader.get_model_cache()
-        if not model_cache:
+        routing_index = self._get_routing_index()
+        if routing_index is None:
             logger.warning("COMPLETE SEGMENT MATCHING: Model cache is empty")
             return []
 
-        for cache_key, discovery_data in model_cache.items():
-            if not isinstance(discovery_data, dict):
-                continue
-
-            channel_id = self._extract_channel_id(cache_key)
-            if not channel_id:
-                continue
-
-            channel = self.config_loader.get_channel_by_id(channel_id)
-            if not channel:
-                logger.info(
-                    f"🚫 TAG MATCHING DEBUG: Channel {channel_id} not found in config"
-                )
-                continue
-            if not channel.enabled:
-                logger.info(
-                    f"🚫 TAG MATCHING DEBUG: Channel {channel_id} ({channel.name}) is disabled"
-                )
-                continue
-
-            models = discovery_data.get("models", [])
-            models_data = discovery_data.get("models_data", {})
-
-            for model_name in models:
-                model_tags = self._extract_tags_from_model_name(model_name)
-                if any(
-                    segment in (tag.lower() for tag in model_tags)
-                    for segment in normalized_segments
-                ):
-                    real_model_id = model_name
-                    if models_data and model_name in models_data:
-                        model_info = models_data[model_name]
-                        real_model_id = model_info.get("id", model_name)
-
-                    candidates.append(
-                        ChannelCandidate(channel=channel, matched_model=real_model_id)
-                    )
-                    break
+        matches = routing_index.find_routing_models_by_segments(normalized_segments)
+        candidates = self._build_candidates_from_matches(matches)
 
         logger.info(
             "COMPLETE SEGMENT MATCHING: Found %s candidates for segments %s",
@@ -398,6 +168,52 @@ class TagRoutingMixin:
         )
         return candidates
 
+    def _get_routing_index(self) -> MemoryModelIndex | None:
+        """Return the routing posting-list index, rebuilding it when stale."""
+        model_cache = self.config_loader.get_model_cache()
+        if not model_cache:
+            return None
+
+        config = self.config_loader.config
+        # Reuse the index while the config/model-cache generation is unchanged
+        signature = self.config_loader.get_cache_generation()
+
+        routing_index = get_memory_index()
+        if not routing_index.is_routing_index_current(signature):
+            routing_index.build_routing_index(model_cache, config.channels, signature)
+        return routing_index
+
+    def _build_candidates_from_matches(
+        self, matches: list[tuple[str, str, str]]
+    ) -> list[ChannelCandidate]:
+        """Convert index matches into candidates, skipping unusable channels."""
+        channels: dict[str, Channel | None] = {}
+        candidates: list[ChannelCandidate] = []
+
+        for channel_id, _model_name, model_id in matches:
+            if channel_id not in channels:
+                channel = self.config_loader.get_channel_by_id(channel_id)
+                if not channel:
+                    logger.debug(
+                        "TAG MATCHING: Channel %s not found in config", channel_id
+                    )
+                elif not channel.enabled:
+                    logger.debug(
+                        "TAG MATCHING: Channel %s (%s) is disabled",
+                        channel_id,
+                        channel.name,
+                    )
+                    channel = None
+                channels[channel_id] = channel
+
+            channel = channels[channel_id]
+            if channel is not None:
+                candidates.append(
+                    ChannelCandidate(channel=channel, matched_model=model_id)
+                )
+
+        return candidates
+
     def _find_channels_with_all_tags(
         self, tags: list[str], model_cache: dict
     ) -> list[ChannelCandidate]:
@@ -0,0 +1,198 @@
+"""Prefix-affinity routing to keep upstream prompt caches warm."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def cached_prompt_tokens(usage: Mapping[str, Any] | None) -> tuple[int, int]:
+    """
+    Return ``(prompt_tokens, cached_tokens)`` from an upstream usage block.
+
+    Understands the OpenAI/Doubao ``prompt_tokens_details.cached_tokens``,
+    DeepSeek ``prompt_cache_hit_tokens`` and Anthropic ``cache_read_input_tokens``
+    conventions; Anthropic reports uncached input separately, so its prompt
+    total is the sum of the three input counters.
+    """
+    if not usage:
+        return 0, 0
+    if "cache_read_input_tokens" in usage or "input_tokens" in usage:
+        cached = usage.get("cache_read_input_tokens") or 0
+        prompt = (
+            (usage.get("input_tokens") or 0)
+            + cached
+            + (usage.get("cache_creation_input_tokens") or 0)
+        )
+        return prompt, cached
+    prompt = usage.get("prompt_tokens") or 0
+    if "prompt_cache_hit_tokens" in usage:
+        return prompt, usage.get("prompt_cache_hit_tokens") or 0
+    details = usage.get("prompt_tokens_details") or {}
+    return prompt, details.get("cached_tokens") or 0
+
+
+class PrefixAffinity:
+    """
+    Bounded, TTL'd table from prompt-prefix hash to the channel that last
+    served it, used to steer follow-up requests back to the same upstream.
+    """
+
+    def __init__(self, settings: Any = None):
+        self.enabled = True
+        self.score_tolerance = 0.05
+        self.ttl = 300.0
+        self.max_entries = 10000
+        self.prefix_messages = 1
+        self.min_prompt_chars = 4000
+
+        self._lock = threading.Lock()
+        # prefix hash -> (channel id, expires at)
+        self._table: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        # channel id -> [prompt tokens, cached prompt tokens]
+        self._usage: dict[str, list[int]] = {}
+        self._stats = {
+            "lookups": 0,
+            "affinity_hits": 0,
+            "out_of_tolerance": 0,
+            "assignments": 0,
+            "evictions": 0,
+        }
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """Apply ``routing.prefix_affinity`` settings."""
+        self.enabled = settings.enabled
+        self.score_tolerance = settings.score_tolerance
+        self.ttl = settings.ttl
+        self.max_entries = settings.max_entries
+        self.prefix_messages = settings.prefix_messages
+        self.min_prompt_chars = settings.min_prompt_chars
+
+    def prefix_key(
+        self, messages: list[Mapping[str, Any]], system: str | None = None
+    ) -> str | None:
+        """
+        Hash of the system prompt plus the first ``prefix_messages``
+        non-system messages.
+
+        The leading window stays identical as a conversation grows, so every
+        turn maps to the same key. Prompts shorter than ``min_prompt_chars``
+        fall below provider caching thresholds and get no key.
+        """
+        if not self.enabled or not messages:
+            return None
+        prompt_chars = len(system or "") + sum(
+            len(json.dumps(message.get("content"), ensure_ascii=False))
+            for message in messages
+        )
+        if prompt_chars < self.min_prompt_chars:
+            return None
+
+        prefix: list[Any] = [system] if system else []
+        leading = 0
+        for message in messages:
+            if message.get("role") != "system":
+                if leading >= self.prefix_messages:
+                    break
+                leading += 1
+            prefix.append([message.get("role"), message.get("content")])
+        canonical = json.dumps(prefix, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def apply(self, scores: list[Any], prefix_key: str | None) -> list[Any]:
+        """Move the affine channel to the front if it scores within tolerance."""
+        if not self.enabled or not prefix_key or len(scores) < 2:
+            return scores
+        now = time.monotonic()
+        with self._lock:
+            self._stats["lookups"] += 1
+            entry = self._table.get(prefix_key)
+            if entry is None or entry[1] <= now:
+                return scores
+            channel_id = entry[0]
+
+        for index, score in enumerate(scores):
+            if score.channel.id != channel_id:
+                continue
+            if score.total_score < scores[0].total_score - self.score_tolerance:
+                with self._lock:
+                    self._stats["out_of_tolerance"] += 1
+                return scores
+            if index:
+                scores.insert(0, scores.pop(index))
+            with self._lock:
+                self._stats["affinity_hits"] += 1
+            logger.debug(
+                "PREFIX AFFINITY: routing to '%s' to reuse its prompt cache",
+                score.channel.name,
+            )
+            break
+        return scores
+
+    def record_success(
+        self,
+        prefix_key: str | None,
+        channel_id: str,
+        usage: Mapping[str, Any] | None = None,
+    ) -> None:
+        """Pin the prefix to the channel that served it and tally cached tokens."""
+        if not self.enabled:
+            return
+        prompt, cached = cached_prompt_tokens(usage)
+        with self._lock:
+            if prompt:
+                totals = self._usage.setdefault(channel_id, [0, 0])
+                totals[0] += prompt
+                totals[1] += cached
+            if not prefix_key:
+                return
+            self._table[prefix_key] = (channel_id, time.monotonic() + self.ttl)
+            self._table.move_to_end(prefix_key)
+            self._stats["assignments"] += 1
+            while len(self._table) > self.max_entries:
+                self._table.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_stats(self) -> dict[str, Any]:
+        with self._lock:
+            prompt = sum(totals[0] for totals in self._usage.values())
+            cached = sum(totals[1] for totals in self._usage.values())
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._table),
+                **self._stats,
+                "prompt_tokens": prompt,
+                "cached_tokens": cached,
+                "cached_token_ratio": round(cached / prompt, 4) if prompt else 0.0,
+                "channels": {
+                    channel_id: {
+                        "prompt_tokens": totals[0],
+                        "cached_tokens": totals[1],
+                        "cached_token_ratio": (
+                            round(totals[1] / totals[0], 4) if totals[0] else 0.0
+                        ),
+                    }
+                    for channel_id, totals in self._usage.items()
+                },
+            }
+
+
+_prefix_affinity: PrefixAffinity | None = None
+
+
+def get_prefix_affinity() -> PrefixAffinity:
+    """Return the process-wide prefix-affinity table."""
+    global _prefix_affinity
+    if _prefix_affinity is None:
+        _prefix_affinity = PrefixAffinity()
+    return _prefix_affinity
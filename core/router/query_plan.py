@@ -0,0 +1,146 @@
+"""Compiled, cached query plans for routing model strings."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from core.router.size_filters import SizeFilter, parse_size_filter
+from core.utils.parameter_comparator import (
+    ParameterComparison,
+    get_parameter_comparator,
+)
+
+PLAN_KIND_PARAMETER = "parameter"
+PLAN_KIND_TAG = "tag"
+PLAN_KIND_MODEL = "model"
+
+QUERY_PLAN_CACHE_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """Immutable routing plan compiled from a request's model string."""
+
+    raw: str
+    kind: str  # parameter / tag / model
+    prefix: str | None = None  # "tag:" / "tags:" or None for implicit comma queries
+    positive_tags: tuple[str, ...] = ()
+    negative_tags: tuple[str, ...] = ()
+    size_filters: tuple[SizeFilter, ...] = ()
+    # Tags reported by TagNotFoundError when the plan yields no candidates
+    not_found_tags: tuple[str, ...] = ()
+    comparison: ParameterComparison | None = field(default=None, compare=False)
+
+    @property
+    def is_tag_query(self) -> bool:
+        return self.kind == PLAN_KIND_TAG
+
+    @property
+    def is_parameter_comparison(self) -> bool:
+        return self.kind == PLAN_KIND_PARAMETER
+
+    @property
+    def exact_model(self) -> str:
+        """Model name used by the exact-name fast path."""
+        return self.raw
+
+    @property
+    def cache_key(self) -> str:
+        """Canonical form: equivalent tag queries share one fingerprint."""
+        if not self.is_tag_query:
+            return self.raw.lower().strip()
+
+        parts = sorted(self.positive_tags)
+        parts.extend(sorted(f"!{tag}" for tag in self.negative_tags))
+        parts.extend(
+            sorted(
+                f"{sf.operator}{sf.value:g}{sf.unit.lower()}"
+                for sf in self.size_filters
+            )
+        )
+        return "tag:" + ",".join(parts)
+
+
+def _split_tag_parts(query: str) -> tuple[tuple[str, ...], tuple[str, ...], tuple]:
+    positive_tags: list[str] = []
+    negative_tags: list[str] = []
+    size_filters: list[SizeFilter] = []
+
+    for tag_part in (tag.strip() for tag in query.split(",")):
+        if not tag_part:
+            continue
+        if tag_part.startswith("!"):
+            negative_tags.append(tag_part[1:].lower())
+            continue
+        size_filter = parse_size_filter(tag_part)
+        if size_filter:
+            size_filters.append(size_filter)
+        else:
+            positive_tags.append(tag_part.lower())
+
+    return tuple(positive_tags), tuple(negative_tags), tuple(size_filters)
+
+
+def _compile_tag_query(raw: str, query: str, prefix: str | None) -> QueryPlan:
+    if "," in query:
+        positive_tags, negative_tags, size_filters = _split_tag_parts(query)
+        not_found_tags = positive_tags + tuple(f"!{tag}" for tag in negative_tags)
+    else:
+        # Single-part explicit query keeps its original semantics and error report
+        tag_part = query.strip()
+        positive_tags, negative_tags, size_filters = (), (), ()
+        if tag_part.startswith("!"):
+            negative_tags = (tag_part[1:].lower(),)
+        else:
+            size_filter = parse_size_filter(tag_part)
+            if size_filter:
+                size_filters = (size_filter,)
+            else:
+                positive_tags = (tag_part.lower(),)
+        not_found_tags = (query,)
+
+    return QueryPlan(
+        raw=raw,
+        kind=PLAN_KIND_TAG,
+        prefix=prefix,
+        positive_tags=positive_tags,
+        negative_tags=negative_tags,
+        size_filters=size_filters,
+        not_found_tags=not_found_tags,
+    )
+
+
+@lru_cache(maxsize=QUERY_PLAN_CACHE_SIZE)
+def compile_query_plan(model: str) -> QueryPlan:
+    """
+    Compile a model string into a QueryPlan.
+
+    Parsing (comma splitting, size-filter and parameter-comparison regexes) is
+    paid once per distinct string; repeated requests hit the bounded LRU.
+    """
+    comparator = get_parameter_comparator()
+    if comparator.is_parameter_comparison(model):
+        return QueryPlan(
+            raw=model,
+            kind=PLAN_KIND_PARAMETER,
+            comparison=comparator.parse_comparison(model),
+        )
+
+    if model.startswith("tag:") or model.startswith("tags:"):
+        prefix = "tag:" if model.startswith("tag:") else "tags:"
+        return _compile_tag_query(model, model.split(":", 1)[1], prefix)
+
+    if "," in model:
+        return _compile_tag_query(model, model, None)
+
+    return QueryPlan(raw=model, kind=PLAN_KIND_MODEL)
+
+
+__all__ = [
+    "QueryPlan",
+    "compile_query_plan",
+    "PLAN_KIND_MODEL",
+    "PLAN_KIND_PARAMETER",
+    "PLAN_KIND_TAG",
+]
@@ -0,0 +1,140 @@
+"""Hierarchical ranking helpers: shared sort key and top-k ranked candidates."""
+
+from __future__ import annotations
+
+import functools
+import heapq
+from collections.abc import Callable, Iterator
+from typing import Any, cast
+
+# Primary + backups kept by route_request (scored_channels[:6])
+DEFAULT_TOP_K = 6
+
+
+def hierarchical_score(score: Any) -> int:
+    """6-digit tier score: Cost|Context|Param|Speed|Quality|Reliability, 0-9 each."""
+    return (
+        min(9, int(score.cost_score * 9)) * 100000
+        + min(9, int(score.context_score * 9)) * 10000
+        + min(9, int(score.parameter_score * 9)) * 1000
+        + min(9, int(score.speed_score * 9)) * 100
+        + min(9, int(score.quality_score * 9)) * 10
+        + min(9, int(score.reliability_score * 9))
+    )
+
+
+def hierarchical_sort_key(score: Any) -> tuple[int, str]:
+    """Sort key used by ``_hierarchical_sort``: best tier first, then channel name."""
+    return (-hierarchical_score(score), score.channel.name)
+
+
+def top_k_split(
+    items: list[Any], k: int, key: Callable[[Any], Any]
+) -> tuple[list[Any], list[Any]]:
+    """
+    Select the best ``k`` items in exact ``sorted(items, key=key)`` order.
+
+    Returns ``(head, tail)`` where ``tail`` keeps the input order, so sorting it
+    later with the same key yields exactly ``sorted(items, key=key)[k:]``.
+    """
+    if k >= len(items):
+        return sorted(items, key=key), []
+
+    decorated = [(key(item), index) for index, item in enumerate(items)]
+    best = heapq.nsmallest(k, decorated)
+    selected = {index for _, index in best}
+    head = [items[index] for _, index in best]
+    tail = [item for index, item in enumerate(items) if index not in selected]
+    return head, tail
+
+
+class RankedCandidates:
+    """
+    Ranked candidates split into an exact top-K head and a lazily ranked rest.
+
+    Deliberately not a list: callers take ``top(k)`` for the primary and
+    backups, and call ``iter_rest()`` only when they need fallbacks past the
+    head. Iterating yields the head first and ranks the rest only once the
+    iteration moves past it, so a retry loop that succeeds on an early
+    candidate never pays for the tail. ``rank_rest`` returns the remaining
+    entries in rank order and runs at most once, so a scorer can defer
+    building them until then.
+    """
+
+    def __init__(
+        self,
+        head: list[Any],
+        rank_rest: Callable[[], list[Any]] | None = None,
+        rest_size: int = 0,
+    ):
+        self._head = head
+        self._size = len(head) + rest_size
+        self._rank_rest = rank_rest if rest_size else None
+        self._rest: list[Any] | None = None if self._rank_rest else []
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def head_size(self) -> int:
+        return len(self._head)
+
+    @property
+    def is_fully_ranked(self) -> bool:
+        return self._rest is not None
+
+    def _ranked_rest(self) -> list[Any]:
+        if self._rest is None:
+            rank_rest = cast(Callable[[], list[Any]], self._rank_rest)
+            self._rank_rest = None
+            self._rest = rank_rest()
+        return self._rest
+
+    def top(self, k: int) -> list[Any]:
+        """Best ``k`` entries as a new list; ranks the rest only past the head."""
+        if k <= len(self._head):
+            return self._head[:k]
+        return self._head + self._ranked_rest()[: k - len(self._head)]
+
+    def iter_rest(self) -> Iterator[Any]:
+        """Entries after the head in rank order (ranks them on first call)."""
+        return iter(self._ranked_rest())
+
+    def __iter__(self) -> Iterator[Any]:
+        """All entries in rank order; the rest is ranked when first reached."""
+        yield from self._head
+        if len(self._head) < self._size:
+            yield from self._ranked_rest()
+
+    def with_head(self, head: list[Any]) -> RankedCandidates:
+        """Same candidates with ``head``, a reordering of ``top(len(head))``, in front."""
+        if len(head) < len(self._head):
+            head = head + self._head[len(head) :]
+        skip = len(head) - len(self._head)
+
+        def rank_rest() -> list[Any]:
+            rest = self._ranked_rest()
+            return rest[skip:] if skip else rest
+
+        return RankedCandidates(head, rank_rest, self._size - len(head))
+
+
+def rank_hierarchical(scored: list[Any], top_k: int | None = None) -> RankedCandidates:
+    """Hierarchically rank routing scores; with ``top_k`` only the head is sorted eagerly."""
+    if top_k is None or top_k >= len(scored):
+        return RankedCandidates(sorted(scored, key=hierarchical_sort_key))
+
+    head, tail = top_k_split(scored, top_k, hierarchical_sort_key)
+    return RankedCandidates(
+        head, functools.partial(sorted, tail, key=hierarchical_sort_key), len(tail)
+    )
+
+
+__all__ = [
+    "DEFAULT_TOP_K",
+    "RankedCandidates",
+    "hierarchical_score",
+    "hierarchical_sort_key",
+    "rank_hierarchical",
+    "top_k_split",
+]
@@ -13,7 +13,7 @@ from core.yaml_config import get_yaml_config_loader
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(frozen=True)
 class SizeFilter:
     """Represents a size constraint for parameter or context length."""
 
@@ -46,3 +46,4 @@ class RoutingRequest:
     required_capabilities: list[str] = None
     data: dict[str, Any] | None = None
     strategy: str | None = None
+    prefix_key: str | None = None  # Prompt-prefix hash for prefix-affinity routing
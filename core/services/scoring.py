@@ -9,7 +9,9 @@ from __future__ import annotations
 
 import logging
 import time
-from typing import TYPE_CHECKING, Any, cast
+from typing import TYPE_CHECKING, Any
+
+from core.router.ranking import DEFAULT_TOP_K, RankedCandidates, hierarchical_sort_key
 
 if TYPE_CHECKING:
     pass
@@ -25,7 +27,7 @@ class ScoringService:
         # Router must provide calculator methods, strategy getter, and sorter.
         self._router = router
 
-    async def score(self, channels: list[Any], request: Any) -> list[Any]:
+    async def score(self, channels: list[Any], request: Any) -> RankedCandidates:
         """Batch-optimized scoring with fallback to individual for small sets."""
         start_time = time.time()
         channel_count = len(channels)
@@ -62,55 +64,68 @@ class ScoringService:
                 f"[STATS] SCORING: Strategy rule: {rule['field']} (weight: {rule['weight']}, order: {rule['order']})"
             )
 
-        scored_channels = []
-        for candidate in channels:
-            scores = self._router._batch_scorer.get_score_for_channel(
-                batch_result, candidate
-            )
+        # Columnar engine: weights applied as one matrix product; only the top-K
+        # (same order as _hierarchical_sort) is built and ranked eagerly, the
+        # tail RoutingScores are built and sorted when the router asks for them
+        logger.info(
+            "HIERARCHICAL SORTING: 6-digit scoring system (Cost|Context|Param|Speed|Quality|Reliability)"
+        )
+        matrix = self._router._batch_scorer.build_score_matrix(batch_result, channels)
+        total_scores = matrix.total_scores(strategy)
+        head_indexes, tail_indexes = matrix.hierarchical_top_k(DEFAULT_TOP_K)
 
-            total_score = self._router._calculate_total_score(
-                strategy,
-                scores["cost_score"],
-                scores["speed_score"],
-                scores["quality_score"],
-                scores["reliability_score"],
-                scores["parameter_score"],
-                scores["context_score"],
-                scores["free_score"],
-                scores["local_score"],
-            )
+        # Import at runtime to avoid circular imports
+        from core.json_router import RoutingScore
+
+        def build_score(index: int) -> Any:
+            candidate = channels[index]
+            total_score = total_scores[index]
+            (
+                cost_score,
+                speed_score,
+                quality_score,
+                reliability_score,
+                parameter_score,
+                context_score,
+                free_score,
+                _local_score,
+            ) = matrix.rows[index]
 
-            model_display = candidate.matched_model or candidate.channel.model_name
             if logger.isEnabledFor(logging.DEBUG):
+                model_display = candidate.matched_model or candidate.channel.model_name
                 logger.debug(
-                    f"[STATS] SCORE: '{candidate.channel.name}' -> '{model_display}' = {total_score:.3f} (Q:{scores['quality_score']:.2f})"
+                    f"[STATS] SCORE: '{candidate.channel.name}' -> '{model_display}' = {total_score:.3f} (Q:{quality_score:.2f})"
                 )
 
-            # Import at runtime to avoid circular imports
-            from core.json_router import RoutingScore
-
-            scored_channels.append(
-                RoutingScore(
-                    channel=candidate.channel,
-                    total_score=total_score,
-                    cost_score=scores["cost_score"],
-                    speed_score=scores["speed_score"],
-                    quality_score=scores["quality_score"],
-                    reliability_score=scores["reliability_score"],
-                    reason=(
-                        f"cost:{scores['cost_score']:.2f} "
-                        f"speed:{scores['speed_score']:.2f} "
-                        f"quality:{scores['quality_score']:.2f} "
-                        f"reliability:{scores['reliability_score']:.2f}"
-                    ),
-                    matched_model=candidate.matched_model,
-                    parameter_score=scores["parameter_score"],
-                    context_score=scores["context_score"],
-                    free_score=scores["free_score"],
-                )
+            return RoutingScore(
+                channel=candidate.channel,
+                total_score=total_score,
+                cost_score=cost_score,
+                speed_score=speed_score,
+                quality_score=quality_score,
+                reliability_score=reliability_score,
+                reason=(
+                    f"cost:{cost_score:.2f} "
+                    f"speed:{speed_score:.2f} "
+                    f"quality:{quality_score:.2f} "
+                    f"reliability:{reliability_score:.2f}"
+                ),
+                matched_model=candidate.matched_model,
+                parameter_score=parameter_score,
+                context_score=context_score,
+                free_score=free_score,
             )
 
-        scored_channels = self._router._hierarchical_sort(scored_channels)
+        def rank_tail() -> list[Any]:
+            return sorted(map(build_score, tail_indexes), key=hierarchical_sort_key)
+
+        scored_channels = RankedCandidates(
+            [build_score(index) for index in head_indexes],
+            rank_tail,
+            len(tail_indexes),
+        )
+
+        self._router._log_hierarchical_ranking(scored_channels)
 
         total_elapsed_ms = (time.time() - start_time) * 1000
         self._router._log_performance_metrics(
@@ -120,14 +135,16 @@ class ScoringService:
         logger.info(
             f"🏆 SCORING RESULT: Channels ranked by score (computed in {total_elapsed_ms:.1f}ms):"
         )
-        for i, scored in enumerate(scored_channels[:5]):
+        for i, scored in enumerate(scored_channels.top(5)):
             logger.info(
                 f"🏆   #{i+1}: '{scored.channel.name}' (Score: {scored.total_score:.3f})"
             )
 
-        return cast(list[Any], scored_channels)
+        return scored_channels
 
-    async def score_individual(self, channels: list[Any], request: Any) -> list[Any]:
+    async def score_individual(
+        self, channels: list[Any], request: Any
+    ) -> RankedCandidates:
         """Individual scoring for small sets."""
         logger.info(
             f"[STATS] SCORING: Using individual scoring for {len(channels)} channels"
@@ -138,11 +155,16 @@ class ScoringService:
         from core.json_router import RoutingScore
 
         scored_channels = []
+        token_stats = self._router._get_request_token_stats(request)
         for candidate in channels:
             channel = candidate.channel
 
-            cost_score = self._router._calculate_cost_score(channel, request)
-            speed_score = self._router._calculate_speed_score(channel)
+            cost_score = self._router._calculate_cost_score(
+                channel, request, candidate.matched_model, token_stats
+            )
+            speed_score = self._router._calculate_speed_score(
+                channel, candidate.matched_model
+            )
             quality_score = self._router._calculate_quality_score(
                 channel, candidate.matched_model
             )
@@ -199,14 +221,16 @@ class ScoringService:
                 )
             )
 
-        scored_channels = self._router._hierarchical_sort(scored_channels)
+        scored_channels = self._router._hierarchical_sort(
+            scored_channels, DEFAULT_TOP_K
+        )
 
         logger.info(
             f"🏆 INDIVIDUAL SCORING RESULT: Processed {len(scored_channels)} channels"
         )
-        for i, scored in enumerate(scored_channels[:3]):
+        for i, scored in enumerate(scored_channels.top(3)):
             logger.info(
                 f"🏆   #{i+1}: '{scored.channel.name}' (Score: {scored.total_score:.3f})"
             )
 
-        return cast(list[Any], scored_channels)
+        return scored_channels
@@ -0,0 +1,289 @@
+"""
+API Key 池 - 同一渠道配置多个Key时按轮询或最低负载选择Key
+按Key记录认证失败、配额用尽（402 / 含quota的429）与限流（429）状态，
+失败的Key暂时或永久退役，渠道仍有可用Key时不因单个Key失败被拉黑
+"""
+
+import logging
+import math
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from .rate_limiter import get_rate_limiter, parse_reset_seconds
+
+logger = logging.getLogger(__name__)
+
+ROTATION_ROUND_ROBIN = "round_robin"
+ROTATION_LEAST_LOADED = "least_loaded"
+
+# 认证失败的Key永久退役（直到配置变更）
+AUTH_FAILURE_STATUS_CODES = frozenset({401, 403})
+
+# 错误信息中表示配额/余额用尽的关键词
+QUOTA_KEYWORDS = ("quota", "balance", "credit", "billing", "insufficient")
+
+
+@dataclass
+class ApiKeyState:
+    """单个Key的状态"""
+
+    key_id: str  # Key摘要，不保存原文
+    retired_until: float = 0.0  # monotonic；math.inf 表示永久退役
+    retire_reason: Optional[str] = None
+    load: float = 0.0  # 按时间衰减的近期请求数
+    load_updated_at: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    last_status: Optional[int] = None
+
+    def is_active(self, now: float) -> bool:
+        return now >= self.retired_until
+
+    def decayed_load(self, now: float, half_life: float) -> float:
+        elapsed = now - self.load_updated_at
+        return self.load * 0.5 ** (elapsed / half_life) if elapsed > 0 else self.load
+
+
+class ChannelKeyPool:
+    """单个渠道的Key池"""
+
+    def __init__(self, keys: list[str], rotation: str):
+        self.keys = keys
+        self.rotation = rotation
+        rate_limiter = get_rate_limiter()
+        self.states = [ApiKeyState(rate_limiter.key_id(key)) for key in keys]
+        self._cursor = 0
+
+    def active_count(self, now: float) -> int:
+        return sum(1 for state in self.states if state.is_active(now))
+
+
+class ApiKeyPoolManager:
+    """管理所有渠道的Key池，为每次请求选择Key并记录Key级结果"""
+
+    def __init__(self, settings: Any = None):
+        self.enabled = True
+        self.quota_cooldown = 3600.0
+        self.rate_limit_cooldown = 60.0
+        self.load_half_life = 60.0
+
+        self._lock = threading.Lock()
+        self._pools: dict[str, ChannelKeyPool] = {}
+        self._stats = {"selections": 0, "retirements": 0, "restorations": 0}
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """应用配置（routing.key_pool）"""
+        self.enabled = settings.enabled
+        self.quota_cooldown = settings.quota_cooldown
+        self.rate_limit_cooldown = settings.rate_limit_cooldown
+        self.load_half_life = settings.load_half_life
+
+    @staticmethod
+    def channel_keys(channel: Any) -> list[str]:
+        """渠道配置的全部Key（api_key 在前，去重保序）"""
+        keys = [getattr(channel, "api_key", None), *getattr(channel, "api_keys", [])]
+        return list(dict.fromkeys(key for key in keys if key))
+
+    def _get_pool(self, channel: Any) -> Optional[ChannelKeyPool]:
+        keys = self.channel_keys(channel)
+        if len(keys) < 2:
+            return None
+        rotation = getattr(channel, "key_rotation", ROTATION_ROUND_ROBIN)
+        pool = self._pools.get(channel.id)
+        if pool is None or pool.keys != keys or pool.rotation != rotation:
+            pool = self._pools[channel.id] = ChannelKeyPool(keys, rotation)
+        return pool
+
+    def select(self, channel: Any, tokens: int = 0) -> Any:
+        """
+        为本次请求选择Key
+
+        Returns:
+            携带选中Key的渠道副本；单Key渠道或未启用时返回原渠道
+        """
+        if not self.enabled:
+            return channel
+        now = time.monotonic()
+        rate_limiter = get_rate_limiter()
+
+        with self._lock:
+            pool = self._get_pool(channel)
+            if pool is None:
+                return channel
+
+            count = len(pool.keys)
+            active = [i for i in range(count) if pool.states[i].is_active(now)]
+            if not active:
+                # 全部退役时选择最早恢复的Key，渠道按原有方式失败
+                active = [min(range(count), key=lambda i: pool.states[i].retired_until)]
+
+            if pool.rotation == ROTATION_LEAST_LOADED:
+                order = sorted(
+                    active,
+                    key=lambda i: pool.states[i].decayed_load(now, self.load_half_life),
+                )
+            else:
+                start = pool._cursor
+                order = sorted(active, key=lambda i: (i - start) % count)
+
+            # 优先选择无需等待限流额度的Key
+            chosen = order[0]
+            best_wait = math.inf
+            for index in order:
+                candidate = channel.model_copy(update={"api_key": pool.keys[index]})
+                wait = rate_limiter.estimate_wait(candidate, tokens)
+                if wait < best_wait:
+                    chosen, best_wait = index, wait
+                if wait <= 0:
+                    break
+
+            pool._cursor = (chosen + 1) % count
+            state = pool.states[chosen]
+            state.load = state.decayed_load(now, self.load_half_life) + 1.0
+            state.load_updated_at = now
+            state.requests += 1
+            self._stats["selections"] += 1
+            return channel.model_copy(update={"api_key": pool.keys[chosen]})
+
+    def record_outcome(
+        self,
+        channel_id: str,
+        api_key: Optional[str],
+        status_code: Optional[int],
+        headers: Optional[Mapping[str, str]] = None,
+        error_text: Optional[str] = None,
+    ) -> bool:
+        """
+        记录Key级请求结果
+
+        Returns:
+            失败是否只归因于该Key（Key已退役且渠道仍有其他可用Key），
+            此时调用方不应把失败计入渠道
+        """
+        if not self.enabled or not api_key:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            pool = self._pools.get(channel_id)
+            if pool is None or api_key not in pool.keys:
+                return False
+            state = pool.states[pool.keys.index(api_key)]
+            state.last_status = status_code
+
+            cooldown, reason = self._classify(status_code, headers, error_text)
+            if cooldown is None:
+                if status_code == 200 and state.retire_reason:
+                    state.retire_reason = None
+                    state.retired_until = 0.0
+                    self._stats["restorations"] += 1
+                return False
+
+            state.failures += 1
+            state.retired_until = max(state.retired_until, now + cooldown)
+            state.retire_reason = reason
+            self._stats["retirements"] += 1
+            remaining = pool.active_count(now)
+
+        logger.warning(
+            f"[WARNING] KEY RETIRED: Channel '{channel_id}' key {state.key_id} "
+            f"({reason}, status {status_code}), {remaining} active keys remain"
+        )
+        return remaining > 0
+
+    def absorbs_failure(self, channel_id: str, api_key: Optional[str]) -> bool:
+        """该Key已退役且渠道仍有其他可用Key：失败不应拉黑渠道"""
+        if not self.enabled or not api_key:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            pool = self._pools.get(channel_id)
+            if pool is None or api_key not in pool.keys:
+                return False
+            state = pool.states[pool.keys.index(api_key)]
+            return not state.is_active(now) and pool.active_count(now) > 0
+
+    def _classify(
+        self,
+        status_code: Optional[int],
+        headers: Optional[Mapping[str, str]],
+        error_text: Optional[str],
+    ) -> tuple[Optional[float], Optional[str]]:
+        """按状态码判断Key是否需要退役，返回 (退役时长, 原因)"""
+        if status_code in AUTH_FAILURE_STATUS_CODES:
+            text = (error_text or "").lower()
+            if status_code == 403 and ("rate" in text or "limit" in text):
+                return self.rate_limit_cooldown, "rate_limit"
+            return math.inf, "auth_error"
+        if status_code == 402:
+            return self.quota_cooldown, "quota_exceeded"
+        if status_code == 429:
+            text = (error_text or "").lower()
+            if any(keyword in text for keyword in QUOTA_KEYWORDS):
+                return self.quota_cooldown, "quota_exceeded"
+            retry_after = headers.get("retry-after") if headers else None
+            seconds = parse_reset_seconds(retry_after) if retry_after else None
+            return seconds or self.rate_limit_cooldown, "rate_limit"
+        return None, None
+
+    def get_channel_status(self, channel_id: str) -> Optional[dict[str, Any]]:
+        """渠道Key池状态（Key以摘要显示）"""
+        now = time.monotonic()
+        with self._lock:
+            pool = self._pools.get(channel_id)
+            if pool is None:
+                return None
+            return {
+                "rotation": pool.rotation,
+                "total_keys": len(pool.keys),
+                "active_keys": pool.active_count(now),
+                "keys": [
+                    {
+                        "key_id": state.key_id,
+                        "active": state.is_active(now),
+                        "retire_reason": state.retire_reason,
+                        "retired_for": (
+                            None
+                            if state.is_active(now)
+                            else (
+                                "permanent"
+                                if state.retired_until == math.inf
+                                else round(state.retired_until - now, 1)
+                            )
+                        ),
+                        "requests": state.requests,
+                        "failures": state.failures,
+                        "last_status": state.last_status,
+                    }
+                    for state in pool.states
+                ],
+            }
+
+    def get_stats(self) -> dict[str, Any]:
+        with self._lock:
+            channel_ids = list(self._pools)
+        return {
+            "enabled": self.enabled,
+            "pooled_channels": len(channel_ids),
+            "channels": {
+                channel_id: self.get_channel_status(channel_id)
+                for channel_id in channel_ids
+            },
+            **self._stats,
+        }
+
+
+# 全局Key池管理器
+_api_key_pool: Optional[ApiKeyPoolManager] = None
+
+
+def get_api_key_pool() -> ApiKeyPoolManager:
+    """获取全局API Key池管理器"""
+    global _api_key_pool
+    if _api_key_pool is None:
+        _api_key_pool = ApiKeyPoolManager()
+    return _api_key_pool
@@ -3,15 +3,16 @@
 用于大幅减少单个模型评分时间，从70-80ms降低到10ms以下
 """
 
-import asyncio
 import logging
 import time
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Any, Optional, cast
 
 from core.json_router import ChannelCandidate
+from core.utils.latency_sketch import get_latency_tracker
+from core.utils.rate_limiter import get_rate_limiter
+from core.utils.score_matrix import FIELD_DEFAULTS, SCORE_FIELDS, ScoreMatrix
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +52,6 @@ class BatchScorer:
         self.router = router
         self.cache = {}
         self.cache_timeout = 300  # 5分钟缓存
-        self.thread_pool = ThreadPoolExecutor(max_workers=4)
 
         # 性能监控配置
         self.slow_threshold_ms = 1000  # 慢查询阈值：1秒
@@ -463,19 +463,28 @@ class BatchScorer:
             health_scores_dict = runtime_state.health_scores
 
         local_tags = {"local", "本地", "localhost", "127.0.0.1", "offline", "edge"}
+        latency_tracker = get_latency_tracker()
+        # token统计只与请求有关，所有候选共享一次计算
+        token_stats = self.router._get_request_token_stats(request)
 
         for candidate in channels:
             channel = candidate.channel
             model_name = candidate.matched_model
             key = f"{channel.id}_{model_name}" if model_name else channel.id
 
-            # 成本评分
-            cost_scores[key] = self.router._calculate_cost_score(channel, request)
+            # 成本评分（按候选实际匹配的模型查价）
+            cost_scores[key] = self.router._calculate_cost_score(
+                channel, request, model_name, token_stats
+            )
 
-            # 速度评分 - 优化版本
+            # 速度评分 - 优先使用时间衰减的首字节时间分布，其次为累计平均延迟
             stats = channel_stats.get(channel.id)
-            if stats and "avg_latency_ms" in stats:
-                avg_latency = stats["avg_latency_ms"]
+            ttfb = latency_tracker.effective_ttfb(channel.id, model_name)
+            if ttfb is not None:
+                avg_latency = ttfb * 1000
+            else:
+                avg_latency = stats.get("avg_latency_ms") if stats else None
+            if avg_latency is not None:
                 base_latency = 2000.0
                 score = max(0.0, 1.0 - (avg_latency / base_latency))
                 speed_scores[key] = 0.1 + score * 0.9
@@ -554,68 +563,28 @@ class BatchScorer:
         # 批量获取模型规格（最耗时的操作）
         model_specs = self._batch_get_model_specs(channels)
 
-        # 并行计算各种评分
-        async def compute_scores():
-            # 在线程池中执行计算密集型任务
-            loop = asyncio.get_event_loop()
-
-            # 分批并行执行评分计算
-            basic_scores_future = loop.run_in_executor(
-                self.thread_pool, self._batch_calculate_basic_scores, channels, request
-            )
-
-            parameter_scores_future = loop.run_in_executor(
-                self.thread_pool,
-                self._batch_calculate_parameter_scores,
-                channels,
-                model_specs,
-            )
-
-            context_scores_future = loop.run_in_executor(
-                self.thread_pool,
-                self._batch_calculate_context_scores,
-                channels,
-                model_specs,
-            )
-
-            free_scores_future = loop.run_in_executor(
-                self.thread_pool,
-                self._batch_calculate_free_scores,
-                channels,
-                model_specs,
-            )
-
-            # 等待所有计算完成
-            basic_scores, parameter_scores, context_scores, free_scores = (
-                await asyncio.gather(
-                    basic_scores_future,
-                    parameter_scores_future,
-                    context_scores_future,
-                    free_scores_future,
-                )
-            )
-
-            (
-                cost_scores,
-                speed_scores,
-                quality_scores,
-                reliability_scores,
-                local_scores,
-            ) = basic_scores
-
-            return BatchedScoreComponents(
-                cost_scores=cost_scores,
-                speed_scores=speed_scores,
-                quality_scores=quality_scores,
-                reliability_scores=reliability_scores,
-                parameter_scores=parameter_scores,
-                context_scores=context_scores,
-                free_scores=free_scores,
-                local_scores=local_scores,
-                computation_time_ms=(time.time() - start_time) * 1000,
-            )
-
-        result = await compute_scores()
+        # 顺序计算各项评分：均为纯Python计算，线程池在GIL下只增加调度开销
+        (
+            cost_scores,
+            speed_scores,
+            quality_scores,
+            reliability_scores,
+            local_scores,
+        ) = self._batch_calculate_basic_scores(channels, request)
+
+        result = BatchedScoreComponents(
+            cost_scores=cost_scores,
+            speed_scores=speed_scores,
+            quality_scores=quality_scores,
+            reliability_scores=reliability_scores,
+            parameter_scores=self._batch_calculate_parameter_scores(
+                channels, model_specs
+            ),
+            context_scores=self._batch_calculate_context_scores(channels, model_specs),
+            free_scores=self._batch_calculate_free_scores(channels, model_specs),
+            local_scores=local_scores,
+            computation_time_ms=(time.time() - start_time) * 1000,
+        )
 
         # 缓存结果
         self._store_cache(cache_key, result)
@@ -660,16 +629,52 @@ class BatchScorer:
         key = f"{channel_id}_{model_name}" if model_name else channel_id
 
         return {
-            "cost_score": batch_result.cost_scores.get(key, 0.5),
-            "speed_score": batch_result.speed_scores.get(key, 0.5),
-            "quality_score": batch_result.quality_scores.get(key, 0.5),
-            "reliability_score": batch_result.reliability_scores.get(key, 0.5),
-            "parameter_score": batch_result.parameter_scores.get(key, 0.5),
-            "context_score": batch_result.context_scores.get(key, 0.5),
-            "free_score": batch_result.free_scores.get(key, 0.1),
-            "local_score": batch_result.local_scores.get(key, 0.1),
+            field: column.get(key, FIELD_DEFAULTS[field])
+            for field, column in zip(SCORE_FIELDS, self._score_columns(batch_result))
         }
 
+    def build_score_matrix(
+        self,
+        batch_result: BatchedScoreComponents,
+        channels: list[ChannelCandidate],
+        use_numpy: Optional[bool] = None,
+    ) -> ScoreMatrix:
+        """将批量结果按候选顺序收集为列式评分矩阵"""
+        keys = [
+            (
+                f"{candidate.channel.id}_{candidate.matched_model}"
+                if candidate.matched_model
+                else candidate.channel.id
+            )
+            for candidate in channels
+        ]
+        columns = [
+            [column.get(key, FIELD_DEFAULTS[field]) for key in keys]
+            for field, column in zip(SCORE_FIELDS, self._score_columns(batch_result))
+        ]
+        # 限流等待时间是实时状态，不进入批量评分缓存，在此折扣速度评分
+        rate_limiter = get_rate_limiter()
+        speed_column = columns[SCORE_FIELDS.index("speed_score")]
+        for index, candidate in enumerate(channels):
+            speed_column[index] *= rate_limiter.speed_factor(candidate.channel)
+        rows = [list(row) for row in zip(*columns)]
+        names = [candidate.channel.name for candidate in channels]
+        return ScoreMatrix(rows, names, use_numpy)
+
+    @staticmethod
+    def _score_columns(batch_result: BatchedScoreComponents) -> list[dict[str, float]]:
+        """按 SCORE_FIELDS 顺序返回各评分字典"""
+        return [
+            batch_result.cost_scores,
+            batch_result.speed_scores,
+            batch_result.quality_scores,
+            batch_result.reliability_scores,
+            batch_result.parameter_scores,
+            batch_result.context_scores,
+            batch_result.free_scores,
+            batch_result.local_scores,
+        ]
+
     def _determine_optimization(self, channel_count: int, elapsed_ms: float) -> str:
         """确定应用的优化策略"""
         if channel_count > 50 and elapsed_ms > 2000:
@@ -0,0 +1,286 @@
+"""
+被动健康追踪 - 从真实流量结果学习渠道可用性
+记录真实请求的状态码、连接错误和TTFB；请求路径只读取已知状态，从不等待探测。
+仅对近期没有流量的渠道安排后台探测
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 每个渠道保留的最近完整请求耗时样本数（用于延迟分位数）
+LATENCY_SAMPLE_SIZE = 128
+
+# 说明渠道本身可达的状态码（请求级错误不计为渠道故障），与原快速预检的判定一致
+REACHABLE_STATUS_CODES = frozenset({200, 400, 404, 422})
+
+
+# 上游限流：渠道本身可用，只是暂时需要降速，不计入连续失败
+THROTTLED_STATUS_CODES = frozenset({429})
+
+
+def is_channel_failure(status_code: Optional[int]) -> bool:
+    """状态码是否表示渠道故障（None 表示连接错误）"""
+    return status_code is None or status_code not in REACHABLE_STATUS_CODES
+
+
+@dataclass
+class ChannelHealthState:
+    """单个渠道的被动健康状态"""
+
+    success_ewma: float = 1.0  # 成功率指数移动平均
+    ttfb_ewma: Optional[float] = None  # 首字节时间指数移动平均（秒）
+    consecutive_failures: int = 0
+    throttled_at: float = 0.0  # 最近一次被上游限流（429）的时间
+    last_status: Optional[int] = None  # None 表示连接错误或尚无记录
+    last_error: Optional[str] = None
+    last_observed_at: float = 0.0  # 最近一次结果（真实流量或探测）
+    last_traffic_at: float = 0.0  # 最近一次真实流量
+    total_observations: int = 0
+    total_failures: int = 0
+    total_throttled: int = 0
+    probe_count: int = 0
+    # 最近成功请求的完整耗时（秒）
+    latencies: deque = field(default_factory=lambda: deque(maxlen=LATENCY_SAMPLE_SIZE))
+
+
+class PassiveHealthTracker:
+    """按渠道汇总真实请求结果，判断可用性并调度空闲渠道的后台探测"""
+
+    def __init__(
+        self,
+        stale_after: float = 300.0,
+        failure_threshold: int = 3,
+        ewma_alpha: float = 0.2,
+        probe_interval: float = 300.0,
+        throttle_window: float = 30.0,
+    ):
+        """
+        Args:
+            stale_after: 超过该时间（秒）没有任何结果时，状态视为未知
+            failure_threshold: 连续失败达到该次数视为不可用（单次超时等瞬时错误不降级）
+            throttle_window: 收到429后该时间（秒）内视为限流中（可用但不优先）
+            ewma_alpha: 成功率与TTFB移动平均的平滑系数
+            probe_interval: 渠道无真实流量超过该时间（秒）才允许后台探测
+        """
+        self.stale_after = stale_after
+        self.failure_threshold = failure_threshold
+        self.ewma_alpha = ewma_alpha
+        self.probe_interval = probe_interval
+        self.throttle_window = throttle_window
+
+        self._lock = threading.Lock()
+        self._states: dict[str, ChannelHealthState] = {}
+        # 进行中的后台探测（保留引用避免任务被回收）
+        self._probe_tasks: dict[str, asyncio.Task] = {}
+        self._stats = {
+            "traffic_outcomes": 0,
+            "probe_outcomes": 0,
+            "probes_scheduled": 0,
+        }
+
+    def record_outcome(
+        self,
+        channel_id: str,
+        status_code: Optional[int],
+        ttfb: Optional[float] = None,
+        error: Optional[str] = None,
+        probe: bool = False,
+    ) -> None:
+        """
+        记录一次请求结果
+
+        Args:
+            channel_id: 渠道ID
+            status_code: 上游HTTP状态码，连接错误时为None
+            ttfb: 首字节时间（秒）
+            error: 错误描述
+            probe: 是否来自后台探测
+        """
+        failed = is_channel_failure(status_code)
+        now = time.monotonic()
+        alpha = self.ewma_alpha
+
+        with self._lock:
+            state = self._states.get(channel_id)
+            if state is None:
+                state = self._states[channel_id] = ChannelHealthState()
+
+            state.success_ewma += alpha * (
+                (0.0 if failed else 1.0) - state.success_ewma
+            )
+            if ttfb is not None and not failed:
+                state.ttfb_ewma = (
+                    ttfb
+                    if state.ttfb_ewma is None
+                    else state.ttfb_ewma + alpha * (ttfb - state.ttfb_ewma)
+                )
+
+            state.last_status = status_code
+            state.last_error = error if failed else None
+            state.last_observed_at = now
+            state.total_observations += 1
+            if status_code in THROTTLED_STATUS_CODES:
+                # 限流不代表渠道故障，连续失败计数保持不变
+                state.throttled_at = now
+                state.total_throttled += 1
+            elif failed:
+                state.consecutive_failures += 1
+                state.total_failures += 1
+            else:
+                state.consecutive_failures = 0
+
+            if probe:
+                state.probe_count += 1
+                self._stats["probe_outcomes"] += 1
+            else:
+                state.last_traffic_at = now
+                self._stats["traffic_outcomes"] += 1
+
+    def record_success(
+        self, channel_id: str, ttfb: Optional[float] = None, probe: bool = False
+    ) -> None:
+        self.record_outcome(channel_id, 200, ttfb=ttfb, probe=probe)
+
+    def record_failure(
+        self,
+        channel_id: str,
+        status_code: Optional[int] = None,
+        error: Optional[str] = None,
+        probe: bool = False,
+    ) -> None:
+        self.record_outcome(channel_id, status_code, error=error, probe=probe)
+
+    def record_latency(self, channel_id: str, latency: float) -> None:
+        """记录一次成功请求的完整耗时（秒）"""
+        with self._lock:
+            state = self._states.get(channel_id)
+            if state is None:
+                state = self._states[channel_id] = ChannelHealthState()
+            state.latencies.append(latency)
+
+    def latency_quantile(
+        self, channel_id: str, quantile: float, min_samples: int = 1
+    ) -> Optional[float]:
+        """最近请求耗时的分位数，样本不足时返回None"""
+        state = self._states.get(channel_id)
+        if state is None or len(state.latencies) < min_samples:
+            return None
+        samples = sorted(state.latencies)
+        index = min(len(samples) - 1, int(quantile * len(samples)))
+        return samples[index]
+
+    def is_available(self, channel_id: str) -> Optional[bool]:
+        """
+        渠道是否可用
+
+        Returns:
+            True/False 为近期结果给出的判断；None 表示没有近期结果（未知）
+        """
+        state = self._states.get(channel_id)
+        if (
+            state is None
+            or time.monotonic() - state.last_observed_at > self.stale_after
+        ):
+            return None
+        return state.consecutive_failures < self.failure_threshold
+
+    def is_throttled(self, channel_id: str) -> bool:
+        """渠道近期是否被上游限流（429）"""
+        state = self._states.get(channel_id)
+        return (
+            state is not None
+            and state.throttled_at > 0
+            and time.monotonic() - state.throttled_at <= self.throttle_window
+        )
+
+    def get_state(self, channel_id: str) -> Optional[ChannelHealthState]:
+        return self._states.get(channel_id)
+
+    def needs_probe(self, channel_id: str) -> bool:
+        """渠道近期没有真实流量且没有进行中的探测"""
+        if channel_id in self._probe_tasks:
+            return False
+        state = self._states.get(channel_id)
+        if state is None:
+            return True
+        now = time.monotonic()
+        return (
+            now - state.last_traffic_at > self.probe_interval
+            and now - state.last_observed_at > self.probe_interval
+        )
+
+    def schedule_probe(
+        self,
+        channel_id: str,
+        probe: Callable[[], Awaitable[tuple[Optional[int], Optional[str]]]],
+    ) -> bool:
+        """
+        为空闲渠道安排后台探测（不阻塞调用方）
+
+        Args:
+            channel_id: 渠道ID
+            probe: 返回 (状态码, 错误描述) 的探测协程工厂
+
+        Returns:
+            是否安排了新的探测
+        """
+        if not self.needs_probe(channel_id):
+            return False
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+        async def run() -> None:
+            try:
+                status_code, error = await probe()
+            except Exception as e:
+                status_code, error = None, str(e)
+            self.record_outcome(channel_id, status_code, error=error, probe=True)
+            logger.debug(
+                f"PASSIVE HEALTH: Background probe for '{channel_id}' -> {status_code}"
+            )
+
+        task = loop.create_task(run())
+        self._probe_tasks[channel_id] = task
+        task.add_done_callback(lambda _: self._probe_tasks.pop(channel_id, None))
+        self._stats["probes_scheduled"] += 1
+        return True
+
+    def get_stats(self) -> dict[str, Any]:
+        with self._lock:
+            unavailable = sum(
+                1
+                for channel_id in self._states
+                if self.is_available(channel_id) is False
+            )
+            throttled = sum(
+                1 for channel_id in self._states if self.is_throttled(channel_id)
+            )
+            return {
+                "tracked_channels": len(self._states),
+                "unavailable_channels": unavailable,
+                "throttled_channels": throttled,
+                "probes_in_flight": len(self._probe_tasks),
+                **self._stats,
+            }
+
+
+# 全局被动健康追踪实例
+_health_tracker: Optional[PassiveHealthTracker] = None
+
+
+def get_health_tracker() -> PassiveHealthTracker:
+    """获取全局被动健康追踪器"""
+    global _health_tracker
+    if _health_tracker is None:
+        _health_tracker = PassiveHealthTracker()
+    return _health_tracker
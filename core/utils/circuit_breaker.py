@@ -0,0 +1,282 @@
+"""
+熔断器 - 按 (渠道, 模型) 维护 关闭/打开/半开 状态
+关闭状态下按滑动窗口统计失败率，超过阈值即打开；打开期间请求直接跳过，
+冷却结束后进入半开，只放行少量真实请求试探，成功则关闭，失败则重新打开
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Optional
+
+from .channel_health import is_channel_failure
+from .routing_generations import get_routing_generations
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """熔断器状态"""
+
+    CLOSED = "closed"  # 正常放行
+    OPEN = "open"  # 熔断，直接跳过
+    HALF_OPEN = "half_open"  # 半开，只放行少量试探请求
+
+
+class CircuitBreaker:
+    """单个 (渠道, 模型) 的熔断器"""
+
+    def __init__(
+        self,
+        window_size: int = 20,
+        min_requests: int = 5,
+        failure_rate_threshold: float = 0.5,
+        consecutive_failure_threshold: int = 3,
+        open_timeout: float = 30.0,
+        max_open_timeout: float = 300.0,
+        half_open_max_calls: int = 1,
+        half_open_success_threshold: int = 2,
+        trial_timeout: float = 120.0,
+    ):
+        self.window_size = window_size
+        self.min_requests = min_requests
+        self.failure_rate_threshold = failure_rate_threshold
+        self.consecutive_failure_threshold = consecutive_failure_threshold
+        self.open_timeout = open_timeout
+        self.max_open_timeout = max_open_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.half_open_success_threshold = half_open_success_threshold
+        self.trial_timeout = trial_timeout
+
+        self.state = CircuitState.CLOSED
+        # 滑动窗口：最近 window_size 次结果（True 表示失败）
+        self._window: deque[bool] = deque(maxlen=window_size)
+        self._window_failures = 0
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._open_count = 0  # 连续打开次数，用于冷却时间指数退避
+        self._trial_in_flight = 0
+        self._trial_started_at = 0.0
+        self._half_open_successes = 0
+
+    def can_attempt(self, now: float) -> bool:
+        """只读检查（不占用半开试探名额），用于候选过滤"""
+        if self.state is CircuitState.CLOSED:
+            return True
+        if self.state is CircuitState.OPEN:
+            return now >= self._open_until
+        return self._has_trial_slot(now)
+
+    def allow_request(self, now: float) -> bool:
+        """请求前调用：允许时在半开状态下占用一个试探名额"""
+        if self.state is CircuitState.CLOSED:
+            return True
+        if self.state is CircuitState.OPEN:
+            if now < self._open_until:
+                return False
+            self._transition(CircuitState.HALF_OPEN)
+        if not self._has_trial_slot(now):
+            return False
+        self._trial_in_flight += 1
+        self._trial_started_at = now
+        return True
+
+    def _has_trial_slot(self, now: float) -> bool:
+        # 试探请求未回报结果（被取消等）超过 trial_timeout 后回收名额
+        if self._trial_in_flight and now - self._trial_started_at > self.trial_timeout:
+            self._trial_in_flight = 0
+        return self._trial_in_flight < self.half_open_max_calls
+
+    def release_trial(self) -> None:
+        """试探请求未产生结果（被取消、归因于Key的失败）时归还名额"""
+        if self.state is CircuitState.HALF_OPEN:
+            self._trial_in_flight = max(0, self._trial_in_flight - 1)
+
+    def record(self, failed: bool, now: float) -> Optional[CircuitState]:
+        """记录请求结果，状态变化时返回新状态"""
+        if self.state is CircuitState.HALF_OPEN:
+            self._trial_in_flight = max(0, self._trial_in_flight - 1)
+            if failed:
+                return self._open(now)
+            self._half_open_successes += 1
+            if self._half_open_successes >= self.half_open_success_threshold:
+                return self._transition(CircuitState.CLOSED)
+            return None
+
+        if self.state is CircuitState.OPEN:
+            # 熔断前已发出的请求晚到的结果，不影响状态
+            return None
+
+        if len(self._window) == self._window.maxlen and self._window[0]:
+            self._window_failures -= 1
+        self._window.append(failed)
+        if failed:
+            self._window_failures += 1
+            self._consecutive_failures += 1
+        else:
+            self._consecutive_failures = 0
+
+        if failed and (
+            self._consecutive_failures >= self.consecutive_failure_threshold
+            or (
+                len(self._window) >= self.min_requests
+                and self._window_failures / len(self._window)
+                >= self.failure_rate_threshold
+            )
+        ):
+            return self._open(now)
+        return None
+
+    def _open(self, now: float) -> CircuitState:
+        # 半开试探失败时冷却时间翻倍，避免持续故障的渠道被反复试探
+        timeout = min(
+            self.open_timeout * (2**self._open_count), self.max_open_timeout
+        )
+        self._open_count += 1
+        self._open_until = now + timeout
+        return self._transition(CircuitState.OPEN)
+
+    def _transition(self, state: CircuitState) -> CircuitState:
+        self.state = state
+        self._trial_in_flight = 0
+        self._half_open_successes = 0
+        if state is CircuitState.CLOSED:
+            self._window.clear()
+            self._window_failures = 0
+            self._consecutive_failures = 0
+            self._open_count = 0
+        return state
+
+    def get_status(self, now: float) -> dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "window_requests": len(self._window),
+            "window_failures": self._window_failures,
+            "consecutive_failures": self._consecutive_failures,
+            "open_remaining": max(0.0, self._open_until - now),
+            "trial_in_flight": self._trial_in_flight,
+        }
+
+
+class CircuitBreakerRegistry:
+    """按 (渠道, 模型) 管理熔断器，路由过滤和重试循环以O(1)查询"""
+
+    def __init__(self, settings: Any = None):
+        self._lock = threading.Lock()
+        self._breakers: dict[tuple[str, str], CircuitBreaker] = {}
+        self._settings: dict[str, Any] = {}
+        self.enabled = True
+        self._stats = {"opened": 0, "closed": 0, "rejected": 0}
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """应用配置（routing.circuit_breaker），已有熔断器按新参数重建"""
+        values = (
+            settings.model_dump() if hasattr(settings, "model_dump") else dict(settings)
+        )
+        with self._lock:
+            self.enabled = values.pop("enabled", True)
+            if values != self._settings:
+                self._settings = values
+                self._breakers.clear()
+
+    def _get(self, channel_id: str, model_name: str) -> CircuitBreaker:
+        key = (channel_id, model_name)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(**self._settings)
+        return breaker
+
+    def can_attempt(self, channel_id: str, model_name: str) -> bool:
+        """候选过滤用的只读检查"""
+        if not self.enabled:
+            return True
+        breaker = self._breakers.get((channel_id, model_name))
+        return breaker is None or breaker.can_attempt(time.monotonic())
+
+    def allow_request(self, channel_id: str, model_name: str) -> bool:
+        """发送请求前调用，半开状态下占用试探名额"""
+        if not self.enabled:
+            return True
+        breaker = self._breakers.get((channel_id, model_name))
+        if breaker is None or breaker.state is CircuitState.CLOSED:
+            return True
+        with self._lock:
+            allowed = breaker.allow_request(time.monotonic())
+            if not allowed:
+                self._stats["rejected"] += 1
+            return allowed
+
+    def release_trial(self, channel_id: str, model_name: str) -> None:
+        """归还 allow_request 占用的试探名额（请求未产生可记录的结果时调用）"""
+        if not self.enabled:
+            return
+        breaker = self._breakers.get((channel_id, model_name))
+        if breaker is None or breaker.state is not CircuitState.HALF_OPEN:
+            return
+        with self._lock:
+            breaker.release_trial()
+
+    def record_outcome(
+        self, channel_id: str, model_name: str, status_code: Optional[int]
+    ) -> None:
+        """记录请求结果（状态码为None表示连接错误）"""
+        if not self.enabled:
+            return
+        failed = is_channel_failure(status_code)
+        with self._lock:
+            breaker = self._breakers.get((channel_id, model_name))
+            if breaker is None:
+                if not failed:
+                    return  # 从未失败的组合无需创建熔断器
+                breaker = self._get(channel_id, model_name)
+            new_state = breaker.record(failed, time.monotonic())
+
+        if new_state is None:
+            return
+        if new_state is CircuitState.OPEN:
+            self._stats["opened"] += 1
+            logger.warning(
+                f"[WARNING] CIRCUIT OPEN: {model_name}@{channel_id} "
+                f"(last status: {status_code}), skipping for "
+                f"{breaker.get_status(time.monotonic())['open_remaining']:.0f}s"
+            )
+        else:
+            self._stats["closed"] += 1
+            logger.info(f"[PASS] CIRCUIT CLOSED: {model_name}@{channel_id} recovered")
+        # 熔断状态变化使包含该渠道的缓存路由失效
+        get_routing_generations().bump_blacklist(channel_id)
+
+    def get_state(self, channel_id: str, model_name: str) -> CircuitState:
+        breaker = self._breakers.get((channel_id, model_name))
+        return breaker.state if breaker else CircuitState.CLOSED
+
+    def get_stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            open_circuits = {
+                f"{model_name}@{channel_id}": breaker.get_status(now)
+                for (channel_id, model_name), breaker in self._breakers.items()
+                if breaker.state is not CircuitState.CLOSED
+            }
+            return {
+                "enabled": self.enabled,
+                "tracked_circuits": len(self._breakers),
+                "open_circuits": open_circuits,
+                **self._stats,
+            }
+
+
+# 全局熔断器注册表
+_circuit_breakers: Optional[CircuitBreakerRegistry] = None
+
+
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """获取全局熔断器注册表"""
+    global _circuit_breakers
+    if _circuit_breakers is None:
+        _circuit_breakers = CircuitBreakerRegistry()
+    return _circuit_breakers
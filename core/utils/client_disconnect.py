@@ -0,0 +1,132 @@
+"""
+客户端断开处理 - 下游连接断开时取消上游请求
+非流式请求等待上游期间轮询 request.is_disconnected()，断开即取消上游任务；
+流式响应结束后立即关闭生成器链，上游连接随之关闭。
+统计被取消请求的部分用量与因此省下的上游输出token
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Optional, TypeVar
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """等待上游响应期间客户端已断开"""
+
+
+class DisconnectAwareStreamingResponse(StreamingResponse):
+    """
+    发送结束（包括客户端断开）后关闭body生成器的流式响应
+
+    Starlette 在客户端断开时只取消发送任务，停在 yield 处的生成器要等垃圾回收
+    才会关闭；这里立即 aclose，生成器内的上游流随之关闭并记录取消
+    """
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+class DisconnectMonitor:
+    """把客户端断开传递为上游取消，并统计取消节省的token"""
+
+    def __init__(self, settings: Any = None):
+        self.enabled = True
+        self.poll_interval = 1.0
+        self.default_completion_tokens = 1024
+        self._stats = {
+            "cancelled_streams": 0,
+            "cancelled_requests": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "completion_tokens_saved": 0,
+        }
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """应用配置（routing.client_disconnect）"""
+        self.enabled = settings.enabled
+        self.poll_interval = settings.poll_interval
+        self.default_completion_tokens = settings.default_completion_tokens
+
+    async def run(self, awaitable: Awaitable[T], http_request: Any = None) -> T:
+        """
+        执行 awaitable；客户端先断开时取消它并抛出 ClientDisconnected
+
+        Args:
+            awaitable: 上游请求（被取消时由其自身记录部分用量）
+            http_request: Starlette 请求对象，为None时不检测断开
+        """
+        if not self.enabled or http_request is None:
+            return await awaitable
+
+        task = asyncio.ensure_future(awaitable)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.poll_interval)
+                if done:
+                    return task.result()
+                if await http_request.is_disconnected():
+                    break
+        except BaseException:
+            task.cancel()
+            raise
+
+        task.cancel()
+        await asyncio.wait({task})
+        if not task.cancelled():
+            task.exception()  # 取消前刚好结束，结果已无人接收
+        raise ClientDisconnected()
+
+    def record_cancelled(
+        self,
+        streaming: bool,
+        prompt_tokens: int,
+        completion_tokens: int,
+        max_tokens: Optional[int] = None,
+    ) -> int:
+        """
+        记录一次因客户端断开而取消的上游请求
+
+        Args:
+            streaming: 是否流式请求
+            prompt_tokens: 输入token（上游通常已计费）
+            completion_tokens: 取消前已生成的输出token
+            max_tokens: 请求的输出上限，未设置时按 default_completion_tokens
+
+        Returns:
+            估算节省的输出token数（输出上限减去已生成部分）
+        """
+        budget = max_tokens or self.default_completion_tokens
+        saved = max(0, budget - completion_tokens)
+        self._stats["cancelled_streams" if streaming else "cancelled_requests"] += 1
+        self._stats["prompt_tokens"] += prompt_tokens
+        self._stats["completion_tokens"] += completion_tokens
+        self._stats["completion_tokens_saved"] += saved
+        return saved
+
+    def get_stats(self) -> dict[str, Any]:
+        return {"enabled": self.enabled, **self._stats}
+
+
+# 全局客户端断开监视器
+_disconnect_monitor: Optional[DisconnectMonitor] = None
+
+
+def get_disconnect_monitor() -> DisconnectMonitor:
+    """获取全局客户端断开监视器"""
+    global _disconnect_monitor
+    if _disconnect_monitor is None:
+        _disconnect_monitor = DisconnectMonitor()
+    return _disconnect_monitor
@@ -0,0 +1,236 @@
+"""
+自适应并发限制 - 按渠道的 AIMD（加性增、乘性减）并发上限
+成功且延迟正常时上限缓慢增加；收到429/503或近期延迟相对长期均值明显升高时按比例降低。
+渠道已满时不排队，由调用方直接溢出到下一个候选渠道
+"""
+
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 表示上游过载的状态码
+OVERLOAD_STATUS_CODES = frozenset({429, 503})
+
+# 近期/长期延迟的EWMA系数：比较两者而不是与最小值比较，
+# 单次请求因提示词长度等原因变慢不会触发降低
+SHORT_LATENCY_ALPHA = 0.1
+LONG_LATENCY_ALPHA = 0.02
+# 延迟信号生效前需要的样本数
+MIN_LATENCY_SAMPLES = 20
+
+
+class ConcurrencyPermit:
+    """一次请求占用的并发名额，release 可重复调用"""
+
+    __slots__ = ("_limiter", "channel_id", "permit_id", "_released")
+
+    def __init__(
+        self, limiter: "AdaptiveConcurrencyLimiter", channel_id: str, permit_id: int
+    ):
+        self._limiter = limiter
+        self.channel_id = channel_id
+        self.permit_id = permit_id
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._limiter._release(self.channel_id, self.permit_id)
+
+
+class ChannelLimit:
+    """单个渠道的 AIMD 状态"""
+
+    def __init__(self, initial_limit: float):
+        self.limit = initial_limit
+        self.permits: dict[int, float] = {}  # permit_id -> 获取时间
+        self.recent_latency: Optional[float] = None  # 近期延迟（快速EWMA）
+        self.baseline_latency: Optional[float] = None  # 长期延迟（慢速EWMA）
+        self.latency_samples = 0
+        self.last_decrease_at = 0.0
+        self.rejected = 0
+        self.decreases = 0
+
+
+class AdaptiveConcurrencyLimiter:
+    """按渠道维护并发上限与在途请求数"""
+
+    def __init__(self, settings: Any = None):
+        self.enabled = True
+        self.initial_limit = 10.0
+        self.min_limit = 1.0
+        self.max_limit = 100.0
+        self.backoff_ratio = 0.5
+        self.latency_backoff_ratio = 0.9
+        self.latency_tolerance = 2.0
+        self.decrease_cooldown = 1.0
+        self.lease_timeout = 300.0
+
+        self._lock = threading.Lock()
+        self._channels: dict[str, ChannelLimit] = {}
+        self._permit_ids = itertools.count(1)
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """应用配置（routing.concurrency）"""
+        with self._lock:
+            self.enabled = settings.enabled
+            self.initial_limit = float(settings.initial_limit)
+            self.min_limit = float(settings.min_limit)
+            self.max_limit = float(settings.max_limit)
+            self.backoff_ratio = settings.backoff_ratio
+            self.latency_backoff_ratio = settings.latency_backoff_ratio
+            self.latency_tolerance = settings.latency_tolerance
+            self.decrease_cooldown = settings.decrease_cooldown
+            self.lease_timeout = settings.lease_timeout
+            for state in self._channels.values():
+                state.limit = min(self.max_limit, max(self.min_limit, state.limit))
+
+    def _get(self, channel_id: str) -> ChannelLimit:
+        state = self._channels.get(channel_id)
+        if state is None:
+            state = self._channels[channel_id] = ChannelLimit(self.initial_limit)
+        return state
+
+    def try_acquire(self, channel_id: str) -> Optional[ConcurrencyPermit]:
+        """
+        尝试占用并发名额（不等待）
+
+        Returns:
+            名额；渠道已达并发上限时返回None，调用方应改用下一个候选
+        """
+        with self._lock:
+            state = self._get(channel_id)
+            now = time.monotonic()
+            if self.enabled and len(state.permits) >= int(state.limit):
+                # 回收未释放的过期名额（如流式响应从未被消费）
+                expired = [
+                    permit_id
+                    for permit_id, acquired_at in state.permits.items()
+                    if now - acquired_at > self.lease_timeout
+                ]
+                for permit_id in expired:
+                    del state.permits[permit_id]
+                if len(state.permits) >= int(state.limit):
+                    state.rejected += 1
+                    return None
+
+            permit_id = next(self._permit_ids)
+            state.permits[permit_id] = now
+            return ConcurrencyPermit(self, channel_id, permit_id)
+
+    def _release(self, channel_id: str, permit_id: int) -> None:
+        with self._lock:
+            state = self._channels.get(channel_id)
+            if state:
+                state.permits.pop(permit_id, None)
+
+    def on_outcome(
+        self, channel_id: str, status_code: Optional[int], latency: Optional[float]
+    ) -> None:
+        """
+        根据请求结果调整并发上限
+
+        Args:
+            channel_id: 渠道ID
+            status_code: 上游状态码（None 表示连接错误，不参与调整）
+            latency: 首字节时间（秒），近期均值超过长期均值 latency_tolerance 倍时降低上限
+        """
+        if not self.enabled or status_code is None:
+            return
+
+        with self._lock:
+            state = self._get(channel_id)
+            now = time.monotonic()
+
+            if status_code in OVERLOAD_STATUS_CODES:
+                self._decrease(state, self.backoff_ratio, now, channel_id, status_code)
+                return
+            if status_code != 200 or latency is None:
+                return
+
+            if state.baseline_latency is None or state.recent_latency is None:
+                state.baseline_latency = state.recent_latency = latency
+            else:
+                state.recent_latency += SHORT_LATENCY_ALPHA * (
+                    latency - state.recent_latency
+                )
+                state.baseline_latency += LONG_LATENCY_ALPHA * (
+                    latency - state.baseline_latency
+                )
+            state.latency_samples += 1
+
+            if (
+                state.latency_samples >= MIN_LATENCY_SAMPLES
+                and state.recent_latency
+                > state.baseline_latency * self.latency_tolerance
+            ):
+                self._decrease(
+                    state, self.latency_backoff_ratio, now, channel_id, status_code
+                )
+            elif len(state.permits) * 2 >= state.limit:
+                # 只有实际用到一半以上的上限时才增加，避免空闲渠道上限虚高
+                state.limit = min(self.max_limit, state.limit + 1.0 / state.limit)
+
+    def _decrease(
+        self,
+        state: ChannelLimit,
+        ratio: float,
+        now: float,
+        channel_id: str,
+        status_code: int,
+    ) -> None:
+        # 同一波并发请求的多个429只降低一次
+        if now - state.last_decrease_at < self.decrease_cooldown:
+            return
+        previous = state.limit
+        state.limit = max(self.min_limit, state.limit * ratio)
+        state.last_decrease_at = now
+        state.decreases += 1
+        logger.info(
+            f"[WARNING] CONCURRENCY: Channel '{channel_id}' limit {previous:.1f} -> "
+            f"{state.limit:.1f} (status {status_code})"
+        )
+
+    def get_channel_status(self, channel_id: str) -> dict[str, Any]:
+        """渠道当前并发上限与在途请求数"""
+        with self._lock:
+            state = self._channels.get(channel_id)
+            if state is None:
+                return {"limit": int(self.initial_limit), "in_flight": 0}
+            return {
+                "limit": int(state.limit),
+                "in_flight": len(state.permits),
+                "rejected": state.rejected,
+                "decreases": state.decreases,
+                "recent_latency": state.recent_latency,
+                "baseline_latency": state.baseline_latency,
+            }
+
+    def get_stats(self) -> dict[str, Any]:
+        with self._lock:
+            channel_ids = list(self._channels)
+        return {
+            "enabled": self.enabled,
+            "channels": {
+                channel_id: self.get_channel_status(channel_id)
+                for channel_id in channel_ids
+            },
+        }
+
+
+# 全局并发限制器
+_concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+
+
+def get_concurrency_limiter() -> AdaptiveConcurrencyLimiter:
+    """获取全局自适应并发限制器"""
+    global _concurrency_limiter
+    if _concurrency_limiter is None:
+        _concurrency_limiter = AdaptiveConcurrencyLimiter()
+    return _concurrency_limiter
@@ -3,10 +3,12 @@
 请求前成本估算器 - Token预估优化系统
 """
 
+import json
 import logging
 import re
 import time
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Any, NamedTuple, Optional, cast
 
 from ..yaml_config import get_yaml_config_loader
@@ -46,6 +48,28 @@ def normalize_model_name(model_name: str) -> list[str]:
     return candidates
 
 
+# OpenRouter基准定价文件缓存: (路径, 修改时间, 解析结果)
+_openrouter_pricing_cache: Optional[tuple[str, float, dict[str, Any]]] = None
+
+
+def _load_openrouter_pricing_data(pricing_file: Path) -> Optional[dict[str, Any]]:
+    """读取OpenRouter基准定价文件，文件未修改时复用已解析的数据"""
+    global _openrouter_pricing_cache
+    try:
+        mtime = pricing_file.stat().st_mtime
+    except OSError:
+        return None
+
+    cached = _openrouter_pricing_cache
+    if cached and cached[0] == str(pricing_file) and cached[1] == mtime:
+        return cached[2]
+
+    with open(pricing_file, encoding="utf-8") as f:
+        pricing_data = json.load(f)
+    _openrouter_pricing_cache = (str(pricing_file), mtime, pricing_data)
+    return pricing_data
+
+
 @dataclass
 class CostEstimate:
     """成本估算结果"""
@@ -329,17 +353,12 @@ class CostEstimator:
         """获取OpenRouter基准定价（作为其他渠道的参考价格）"""
         try:
             # [BOOST] 直接使用全局model_pricing.json中已经转换的价格数据
-            import json
-            from pathlib import Path
-
             model_pricing_file = Path("cache/model_pricing.json")
-            if not model_pricing_file.exists():
+            pricing_data = _load_openrouter_pricing_data(model_pricing_file)
+            if pricing_data is None:
                 logger.debug(f"OpenRouter基准定价文件不存在: {model_pricing_file}")
                 return None
 
-            with open(model_pricing_file, encoding="utf-8") as f:
-                pricing_data = json.load(f)
-
             # 寻找模型定价（可能有多个变体）
             found_pricing = None
             max_price = {"input": 0.0, "output": 0.0}
@@ -0,0 +1,127 @@
+"""
+对冲请求策略 - 主渠道超过延迟分位数仍未返回时，向下一候选发送相同请求
+触发时间取自渠道近期请求耗时的分位数；对冲预算按令牌桶累积，
+将对冲请求限制在总流量的一小部分
+"""
+
+import logging
+import threading
+from typing import Any, Optional
+
+from .channel_health import get_health_tracker
+
+logger = logging.getLogger(__name__)
+
+
+class HedgeBudget:
+    """对冲预算：每个合格请求累积 ratio 个令牌，每次对冲消耗1个"""
+
+    def __init__(self, ratio: float = 0.05, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    def refund(self) -> None:
+        """归还一个已申请但未使用的令牌"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1.0)
+
+    @property
+    def available(self) -> float:
+        return self._tokens
+
+
+class HedgingPolicy:
+    """决定是否对冲以及何时触发"""
+
+    def __init__(self, settings: Any = None):
+        self.enabled = False
+        self.latency_quantile = 0.9
+        self.min_samples = 20
+        self.min_delay = 0.5
+        self.max_delay = 30.0
+        self.budget = HedgeBudget()
+        self._stats = {"eligible": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0}
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """应用配置（routing.hedging）"""
+        self.enabled = settings.enabled
+        self.latency_quantile = settings.latency_quantile
+        self.min_samples = settings.min_samples
+        self.min_delay = settings.min_delay
+        self.max_delay = settings.max_delay
+        if (
+            self.budget.ratio != settings.budget_ratio
+            or self.budget.burst != settings.budget_burst
+        ):
+            self.budget = HedgeBudget(settings.budget_ratio, settings.budget_burst)
+
+    def hedge_delay(self, channel_id: str) -> Optional[float]:
+        """
+        主渠道的对冲触发时间（秒）
+
+        Returns:
+            延迟分位数（限制在 [min_delay, max_delay]），未启用或样本不足时返回None
+        """
+        if not self.enabled:
+            return None
+        quantile = get_health_tracker().latency_quantile(
+            channel_id, self.latency_quantile, self.min_samples
+        )
+        if quantile is None:
+            return None
+        return min(self.max_delay, max(self.min_delay, quantile))
+
+    def record_eligible(self) -> None:
+        """记录一个可对冲的请求（累积预算）"""
+        self._stats["eligible"] += 1
+        self.budget.record_request()
+
+    def try_acquire(self) -> bool:
+        """申请对冲预算"""
+        if self.budget.try_acquire():
+            self._stats["hedged"] += 1
+            return True
+        self._stats["budget_denied"] += 1
+        return False
+
+    def release(self) -> None:
+        """归还已申请的对冲预算（没有可用的对冲目标时）"""
+        self.budget.refund()
+        self._stats["hedged"] -= 1
+
+    def record_hedge_win(self) -> None:
+        self._stats["hedge_wins"] += 1
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "budget_available": round(self.budget.available, 3),
+            **self._stats,
+        }
+
+
+# 全局对冲策略实例
+_hedging_policy: Optional[HedgingPolicy] = None
+
+
+def get_hedging_policy() -> HedgingPolicy:
+    """获取全局对冲策略"""
+    global _hedging_policy
+    if _hedging_policy is None:
+        _hedging_policy = HedgingPolicy()
+    return _hedging_policy
@@ -0,0 +1,263 @@
+"""
+延迟分布草图 - 按 (渠道, 模型) 维护首字节时间（TTFB）与完整耗时的时间衰减分布
+每个分布由 EWMA 与可合并的对数分桶分位数草图（DDSketch）组成，内存有界；
+样本按前向衰减加权，旧数据的影响随半衰期减弱，用于速度评分和状态API的 p50/p95/p99
+"""
+
+import math
+import threading
+import time
+from typing import Any, Optional
+
+# 渠道级汇总使用的模型键（汇总该渠道所有模型的样本）
+ALL_MODELS = "*"
+
+# 最小可分辨延迟（秒），更小的值计入零桶
+MIN_LATENCY = 1e-4
+
+# 前向衰减权重超过该值时重新选取基准时间，避免浮点溢出
+_MAX_WEIGHT = 1e100
+
+
+class QuantileSketch:
+    """
+    对数分桶分位数草图：分位数相对误差不超过 relative_accuracy，
+    桶数超过 max_buckets 时合并最低的桶（只损失低分位精度）
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = 0.02,
+        max_buckets: int = 256,
+        half_life: float = 600.0,
+        landmark: float = 0.0,
+    ):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.half_life = half_life
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._decay_rate = math.log(2) / half_life if half_life > 0 else 0.0
+        self.landmark = landmark
+        self.buckets: dict[int, float] = {}
+        self.zero_count = 0.0
+        self.count = 0.0  # 以 landmark 为基准的加权样本数
+
+    def _weight(self, now: float) -> float:
+        return math.exp(self._decay_rate * (now - self.landmark))
+
+    def _rescale(self, landmark: float) -> None:
+        """将权重换算到新的基准时间"""
+        factor = math.exp(-self._decay_rate * (landmark - self.landmark))
+        self.buckets = {index: c * factor for index, c in self.buckets.items()}
+        self.zero_count *= factor
+        self.count *= factor
+        self.landmark = landmark
+
+    def add(self, value: float, now: float) -> None:
+        weight = self._weight(now)
+        if weight > _MAX_WEIGHT:
+            self._rescale(now)
+            weight = 1.0
+        if value <= MIN_LATENCY:
+            self.zero_count += weight
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0.0) + weight
+            if len(self.buckets) > self.max_buckets:
+                self._collapse()
+        self.count += weight
+
+    def _collapse(self) -> None:
+        indexes = sorted(self.buckets)
+        lowest = indexes[0]
+        self.buckets[indexes[1]] += self.buckets.pop(lowest)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """合并另一个草图（相对精度需一致）"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        if other.landmark > self.landmark:
+            self._rescale(other.landmark)
+        factor = math.exp(-self._decay_rate * (self.landmark - other.landmark))
+        for index, c in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0.0) + c * factor
+        self.zero_count += other.zero_count * factor
+        self.count += other.count * factor
+        while len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def decayed_count(self, now: float) -> float:
+        """按当前时间衰减后的有效样本数"""
+        return self.count / self._weight(now) if self.count else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count <= 0:
+            return None
+        rank = q * self.count
+        cumulative = self.zero_count
+        if cumulative > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative > rank:
+                # 桶中点，保证相对误差
+                return 2 * self.gamma**index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class LatencyDistribution:
+    """单个指标（TTFB或完整耗时）的 EWMA + 分位数草图"""
+
+    def __init__(self, ewma_alpha: float = 0.2, **sketch_options: Any):
+        self.ewma_alpha = ewma_alpha
+        self.ewma: Optional[float] = None
+        self.samples = 0
+        self.sketch = QuantileSketch(**sketch_options)
+
+    def add(self, value: float, now: float) -> None:
+        self.ewma = (
+            value
+            if self.ewma is None
+            else self.ewma + self.ewma_alpha * (value - self.ewma)
+        )
+        self.samples += 1
+        self.sketch.add(value, now)
+
+    def summary(self, now: float) -> dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "effective_samples": round(self.sketch.decayed_count(now), 2),
+            "ewma": self.ewma,
+            "p50": self.sketch.quantile(0.5),
+            "p95": self.sketch.quantile(0.95),
+            "p99": self.sketch.quantile(0.99),
+        }
+
+
+class LatencyTracker:
+    """按 (渠道, 模型) 记录 TTFB 与完整耗时，同时维护渠道级汇总"""
+
+    def __init__(
+        self,
+        relative_accuracy: float = 0.02,
+        max_buckets: int = 256,
+        half_life: float = 600.0,
+        min_samples: int = 3,
+    ):
+        """
+        Args:
+            relative_accuracy: 分位数相对误差
+            max_buckets: 每个草图最多保留的桶数
+            half_life: 样本权重的半衰期（秒）
+            min_samples: 用于评分所需的最少样本数
+        """
+        self.min_samples = min_samples
+        self._sketch_options = {
+            "relative_accuracy": relative_accuracy,
+            "max_buckets": max_buckets,
+            "half_life": half_life,
+            "landmark": time.monotonic(),
+        }
+        self._lock = threading.Lock()
+        # (渠道ID, 模型) -> {"ttfb": 分布, "total": 分布}
+        self._distributions: dict[tuple[str, str], dict[str, LatencyDistribution]] = {}
+
+    def _get(self, channel_id: str, model_name: str) -> dict[str, LatencyDistribution]:
+        key = (channel_id, model_name)
+        distributions = self._distributions.get(key)
+        if distributions is None:
+            distributions = self._distributions[key] = {
+                "ttfb": LatencyDistribution(**self._sketch_options),
+                "total": LatencyDistribution(**self._sketch_options),
+            }
+        return distributions
+
+    def record(
+        self,
+        channel_id: str,
+        model_name: Optional[str],
+        ttfb: Optional[float] = None,
+        total: Optional[float] = None,
+    ) -> None:
+        """
+        记录一次成功请求的延迟（秒）
+
+        Args:
+            channel_id: 渠道ID
+            model_name: 模型名
+            ttfb: 首字节时间（仅流式请求的首个数据块；非流式请求不记录）
+            total: 完整耗时（流式为整个流的时长）
+        """
+        now = time.monotonic()
+        with self._lock:
+            for model_key in {model_name or ALL_MODELS, ALL_MODELS}:
+                distributions = self._get(channel_id, model_key)
+                if ttfb is not None:
+                    distributions["ttfb"].add(ttfb, now)
+                if total is not None:
+                    distributions["total"].add(total, now)
+
+    def quantile(
+        self,
+        channel_id: str,
+        model_name: Optional[str],
+        q: float,
+        metric: str = "ttfb",
+    ) -> Optional[float]:
+        """分位数（秒）；模型样本不足时回退到渠道级汇总，仍不足返回None"""
+        with self._lock:
+            for model_key in (model_name or ALL_MODELS, ALL_MODELS):
+                distributions = self._distributions.get((channel_id, model_key))
+                if distributions is None:
+                    continue
+                distribution = distributions[metric]
+                if distribution.samples >= self.min_samples:
+                    return distribution.sketch.quantile(q)
+        return None
+
+    def effective_ttfb(
+        self, channel_id: str, model_name: Optional[str] = None
+    ) -> Optional[float]:
+        """速度评分用的首字节时间：p50 与 p95 的均值，兼顾典型值与尾延迟"""
+        p50 = self.quantile(channel_id, model_name, 0.5)
+        if p50 is None:
+            return None
+        p95 = self.quantile(channel_id, model_name, 0.95)
+        return (p50 + (p95 if p95 is not None else p50)) / 2
+
+    def get_channel_summary(self, channel_id: str) -> dict[str, Any]:
+        """渠道各模型的 TTFB 与完整耗时分位数"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model_name: {
+                    metric: distribution.summary(now)
+                    for metric, distribution in distributions.items()
+                }
+                for (cid, model_name), distributions in self._distributions.items()
+                if cid == channel_id
+            }
+
+    def get_stats(self) -> dict[str, Any]:
+        with self._lock:
+            channel_ids = sorted({cid for cid, _model in self._distributions})
+        return {
+            "tracked_series": len(self._distributions),
+            "channels": {
+                channel_id: self.get_channel_summary(channel_id)
+                for channel_id in channel_ids
+            },
+        }
+
+
+# 全局延迟追踪实例
+_latency_tracker: Optional[LatencyTracker] = None
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """获取全局延迟分布追踪器"""
+    global _latency_tracker
+    if _latency_tracker is None:
+        _latency_tracker = LatencyTracker()
+    return _latency_tracker
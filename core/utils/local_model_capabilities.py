@@ -3,8 +3,11 @@
 检测本地模型是否支持特定能力（vision、function_calling等），不支持时自动fallback到云端
 """
 
+import asyncio
+import hashlib
 import json
 import logging
+import time
 from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
 from typing import Any, Optional
@@ -15,6 +18,9 @@ from core.utils.smart_cache import cache_get, cache_set
 
 logger = logging.getLogger(__name__)
 
+# smart_cache 中的持久化缓存类型
+CAPABILITY_CACHE_TYPE = "model_capabilities"
+
 
 @dataclass
 class ModelCapabilities:
@@ -46,13 +52,25 @@ class CapabilityTestRequest:
 class LocalModelCapabilityDetector:
     """本地模型能力检测器"""
 
-    def __init__(self, cache_ttl: int = 86400):  # 24小时缓存
+    def __init__(
+        self,
+        cache_ttl: int = 86400,  # 24小时缓存
+        negative_cache_ttl: int = 3600,  # 探测失败的结果缓存1小时
+        warmup_concurrency: int = 2,
+    ):
         """
         Args:
             cache_ttl: 缓存时间（秒）
+            negative_cache_ttl: 本地模型所有能力探测均失败时的缓存时间（秒）
+            warmup_concurrency: 后台预热探测的并发数（本地推理服务通常承受不了高并发）
         """
         self.cache_ttl = cache_ttl
-        self.capability_cache: dict[str, ModelCapabilities] = {}
+        self.negative_cache_ttl = negative_cache_ttl
+        self.warmup_concurrency = warmup_concurrency
+        # 进程内缓存: cache_key -> (能力, 过期时间)，包括探测失败的负结果
+        self.capability_cache: dict[str, tuple[ModelCapabilities, float]] = {}
+        # 进行中的检测：同一模型的并发请求共享一次探测
+        self._inflight: dict[str, asyncio.Future] = {}
 
         # 预定义能力测试案例
         self.test_cases: dict[str, CapabilityTestRequest] = {
@@ -117,8 +135,35 @@ class LocalModelCapabilityDetector:
         }
 
     def _generate_cache_key(self, model_name: str, provider: str, base_url: str) -> str:
-        """生成能力缓存键"""
-        return f"capabilities_{provider}_{model_name}_{hash(base_url) % 10000}"
+        """生成能力缓存键（稳定哈希，保证持久化缓存跨进程可用）"""
+        url_hash = hashlib.md5(base_url.encode("utf-8")).hexdigest()[:8]
+        return f"capabilities_{provider}_{model_name}_{url_hash}"
+
+    def get_cache_ttl(self, capabilities: ModelCapabilities) -> int:
+        """能力结果的缓存时间：本地模型探测全部失败时使用较短的负缓存TTL"""
+        if (
+            capabilities.is_local
+            and not capabilities.supports_vision
+            and not capabilities.supports_function_calling
+        ):
+            return self.negative_cache_ttl
+        return self.cache_ttl
+
+    def get_cached_capabilities(
+        self, model_name: str, provider: str, base_url: str
+    ) -> Optional[ModelCapabilities]:
+        """同步查询进程内缓存（不触发探测）"""
+        cache_key = self._generate_cache_key(model_name, provider, base_url)
+        cached = self.capability_cache.get(cache_key)
+        if cached and cached[1] > time.time():
+            return cached[0]
+        return None
+
+    def _remember(self, cache_key: str, capabilities: ModelCapabilities) -> None:
+        self.capability_cache[cache_key] = (
+            capabilities,
+            time.time() + self.get_cache_ttl(capabilities),
+        )
 
     def _is_local_provider(self, provider: str, base_url: str) -> bool:
         """判断是否为本地提供商"""
@@ -164,13 +209,37 @@ class LocalModelCapabilityDetector:
         """
         cache_key = self._generate_cache_key(model_name, provider, base_url)
 
-        # 检查缓存
+        # 检查缓存（进程内 -> 持久化）
         if not force_refresh:
+            cached = self.capability_cache.get(cache_key)
+            if cached and cached[1] > time.time():
+                return cached[0]
+
             cached_capabilities = await self._get_cached_capabilities(cache_key)
             if cached_capabilities:
                 logger.debug(f"使用缓存的能力信息: {model_name}")
+                self._remember(cache_key, cached_capabilities)
                 return cached_capabilities
 
+        # 同一模型已有探测在进行时直接等待其结果，避免重复探测
+        inflight = self._inflight.get(cache_key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(
+                self._detect_uncached(model_name, provider, base_url, api_key)
+            )
+            self._inflight[cache_key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+
+        capabilities = await asyncio.shield(inflight)
+        self._remember(cache_key, capabilities)
+        return capabilities
+
+    async def _detect_uncached(
+        self, model_name: str, provider: str, base_url: str, api_key: str
+    ) -> ModelCapabilities:
+        """执行能力检测（云端推断或本地探测）并写入持久化缓存"""
+        cache_key = self._generate_cache_key(model_name, provider, base_url)
+
         # 创建基础能力对象
         capabilities = ModelCapabilities(
             model_name=model_name,
@@ -187,22 +256,17 @@ class LocalModelCapabilityDetector:
             await self._cache_capabilities(cache_key, capabilities)
             return capabilities
 
-        # 对本地模型进行能力测试
+        # 对本地模型进行能力测试（三项探测互不依赖，并发执行）
         logger.info(f"开始检测本地模型能力: {model_name}")
 
-        # 测试视觉能力
-        capabilities.supports_vision = await self._test_vision_capability(
-            base_url, api_key, model_name
-        )
-
-        # 测试函数调用能力
-        capabilities.supports_function_calling = (
-            await self._test_function_calling_capability(base_url, api_key, model_name)
-        )
-
-        # 测试基础能力（代码生成、流式）
-        basic_capabilities = await self._test_basic_capabilities(
-            base_url, api_key, model_name
+        (
+            capabilities.supports_vision,
+            capabilities.supports_function_calling,
+            basic_capabilities,
+        ) = await asyncio.gather(
+            self._test_vision_capability(base_url, api_key, model_name),
+            self._test_function_calling_capability(base_url, api_key, model_name),
+            self._test_basic_capabilities(base_url, api_key, model_name),
         )
         capabilities.supports_code_generation = basic_capabilities.get(
             "code_generation", True
@@ -210,7 +274,7 @@ class LocalModelCapabilityDetector:
         capabilities.supports_streaming = basic_capabilities.get("streaming", True)
         capabilities.max_context_length = basic_capabilities.get("max_context_length")
 
-        # 缓存结果
+        # 缓存结果（包括全部失败的负结果）
         await self._cache_capabilities(cache_key, capabilities)
 
         logger.info(
@@ -222,6 +286,47 @@ class LocalModelCapabilityDetector:
 
         return capabilities
 
+    async def warm_capabilities(
+        self, targets: list[dict[str, Any]], memory_index: Any = None
+    ) -> int:
+        """
+        预热能力检测（模型发现后后台执行，使路由热路径不再探测）
+
+        Args:
+            targets: 渠道模型列表，包含 channel_id/model_name/provider/base_url/api_key
+            memory_index: 可选的内存索引，检测结果写入对应的 ModelInfo
+
+        Returns:
+            成功检测的模型数量
+        """
+        semaphore = asyncio.Semaphore(self.warmup_concurrency)
+
+        async def warm(target: dict[str, Any]) -> bool:
+            async with semaphore:
+                try:
+                    capabilities = await self.detect_model_capabilities(
+                        target["model_name"],
+                        target.get("provider", ""),
+                        target.get("base_url", ""),
+                        target.get("api_key", ""),
+                    )
+                except Exception as e:
+                    logger.debug(f"能力预热失败 {target['model_name']}: {e}")
+                    return False
+            if memory_index is not None:
+                memory_index.set_detected_capabilities(
+                    target["channel_id"],
+                    target["model_name"],
+                    capabilities,
+                    self.get_cache_ttl(capabilities),
+                )
+            return True
+
+        results = await asyncio.gather(*(warm(target) for target in targets))
+        warmed = sum(results)
+        logger.info(f"[PASS] 能力预热完成: {warmed}/{len(targets)} 个模型")
+        return warmed
+
     def _get_cloud_provider_capabilities(
         self, capabilities: ModelCapabilities
     ) -> ModelCapabilities:
@@ -422,13 +527,17 @@ class LocalModelCapabilityDetector:
     ) -> Optional[ModelCapabilities]:
         """获取缓存的能力信息"""
         try:
-            cached_data = await cache_get(cache_key)
+            cached_data = await cache_get(CAPABILITY_CACHE_TYPE, cache_key)
             if cached_data:
-                # 检查缓存是否过期
-                if "tested_at" in cached_data:
+                # 检查缓存是否过期（负结果使用较短的TTL）
+                if cached_data.get("tested_at"):
                     tested_at = datetime.fromisoformat(cached_data["tested_at"])
-                    if datetime.now() - tested_at < timedelta(seconds=self.cache_ttl):
-                        return ModelCapabilities(**cached_data)
+                    capabilities = ModelCapabilities(
+                        **{**cached_data, "tested_at": tested_at}
+                    )
+                    ttl = self.get_cache_ttl(capabilities)
+                    if datetime.now() - tested_at < timedelta(seconds=ttl):
+                        return capabilities
             return None
         except Exception as e:
             logger.debug(f"获取缓存能力信息失败: {e}")
@@ -444,7 +553,7 @@ class LocalModelCapabilityDetector:
             if capabilities.tested_at:
                 cache_data["tested_at"] = capabilities.tested_at.isoformat()
 
-            await cache_set(cache_key, cache_data)
+            await cache_set(CAPABILITY_CACHE_TYPE, cache_key, cache_data)
         except Exception as e:
             logger.debug(f"缓存能力信息失败: {e}")
 
@@ -461,25 +570,43 @@ class LocalModelCapabilityDetector:
         Returns:
             True表示可以处理
         """
+        return self.meets_requirements(
+            capabilities, self.get_request_requirements(request_data)
+        )
+
+    def get_request_requirements(
+        self, request_data: dict[str, Any]
+    ) -> tuple[bool, bool, int]:
+        """
+        解析请求的能力需求（每个请求只需计算一次）
+
+        Returns:
+            (是否需要视觉, 是否需要函数调用, 估算token数)
+        """
+        return (
+            self._request_needs_vision(request_data),
+            self._request_needs_function_calling(request_data),
+            self._estimate_request_tokens(request_data),
+        )
+
+    def meets_requirements(
+        self, capabilities: ModelCapabilities, requirements: tuple[bool, bool, int]
+    ) -> bool:
+        """检查模型能力是否满足预先解析的请求需求"""
+        needs_vision, needs_function_calling, estimated_tokens = requirements
+
         # 检查是否需要视觉能力
-        if (
-            self._request_needs_vision(request_data)
-            and not capabilities.supports_vision
-        ):
+        if needs_vision and not capabilities.supports_vision:
             logger.debug(f"模型 {capabilities.model_name} 不支持视觉能力")
             return False
 
         # 检查是否需要函数调用能力
-        if (
-            self._request_needs_function_calling(request_data)
-            and not capabilities.supports_function_calling
-        ):
+        if needs_function_calling and not capabilities.supports_function_calling:
             logger.debug(f"模型 {capabilities.model_name} 不支持函数调用能力")
             return False
 
         # 检查上下文长度
         if capabilities.max_context_length:
-            estimated_tokens = self._estimate_request_tokens(request_data)
             if estimated_tokens > capabilities.max_context_length:
                 logger.debug(
                     f"请求过长 ({estimated_tokens} tokens) 超过模型上下文限制 ({capabilities.max_context_length})"
@@ -10,6 +10,8 @@ from collections import defaultdict
 from dataclasses import dataclass
 from typing import Any, Optional
 
+from .tag_bitmap import TagBitmapIndex
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,6 +29,9 @@ class ModelInfo:
     # 健康状态缓存
     health_score: Optional[float] = None
     health_cached_at: Optional[float] = None  # Unix时间戳
+    # 能力检测结果（发现阶段预热写入，路由热路径只读）
+    detected_capabilities: Optional[Any] = None
+    capabilities_expires_at: Optional[float] = None  # Unix时间戳
 
 
 @dataclass
@@ -47,9 +52,7 @@ class MemoryModelIndex:
         self._lock = threading.RLock()
 
         # 核心索引结构
-        self._tag_to_models: dict[str, set[tuple[str, str]]] = defaultdict(
-            set
-        )  # tag -> {(channel_id, model_name)}
+        self._tag_index = TagBitmapIndex()  # tag -> 位图{(channel_id, model_name)}
         self._channel_to_models: dict[str, set[str]] = defaultdict(
             set
         )  # channel_id -> {model_names}
@@ -57,6 +60,12 @@ class MemoryModelIndex:
             {}
         )  # (channel_id, model_name) -> ModelInfo
 
+        # 路由标签倒排索引（与TagRoutingMixin的匹配语义保持一致）
+        self._routing_tag_index = TagBitmapIndex()  # 稠密ID即发现顺序，保证结果稳定
+        self._routing_segment_index = TagBitmapIndex()
+        self._routing_model_ids: dict[tuple[str, str], str] = {}  # 实际请求的模型ID
+        self._routing_signature: Optional[tuple] = None
+
         # 性能统计
         self._stats = IndexStats(0, 0, 0, 0.0, 0.0)
 
@@ -103,7 +112,7 @@ class MemoryModelIndex:
 
         with self._lock:
             # 清空现有索引
-            self._tag_to_models.clear()
+            tag_postings: dict[str, set[tuple[str, str]]] = defaultdict(set)
             self._channel_to_models.clear()
             self._model_info.clear()
 
@@ -292,16 +301,20 @@ class MemoryModelIndex:
 
                     # 更新标签索引
                     for tag in tags:
-                        self._tag_to_models[tag].add(model_key)
+                        tag_postings[tag].add(model_key)
 
                     total_models += 1
 
+            self._tag_index = TagBitmapIndex.from_postings(
+                tag_postings, order=self._model_info
+            )
+
             # 构建统计信息
             build_time_ms = (time.time() - start_time) * 1000
             self._stats = IndexStats(
                 total_models=total_models,
                 total_channels=len(processed_channels),
-                total_tags=len(self._tag_to_models),
+                total_tags=len(tag_postings),
                 build_time_ms=build_time_ms,
                 memory_usage_mb=self._estimate_memory_usage(),
             )
@@ -311,7 +324,7 @@ class MemoryModelIndex:
             self._build_count += 1
 
             # [BOOST] 统计多Provider免费策略的效果
-            free_models_count = len(self._tag_to_models.get("free", set()))
+            free_models_count = len(tag_postings.get("free", ()))
             multi_provider_free = 0
 
             for _model_name, provider_infos in global_model_pricing.items():
@@ -324,7 +337,7 @@ class MemoryModelIndex:
 
             logger.info(
                 f"[PASS] INDEX BUILT: {total_models} models, {len(processed_channels)} channels, "
-                f"{len(self._tag_to_models)} tags in {build_time_ms:.1f}ms"
+                f"{len(tag_postings)} tags in {build_time_ms:.1f}ms"
             )
             logger.info(
                 f"🆓 FREE MODELS: {free_models_count} models tagged as free, {multi_provider_free} from multi-provider analysis"
@@ -349,29 +362,137 @@ class MemoryModelIndex:
             return []
 
         with self._lock:
-            # 开始从最小的标签集合进行交集运算
-            tag_sets = [self._tag_to_models.get(tag, set()) for tag in include_tags]
-            if not all(tag_sets):
-                return []  # 如果任何标签都没有匹配，直接返回空
-
-            # 找到最小的集合作为起点（性能优化）
-            result_set = min(tag_sets, key=len)
-
-            # 计算交集
-            for tag_set in tag_sets:
-                if tag_set is not result_set:  # 避免自己和自己求交集
-                    result_set = result_set.intersection(tag_set)
-                    if not result_set:  # 如果交集为空，提前退出
-                        break
-
-            # 排除不需要的标签
-            if exclude_tags and result_set:
-                exclude_set = set()
-                for tag in exclude_tags:
-                    exclude_set.update(self._tag_to_models.get(tag, set()))
-                result_set = result_set - exclude_set
-
-            return list(result_set)
+            # 位图 AND / ANDNOT，不再为宽泛标签构造临时集合
+            result = self._tag_index.query(include_tags, exclude_tags)
+            return self._tag_index.decode(result)
+
+    def is_routing_index_current(self, signature: tuple) -> bool:
+        """检查路由索引是否与给定的缓存/配置签名一致"""
+        return self._routing_signature == signature
+
+    def build_routing_index(
+        self,
+        model_cache: dict[str, dict],
+        channels: list[Any],
+        signature: Optional[tuple] = None,
+    ) -> int:
+        """
+        构建路由标签倒排索引
+
+        与 _tag_index 不同，这里的标签严格按照路由匹配语义生成：
+        模型名称标签 + 别名派生标签 + 渠道标签，保证标签路由结果与逐个扫描一致。
+
+        Args:
+            model_cache: 原始模型缓存数据
+            channels: 渠道配置对象列表（需要 id / tags / model_aliases）
+            signature: 缓存与配置签名，用于判断索引是否需要重建
+
+        Returns:
+            已索引的 (channel_id, model_name) 数量
+        """
+        from core.services.tag_processor import (
+            extract_tags_from_model_name,
+            extract_tags_with_aliases,
+        )
+
+        start_time = time.time()
+        channel_map = {channel.id: channel for channel in channels}
+
+        tag_postings: dict[str, set[tuple[str, str]]] = defaultdict(set)
+        segment_postings: dict[str, set[tuple[str, str]]] = defaultdict(set)
+        order: list[tuple[str, str]] = []
+        model_ids: dict[tuple[str, str], str] = {}
+
+        for cache_key, cache_data in model_cache.items():
+            if not isinstance(cache_data, dict):
+                continue
+
+            channel_id = self._extract_channel_id(cache_key)
+            channel = channel_map.get(channel_id) if channel_id else None
+            if channel is None:
+                continue
+
+            channel_tags = {
+                tag.lower() for tag in (getattr(channel, "tags", None) or []) if tag
+            }
+            models_data = cache_data.get("models_data") or {}
+
+            for model_name in cache_data.get("models", []):
+                if not model_name or not isinstance(model_name, str):
+                    continue
+
+                model_key = (channel_id, model_name)
+                if model_key in model_ids:
+                    continue  # 同一渠道多个API Key的重复条目只索引一次
+
+                order.append(model_key)
+                model_data = models_data.get(model_name)
+                model_ids[model_key] = (
+                    model_data.get("id", model_name)
+                    if isinstance(model_data, dict)
+                    else model_name
+                )
+
+                for tag in extract_tags_with_aliases(model_name, channel):
+                    tag_postings[tag.lower()].add(model_key)
+                for tag in channel_tags:
+                    tag_postings[tag].add(model_key)
+                for tag in extract_tags_from_model_name(model_name):
+                    segment_postings[tag.lower()].add(model_key)
+
+        # 两个位图索引共用同一ID分配顺序（即发现顺序）
+        tag_index = TagBitmapIndex.from_postings(tag_postings, order=order)
+        segment_index = TagBitmapIndex.from_postings(segment_postings, order=order)
+
+        with self._lock:
+            self._routing_tag_index = tag_index
+            self._routing_segment_index = segment_index
+            self._routing_model_ids = model_ids
+            self._routing_signature = signature
+
+        logger.info(
+            f"[PASS] ROUTING INDEX BUILT: {len(order)} models, {len(tag_postings)} tags "
+            f"in {(time.time() - start_time) * 1000:.1f}ms"
+        )
+        return len(order)
+
+    def find_routing_models(
+        self, include_tags: list[str], exclude_tags: Optional[list[str]] = None
+    ) -> list[tuple[str, str, str]]:
+        """
+        按路由标签查找模型，耗时与结果集大小成正比
+
+        Args:
+            include_tags: 必须包含的标签（为空时表示所有模型）
+            exclude_tags: 必须排除的标签
+
+        Returns:
+            按发现顺序排列的 [(channel_id, model_name, model_id), ...]
+        """
+        with self._lock:
+            index = self._routing_tag_index
+            matched = index.decode(index.query(include_tags, exclude_tags))
+            return [(*key, self._routing_model_ids[key]) for key in matched]
+
+    def find_routing_models_by_segments(
+        self, segments: list[str]
+    ) -> list[tuple[str, str, str]]:
+        """
+        按完整段查找模型，每个渠道只返回发现顺序中的第一个匹配
+
+        Returns:
+            [(channel_id, model_name, model_id), ...]
+        """
+        with self._lock:
+            index = self._routing_segment_index
+            first_by_channel: dict[str, tuple[str, str]] = {}
+            for key in index.decode(index.union(segments)):
+                first_by_channel.setdefault(key[0], key)
+
+            return [
+                (*key, self._routing_model_ids[key])
+                for key in first_by_channel.values()
+            ]
 
     def get_model_info(self, channel_id: str, model_name: str) -> Optional[ModelInfo]:
         """获取模型详细信息"""
@@ -427,10 +548,35 @@ class MemoryModelIndex:
                     model_info.health_score = health_score
                     model_info.health_cached_at = current_time
 
+    def get_detected_capabilities(
+        self, channel_id: str, model_name: str
+    ) -> Optional[Any]:
+        """获取预先检测的模型能力（过期返回None）"""
+        with self._lock:
+            model_info = self._model_info.get((channel_id, model_name))
+            if (
+                model_info
+                and model_info.detected_capabilities is not None
+                and model_info.capabilities_expires_at is not None
+                and time.time() < model_info.capabilities_expires_at
+            ):
+                return model_info.detected_capabilities
+            return None
+
+    def set_detected_capabilities(
+        self, channel_id: str, model_name: str, capabilities: Any, ttl: float
+    ) -> None:
+        """记录模型能力检测结果（包括探测失败的负结果）"""
+        with self._lock:
+            model_info = self._model_info.get((channel_id, model_name))
+            if model_info:
+                model_info.detected_capabilities = capabilities
+                model_info.capabilities_expires_at = time.time() + ttl
+
     def get_tag_stats(self) -> dict[str, int]:
         """获取标签统计信息"""
         with self._lock:
-            return {tag: len(models) for tag, models in self._tag_to_models.items()}
+            return {tag: self._tag_index.count(tag) for tag in self._tag_index.tags()}
 
     def get_stats(self) -> IndexStats:
         """获取索引统计信息"""
@@ -684,13 +830,11 @@ class MemoryModelIndex:
         import sys
 
         total_size = 0
-        total_size += sys.getsizeof(self._tag_to_models)
+        total_size += self._tag_index.memory_bytes()
         total_size += sys.getsizeof(self._channel_to_models)
         total_size += sys.getsizeof(self._model_info)
 
         # 估算内部数据结构的大小
-        for tag_set in self._tag_to_models.values():
-            total_size += sys.getsizeof(tag_set)
 
         for model_set in self._channel_to_models.values():
             total_size += sys.getsizeof(model_set)
@@ -742,7 +886,7 @@ class MemoryModelIndex:
 
             # 更新标签索引
             for tag in tags:
-                self._tag_to_models[tag].add(model_key)
+                self._tag_index.add(tag, model_key)
 
             self._incremental_updates_count += 1
             logger.debug(
@@ -763,11 +907,8 @@ class MemoryModelIndex:
                     del self._model_info[model_key]
 
                     # 从标签索引中移除
-                    for tag in model_info.tags:
-                        self._tag_to_models[tag].discard(model_key)
-                        # 如果标签没有任何模型了，删除标签
-                        if not self._tag_to_models[tag]:
-                            del self._tag_to_models[tag]
+                    # 从标签位图中移除（标签位图为空时自动删除）
+                    self._tag_index.remove_key(model_key, model_info.tags)
 
             # 清空渠道模型列表
             if channel_id in self._channel_to_models:
@@ -786,7 +927,9 @@ class MemoryModelIndex:
             "min_rebuild_interval": self._min_rebuild_interval,
             "models_count": len(self._model_info),
             "channels_count": len(self._channel_to_models),
-            "tags_count": len(self._tag_to_models),
+            "tags_count": len(self._tag_index.tags()),
+            "routing_models_count": len(self._routing_model_ids),
+            "routing_tags_count": len(self._routing_tag_index.tags()),
         }
 
 
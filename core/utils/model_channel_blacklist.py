@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from enum import Enum
 from typing import Any, Optional
 
+from .routing_generations import get_routing_generations
+
 logger = logging.getLogger(__name__)
 
 
@@ -232,6 +234,7 @@ class ModelChannelBlacklistManager:
                     backoff_duration=duration,
                 )
                 self._blacklist[key] = entry
+                get_routing_generations().bump_blacklist(channel_id)
 
                 logger.warning(
                     f"🚫 MODEL BLACKLISTED: {model_name}@{channel_id} due to {error_type.value} "
@@ -273,6 +276,7 @@ class ModelChannelBlacklistManager:
         # 检查是否过期
         if entry.is_expired():
             del self._blacklist[key]
+            get_routing_generations().bump_blacklist(channel_id)
             logger.info(
                 f"[PASS] BLACKLIST EXPIRED: {model_name}@{channel_id} is now available again"
             )
@@ -296,6 +300,8 @@ class ModelChannelBlacklistManager:
         # 清理过期条目
         for key in expired_keys:
             del self._blacklist[key]
+        if expired_keys:
+            get_routing_generations().bump_blacklist(channel_id)
 
         return blacklisted_models
 
@@ -324,6 +330,7 @@ class ModelChannelBlacklistManager:
 
             if key in self._blacklist:
                 del self._blacklist[key]
+                get_routing_generations().bump_blacklist(channel_id)
                 logger.info(
                     f"[PASS] BLACKLIST REMOVED: {model_name}@{channel_id} manually recovered"
                 )
@@ -403,6 +410,7 @@ class ModelChannelBlacklistManager:
         for key in expired_keys:
             entry = self._blacklist[key]
             del self._blacklist[key]
+            get_routing_generations().bump_blacklist(entry.channel_id)
             logger.debug(
                 f"[CLEANUP] CLEANUP: Removed expired blacklist entry for {entry.model_name}@{entry.channel_id}"
             )
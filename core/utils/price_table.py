@@ -0,0 +1,168 @@
+"""
+渠道模型价格表 - (channel_id, model) → 最终每token价格
+定价源解析与汇率折扣只在首次查询时执行一次，之后评分只需字典查找与乘法
+"""
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 会影响定价结果的文件：OpenRouter基准缓存与静态定价配置
+PRICING_FILE_PATHS = (Path("cache/model_pricing.json"),)
+PRICING_DIR = Path("config/pricing")
+
+
+class PriceTable:
+    """(channel_id, model) → (input, output) 每token价格表"""
+
+    def __init__(self, file_check_interval: float = 10.0) -> None:
+        self._lock = threading.RLock()
+        # None 表示无可用定价（负缓存，避免重复遍历定价源）
+        self._prices: dict[tuple[str, str], Optional[tuple[float, float]]] = {}
+        self._estimator: Any = None
+
+        # 失效检测：配置/模型缓存代数 + 定价文件修改时间
+        self._config_signature: Optional[tuple] = None
+        self._file_signature: Optional[tuple] = None
+        self._file_check_interval = file_check_interval
+        self._last_file_check = 0.0
+
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get_prices(
+        self, channel_id: str, model_name: str
+    ) -> Optional[tuple[float, float]]:
+        """获取最终每token价格 (input, output)，无定价时返回 None"""
+        self._ensure_current()
+        key = (channel_id, model_name)
+
+        with self._lock:
+            if key in self._prices:
+                self._stats["hits"] += 1
+                return self._prices[key]
+
+        prices = self._resolve(channel_id, model_name)
+        with self._lock:
+            self._prices[key] = prices
+            self._stats["misses"] += 1
+        return prices
+
+    def get_pricing(self, channel_id: str, model_name: str) -> Optional[dict[str, Any]]:
+        """与 CostEstimator._get_model_pricing 相同格式的定价字典"""
+        prices = self.get_prices(channel_id, model_name)
+        if prices is None:
+            return None
+        return {"input": prices[0], "output": prices[1], "unit": "per_token"}
+
+    def estimate_cost(
+        self,
+        channel_id: str,
+        model_name: str,
+        input_tokens: int,
+        output_tokens: int,
+    ) -> Optional[float]:
+        """按价格表估算成本，无定价时返回 None"""
+        prices = self.get_prices(channel_id, model_name)
+        if prices is None:
+            return None
+        return input_tokens * prices[0] + output_tokens * prices[1]
+
+    def invalidate(self, channel_id: Optional[str] = None) -> None:
+        """使价格表失效（指定渠道时只清除该渠道）"""
+        with self._lock:
+            if channel_id is None:
+                removed = len(self._prices)
+                self._prices.clear()
+            else:
+                keys = [key for key in self._prices if key[0] == channel_id]
+                for key in keys:
+                    del self._prices[key]
+                removed = len(keys)
+            self._stats["invalidations"] += 1
+
+        logger.debug(
+            f"[DELETE] PRICE TABLE INVALIDATED: {removed} entries"
+            + (f" for channel {channel_id}" if channel_id else "")
+        )
+
+    def get_stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._prices), **self._stats}
+
+    def _resolve(
+        self, channel_id: str, model_name: str
+    ) -> Optional[tuple[float, float]]:
+        """通过完整定价源链路（含汇率折扣）解析价格"""
+        if self._estimator is None:
+            from .cost_estimator import CostEstimator
+
+            self._estimator = CostEstimator()
+
+        pricing = self._estimator._get_model_pricing(channel_id, model_name)
+        if not pricing:
+            return None
+        return float(pricing.get("input", 0.0)), float(pricing.get("output", 0.0))
+
+    def _ensure_current(self) -> None:
+        """配置、模型缓存或定价文件变化时清空价格表"""
+        from ..yaml_config import get_yaml_config_loader
+
+        config_signature = get_yaml_config_loader().get_cache_generation()[:2]
+        stale = config_signature != self._config_signature
+
+        now = time.time()
+        if now - self._last_file_check >= self._file_check_interval:
+            self._last_file_check = now
+            file_signature = self._get_file_signature()
+            if file_signature != self._file_signature:
+                if self._file_signature is not None:
+                    self._reload_pricing_sources()
+                self._file_signature = file_signature
+                stale = True
+
+        if stale:
+            with self._lock:
+                self._config_signature = config_signature
+            self.invalidate()
+
+    @staticmethod
+    def _get_file_signature() -> tuple:
+        paths = list(PRICING_FILE_PATHS)
+        if PRICING_DIR.is_dir():
+            paths.extend(sorted(PRICING_DIR.glob("*.json")))
+
+        signature = []
+        for path in paths:
+            try:
+                signature.append((str(path), path.stat().st_mtime))
+            except OSError:
+                signature.append((str(path), None))
+        return tuple(signature)
+
+    @staticmethod
+    def _reload_pricing_sources() -> None:
+        try:
+            from .static_pricing import get_static_pricing_loader
+
+            get_static_pricing_loader().reload()
+            logger.info("[PASS] PRICE TABLE: Pricing files changed, sources reloaded")
+        except Exception as e:
+            logger.warning(
+                f"[WARNING] PRICE TABLE: Failed to reload pricing sources: {e}"
+            )
+
+
+# 全局价格表实例
+_price_table: Optional[PriceTable] = None
+
+
+def get_price_table() -> PriceTable:
+    """获取全局价格表实例"""
+    global _price_table
+    if _price_table is None:
+        _price_table = PriceTable()
+    return _price_table
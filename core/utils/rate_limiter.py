@@ -0,0 +1,379 @@
+"""
+令牌桶限流 - 按渠道和按API Key维护请求数（RPM）与Token数（TPM）令牌桶
+渠道桶来自渠道配置（rpm / tpm / min_request_interval），Key桶由上游返回的限流响应头同步。
+预计等待时间在截止时间内的请求短暂排队，否则由调用方溢出到下一个候选
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 上游限流响应头：(资源类型, limit头, remaining头, reset头)
+# OpenAI / Groq / 大多数兼容接口使用 x-ratelimit-*-requests/tokens，reset 为时长（如 "6m0s"）
+# Anthropic 使用 anthropic-ratelimit-*，reset 为 RFC 3339 时间
+RATE_LIMIT_HEADERS = (
+    (
+        "requests",
+        "x-ratelimit-limit-requests",
+        "x-ratelimit-remaining-requests",
+        "x-ratelimit-reset-requests",
+    ),
+    (
+        "tokens",
+        "x-ratelimit-limit-tokens",
+        "x-ratelimit-remaining-tokens",
+        "x-ratelimit-reset-tokens",
+    ),
+    (
+        "requests",
+        "anthropic-ratelimit-requests-limit",
+        "anthropic-ratelimit-requests-remaining",
+        "anthropic-ratelimit-requests-reset",
+    ),
+    (
+        "tokens",
+        "anthropic-ratelimit-tokens-limit",
+        "anthropic-ratelimit-tokens-remaining",
+        "anthropic-ratelimit-tokens-reset",
+    ),
+    # OpenRouter：x-ratelimit-limit / remaining / reset（reset 为毫秒时间戳）
+    ("requests", "x-ratelimit-limit", "x-ratelimit-remaining", "x-ratelimit-reset"),
+)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# 没有令牌数信息时按字符数粗略估算（约4字符1个token）
+CHARS_PER_TOKEN = 4
+
+
+def parse_reset_seconds(value: str, now: Optional[float] = None) -> Optional[float]:
+    """
+    将限流重置头解析为距离现在的秒数
+
+    支持时长（"1s" / "6m0s" / "59ms"）、纯数字秒数、Unix时间戳（秒或毫秒）和 RFC 3339 / HTTP 日期
+    """
+    value = value.strip()
+    if not value:
+        return None
+    wall_now = time.time() if now is None else now
+
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if number is not None:
+        if number > 1e12:  # 毫秒时间戳
+            return max(0.0, number / 1000 - wall_now)
+        if number > 1e9:  # 秒时间戳
+            return max(0.0, number - wall_now)
+        return max(0.0, number)
+
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    return max(0.0, moment.timestamp() - wall_now)
+
+
+def estimate_request_tokens(
+    messages: list[dict[str, Any]], max_tokens: Optional[int] = None
+) -> int:
+    """按字符数估算请求会消耗的Token数（输入 + 最大输出）"""
+    chars = sum(len(str(message.get("content") or "")) for message in messages)
+    return chars // CHARS_PER_TOKEN + (max_tokens or 0)
+
+
+class TokenBucket:
+    """令牌桶：容量 capacity，每秒补充 refill_rate；令牌可为负数，表示已预约的排队请求"""
+
+    __slots__ = ("capacity", "refill_rate", "tokens", "updated_at")
+
+    def __init__(self, capacity: float, refill_rate: float, now: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated_at:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate
+            )
+            self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """获得 amount 个令牌需要等待的秒数"""
+        self._refill(now)
+        # 超过容量的请求按满桶处理，避免永远无法满足
+        deficit = min(amount, self.capacity) - self.tokens
+        if deficit <= 0:
+            return 0.0
+        if self.refill_rate <= 0:
+            return math.inf
+        return deficit / self.refill_rate
+
+    def consume(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def sync(
+        self,
+        limit: float,
+        remaining: float,
+        reset_after: Optional[float],
+        now: float,
+        window: float,
+    ) -> None:
+        """按上游报告的额度校准（只向保守方向调整剩余令牌）"""
+        self._refill(now)
+        self.capacity = limit
+        if reset_after and reset_after > 0 and remaining < limit:
+            # reset 表示补满所需时间
+            self.refill_rate = (limit - remaining) / reset_after
+        else:
+            self.refill_rate = limit / window
+        self.tokens = min(self.tokens, remaining)
+
+
+class RateLimiter:
+    """渠道级与Key级令牌桶，提供预计等待时间、预约与排队等待"""
+
+    def __init__(self, settings: Any = None):
+        self.enabled = True
+        self.max_queue_wait = 2.0
+        self.respect_upstream_headers = True
+        self.header_window = 60.0
+
+        self._lock = threading.Lock()
+        # (作用域, 标识, 资源类型) -> 令牌桶；作用域为 "channel" 或 "key"
+        self._buckets: dict[tuple[str, str, str], TokenBucket] = {}
+        # 渠道ID -> (配置签名, 最近使用的Key标识)
+        self._channels: dict[str, tuple[tuple, str]] = {}
+        # Key标识 -> 上游要求的最早重试时间（monotonic）
+        self._blocked_until: dict[str, float] = {}
+        self._stats = {"queued": 0, "rejected": 0, "header_syncs": 0}
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """应用配置（routing.rate_limit）"""
+        self.enabled = settings.enabled
+        self.max_queue_wait = settings.max_queue_wait
+        self.respect_upstream_headers = settings.respect_upstream_headers
+        self.header_window = settings.header_window
+
+    @staticmethod
+    def key_id(api_key: Optional[str]) -> str:
+        # 只保存Key的摘要
+        return hashlib.md5((api_key or "").encode()).hexdigest()[:12]
+
+    def _register(self, channel: Any, now: float) -> str:
+        """
+        按渠道配置建立渠道桶，返回本次请求所用Key的标识（需持有锁）
+
+        多Key渠道每次请求携带选中的Key，渠道桶共享，Key桶按Key区分
+        """
+        rpm = getattr(channel, "rpm", None)
+        tpm = getattr(channel, "tpm", None)
+        interval = getattr(channel, "min_request_interval", 0) or 0
+        key_id = self.key_id(getattr(channel, "api_key", None))
+        signature = (rpm, tpm, interval)
+
+        registered = self._channels.get(channel.id)
+        if registered and registered[0] == signature:
+            if registered[1] != key_id:
+                self._channels[channel.id] = (signature, key_id)
+            return key_id
+
+        buckets = {
+            "requests": (rpm, rpm / 60.0) if rpm else None,
+            "tokens": (tpm, tpm / 60.0) if tpm else None,
+            # 最小请求间隔等价于容量为1的令牌桶
+            "interval": (1, 1.0 / interval) if interval > 0 else None,
+        }
+        for kind, params in buckets.items():
+            bucket_key = ("channel", channel.id, kind)
+            if params is None:
+                self._buckets.pop(bucket_key, None)
+            else:
+                self._buckets[bucket_key] = TokenBucket(params[0], params[1], now)
+        self._channels[channel.id] = (signature, key_id)
+        return key_id
+
+    def _demands(
+        self, channel_id: str, key_id: str, tokens: int
+    ) -> list[tuple[TokenBucket, float]]:
+        demands = []
+        for scope, ident in (("channel", channel_id), ("key", key_id)):
+            for kind, amount in (("requests", 1), ("tokens", tokens), ("interval", 1)):
+                bucket = self._buckets.get((scope, ident, kind))
+                if bucket is not None and amount > 0:
+                    demands.append((bucket, amount))
+        return demands
+
+    def _wait_locked(self, channel: Any, tokens: int, now: float) -> float:
+        key_id = self._register(channel, now)
+        wait = max(0.0, self._blocked_until.get(key_id, 0.0) - now)
+        for bucket, amount in self._demands(channel.id, key_id, tokens):
+            wait = max(wait, bucket.wait_time(amount, now))
+        return wait
+
+    def estimate_wait(self, channel: Any, tokens: int = 0) -> float:
+        """预计需要等待的秒数（只读，不占用令牌）"""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            return self._wait_locked(channel, tokens, time.monotonic())
+
+    def speed_factor(self, channel: Any) -> float:
+        """路由评分用：需要排队的渠道按预计等待时间折扣速度评分"""
+        wait = self.estimate_wait(channel)
+        if wait <= 0:
+            return 1.0
+        return 1.0 / (1.0 + wait / max(self.max_queue_wait, 0.1))
+
+    def reserve(
+        self, channel: Any, tokens: int = 0, max_wait: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        预约额度：预计等待不超过 max_wait 时立即扣除令牌
+
+        Returns:
+            需要等待的秒数；超过截止时间时返回None（不扣除令牌）
+        """
+        if not self.enabled:
+            return 0.0
+        deadline = self.max_queue_wait if max_wait is None else max_wait
+        with self._lock:
+            now = time.monotonic()
+            wait = self._wait_locked(channel, tokens, now)
+            if wait > deadline:
+                self._stats["rejected"] += 1
+                return None
+            key_id = self.key_id(getattr(channel, "api_key", None))
+            for bucket, amount in self._demands(channel.id, key_id, tokens):
+                bucket.consume(amount, now)
+            if wait > 0:
+                self._stats["queued"] += 1
+            return wait
+
+    async def acquire(
+        self, channel: Any, tokens: int = 0, max_wait: Optional[float] = None
+    ) -> bool:
+        """预约额度并等待到可发送；超过截止时间返回False"""
+        wait = self.reserve(channel, tokens, max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            logger.info(
+                f"⏳ RATE LIMIT QUEUE: Channel '{channel.id}' waiting {wait:.2f}s for capacity"
+            )
+            await asyncio.sleep(wait)
+        return True
+
+    def update_from_headers(
+        self,
+        channel_id: str,
+        headers: Mapping[str, str],
+        status_code: Optional[int] = None,
+        api_key: Optional[str] = None,
+    ) -> None:
+        """根据上游限流响应头校准请求所用Key的令牌桶（未指定Key时为渠道最近使用的Key）"""
+        if not self.enabled or not self.respect_upstream_headers:
+            return
+        if api_key is not None:
+            key_id = self.key_id(api_key)
+        else:
+            registered = self._channels.get(channel_id)
+            if registered is None:
+                return
+            key_id = registered[1]
+        now = time.monotonic()
+        wall_now = time.time()
+
+        with self._lock:
+            for (
+                kind,
+                limit_header,
+                remaining_header,
+                reset_header,
+            ) in RATE_LIMIT_HEADERS:
+                limit = headers.get(limit_header)
+                remaining = headers.get(remaining_header)
+                if limit is None or remaining is None:
+                    continue
+                try:
+                    limit_value = float(limit)
+                    remaining_value = float(remaining)
+                except ValueError:
+                    continue
+                if limit_value <= 0:
+                    continue
+                reset = headers.get(reset_header)
+                reset_after = parse_reset_seconds(reset, wall_now) if reset else None
+
+                bucket_key = ("key", key_id, kind)
+                bucket = self._buckets.get(bucket_key)
+                if bucket is None:
+                    bucket = self._buckets[bucket_key] = TokenBucket(
+                        limit_value, limit_value / self.header_window, now
+                    )
+                bucket.sync(
+                    limit_value, remaining_value, reset_after, now, self.header_window
+                )
+                self._stats["header_syncs"] += 1
+
+            retry_after = headers.get("retry-after")
+            if status_code == 429 and retry_after:
+                seconds = parse_reset_seconds(retry_after, wall_now)
+                if seconds:
+                    self._blocked_until[key_id] = max(
+                        self._blocked_until.get(key_id, 0.0), now + seconds
+                    )
+                    logger.info(
+                        f"[WARNING] RATE LIMIT: Channel '{channel_id}' key blocked for {seconds:.1f}s (Retry-After)"
+                    )
+
+    def get_stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_queue_wait": self.max_queue_wait,
+                "tracked_channels": len(self._channels),
+                "tracked_buckets": len(self._buckets),
+                "blocked_keys": sum(
+                    1 for until in self._blocked_until.values() if until > now
+                ),
+                **self._stats,
+            }
+
+
+# 全局限流器
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取全局令牌桶限流器"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -9,10 +9,14 @@ import json
 import logging
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Optional
 
 from ..config_models import Channel
 
+if TYPE_CHECKING:
+    from ..router.query_plan import QueryPlan
+    from .routing_generations import GenerationSnapshot
+
 logger = logging.getLogger(__name__)
 
 
@@ -32,12 +36,20 @@ class RequestFingerprint:
     temperature: Optional[float] = None
     stream: bool = False
     has_functions: bool = False  # 是否有function_calling需求
+    # 编译后的查询计划，提供规范化的模型查询键（等价的标签查询共享缓存）
+    query_plan: Optional["QueryPlan"] = None
 
     def to_cache_key(self) -> str:
         """生成缓存键的Hash值"""
+        model_key = (
+            self.query_plan.cache_key
+            if self.query_plan is not None
+            else self.model.lower().strip()
+        )
+
         # 创建标准化的指纹字典
         fingerprint_dict = {
-            "model": self.model.lower().strip(),
+            "model": model_key,
             "routing_strategy": self.routing_strategy,
             "required_capabilities": sorted(self.required_capabilities or []),
             "min_context_length": self.min_context_length,
@@ -74,6 +86,13 @@ class CachedModelSelection:
     # 新增：存储实际匹配的模型名（对于标签路由很重要）
     primary_matched_model: Optional[str] = None
     backup_matched_models: Optional[list[str]] = None
+    # 计算时的配置/模型缓存/健康/黑名单代数，任一变化即视为过期
+    generations: Optional["GenerationSnapshot"] = None
+    # 评分相近、按负载轮流作为首选的候选数（主渠道 + 前 group_size-1 个备选）
+    group_size: int = 1
+    # 计算时的总评分，命中缓存时据此判断前缀亲和是否在容差内
+    primary_score: Optional[float] = None
+    backup_scores: Optional[list[float]] = None
 
     def is_expired(self) -> bool:
         """检查是否已过期"""
@@ -88,7 +107,11 @@ class CachedModelSelection:
         if not self.primary_channel.enabled:
             return False
 
-        return True
+        return self.is_current()
+
+    def is_current(self) -> bool:
+        """计算时依赖的各项代数是否均未变化"""
+        return self.generations is None or self.generations.is_current()
 
     def mark_used(self) -> None:
         """标记为已使用"""
@@ -119,7 +142,13 @@ class RequestModelCache:
         self._cache: dict[str, CachedModelSelection] = {}
 
         # 统计信息
-        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "cleanup_runs": 0}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "generation_invalidations": 0,
+            "cleanup_runs": 0,
+        }
 
         # 异步锁保护并发访问
         self._lock = asyncio.Lock()
@@ -159,9 +188,14 @@ class RequestModelCache:
                 # 缓存失效，删除并返回None
                 del self._cache[cache_key]
                 self._stats["invalidations"] += 1
-                logger.info(
-                    f"[FAIL] CACHE INVALIDATED: {cache_key} (expired or unhealthy)"
-                )
+                if cached_result.is_expired():
+                    reason = "expired"
+                elif not cached_result.is_current():
+                    reason = "stale generations"
+                    self._stats["generation_invalidations"] += 1
+                else:
+                    reason = "unhealthy"
+                logger.info(f"[FAIL] CACHE INVALIDATED: {cache_key} ({reason})")
                 return None
 
             # 缓存命中
@@ -186,8 +220,17 @@ class RequestModelCache:
         ttl_seconds: Optional[int] = None,
         primary_matched_model: Optional[str] = None,
         backup_matched_models: Optional[list[str]] = None,
+        generations: Optional["GenerationSnapshot"] = None,
+        group_size: int = 1,
+        primary_score: Optional[float] = None,
+        backup_scores: Optional[list[float]] = None,
     ) -> str:
-        """缓存模型选择结果"""
+        """
+        缓存模型选择结果
+
+        传入 generations 时，读取时会校验代数，相关状态变化后立即失效，
+        因此可以使用更长的TTL
+        """
 
         cache_key = fingerprint.to_cache_key()
         ttl = ttl_seconds or self.default_ttl
@@ -211,6 +254,10 @@ class RequestModelCache:
                 backup_matched_models=(
                     backup_matched_models[:5] if backup_matched_models else None
                 ),
+                generations=generations,
+                group_size=min(group_size, len(backup_channels[:5]) + 1),
+                primary_score=primary_score,
+                backup_scores=backup_scores[:5] if backup_scores else None,
             )
 
             self._cache[cache_key] = cached_selection
@@ -344,6 +391,7 @@ class RequestModelCache:
             "total_hits": self._stats["hits"],
             "total_misses": self._stats["misses"],
             "total_invalidations": self._stats["invalidations"],
+            "generation_invalidations": self._stats["generation_invalidations"],
             "cleanup_runs": self._stats["cleanup_runs"],
             "default_ttl_seconds": self.default_ttl,
         }
@@ -369,7 +417,7 @@ def get_request_cache() -> RequestModelCache:
     global _global_cache
     if _global_cache is None:
         _global_cache = RequestModelCache(
-            default_ttl_seconds=60,  # 1分钟默认TTL
+            default_ttl_seconds=600,  # 10分钟默认TTL（依赖代数校验及时失效）
             max_cache_entries=1000,  # 最大1000个缓存条目
             cleanup_interval_seconds=300,  # 5分钟清理一次
         )
@@ -0,0 +1,121 @@
+"""
+请求合并（single-flight）- 相同的非流式确定性请求同时在途时只转发一次
+后到的重复请求挂到在途请求上，与其共享同一个响应；
+请求键为模型、消息与采样参数的规范化哈希
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections.abc import Awaitable, Mapping
+from typing import Any, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """首个请求被取消（如客户端断开），等待者需自行发起请求"""
+
+
+class RequestCoalescer:
+    """按请求键合并在途请求（仅在事件循环线程中使用，无需加锁）"""
+
+    def __init__(self, settings: Any = None):
+        self.enabled = False
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "leader_failures": 0}
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """应用配置（routing.coalescing）"""
+        self.enabled = settings.enabled
+
+    @staticmethod
+    def request_key(payload: Mapping[str, Any]) -> str:
+        """请求内容的规范化哈希（键排序，与字段顺序无关）"""
+        canonical = json.dumps(
+            payload,
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def is_eligible(
+        self, temperature: Optional[float], force: Optional[bool] = None
+    ) -> bool:
+        """
+        请求是否可以合并
+
+        Args:
+            temperature: 请求的采样温度，为0时输出确定，可以合并
+            force: 客户端通过请求头显式开启/关闭合并，优先于温度判断
+        """
+        if not self.enabled:
+            return False
+        if force is not None:
+            return force
+        return temperature == 0
+
+    async def run(
+        self, key: str, factory: Callable[[], Awaitable[T]]
+    ) -> tuple[T, bool]:
+        """
+        执行请求；相同键已有在途请求时等待其结果
+
+        Returns:
+            (结果, 是否由本次调用实际执行)
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self._stats["coalesced"] += 1
+            try:
+                # shield: 等待者被取消不影响在途请求
+                return await asyncio.shield(future), False
+            except _LeaderCancelled:
+                return await self.run(key, factory)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._stats["leaders"] += 1
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()  # 无等待者时避免 "exception was never retrieved"
+            raise
+        except Exception as e:
+            self._stats["leader_failures"] += 1
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, True
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            **self._stats,
+        }
+
+
+# 全局请求合并器
+_request_coalescer: Optional[RequestCoalescer] = None
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """获取全局请求合并器"""
+    global _request_coalescer
+    if _request_coalescer is None:
+        _request_coalescer = RequestCoalescer()
+    return _request_coalescer
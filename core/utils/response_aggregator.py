@@ -39,6 +39,7 @@ class RequestMetadata:
     routing_strategy: str = "balanced"
     routing_score: float = 0.0
     routing_reason: str = ""
+    prefix_key: Optional[str] = None  # 提示词前缀哈希（前缀亲和路由）
 
     # 性能信息
     ttfb: Optional[float] = None  # Time to first byte
@@ -51,6 +52,10 @@ class RequestMetadata:
     # 成本预览信息
     cost_preview: Optional[dict[str, Any]] = None
 
+    # 响应缓存信息
+    cache_status: Optional[str] = None  # HIT / MISS
+    cache_age: Optional[float] = None  # 命中条目的年龄（秒）
+
     def finish_request(self, end_time: Optional[float] = None) -> None:
         """结束请求，计算最终指标"""
         self.end_time = end_time or time.time()
@@ -143,6 +148,15 @@ class ResponseAggregator:
             if tokens_per_second is not None:
                 metadata.tokens_per_second = tokens_per_second
 
+    def update_cache(
+        self, request_id: str, status: str, age: Optional[float] = None
+    ) -> None:
+        """更新响应缓存状态"""
+        if request_id in self.active_requests:
+            metadata = self.active_requests[request_id]
+            metadata.cache_status = status
+            metadata.cache_age = age
+
     def set_error(self, request_id: str, error_code: str, error_message: str) -> None:
         """设置错误信息"""
         if request_id in self.active_requests:
@@ -170,7 +184,7 @@ class ResponseAggregator:
 
         metadata = self.active_requests[request_id]
 
-        return {
+        headers = {
             "X-Router-Request-ID": metadata.request_id,
             "X-Router-Channel": f"{metadata.channel_name} (ID: {metadata.channel_id})",
             "X-Router-Provider": metadata.provider,
@@ -180,6 +194,15 @@ class ResponseAggregator:
             "X-Router-Score": f"{metadata.routing_score:.3f}",
             "X-Router-Streaming": "true" if metadata.is_streaming else "false",
         }
+        if metadata.cache_status:
+            headers["X-Router-Cache"] = metadata.cache_status
+            if metadata.cache_age is not None:
+                headers["X-Router-Cache-Age"] = str(int(metadata.cache_age))
+        # HTTP头只能使用latin-1，渠道名等非ASCII字符转义
+        return {
+            name: value.encode("ascii", "backslashreplace").decode("ascii")
+            for name, value in headers.items()
+        }
 
     def get_final_summary(self, metadata: RequestMetadata) -> dict[str, Any]:
         """获取最终的完整汇总信息"""
@@ -351,6 +374,16 @@ class ResponseAggregator:
             },
         }
 
+        if metadata.cache_status:
+            enhanced_response["smart_ai_router"]["cache"] = {
+                "status": metadata.cache_status,
+                "age_seconds": (
+                    round(metadata.cache_age, 1)
+                    if metadata.cache_age is not None
+                    else None
+                ),
+            }
+
         # 如果有错误信息，也添加到我们的数据结构中
         if metadata.error_code:
             enhanced_response["smart_ai_router"]["error"] = {
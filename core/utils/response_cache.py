@@ -0,0 +1,268 @@
+"""
+响应缓存 - 确定性请求的精确匹配缓存
+内存层为按条数和字节数限定大小的LRU，可选本地磁盘持久层；
+TTL可按模型或标签配置，命中时不再请求上游，节省的成本计入使用统计
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from .async_file_ops import get_async_file_manager
+from .request_coalescer import RequestCoalescer
+
+logger = logging.getLogger(__name__)
+
+# 每写入多少个磁盘条目检查一次磁盘层大小
+_DISK_PRUNE_INTERVAL = 100
+
+
+@dataclass
+class CachedResponse:
+    """缓存的上游响应及其来源"""
+
+    key: str
+    response: dict[str, Any]  # 清理后的上游响应（不含路由汇总）
+    model_used: str
+    channel_id: str
+    channel_name: str
+    provider: str
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float  # 原始请求成本（USD），命中时计为节省
+    created_at: float  # time.time()，磁盘层跨进程有效
+    expires_at: float
+    size: int = 0  # 序列化后的字节数
+
+    def is_expired(self, now: float) -> bool:
+        return now >= self.expires_at
+
+
+class ResponseCache:
+    """响应缓存：内存LRU + 可选磁盘层"""
+
+    def __init__(self, settings: Any = None):
+        self.enabled = False
+        self.default_ttl = 3600.0
+        self.max_entries = 1000
+        self.max_memory_bytes = 64 * 1024 * 1024
+        self.disk_enabled = False
+        self.disk_dir = Path("cache/responses")
+        self.disk_max_entries = 10000
+        self.ttl_by_model: dict[str, float] = {}
+        self.ttl_by_tag: dict[str, float] = {}
+
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_writes = 0
+        self._stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "saved_cost": 0.0,
+        }
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """应用配置（routing.response_cache）"""
+        self.enabled = settings.enabled
+        self.default_ttl = settings.default_ttl
+        self.max_entries = settings.max_entries
+        self.max_memory_bytes = int(settings.max_memory_mb * 1024 * 1024)
+        self.disk_enabled = settings.disk_enabled
+        self.disk_dir = Path(settings.disk_dir)
+        self.disk_max_entries = settings.disk_max_entries
+        self.ttl_by_model = dict(settings.ttl_by_model)
+        self.ttl_by_tag = dict(settings.ttl_by_tag)
+        self._evict()
+
+    @staticmethod
+    def request_key(payload: Mapping[str, Any]) -> str:
+        """请求内容的规范化哈希（与请求合并使用相同的键）"""
+        return RequestCoalescer.request_key(payload)
+
+    def ttl_for(self, model: str, tags: Optional[list[str]] = None) -> float:
+        """缓存时长：模型配置优先，其次取匹配标签中最短的TTL；0表示不缓存"""
+        if model in self.ttl_by_model:
+            return self.ttl_by_model[model]
+        tag_ttls = [
+            self.ttl_by_tag[tag] for tag in tags or [] if tag in self.ttl_by_tag
+        ]
+        return min(tag_ttls) if tag_ttls else self.default_ttl
+
+    def is_cacheable(
+        self,
+        temperature: Optional[float],
+        ttl: float,
+        force: Optional[bool] = None,
+    ) -> bool:
+        """
+        请求是否可以缓存
+
+        Args:
+            temperature: 请求的采样温度，为0时输出确定，可以缓存
+            ttl: 该请求的缓存时长
+            force: 客户端通过请求头显式开启/关闭缓存，优先于温度判断
+        """
+        if not self.enabled or ttl <= 0:
+            return False
+        if force is not None:
+            return force
+        return temperature == 0
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """查找缓存：先查内存层，未命中时查磁盘层并回填内存"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.is_expired(now):
+                self._remove(key)
+                entry = None
+            else:
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+
+        if entry is None and self.disk_enabled:
+            entry = await self._read_disk(key, now)
+            if entry is not None:
+                self._insert(entry)
+                self._stats["disk_hits"] += 1
+
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        self._stats["saved_cost"] += entry.cost
+        return entry
+
+    async def store(
+        self,
+        key: str,
+        response: dict[str, Any],
+        channel: Any,
+        model_used: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cost: float,
+        ttl: float,
+    ) -> None:
+        """写入缓存（内存层，启用时同时写入磁盘层）"""
+        if not self.enabled or ttl <= 0:
+            return
+        now = time.time()
+        entry = CachedResponse(
+            key=key,
+            response=response,
+            model_used=model_used,
+            channel_id=channel.id,
+            channel_name=channel.name,
+            provider=channel.provider,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=cost,
+            created_at=now,
+            expires_at=now + ttl,
+        )
+        entry.size = len(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+        if entry.size > self.max_memory_bytes:
+            return
+        self._insert(entry)
+        self._stats["stores"] += 1
+        if self.disk_enabled:
+            await self._write_disk(entry)
+
+    def _insert(self, entry: CachedResponse) -> None:
+        self._remove(entry.key)
+        self._entries[entry.key] = entry
+        self._memory_bytes += entry.size
+        self._evict()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size
+
+    def _evict(self) -> None:
+        """按LRU淘汰，直到条数和字节数都在限制内"""
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or self._memory_bytes > self.max_memory_bytes
+        ):
+            _key, entry = self._entries.popitem(last=False)
+            self._memory_bytes -= entry.size
+            self._stats["evictions"] += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    async def _read_disk(self, key: str, now: float) -> Optional[CachedResponse]:
+        path = self._disk_path(key)
+        data = await get_async_file_manager().read_json(path)
+        if not data:
+            return None
+        try:
+            entry = CachedResponse(**data)
+        except TypeError:
+            logger.warning(f"[WARNING] Invalid response cache file {path.name}")
+            entry = None
+        if entry is None or entry.is_expired(now):
+            await get_async_file_manager().remove_file(path)
+            return None
+        return entry
+
+    async def _write_disk(self, entry: CachedResponse) -> None:
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        await get_async_file_manager().write_json(
+            self._disk_path(entry.key), asdict(entry)
+        )
+        self._disk_writes += 1
+        if self._disk_writes % _DISK_PRUNE_INTERVAL == 0:
+            await asyncio.to_thread(self._prune_disk)
+
+    def _prune_disk(self) -> None:
+        """删除磁盘层中超出条数限制的最旧条目（过期条目在读取时删除）"""
+        files = sorted(
+            self.disk_dir.glob("*.json"), key=lambda path: path.stat().st_mtime
+        )
+        excess = len(files) - self.disk_max_entries
+        for path in files[: max(excess, 0)]:
+            path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """清空内存层（磁盘层保留）"""
+        self._entries.clear()
+        self._memory_bytes = 0
+
+    def get_stats(self) -> dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "memory_bytes": self._memory_bytes,
+            "disk_enabled": self.disk_enabled,
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            **self._stats,
+            "saved_cost": round(self._stats["saved_cost"], 6),
+        }
+
+
+# 全局响应缓存
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """获取全局响应缓存"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,127 @@
+"""
+路由代数计数器 - 事件驱动的路由缓存失效
+渠道健康档位变化、黑名单增删时递增对应渠道的代数；
+缓存的路由决策记录计算时的代数，读取时只需比较几个整数即可判断是否过期
+"""
+
+import itertools
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+# 健康档位边界：低于0.3会被 _filter_channels 过滤，低于0.7视为降级
+HEALTH_BAND_THRESHOLDS = (0.3, 0.7)
+
+
+def health_band(health_score: float) -> int:
+    """健康评分所属档位（0=不健康, 1=降级, 2=健康）"""
+    band = 0
+    for threshold in HEALTH_BAND_THRESHOLDS:
+        if health_score >= threshold:
+            band += 1
+    return band
+
+
+@dataclass(frozen=True)
+class GenerationSnapshot:
+    """路由决策计算时的代数快照"""
+
+    # (配置代数, 模型缓存代数, 缓存条目数)，来自 YAMLConfigLoader.get_cache_generation
+    config_generation: tuple
+    # ((channel_id, 健康代数, 黑名单代数), ...)
+    channel_generations: tuple[tuple[str, int, int], ...]
+    tracker: "RoutingGenerations" = field(compare=False, repr=False)
+    config_loader: Any = field(default=None, compare=False, repr=False)
+
+    def is_current(self) -> bool:
+        return self.tracker.is_current(self)
+
+
+class RoutingGenerations:
+    """按渠道维护健康与黑名单代数"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # 全局单调计数，保证失效后重建的渠道不会与旧代数碰撞
+        self._counter = itertools.count(1)
+        self._health: dict[str, int] = {}
+        self._blacklist: dict[str, int] = {}
+        self._health_generation = 0  # 任一渠道健康档位变化时更新
+        self._stats = {"health_bumps": 0, "blacklist_bumps": 0}
+
+    def bump_health(self, channel_id: str) -> None:
+        """渠道健康档位变化"""
+        with self._lock:
+            generation = next(self._counter)
+            self._health[channel_id] = generation
+            self._health_generation = generation
+            self._stats["health_bumps"] += 1
+
+    def bump_blacklist(self, channel_id: str) -> None:
+        """渠道下的模型被拉黑、恢复或过期"""
+        with self._lock:
+            self._blacklist[channel_id] = next(self._counter)
+            self._stats["blacklist_bumps"] += 1
+
+    @property
+    def health_generation(self) -> int:
+        """全局健康代数，用于刷新健康评分快照"""
+        return self._health_generation
+
+    def channel_generation(self, channel_id: str) -> tuple[str, int, int]:
+        return (
+            channel_id,
+            self._health.get(channel_id, 0),
+            self._blacklist.get(channel_id, 0),
+        )
+
+    def snapshot(
+        self, config_loader: Any, channel_ids: list[str]
+    ) -> GenerationSnapshot:
+        """记录当前代数（主渠道与备选渠道）"""
+        return GenerationSnapshot(
+            config_generation=config_loader.get_cache_generation(),
+            channel_generations=tuple(
+                self.channel_generation(channel_id) for channel_id in channel_ids
+            ),
+            tracker=self,
+            config_loader=config_loader,
+        )
+
+    def is_current(self, snapshot: GenerationSnapshot) -> bool:
+        """快照记录的所有代数均未变化"""
+        if (
+            snapshot.config_loader is not None
+            and snapshot.config_loader.get_cache_generation()
+            != snapshot.config_generation
+        ):
+            return False
+
+        health = self._health
+        blacklist = self._blacklist
+        for channel_id, health_gen, blacklist_gen in snapshot.channel_generations:
+            if (
+                health.get(channel_id, 0) != health_gen
+                or blacklist.get(channel_id, 0) != blacklist_gen
+            ):
+                return False
+        return True
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "tracked_health_channels": len(self._health),
+            "tracked_blacklist_channels": len(self._blacklist),
+            **self._stats,
+        }
+
+
+# 全局代数计数器实例
+_routing_generations: Optional[RoutingGenerations] = None
+
+
+def get_routing_generations() -> RoutingGenerations:
+    """获取全局路由代数计数器"""
+    global _routing_generations
+    if _routing_generations is None:
+        _routing_generations = RoutingGenerations()
+    return _routing_generations
@@ -0,0 +1,242 @@
+"""
+列式评分引擎 - 将候选渠道的各项评分收集为矩阵
+策略权重一次矩阵运算得到总分，分层排序使用 argsort/lexsort
+NumPy 不可用时回退到纯Python实现，结果与逐个计算完全一致
+"""
+
+import heapq
+import logging
+from collections.abc import Sequence
+from typing import Any, Optional
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 列顺序与 _calculate_total_score 的参数顺序一致
+SCORE_FIELDS = (
+    "cost_score",
+    "speed_score",
+    "quality_score",
+    "reliability_score",
+    "parameter_score",
+    "context_score",
+    "free_score",
+    "local_score",
+)
+FIELD_INDEX = {field: index for index, field in enumerate(SCORE_FIELDS)}
+
+# 缺失评分的默认值（与 BatchScorer.get_score_for_channel 一致）
+FIELD_DEFAULTS = {
+    "cost_score": 0.5,
+    "speed_score": 0.5,
+    "quality_score": 0.5,
+    "reliability_score": 0.5,
+    "parameter_score": 0.5,
+    "context_score": 0.5,
+    "free_score": 0.1,
+    "local_score": 0.1,
+}
+
+# 分层排序的位次：成本|上下文|参数|速度|质量|可靠性，每位 0-9
+HIERARCHY_FIELDS = (
+    "cost_score",
+    "context_score",
+    "parameter_score",
+    "speed_score",
+    "quality_score",
+    "reliability_score",
+)
+HIERARCHY_MULTIPLIERS = (100000, 10000, 1000, 100, 10, 1)
+
+# 候选数低于该值时矩阵构建开销大于收益，直接使用纯Python路径
+NUMPY_MIN_ROWS = 16
+
+
+def compile_strategy(
+    strategy: list[dict[str, Any]]
+) -> tuple[list[float], float, float]:
+    """
+    将策略规则编译为权重向量
+
+    asc 规则的贡献为 w*(1-s) = w - w*s，因此总分可写成
+    (S · weights + offset) / total_weight
+
+    Returns:
+        (每列权重, 常数偏移, 总权重)
+    """
+    weights = [0.0] * len(SCORE_FIELDS)
+    offset = 0.0
+    total_weight = 0.0
+
+    for rule in strategy:
+        weight = rule.get("weight", 0.0)
+        total_weight += weight
+        index = FIELD_INDEX.get(rule.get("field", ""))
+        if index is None:
+            continue
+        if rule.get("order") == "asc":
+            weights[index] -= weight
+            offset += weight
+        else:
+            weights[index] += weight
+
+    return weights, offset, total_weight
+
+
+class ScoreMatrix:
+    """候选渠道 × 评分字段 的列式评分矩阵"""
+
+    __slots__ = ("rows", "names", "_array")
+
+    def __init__(
+        self,
+        rows: list[list[float]],
+        names: Sequence[str],
+        use_numpy: Optional[bool] = None,
+    ):
+        """
+        Args:
+            rows: 每个候选一行，列顺序见 SCORE_FIELDS
+            names: 候选渠道名称（分层排序的次级键）
+            use_numpy: 强制指定后端，None 表示按规模自动选择
+        """
+        self.rows = rows
+        self.names = list(names)
+        if use_numpy is None:
+            use_numpy = NUMPY_AVAILABLE and len(rows) >= NUMPY_MIN_ROWS
+        elif use_numpy and not NUMPY_AVAILABLE:
+            logger.debug("SCORE MATRIX: numpy unavailable, using pure Python backend")
+            use_numpy = False
+        self._array = (
+            np.array(rows, dtype=np.float64).reshape(len(rows), len(SCORE_FIELDS))
+            if use_numpy
+            else None
+        )
+
+    @classmethod
+    def from_score_dicts(
+        cls,
+        score_dicts: Sequence[dict[str, float]],
+        names: Sequence[str],
+        use_numpy: Optional[bool] = None,
+    ) -> "ScoreMatrix":
+        """从 {字段: 评分} 字典列表构建矩阵"""
+        rows = [
+            [scores.get(field, FIELD_DEFAULTS[field]) for field in SCORE_FIELDS]
+            for scores in score_dicts
+        ]
+        return cls(rows, names, use_numpy)
+
+    @property
+    def backend(self) -> str:
+        return "numpy" if self._array is not None else "python"
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def column(self, field: str) -> list[float]:
+        index = FIELD_INDEX[field]
+        return [row[index] for row in self.rows]
+
+    def total_scores(self, strategy: list[dict[str, Any]]) -> list[float]:
+        """按策略计算每个候选的加权总分（与 _calculate_total_score 一致）"""
+        weights, offset, total_weight = compile_strategy(strategy)
+        if total_weight == 0:
+            return [0.5] * len(self.rows)
+
+        if self._array is not None:
+            totals = (self._array @ np.array(weights) + offset) / total_weight
+            return totals.tolist()
+
+        return [
+            (
+                sum(score * weight for score, weight in zip(row, weights) if weight)
+                + offset
+            )
+            / total_weight
+            for row in self.rows
+        ]
+
+    def hierarchical_keys(self) -> list[int]:
+        """每个候选的6位分层评分（成本|上下文|参数|速度|质量|可靠性）"""
+        indexes = [FIELD_INDEX[field] for field in HIERARCHY_FIELDS]
+
+        if self._array is not None:
+            tiers = np.minimum(9, (self._array[:, indexes] * 9).astype(np.int64))
+            return (tiers @ np.array(HIERARCHY_MULTIPLIERS, dtype=np.int64)).tolist()
+
+        return [
+            sum(
+                min(9, int(row[index] * 9)) * multiplier
+                for index, multiplier in zip(indexes, HIERARCHY_MULTIPLIERS)
+            )
+            for row in self.rows
+        ]
+
+    def hierarchical_order(self) -> list[int]:
+        """
+        按分层评分降序、渠道名称升序排列的行下标
+
+        排序稳定：完全相同的键保持原有顺序，与 _hierarchical_sort 一致
+        """
+        keys = self.hierarchical_keys()
+
+        if self._array is not None and self.names:
+            # lexsort 以最后一个键为主键且为稳定排序
+            # 名称须为unicode数组：object数组的lexsort不按字符串比较
+            order = np.lexsort(
+                (np.array(self.names, dtype=str), -np.array(keys, dtype=np.int64))
+            )
+            return order.tolist()
+
+        names = self.names
+        return sorted(range(len(keys)), key=lambda i: (-keys[i], names[i]))
+
+    def hierarchical_top_k(self, k: int) -> tuple[list[int], list[int]]:
+        """
+        选出分层排序的前 k 名
+
+        Returns:
+            (前k名行下标，顺序与 hierarchical_order()[:k] 完全一致,
+             其余行下标，保持原有升序，稳定排序后即为 hierarchical_order()[k:])
+        """
+        count = len(self.rows)
+        if k >= count:
+            return self.hierarchical_order(), []
+        if k <= 0:
+            return [], list(range(count))
+
+        keys = self.hierarchical_keys()
+
+        if self._array is not None and self.names:
+            negated = -np.array(keys, dtype=np.int64)
+            # argpartition 找到第k名的分层评分，所有不差于它的行（含并列）再精确排序
+            threshold = negated[np.argpartition(negated, k - 1)[k - 1]]
+            candidates = np.flatnonzero(negated <= threshold)
+            names = np.array(self.names, dtype=str)
+            ranked = candidates[np.lexsort((names[candidates], negated[candidates]))]
+            head = ranked[:k]
+            mask = np.ones(count, dtype=bool)
+            mask[head] = False
+            return head.tolist(), np.flatnonzero(mask).tolist()
+
+        names = self.names
+        head = heapq.nsmallest(k, range(count), key=lambda i: (-keys[i], names[i], i))
+        head_set = set(head)
+        return head, [i for i in range(count) if i not in head_set]
+
+
+__all__ = [
+    "FIELD_DEFAULTS",
+    "NUMPY_AVAILABLE",
+    "SCORE_FIELDS",
+    "ScoreMatrix",
+    "compile_strategy",
+]
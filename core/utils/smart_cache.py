@@ -76,6 +76,12 @@ class SmartCache:
                 "priority": "medium",
                 "max_size": 2000,
             },  # 2小时
+            "model_capabilities": {
+                "ttl": 86400,
+                "persistent": True,
+                "priority": "medium",
+                "max_size": 2000,
+            },  # 24小时（能力探测结果）
             # === 中期缓存层 (L2) - 需要定期更新 ===
             "health_check": {
                 "ttl": 300,
@@ -0,0 +1,149 @@
+"""
+增量SSE解析器 - 流式转发热路径上的事件提取
+直接处理上游的原始字节块，只保留跨块的未完成行作为进位缓冲区；
+解析只读取数据，不修改转发给客户端的字节
+"""
+
+import json
+import logging
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 单个事件允许缓冲的最大字节数，防止异常流无限占用内存
+DEFAULT_MAX_EVENT_BYTES = 16 * 1024 * 1024
+
+_DONE = b"[DONE]"
+
+
+class SSEEvent:
+    """一个完整的SSE事件（data为多行data字段以换行拼接后的原始字节）"""
+
+    __slots__ = ("event", "data")
+
+    def __init__(self, event: str, data: bytes):
+        self.event = event
+        self.data = data
+
+    @property
+    def is_done(self) -> bool:
+        """OpenAI风格的结束标记 data: [DONE]"""
+        return self.data == _DONE
+
+    def json(self) -> Optional[Any]:
+        """解析data为JSON，失败时返回None"""
+        try:
+            return json.loads(self.data)
+        except ValueError:
+            return None
+
+    def __repr__(self) -> str:
+        return f"SSEEvent(event={self.event!r}, data={self.data!r})"
+
+
+class SSEParser:
+    """
+    按字节增量解析SSE流
+
+    行结束符支持 \\n、\\r\\n 和 \\r（含跨块拆开的 \\r\\n），空行分隔事件；
+    注释行和未知字段被忽略
+    """
+
+    def __init__(self, max_event_bytes: int = DEFAULT_MAX_EVENT_BYTES):
+        self.max_event_bytes = max_event_bytes
+        self._carry = b""  # 上一块末尾不完整的行
+        self._skip_lf = False  # 上一块以\r结尾，本块开头的\n属于同一个换行
+        self._event = ""
+        self._data: list[bytes] = []
+        self._pending_bytes = 0
+        self._discarding = False  # 超长事件被丢弃，忽略其余字段直到空行
+        self.events = 0
+        self.dropped_events = 0
+
+    def feed(self, chunk: bytes) -> list[SSEEvent]:
+        """输入一个原始字节块，返回其中完成的事件"""
+        if not chunk:
+            return []
+        if self._skip_lf:
+            self._skip_lf = False
+            if chunk[:1] == b"\n":
+                chunk = chunk[1:]
+                if not chunk:
+                    return []
+
+        # bytes.splitlines 只识别 \n、\r\n 和 \r，与SSE规范一致
+        lines = chunk.splitlines()
+        if self._carry:
+            lines[0] = self._carry + lines[0]
+            self._carry = b""
+        last = chunk[-1:]
+        if last == b"\r":
+            self._skip_lf = True
+        elif last != b"\n":
+            self._set_carry(lines.pop())
+
+        events: list[SSEEvent] = []
+        for line in lines:
+            if not line:
+                if self._data:
+                    events.append(
+                        SSEEvent(self._event or "message", b"\n".join(self._data))
+                    )
+                self._reset_event()
+            elif line[0] != 0x3A:  # 以 ':' 开头的是注释行
+                self._process_field(line)
+        self.events += len(events)
+        return events
+
+    def flush(self) -> list[SSEEvent]:
+        """
+        流结束时调用：输出未以空行结束的最后一个事件
+
+        规范要求丢弃不完整事件，但不少上游最后一个事件后不带空行，这里宽松处理
+        """
+        if self._carry:
+            self._process_field(self._carry)
+            self._carry = b""
+        events = []
+        if self._data:
+            events.append(SSEEvent(self._event or "message", b"\n".join(self._data)))
+            self.events += 1
+        self._reset_event()
+        self._skip_lf = False
+        return events
+
+    def _process_field(self, line: bytes) -> None:
+        if self._discarding:
+            return
+        field, _sep, value = line.partition(b":")
+        if value[:1] == b" ":
+            value = value[1:]
+        if field == b"data":
+            self._pending_bytes += len(value)
+            if self._pending_bytes > self.max_event_bytes:
+                self._drop_event()
+                return
+            self._data.append(value)
+        elif field == b"event":
+            self._event = value.decode("utf-8", errors="replace")
+
+    def _set_carry(self, tail: bytes) -> None:
+        if len(tail) > self.max_event_bytes:
+            self._drop_event()
+            tail = b""
+        self._carry = tail
+
+    def _drop_event(self) -> None:
+        if not self._discarding:
+            self.dropped_events += 1
+            logger.warning(
+                f"[WARNING] SSE event exceeds {self.max_event_bytes} bytes, dropped from parsing"
+            )
+        self._reset_event()
+        self._discarding = True
+
+    def _reset_event(self) -> None:
+        self._event = ""
+        self._data = []
+        self._pending_bytes = 0
+        self._discarding = False
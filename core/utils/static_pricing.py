@@ -46,6 +46,11 @@ class UnifiedStaticPricingLoader:
         # 特殊处理器（豆包阶梯定价）
         self.doubao_calculator = get_pricing_calculator()
 
+    def reload(self) -> None:
+        """定价文件变化后重新加载基准定价并清空渠道定价缓存"""
+        self.base_pricing_data = self._load_base_pricing()
+        self.channel_pricing_cache.clear()
+
     def _load_base_pricing(self) -> dict[str, Any]:
         """加载第2层OpenRouter基准定价数据"""
         try:
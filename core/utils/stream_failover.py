@@ -0,0 +1,95 @@
+"""
+流式请求故障转移 - 向客户端提交首个字节之前的透明切换
+上游返回错误状态、首个数据事件是错误，或在TTFB截止时间内没有产生有效数据时，
+放弃该上游并尝试下一个候选渠道；截止时间按渠道TTFB分位数自适应
+"""
+
+import logging
+from typing import Any, Optional
+
+from .latency_sketch import get_latency_tracker
+
+logger = logging.getLogger(__name__)
+
+
+class StreamFailoverError(Exception):
+    """流式请求在提交任何字节给客户端之前失败，可以切换到下一个候选渠道"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(message)
+
+
+class StreamFailoverPolicy:
+    """决定流式请求的首字节截止时间并统计故障转移"""
+
+    def __init__(self, settings: Any = None):
+        self.enabled = True
+        self.ttfb_timeout = 30.0
+        self.min_ttfb_timeout = 5.0
+        self.latency_quantile = 0.95
+        self.latency_multiplier = 3.0
+        self._stats = {
+            "failovers": 0,
+            "ttfb_timeouts": 0,
+            "error_status": 0,
+            "error_events": 0,
+            "connect_errors": 0,
+        }
+        if settings is not None:
+            self.configure(settings)
+
+    def configure(self, settings: Any) -> None:
+        """应用配置（routing.stream_failover）"""
+        self.enabled = settings.enabled
+        self.ttfb_timeout = settings.ttfb_timeout
+        self.min_ttfb_timeout = settings.min_ttfb_timeout
+        self.latency_quantile = settings.latency_quantile
+        self.latency_multiplier = settings.latency_multiplier
+
+    def ttfb_deadline(
+        self, channel: Any, model_name: Optional[str] = None
+    ) -> Optional[float]:
+        """
+        渠道的首个有效数据事件截止时间（秒）
+
+        渠道配置了 ttfb_timeout 时直接使用；否则取TTFB分位数乘以倍数，
+        限制在 [min_ttfb_timeout, ttfb_timeout]，样本不足时为 ttfb_timeout。
+        未启用时返回None（不设截止时间）
+        """
+        if not self.enabled:
+            return None
+        override = getattr(channel, "ttfb_timeout", None)
+        if override:
+            return float(override)
+        quantile = get_latency_tracker().quantile(
+            channel.id, model_name, self.latency_quantile
+        )
+        if quantile is None:
+            return self.ttfb_timeout
+        return min(
+            self.ttfb_timeout,
+            max(self.min_ttfb_timeout, quantile * self.latency_multiplier),
+        )
+
+    def record_failover(self, reason: str) -> None:
+        """记录一次故障转移（reason 为统计项名称）"""
+        self._stats["failovers"] += 1
+        if reason in self._stats:
+            self._stats[reason] += 1
+
+    def get_stats(self) -> dict[str, Any]:
+        return {"enabled": self.enabled, **self._stats}
+
+
+# 全局流式故障转移策略
+_stream_failover_policy: Optional[StreamFailoverPolicy] = None
+
+
+def get_stream_failover_policy() -> StreamFailoverPolicy:
+    """获取全局流式故障转移策略"""
+    global _stream_failover_policy
+    if _stream_failover_policy is None:
+        _stream_failover_policy = StreamFailoverPolicy()
+    return _stream_failover_policy
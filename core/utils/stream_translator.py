@@ -0,0 +1,517 @@
+"""
+流式协议转换 - 将上游OpenAI风格SSE流逐事件转换为客户端协议
+基于增量SSE解析器，每个上游事件到达即转换输出，不缓冲内容；
+上游本身已是目标协议时原样透传字节
+"""
+
+import json
+import uuid
+from typing import Any, Optional, Union
+
+from .sse_parser import SSEEvent, SSEParser
+
+_TRANSLATE = "translate"
+_PASSTHROUGH = "passthrough"
+
+# Anthropic Messages 流式事件类型，首个事件属于这些类型时说明上游已是Anthropic协议
+ANTHROPIC_EVENT_TYPES = frozenset(
+    {
+        "message_start",
+        "ping",
+        "content_block_start",
+        "content_block_delta",
+        "content_block_stop",
+        "message_delta",
+        "message_stop",
+    }
+)
+
+ANTHROPIC_ERROR_TYPES = frozenset(
+    {
+        "invalid_request_error",
+        "authentication_error",
+        "permission_error",
+        "not_found_error",
+        "request_too_large",
+        "rate_limit_error",
+        "api_error",
+        "overloaded_error",
+    }
+)
+
+_ERROR_TYPES_BY_STATUS = {
+    400: "invalid_request_error",
+    401: "authentication_error",
+    403: "permission_error",
+    404: "not_found_error",
+    413: "request_too_large",
+    429: "rate_limit_error",
+    503: "overloaded_error",
+    529: "overloaded_error",
+}
+
+_STOP_REASONS = {
+    "stop": "end_turn",
+    "length": "max_tokens",
+    "tool_calls": "tool_use",
+    "function_call": "tool_use",
+    "content_filter": "refusal",
+}
+
+_GEMINI_FINISH_REASONS = {
+    "stop": "STOP",
+    "length": "MAX_TOKENS",
+    "tool_calls": "STOP",
+    "function_call": "STOP",
+    "content_filter": "SAFETY",
+}
+
+_GEMINI_ERROR_STATUS = {
+    400: "INVALID_ARGUMENT",
+    401: "UNAUTHENTICATED",
+    403: "PERMISSION_DENIED",
+    404: "NOT_FOUND",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+
+def _status_code(code: Any) -> Optional[int]:
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+class _OpenAIStreamTranslator:
+    """
+    OpenAI Chat Completions 流的逐事件转换基类
+
+    feed() 接收 _execute_stream_request_with_retry 的输出：bytes 为上游原始数据，
+    str 为路由器生成的事件（汇总、[DONE]、错误），返回应发给客户端的帧
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._parser = SSEParser()
+        self._usage: Optional[dict[str, Any]] = None
+        self._finish_reason: Optional[str] = None
+        self._output_chars = 0  # 上游未返回usage时用于估算输出token
+        self._errored = False
+
+    def feed(self, chunk: Union[bytes, str]) -> list[bytes]:
+        """输入一个上游数据块或路由器事件，返回转换后的帧"""
+        if self._errored:
+            return []
+        if isinstance(chunk, str):
+            return self._router_event(chunk)
+        return self._translate(self._parser.feed(chunk))
+
+    def _translate(self, events: list[SSEEvent]) -> list[bytes]:
+        frames: list[bytes] = []
+        for event in events:
+            if event.is_done:
+                continue
+            payload = event.json()
+            if not isinstance(payload, dict):
+                continue
+            if payload.get("error"):
+                frames.append(self._error(payload["error"]))
+                break
+            usage = payload.get("usage")
+            if isinstance(usage, dict):
+                self._usage = usage
+
+            choices = payload.get("choices")
+            if not choices:
+                continue
+            choice = choices[0]
+            frames.extend(self._translate_delta(choice.get("delta") or {}))
+            if choice.get("finish_reason"):
+                self._finish_reason = choice["finish_reason"]
+        return frames
+
+    def _translate_delta(self, delta: dict[str, Any]) -> list[bytes]:
+        raise NotImplementedError
+
+    def _router_event(self, chunk: str) -> list[bytes]:
+        """路由器生成的事件：错误转换为目标协议的错误，汇总和[DONE]丢弃"""
+        parser = SSEParser()
+        for event in parser.feed(chunk.encode("utf-8")) + parser.flush():
+            payload = event.json()
+            if isinstance(payload, dict) and payload.get("error"):
+                return [self._error(payload["error"])]
+        return []
+
+    def _error(self, error: Any) -> bytes:
+        """转换错误并结束转换（之后不再输出内容帧）"""
+        self._errored = True
+        if isinstance(error, dict):
+            return self._error_frame(
+                str(error.get("message", "")),
+                _status_code(error.get("code")),
+                error.get("type"),
+            )
+        return self._error_frame(str(error), None, None)
+
+    def _error_frame(
+        self, message: str, status: Optional[int], error_type: Optional[str]
+    ) -> bytes:
+        raise NotImplementedError
+
+    def _token_counts(self) -> tuple[int, int, int]:
+        """(prompt, cached prompt, completion)；上游未返回usage时按字符数粗略估算输出"""
+        usage = self._usage or {}
+        prompt = usage.get("prompt_tokens") or 0
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        completion = usage.get("completion_tokens")
+        if completion is None:
+            completion = (self._output_chars + 3) // 4
+        return prompt, cached, completion
+
+
+class AnthropicStreamTranslator(_OpenAIStreamTranslator):
+    """OpenAI Chat Completions 流 -> Anthropic Messages 流"""
+
+    def __init__(self, message_id: str, model: str):
+        super().__init__(model)
+        self.message_id = message_id
+        self._mode: Optional[str] = None
+        self._pending: list[bytes] = []  # 判断上游协议前收到的原始字节
+        self._block_index = -1
+        self._block_type: Optional[str] = None
+        self._tool_blocks: dict[int, int] = {}  # OpenAI tool_call index -> 内容块序号
+
+    @property
+    def passthrough(self) -> bool:
+        """上游是否为Anthropic协议（原样透传）"""
+        return self._mode == _PASSTHROUGH
+
+    def feed(self, chunk: Union[bytes, str]) -> list[bytes]:
+        if self._errored or isinstance(chunk, str) or self._mode == _TRANSLATE:
+            return super().feed(chunk)
+        if self._mode == _PASSTHROUGH:
+            return [chunk]
+
+        self._pending.append(chunk)
+        events = self._parser.feed(chunk)
+        return self._start(events) if events else []
+
+    def finish(self) -> list[bytes]:
+        """上游流结束：关闭打开的内容块并发送 message_delta / message_stop"""
+        frames: list[bytes] = []
+        if self._mode != _PASSTHROUGH and not self._errored:
+            events = self._parser.flush()
+            if self._mode is None and events:
+                frames = self._start(events)
+            else:
+                frames = self._translate(events)
+        if self._mode == _PASSTHROUGH or self._errored:
+            return frames
+
+        if self._mode is None:
+            self._mode = _TRANSLATE
+            frames.append(self._message_start())
+        frames.extend(self._close_block())
+        stop_reason = _STOP_REASONS.get(self._finish_reason or "")
+        frames.append(
+            self._frame(
+                "message_delta",
+                {
+                    "type": "message_delta",
+                    "delta": {
+                        "stop_reason": stop_reason
+                        or ("tool_use" if self._tool_blocks else "end_turn"),
+                        "stop_sequence": None,
+                    },
+                    "usage": self._anthropic_usage(),
+                },
+            )
+        )
+        frames.append(self._frame("message_stop", {"type": "message_stop"}))
+        return frames
+
+    def error(self, message: str, error_type: str = "api_error") -> bytes:
+        """生成Anthropic错误事件（之后不再输出任何帧）"""
+        return self._error({"type": error_type, "message": message})
+
+    def _start(self, events: list[SSEEvent]) -> list[bytes]:
+        """根据首个事件判断上游协议"""
+        payload = events[0].json()
+        if not isinstance(payload, dict):
+            payload = {}
+        if (
+            events[0].event in ANTHROPIC_EVENT_TYPES
+            or payload.get("type") in ANTHROPIC_EVENT_TYPES
+        ):
+            self._mode = _PASSTHROUGH
+            frames, self._pending = self._pending, []
+            return frames
+
+        self._mode = _TRANSLATE
+        self._pending = []
+        if payload.get("error"):
+            # 上游一开始就返回错误：只发送错误事件，不发送 message_start
+            return self._translate(events)
+        return [self._message_start()] + self._translate(events)
+
+    def _translate_delta(self, delta: dict[str, Any]) -> list[bytes]:
+        frames: list[bytes] = []
+        reasoning = delta.get("reasoning_content")
+        if reasoning:
+            frames.extend(
+                self._block_delta(
+                    "thinking", {"type": "thinking_delta", "thinking": reasoning}
+                )
+            )
+        text = delta.get("content")
+        if text:
+            frames.extend(
+                self._block_delta("text", {"type": "text_delta", "text": text})
+            )
+        for tool_call in delta.get("tool_calls") or []:
+            frames.extend(self._tool_call_delta(tool_call))
+        return frames
+
+    def _block_delta(self, block_type: str, delta: dict[str, Any]) -> list[bytes]:
+        frames: list[bytes] = []
+        if self._block_type != block_type:
+            frames.extend(self._close_block())
+            self._block_index += 1
+            self._block_type = block_type
+            frames.append(
+                self._frame(
+                    "content_block_start",
+                    {
+                        "type": "content_block_start",
+                        "index": self._block_index,
+                        "content_block": {"type": block_type, block_type: ""},
+                    },
+                )
+            )
+        self._output_chars += len(delta.get(block_type, ""))
+        frames.append(
+            self._frame(
+                "content_block_delta",
+                {
+                    "type": "content_block_delta",
+                    "index": self._block_index,
+                    "delta": delta,
+                },
+            )
+        )
+        return frames
+
+    def _tool_call_delta(self, tool_call: dict[str, Any]) -> list[bytes]:
+        frames: list[bytes] = []
+        function = tool_call.get("function") or {}
+        position = tool_call.get("index", 0)
+        block_index = self._tool_blocks.get(position)
+        if block_index is None:
+            frames.extend(self._close_block())
+            self._block_index += 1
+            self._block_type = "tool_use"
+            block_index = self._tool_blocks[position] = self._block_index
+            frames.append(
+                self._frame(
+                    "content_block_start",
+                    {
+                        "type": "content_block_start",
+                        "index": block_index,
+                        "content_block": {
+                            "type": "tool_use",
+                            "id": tool_call.get("id") or f"toolu_{uuid.uuid4().hex}",
+                            "name": function.get("name") or "",
+                            "input": {},
+                        },
+                    },
+                )
+            )
+        arguments = function.get("arguments")
+        if arguments:
+            self._output_chars += len(arguments)
+            frames.append(
+                self._frame(
+                    "content_block_delta",
+                    {
+                        "type": "content_block_delta",
+                        "index": block_index,
+                        "delta": {
+                            "type": "input_json_delta",
+                            "partial_json": arguments,
+                        },
+                    },
+                )
+            )
+        return frames
+
+    def _close_block(self) -> list[bytes]:
+        if self._block_type is None:
+            return []
+        self._block_type = None
+        return [
+            self._frame(
+                "content_block_stop",
+                {"type": "content_block_stop", "index": self._block_index},
+            )
+        ]
+
+    def _message_start(self) -> bytes:
+        return self._frame(
+            "message_start",
+            {
+                "type": "message_start",
+                "message": {
+                    "id": self.message_id,
+                    "type": "message",
+                    "role": "assistant",
+                    "content": [],
+                    "model": self.model,
+                    "stop_reason": None,
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": 0, "output_tokens": 0},
+                },
+            },
+        )
+
+    def _anthropic_usage(self) -> dict[str, int]:
+        """Anthropic的input_tokens不含缓存命中部分"""
+        prompt, cached, completion = self._token_counts()
+        result = {"input_tokens": prompt - cached, "output_tokens": completion}
+        if cached:
+            result["cache_read_input_tokens"] = cached
+        return result
+
+    def _error_frame(
+        self, message: str, status: Optional[int], error_type: Optional[str]
+    ) -> bytes:
+        if error_type not in ANTHROPIC_ERROR_TYPES:
+            error_type = _ERROR_TYPES_BY_STATUS.get(status, "api_error")
+        return self._frame(
+            "error",
+            {"type": "error", "error": {"type": error_type, "message": message}},
+        )
+
+    @staticmethod
+    def _frame(event_type: str, data: dict[str, Any]) -> bytes:
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        return f"event: {event_type}\ndata: {body}\n\n".encode()
+
+
+class GeminiStreamTranslator(_OpenAIStreamTranslator):
+    """
+    OpenAI Chat Completions 流 -> Gemini streamGenerateContent 流
+
+    sse=True 时按 alt=sse 输出 "data: {...}" 帧，否则输出逐步写出的JSON数组。
+    文本增量到达即输出；Gemini的functionCall需要完整参数，工具调用参数在结束时输出
+    """
+
+    def __init__(self, model: str, sse: bool = True):
+        super().__init__(model)
+        self.sse = sse
+        self._frames_sent = 0
+        self._tool_calls: dict[int, dict[str, Any]] = {}  # tool_call index -> 名称和参数片段
+
+    def finish(self) -> list[bytes]:
+        """上游流结束：输出带finishReason和usageMetadata的最后一帧"""
+        frames = [] if self._errored else self._translate(self._parser.flush())
+        if not self._errored:
+            parts: list[dict[str, Any]] = [
+                {"functionCall": self._function_call(tool_call)}
+                for _position, tool_call in sorted(self._tool_calls.items())
+            ]
+            prompt, cached, completion = self._token_counts()
+            usage_metadata = {
+                "promptTokenCount": prompt,
+                "candidatesTokenCount": completion,
+                "totalTokenCount": prompt + completion,
+            }
+            if cached:
+                usage_metadata["cachedContentTokenCount"] = cached
+            candidate = {
+                "content": {"parts": parts or [{"text": ""}], "role": "model"},
+                "finishReason": _GEMINI_FINISH_REASONS.get(
+                    self._finish_reason or "", "STOP"
+                ),
+                "index": 0,
+            }
+            frames.append(
+                self._frame(
+                    {
+                        "candidates": [candidate],
+                        "usageMetadata": usage_metadata,
+                        "modelVersion": self.model,
+                    }
+                )
+            )
+        if not self.sse:
+            frames.append(b"]" if self._frames_sent else b"[]")
+        return frames
+
+    def error(self, message: str, status: int = 500) -> bytes:
+        """生成Gemini错误帧（之后只输出JSON数组的结尾）"""
+        return self._error({"code": status, "message": message})
+
+    def _translate_delta(self, delta: dict[str, Any]) -> list[bytes]:
+        for tool_call in delta.get("tool_calls") or []:
+            function = tool_call.get("function") or {}
+            entry = self._tool_calls.setdefault(
+                tool_call.get("index", 0), {"name": "", "arguments": []}
+            )
+            if function.get("name"):
+                entry["name"] = function["name"]
+            if function.get("arguments"):
+                entry["arguments"].append(function["arguments"])
+                self._output_chars += len(function["arguments"])
+
+        text = delta.get("content")
+        if not text:
+            return []
+        self._output_chars += len(text)
+        return [
+            self._frame(
+                {
+                    "candidates": [
+                        {
+                            "content": {"parts": [{"text": text}], "role": "model"},
+                            "index": 0,
+                        }
+                    ],
+                    "modelVersion": self.model,
+                }
+            )
+        ]
+
+    @staticmethod
+    def _function_call(tool_call: dict[str, Any]) -> dict[str, Any]:
+        arguments = "".join(tool_call["arguments"])
+        try:
+            args = json.loads(arguments) if arguments else {}
+        except ValueError:
+            args = {"arguments": arguments}
+        return {"name": tool_call["name"], "args": args}
+
+    def _error_frame(
+        self, message: str, status: Optional[int], error_type: Optional[str]
+    ) -> bytes:
+        status = status or 500
+        return self._frame(
+            {
+                "error": {
+                    "code": status,
+                    "message": message,
+                    "status": _GEMINI_ERROR_STATUS.get(status, "INTERNAL"),
+                }
+            }
+        )
+
+    def _frame(self, data: dict[str, Any]) -> bytes:
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        self._frames_sent += 1
+        if self.sse:
+            return f"data: {body}\r\n\r\n".encode()
+        # JSON数组模式：首帧带 "["，之后的帧以 "," 分隔
+        prefix = "[" if self._frames_sent == 1 else ",\r\n"
+        return f"{prefix}{body}".encode()
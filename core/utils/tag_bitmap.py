@@ -0,0 +1,157 @@
+"""
+位图倒排索引 - 紧凑的标签→模型posting list
+为每个模型分配稠密整数ID，每个标签对应一个Python int位图，
+查询时只做 AND / ANDNOT 位运算，避免构造大量临时集合
+"""
+
+from collections.abc import Hashable, Iterable, KeysView
+from itertools import compress
+from typing import Optional
+
+_BIT_SELECTORS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+class TagBitmapIndex:
+    """标签位图索引：稠密模型ID + 每标签一个int位图"""
+
+    __slots__ = ("_ids", "_keys", "_bitmaps", "_live")
+
+    def __init__(self) -> None:
+        self._ids: dict[Hashable, int] = {}  # 模型键 -> 稠密ID
+        self._keys: list[Hashable] = []  # 稠密ID -> 模型键
+        self._bitmaps: dict[str, int] = {}  # 标签 -> 位图
+        self._live = 0  # 当前仍在索引中的模型位图
+
+    @classmethod
+    def from_postings(
+        cls,
+        postings: dict[str, Iterable[Hashable]],
+        order: Optional[Iterable[Hashable]] = None,
+    ) -> "TagBitmapIndex":
+        """
+        从 标签->模型集合 一次性构建位图索引
+
+        Args:
+            postings: 标签到模型键集合的映射
+            order: 模型键的ID分配顺序（解码结果按此顺序返回）
+        """
+        index = cls()
+        if order is not None:
+            for key in order:
+                index.intern(key)
+
+        for tag, keys in postings.items():
+            ids = [index.intern(key) for key in keys]
+            if ids:
+                index._bitmaps[tag] = index._pack(ids)
+
+        index._live = (1 << len(index._keys)) - 1
+        return index
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def intern(self, key: Hashable) -> int:
+        """获取模型键的稠密ID，不存在时分配新ID"""
+        model_id = self._ids.get(key)
+        if model_id is None:
+            model_id = len(self._keys)
+            self._ids[key] = model_id
+            self._keys.append(key)
+        return model_id
+
+    def add(self, tag: str, key: Hashable) -> None:
+        """将模型加入标签的posting list"""
+        bit = 1 << self.intern(key)
+        self._bitmaps[tag] = self._bitmaps.get(tag, 0) | bit
+        self._live |= bit
+
+    def remove_key(self, key: Hashable, tags: Iterable[str]) -> None:
+        """从给定标签的posting list中移除模型（ID不回收）"""
+        model_id = self._ids.get(key)
+        if model_id is None:
+            return
+        mask = ~(1 << model_id)
+        for tag in tags:
+            bitmap = self._bitmaps.get(tag)
+            if bitmap is None:
+                continue
+            bitmap &= mask
+            if bitmap:
+                self._bitmaps[tag] = bitmap
+            else:
+                del self._bitmaps[tag]
+        self._live &= mask
+
+    def tags(self) -> KeysView[str]:
+        return self._bitmaps.keys()
+
+    def count(self, tag: str) -> int:
+        return self.popcount(self._bitmaps.get(tag, 0))
+
+    def query(
+        self, include_tags: Iterable[str], exclude_tags: Optional[Iterable[str]] = None
+    ) -> int:
+        """
+        计算 AND(include) ANDNOT OR(exclude) 的结果位图
+
+        include_tags 为空时以全部在册模型为起点
+        """
+        bitmaps = self._bitmaps
+        result = None
+        for tag in include_tags:
+            bitmap = bitmaps.get(tag, 0)
+            result = bitmap if result is None else result & bitmap
+            if not result:
+                return 0
+        if result is None:
+            result = self._live
+
+        for tag in exclude_tags or ():
+            bitmap = bitmaps.get(tag)
+            if bitmap:
+                result &= ~bitmap
+                if not result:
+                    return 0
+        return result
+
+    def union(self, tags: Iterable[str]) -> int:
+        result = 0
+        for tag in tags:
+            result |= self._bitmaps.get(tag, 0)
+        return result
+
+    def decode(self, bitmap: int) -> list[Hashable]:
+        """将位图解码为模型键列表（按ID升序）"""
+        if not bitmap:
+            return []
+        bits = bin(bitmap)[:1:-1]  # 反转后下标即模型ID
+        if bits.count("1") * 8 < len(bits):
+            # 稀疏结果：用str.find跳到下一个置位，耗时与命中数成正比
+            keys = self._keys
+            result = []
+            position = bits.find("1")
+            while position != -1:
+                result.append(keys[position])
+                position = bits.find("1", position + 1)
+            return result
+
+        # 稠密结果：转为0/1字节序列，由 itertools.compress 在C层完成筛选
+        selectors = bits.encode("ascii").translate(_BIT_SELECTORS)
+        return list(compress(self._keys, selectors))
+
+    def memory_bytes(self) -> int:
+        """估算位图占用的字节数"""
+        return sum((bitmap.bit_length() + 7) // 8 for bitmap in self._bitmaps.values())
+
+    @staticmethod
+    def popcount(bitmap: int) -> int:
+        return bin(bitmap).count("1")
+
+    @staticmethod
+    def _pack(ids: list[int]) -> int:
+        """批量置位，避免逐位 |= 带来的平方级开销"""
+        buffer = bytearray(max(ids) // 8 + 1)
+        for model_id in ids:
+            buffer[model_id >> 3] |= 1 << (model_id & 7)
+        return int.from_bytes(buffer, "little")
@@ -15,6 +15,15 @@ from typing import Any, Optional
 
 logger = logging.getLogger(__name__)
 
+# 对冲请求中未胜出一方的状态（仍产生上游费用）
+HEDGE_STATUSES = frozenset({"hedge_loser", "hedge_cancelled"})
+
+# 合并到相同在途请求的重复请求（共享响应，不产生上游费用）
+COALESCED_STATUS = "coalesced"
+
+# 由响应缓存直接返回的请求（不产生上游费用，原始成本计为节省）
+CACHE_HIT_STATUS = "cache_hit"
+
 
 @dataclass
 class UsageRecord:
@@ -41,6 +50,7 @@ class UsageRecord:
     output_cost: float  # 输出成本（USD）
     total_cost: float  # 总成本（USD）
     cost_currency: str = "USD"  # 成本货币
+    saved_cost: float = 0.0  # 缓存命中节省的成本（USD）
 
     # 请求信息
     request_type: str = "chat"  # 请求类型 (chat, embedding等)
@@ -128,6 +138,11 @@ class UsageTracker:
             "total_tokens": 0,
             "successful_requests": 0,
             "failed_requests": 0,
+            "hedged_requests": 0,
+            "coalesced_requests": 0,
+            "cache_hits": 0,
+            "saved_cost": 0.0,
+            "cache_hit_ratio": 0.0,
             "providers": {},
             "channels": {},
             "models": {},
@@ -153,6 +168,7 @@ class UsageTracker:
                 stats["avg_cost_per_request"] = (
                     stats["total_cost"] / stats["total_requests"]
                 )
+                stats["cache_hit_ratio"] = stats["cache_hits"] / stats["total_requests"]
             if stats["total_tokens"] > 0:
                 stats["avg_cost_per_1k_tokens"] = (
                     stats["total_cost"] / stats["total_tokens"]
@@ -241,8 +257,23 @@ class UsageTracker:
         stats["total_output_tokens"] += record.get("output_tokens", 0)
         stats["total_tokens"] += record.get("total_tokens", 0)
 
-        if record.get("status") == "success":
+        status = record.get("status")
+        if status == "success":
+            stats["successful_requests"] += 1
+        elif status in HEDGE_STATUSES:
+            # 对冲中未胜出的请求：计入费用，但不算失败
+            stats["hedged_requests"] += 1
+        elif status == COALESCED_STATUS:
+            # 合并的重复请求：成功返回，零成本
             stats["successful_requests"] += 1
+            stats["coalesced_requests"] = stats.get("coalesced_requests", 0) + 1
+        elif status == CACHE_HIT_STATUS:
+            # 缓存命中：成功返回，零成本，原始成本计为节省
+            stats["successful_requests"] += 1
+            stats["cache_hits"] = stats.get("cache_hits", 0) + 1
+            stats["saved_cost"] = stats.get("saved_cost", 0.0) + record.get(
+                "saved_cost", 0.0
+            )
         else:
             stats["failed_requests"] += 1
 
@@ -281,6 +312,18 @@ class UsageTracker:
         target_stats["total_tokens"] += source_stats["total_tokens"]
         target_stats["successful_requests"] += source_stats["successful_requests"]
         target_stats["failed_requests"] += source_stats["failed_requests"]
+        target_stats["hedged_requests"] = target_stats.get(
+            "hedged_requests", 0
+        ) + source_stats.get("hedged_requests", 0)
+        target_stats["coalesced_requests"] = target_stats.get(
+            "coalesced_requests", 0
+        ) + source_stats.get("coalesced_requests", 0)
+        target_stats["cache_hits"] = target_stats.get(
+            "cache_hits", 0
+        ) + source_stats.get("cache_hits", 0)
+        target_stats["saved_cost"] = target_stats.get(
+            "saved_cost", 0.0
+        ) + source_stats.get("saved_cost", 0.0)
 
         # 合并子统计
         for category in ["providers", "channels", "models"]:
@@ -300,6 +343,9 @@ class UsageTracker:
             target_stats["avg_cost_per_request"] = (
                 target_stats["total_cost"] / target_stats["total_requests"]
             )
+            target_stats["cache_hit_ratio"] = (
+                target_stats["cache_hits"] / target_stats["total_requests"]
+            )
         if target_stats["total_tokens"] > 0:
             target_stats["avg_cost_per_1k_tokens"] = (
                 target_stats["total_cost"] / target_stats["total_tokens"]
@@ -367,6 +413,7 @@ def create_usage_record(
     user_agent: Optional[str] = None,
     client_ip: Optional[str] = None,
     tags: Optional[list[str]] = None,
+    saved_cost: float = 0.0,
 ) -> UsageRecord:
     """创建使用记录"""
     if request_id is None:
@@ -386,6 +433,7 @@ def create_usage_record(
         input_cost=input_cost,
         output_cost=output_cost,
         total_cost=input_cost + output_cost,
+        saved_cost=saved_cost,
         request_type=request_type,
         status=status,
         error_message=error_message,
@@ -3,6 +3,7 @@
 """
 
 import asyncio
+import itertools
 import json
 import logging
 import threading
@@ -18,9 +19,13 @@ from .config.async_loader import load_config_async
 from .config_models import Channel, Config, Provider
 from .utils.api_key_cache import get_api_key_cache_manager
 from .utils.async_file_ops import get_async_file_manager
+from .utils.routing_generations import get_routing_generations, health_band
 
 logger = logging.getLogger(__name__)
 
+# 全局单调递增的代数计数器：不同加载器实例之间的代数也不会重复
+_generation_counter = itertools.count(1)
+
 
 @dataclass
 class RuntimeState:
@@ -41,7 +46,7 @@ class YAMLConfigLoader:
         # 运行时状态
         self.runtime_state: RuntimeState = RuntimeState()
 
-        # 模型缓存
+        # 模型缓存（赋值时自动使缓存键索引失效）
         self.model_cache: dict[str, dict] = {}
 
         # API Key缓存管理器
@@ -50,13 +55,12 @@ class YAMLConfigLoader:
         # 迁移状态标志，防止重复迁移
         self._migration_completed = False
         self._migration_in_progress = False
+        # 本地模型能力预热任务（保留引用避免被回收）
+        self._capability_warmup_task: Optional[asyncio.Task] = None
 
-        # 加载并解析配置
+        # 加载并解析配置（赋值时自动重建渠道索引）
         self.config: Config = self._load_and_validate_config()
 
-        # 创建渠道映射
-        self.channels_map = {ch.id: ch for ch in self.config.channels}
-
         # 加载模型缓存
         self._load_model_cache_from_disk()
 
@@ -88,15 +92,13 @@ class YAMLConfigLoader:
         instance.api_key_cache_manager = get_api_key_cache_manager()
         instance._migration_completed = False
         instance._migration_in_progress = False
+        instance._capability_warmup_task = None
 
         try:
             # [BOOST] 使用异步配置加载器替代同步加载
             logger.info("开始异步配置加载...")
             instance.config = await load_config_async(instance.config_path)
 
-            # 创建渠道映射
-            instance.channels_map = {ch.id: ch for ch in instance.config.channels}
-
             # [BOOST] 异步加载模型缓存（如果有的话）
             await instance._load_model_cache_async()
 
@@ -113,6 +115,65 @@ class YAMLConfigLoader:
             # 如果异步加载失败，回退到同步加载
             return cls(config_path)
 
+    @property
+    def config(self) -> Config:
+        return self._config
+
+    @config.setter
+    def config(self, config: Config) -> None:
+        """替换配置并原子地重建渠道索引"""
+        self._config = config
+        self._rebuild_channel_indexes()
+
+    @property
+    def model_cache(self) -> dict[str, dict]:
+        return self._model_cache
+
+    @model_cache.setter
+    def model_cache(self, model_cache: dict[str, dict]) -> None:
+        self._model_cache = model_cache
+        self._invalidate_cache_key_index()
+
+    def _rebuild_channel_indexes(self) -> None:
+        """构建 id→Channel 与启用渠道索引，整体替换保证读取方看到一致的快照"""
+        channels = self._config.channels
+        channels_map = {ch.id: ch for ch in channels}
+        enabled_channels = tuple(ch for ch in channels if ch.enabled)
+
+        self.channels_map = channels_map
+        self._enabled_channels = enabled_channels
+        self._config_generation = next(_generation_counter)
+
+    def _invalidate_cache_key_index(self) -> None:
+        """模型缓存变化后丢弃 渠道→缓存键 索引与合并视图"""
+        self._cache_key_index: Optional[tuple] = None
+        self._model_cache_generation = next(_generation_counter)
+
+    def _get_cache_key_index(self) -> tuple[dict[str, list[str]], dict[str, dict]]:
+        """
+        获取 渠道→缓存键 索引及合并视图缓存，必要时重建
+
+        条目数量变化（例如外部直接清空缓存）同样会触发重建
+        """
+        model_cache = self._model_cache
+        state = self._cache_key_index
+        if state is None or state[0] != len(model_cache):
+            channel_keys: dict[str, list[str]] = {}
+            for cache_key in model_cache:
+                channel_id, _ = self.api_key_cache_manager.parse_cache_key(cache_key)
+                channel_keys.setdefault(channel_id, []).append(cache_key)
+            state = (len(model_cache), channel_keys, {})
+            self._cache_key_index = state
+        return state[1], state[2]
+
+    def get_cache_generation(self) -> tuple[int, int, int]:
+        """返回 (配置代数, 模型缓存代数, 缓存条目数)，用于下游索引判断是否过期"""
+        return (
+            self._config_generation,
+            self._model_cache_generation,
+            len(self._model_cache),
+        )
+
     async def _load_model_cache_async(self) -> None:
         """异步加载模型缓存"""
         try:
@@ -440,11 +501,11 @@ class YAMLConfigLoader:
 
     def get_channels_by_model(self, model_name: str) -> list[Channel]:
         """根据模型名称获取渠道"""
-        return [ch for ch in self.get_enabled_channels() if ch.model_name == model_name]
+        return [ch for ch in self._enabled_channels if ch.model_name == model_name]
 
     def get_channels_by_tag(self, tag: str) -> list[Channel]:
         """根据标签获取渠道"""
-        return [ch for ch in self.get_enabled_channels() if tag in ch.tags]
+        return [ch for ch in self._enabled_channels if tag in ch.tags]
 
     def _build_memory_index(self) -> None:
         """构建内存索引（启动时预加载）"""
@@ -479,10 +540,47 @@ class YAMLConfigLoader:
                 f"{stats.memory_usage_mb:.1f}MB memory in {stats.build_time_ms:.1f}ms"
             )
 
+            self._schedule_capability_warmup(memory_index)
+
         except Exception as e:
             logger.error(f"MEMORY INDEX BUILD FAILED: {e}")
             # 不影响系统启动，继续运行
 
+    def _schedule_capability_warmup(self, memory_index: Any) -> None:
+        """后台预热本地模型的能力检测，结果写入内存索引（无事件循环时跳过）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        if self._capability_warmup_task and not self._capability_warmup_task.done():
+            return
+
+        from .utils.local_model_capabilities import get_capability_detector
+
+        detector = get_capability_detector()
+        targets = []
+        for channel in self._enabled_channels:
+            base_url = channel.base_url or ""
+            # 云端模型能力按提供商推断，无需探测
+            if not detector._is_local_provider(channel.provider, base_url):
+                continue
+            for model_name in memory_index.get_channel_models(channel.id):
+                targets.append(
+                    {
+                        "channel_id": channel.id,
+                        "model_name": model_name,
+                        "provider": channel.provider,
+                        "base_url": base_url,
+                        "api_key": channel.api_key,
+                    }
+                )
+
+        if targets:
+            self._capability_warmup_task = loop.create_task(
+                detector.warm_capabilities(targets, memory_index)
+            )
+
     def _needs_cache_migration(self, cache: dict[str, Any]) -> bool:
         """检查缓存是否需要迁移到API Key级别格式"""
         if not cache:
@@ -662,9 +760,8 @@ class YAMLConfigLoader:
     def get_model_cache_by_channel(self, channel_id: str) -> dict[str, Any]:
         """获取渠道下所有API Key的缓存（兼容性方法）"""
         # 查找该渠道的所有缓存条目
-        channel_cache_keys = self.api_key_cache_manager.find_cache_entries_by_channel(
-            self.model_cache, channel_id
-        )
+        channel_index, merged_views = self._get_cache_key_index()
+        channel_cache_keys = channel_index.get(channel_id)
 
         if not channel_cache_keys:
             # 尝试查找旧格式缓存
@@ -677,7 +774,11 @@ class YAMLConfigLoader:
         if len(channel_cache_keys) == 1:
             return self.model_cache[channel_cache_keys[0]]
 
-        # 多个API Key的情况，返回合并结果
+        # 多个API Key的情况，返回合并结果（缓存条目变化前复用）
+        merged_view = merged_views.get(channel_id)
+        if merged_view is not None:
+            return merged_view
+
         merged_models = []
         latest_status = "unknown"
         latest_update = None
@@ -695,7 +796,7 @@ class YAMLConfigLoader:
         # 去重并排序
         unique_models = sorted(set(merged_models))
 
-        return {
+        merged_view = {
             "channel_id": channel_id,
             "models": unique_models,
             "model_count": len(unique_models),
@@ -704,17 +805,16 @@ class YAMLConfigLoader:
             "merged_from_keys": len(channel_cache_keys),
             "note": f"Merged from {len(channel_cache_keys)} API keys",
         }
+        merged_views[channel_id] = merged_view
+        return merged_view
 
     def get_enabled_channels(self) -> list[Channel]:
-        """获取所有启用的渠道"""
-        return [ch for ch in self.config.channels if ch.enabled]
+        """获取所有启用的渠道（返回副本，调用方修改不影响共享索引）"""
+        return list(self._enabled_channels)
 
     def get_channel_by_id(self, channel_id: str) -> Optional[Channel]:
         """根据ID获取渠道"""
-        for channel in self.config.channels:
-            if channel.id == channel_id:
-                return channel
-        return None
+        return self.channels_map.get(channel_id)
 
     def update_model_cache(self, new_cache: dict[str, dict]) -> None:
         """更新模型缓存（支持API Key级别缓存）"""
@@ -727,6 +827,7 @@ class YAMLConfigLoader:
             self.model_cache.update(migrated_cache)
         else:
             self.model_cache.update(new_cache)
+        self._invalidate_cache_key_index()
 
         # 输出更新统计信息
         stats = self.api_key_cache_manager.get_cache_statistics(self.model_cache)
@@ -751,6 +852,7 @@ class YAMLConfigLoader:
         }
 
         self.model_cache[cache_key] = enhanced_cache_data
+        self._invalidate_cache_key_index()
         logger.info(
             f"Updated cache for channel '{channel_id}' with API key hash '{enhanced_cache_data['api_key_hash'][:8]}...'"
         )
@@ -766,16 +868,14 @@ class YAMLConfigLoader:
             )
             if cache_key in self.model_cache:
                 del self.model_cache[cache_key]
+                self._invalidate_cache_key_index()
                 logger.info(
                     f"Invalidated cache for channel '{channel_id}' with specific API key"
                 )
         else:
             # 清除该渠道所有API Key的缓存
-            channel_cache_keys = (
-                self.api_key_cache_manager.find_cache_entries_by_channel(
-                    self.model_cache, channel_id
-                )
-            )
+            channel_index, _ = self._get_cache_key_index()
+            channel_cache_keys = list(channel_index.get(channel_id, ()))
             for cache_key in channel_cache_keys:
                 if cache_key in self.model_cache:
                     del self.model_cache[cache_key]
@@ -783,6 +883,7 @@ class YAMLConfigLoader:
             # 同时清除可能存在的旧格式缓存
             if channel_id in self.model_cache:
                 del self.model_cache[channel_id]
+            self._invalidate_cache_key_index()
 
             logger.info(
                 f"Invalidated {len(channel_cache_keys)} cache entries for channel '{channel_id}'"
@@ -800,6 +901,9 @@ class YAMLConfigLoader:
             new_health = max(0.0, current_health * 0.9 - 0.1)
 
         self.runtime_state.health_scores[channel_id] = new_health
+        if health_band(new_health) != health_band(current_health):
+            # 健康档位变化：使基于旧健康状态的缓存路由失效
+            get_routing_generations().bump_health(channel_id)
 
         # 更新统计信息
         if channel_id not in self.runtime_state.channel_stats:
@@ -900,7 +1004,6 @@ class YAMLConfigLoader:
         refreshes the in-memory Pydantic config and maps.
         """
         try:
-
             import yaml as _yaml
 
             with open(self.config_path, encoding="utf-8") as f:
@@ -922,7 +1025,6 @@ class YAMLConfigLoader:
             # Save back and reload Pydantic config
             self._save_config_to_file(raw)
             self.config = self._load_and_validate_config()
-            self.channels_map = {ch.id: ch for ch in self.config.channels}
             logger.info(
                 f"Configuration updated: channel '{channel_id}' enabled={enabled}"
             )
@@ -954,7 +1056,6 @@ class YAMLConfigLoader:
 
             self._save_config_to_file(raw)
             self.config = self._load_and_validate_config()
-            self.channels_map = {ch.id: ch for ch in self.config.channels}
             logger.info(
                 f"Configuration updated: channel '{channel_id}' priority={priority}"
             )
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+SSE流解析性能基准 - 增量字节解析器 vs 逐块解码+字符串查找
+默认合成多MB的OpenAI风格流（每个事件带 "usage": null，末尾带usage），
+也可通过 --file 使用录制的原始流；按 8KB 分块模拟 aiter_bytes
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.utils.sse_parser import SSEParser
+
+USAGE = {"prompt_tokens": 1200, "completion_tokens": 50000, "total_tokens": 51200}
+
+
+def synthesize_stream(megabytes: float) -> bytes:
+    """生成指定大小的OpenAI风格流式响应"""
+    parts = []
+    size = 0
+    index = 0
+    while size < megabytes * 1024 * 1024:
+        event = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "delta": {"content": f"词元 token {index} "}}],
+            "usage": None,
+        }
+        part = b"data: " + json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n\n"
+        parts.append(part)
+        size += len(part)
+        index += 1
+    final = {"choices": [], "usage": USAGE}
+    parts.append(b"data: " + json.dumps(final).encode("utf-8") + b"\n\n")
+    parts.append(b"data: [DONE]\n\n")
+    return b"".join(parts)
+
+
+def split_chunks(data: bytes, chunk_size: int) -> list[bytes]:
+    return [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+def legacy_scan(chunks: list[bytes]):
+    """原有实现：每块解码为str后按行查找usage（此处按真实换行拆分；跨块的事件仍会丢失）"""
+    usage = None
+    for chunk in chunks:
+        chunk_str = chunk.decode("utf-8", errors="ignore")
+        if "data: " in chunk_str and '"usage"' in chunk_str:
+            for line in chunk_str.split("\n"):
+                if line.startswith("data: ") and line != "data: [DONE]":
+                    try:
+                        data = json.loads(line[6:])
+                        if data.get("usage"):
+                            usage = data["usage"]
+                    except json.JSONDecodeError:
+                        pass
+    return usage
+
+
+def parser_scan(chunks: list[bytes]):
+    """增量解析器：与 ChatCompletionHandler._inspect_stream_event 相同的过滤方式"""
+    usage = None
+    parser = SSEParser()
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            data = event.data
+            if (
+                b'"usage"' in data
+                and b'"usage":null' not in data
+                and b'"usage": null' not in data
+            ):
+                payload = event.json()
+                if isinstance(payload, dict) and payload.get("usage"):
+                    usage = payload["usage"]
+    return usage
+
+
+def timed(func, rounds: int) -> float:
+    """与 timeit 一致，计时期间关闭GC以减少抖动"""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        return (time.perf_counter() - start) / rounds * 1000
+    finally:
+        gc.enable()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE流解析性能基准")
+    parser.add_argument("--file", type=Path, help="录制的原始SSE流文件")
+    parser.add_argument("--mb", type=float, default=4.0, help="合成流的大小（MB）")
+    parser.add_argument("--chunk-size", type=int, default=8192, help="分块大小")
+    parser.add_argument("--rounds", type=int, default=5, help="重复次数")
+    args = parser.parse_args()
+
+    data = args.file.read_bytes() if args.file else synthesize_stream(args.mb)
+    chunks = split_chunks(data, args.chunk_size)
+    print(f"流大小: {len(data) / 1024 / 1024:.1f}MB, 分块: {len(chunks)}")
+
+    legacy_usage = legacy_scan(chunks)
+    parser_usage = parser_scan(chunks)
+    print(f"usage 识别: 旧实现={legacy_usage is not None}, 解析器={parser_usage is not None}")
+
+    legacy_ms = timed(lambda: legacy_scan(chunks), args.rounds)
+    parser_ms = timed(lambda: parser_scan(chunks), args.rounds)
+    throughput = len(data) / 1024 / 1024 / (parser_ms / 1000)
+    print(f"{'legacy ms':>12}{'parser ms':>12}{'x':>7}{'parser MB/s':>14}")
+    print(
+        f"{legacy_ms:>12.1f}{parser_ms:>12.1f}{legacy_ms / parser_ms:>7.2f}{throughput:>14.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
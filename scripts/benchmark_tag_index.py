@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+标签索引性能基准 - 位图posting list vs 集合交集
+模拟 3400 个模型 × 38 个渠道的目录，对比两种查询路径的耗时与内存
+"""
+
+import argparse
+import gc
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.utils.tag_bitmap import TagBitmapIndex
+
+FAMILIES = ["qwen", "gpt", "claude", "gemini", "llama", "deepseek", "glm", "mistral"]
+SIZES = ["1.5b", "7b", "8b", "14b", "32b", "70b", "235b"]
+FEATURES = ["chat", "instruct", "coder", "vision", "turbo", "mini", "pro", "preview"]
+
+QUERIES = [
+    (["free"], []),
+    (["chat"], []),
+    (["qwen"], []),
+    (["qwen", "free"], []),
+    (["chat", "free"], ["local"]),
+    (["qwen", "chat"], ["local", "preview"]),
+    (["free"], ["qwen", "gpt", "claude", "local"]),
+    (["gpt", "mini", "turbo"], []),
+]
+
+
+def build_catalog(models: int, channels: int, seed: int) -> dict[str, set]:
+    """生成 标签 -> {(channel_id, model_name)} 的posting list"""
+    rng = random.Random(seed)
+    postings: dict[str, set] = defaultdict(set)
+
+    for channel_index in range(channels):
+        channel_id = f"channel_{channel_index}"
+        channel_tags = ["free"] if channel_index % 3 == 0 else []
+        if channel_index % 5 == 0:
+            channel_tags.append("local")
+
+        for model_index in range(models):
+            family = FAMILIES[model_index % len(FAMILIES)]
+            model_name = f"{family}-{model_index}"
+            key = (channel_id, model_name)
+
+            tags = {family, rng.choice(SIZES), *rng.sample(FEATURES, 2), *channel_tags}
+            if rng.random() < 0.6:
+                tags.add("chat")
+            for tag in tags:
+                postings[tag].add(key)
+
+    return postings
+
+
+def set_query(postings: dict[str, set], include_tags, exclude_tags) -> list:
+    """原有的集合实现（与 MemoryModelIndex 旧版 find_models_by_tags 相同）"""
+    tag_sets = [postings.get(tag, set()) for tag in include_tags]
+    if not all(tag_sets):
+        return []
+
+    result_set = min(tag_sets, key=len)
+    for tag_set in tag_sets:
+        if tag_set is not result_set:
+            result_set = result_set.intersection(tag_set)
+            if not result_set:
+                break
+
+    if exclude_tags and result_set:
+        exclude_set = set()
+        for tag in exclude_tags:
+            exclude_set.update(postings.get(tag, set()))
+        result_set = result_set - exclude_set
+
+    return list(result_set)
+
+
+def bitmap_query(index: TagBitmapIndex, include_tags, exclude_tags) -> list:
+    return index.decode(index.query(include_tags, exclude_tags))
+
+
+def timed(func, rounds: int) -> float:
+    """与 timeit 一致，计时期间关闭GC以减少抖动"""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        return (time.perf_counter() - start) / rounds * 1000
+    finally:
+        gc.enable()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="标签索引性能基准")
+    parser.add_argument("--models", type=int, default=3400, help="每个渠道的模型数")
+    parser.add_argument("--channels", type=int, default=38, help="渠道数")
+    parser.add_argument("--rounds", type=int, default=20, help="每个查询的重复次数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"构建目录: {args.models} 模型 × {args.channels} 渠道 ...")
+    postings = build_catalog(args.models, args.channels, args.seed)
+    total = len({key for keys in postings.values() for key in keys})
+
+    start = time.perf_counter()
+    index = TagBitmapIndex.from_postings(postings)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    set_bytes = sum(sys.getsizeof(keys) for keys in postings.values())
+    print(
+        f"条目: {total}, 标签: {len(postings)}, 位图构建: {build_ms:.1f}ms, "
+        f"集合内存≈{set_bytes / 1024 / 1024:.1f}MB, 位图内存≈{index.memory_bytes() / 1024 / 1024:.2f}MB"
+    )
+    print()
+    print(f"{'include':<28}{'exclude':<32}{'hits':>8}{'set ms':>10}{'bitmap ms':>12}{'x':>7}")
+
+    for include_tags, exclude_tags in QUERIES:
+        expected = set(set_query(postings, include_tags, exclude_tags))
+        actual = bitmap_query(index, include_tags, exclude_tags)
+        assert set(actual) == expected and len(actual) == len(expected), "结果不一致"
+
+        set_ms = timed(
+            lambda inc=include_tags, exc=exclude_tags: set_query(postings, inc, exc),
+            args.rounds,
+        )
+        bitmap_ms = timed(
+            lambda inc=include_tags, exc=exclude_tags: bitmap_query(index, inc, exc),
+            args.rounds,
+        )
+        print(
+            f"{','.join(include_tags):<28}{','.join(exclude_tags) or '-':<32}"
+            f"{len(expected):>8}{set_ms:>10.2f}{bitmap_ms:>12.2f}{set_ms / bitmap_ms:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""被动健康追踪测试"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.utils.channel_health import PassiveHealthTracker
+except ImportError as e:
+    pytest.skip(f"Channel health module not available: {e}", allow_module_level=True)
+
+
+class TestPassiveHealthTracker:
+    """从真实流量结果判断渠道可用性"""
+
+    def test_unknown_until_traffic(self):
+        tracker = PassiveHealthTracker()
+        assert tracker.is_available("ch") is None
+        assert tracker.needs_probe("ch")
+
+        tracker.record_success("ch", ttfb=0.2)
+        assert tracker.is_available("ch") is True
+        assert not tracker.needs_probe("ch")
+        assert tracker.get_state("ch").ttfb_ewma == pytest.approx(0.2)
+
+    @pytest.mark.parametrize(
+        "status_code,available",
+        [(200, True), (400, True), (422, True), (429, True), (503, False)],
+    )
+    def test_status_classification(self, status_code, available):
+        tracker = PassiveHealthTracker(failure_threshold=1)
+        tracker.record_outcome("ch", status_code)
+        assert tracker.is_available("ch") is available
+
+    def test_single_transient_failure_keeps_channel_available(self):
+        tracker = PassiveHealthTracker()
+        tracker.record_failure("ch", error="read timeout")
+        assert tracker.is_available("ch") is True
+        tracker.record_failure("ch", error="read timeout")
+        tracker.record_failure("ch", error="read timeout")
+        assert tracker.is_available("ch") is False
+        tracker.record_success("ch")
+        assert tracker.is_available("ch") is True
+
+    def test_rate_limit_marks_throttled_not_unavailable(self):
+        tracker = PassiveHealthTracker(throttle_window=60.0)
+        for _ in range(5):
+            tracker.record_outcome("ch", 429)
+        assert tracker.is_available("ch") is True
+        assert tracker.is_throttled("ch")
+        assert not tracker.is_throttled("other")
+        assert tracker.get_state("ch").consecutive_failures == 0
+
+    def test_stale_state_becomes_unknown(self):
+        tracker = PassiveHealthTracker(stale_after=0.0, probe_interval=0.0)
+        tracker.record_failure("ch", status_code=500)
+        assert tracker.is_available("ch") is None
+        assert tracker.needs_probe("ch")
+
+    def test_background_probe_is_deduplicated(self):
+        tracker = PassiveHealthTracker()
+        calls = []
+
+        async def probe():
+            calls.append(1)
+            await asyncio.sleep(0)
+            return 200, None
+
+        async def run():
+            assert tracker.schedule_probe("ch", probe)
+            assert not tracker.schedule_probe("ch", probe)
+            await asyncio.gather(*tracker._probe_tasks.values())
+
+        asyncio.run(run())
+        assert len(calls) == 1
+        assert tracker.is_available("ch") is True
+        state = tracker.get_state("ch")
+        assert state.probe_count == 1 and state.last_traffic_at == 0.0
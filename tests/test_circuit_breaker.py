@@ -0,0 +1,234 @@
+"""熔断器状态转换测试"""
+
+import asyncio
+import contextlib
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import httpx
+
+    import core.handlers.chat_handler as chat_handler_module
+    from core.config_models import CircuitBreakerConfig
+    from core.utils.circuit_breaker import (
+        CircuitBreaker,
+        CircuitBreakerRegistry,
+        CircuitState,
+    )
+except ImportError as e:
+    pytest.skip(f"Circuit breaker module not available: {e}", allow_module_level=True)
+
+
+class TestCircuitBreaker:
+    """关闭 -> 打开 -> 半开 -> 关闭"""
+
+    def test_consecutive_failures_open_circuit(self):
+        breaker = CircuitBreaker(consecutive_failure_threshold=3, open_timeout=10)
+        assert breaker.record(True, now=0) is None
+        assert breaker.record(True, now=1) is None
+        assert breaker.record(True, now=2) is CircuitState.OPEN
+        assert not breaker.can_attempt(now=5)
+        assert not breaker.allow_request(now=5)
+
+    def test_failure_rate_window(self):
+        breaker = CircuitBreaker(
+            window_size=10,
+            min_requests=4,
+            failure_rate_threshold=0.5,
+            consecutive_failure_threshold=100,
+        )
+        for failed in (False, True, False):
+            assert breaker.record(failed, now=0) is None
+        # 4次中2次失败，达到50%阈值
+        assert breaker.record(True, now=0) is CircuitState.OPEN
+
+    def test_half_open_trickle_and_recovery(self):
+        breaker = CircuitBreaker(
+            consecutive_failure_threshold=1,
+            open_timeout=10,
+            half_open_max_calls=1,
+            half_open_success_threshold=2,
+        )
+        breaker.record(True, now=0)
+
+        # 冷却结束后只放行一个试探请求
+        assert breaker.can_attempt(now=11)
+        assert breaker.allow_request(now=11)
+        assert breaker.state is CircuitState.HALF_OPEN
+        assert not breaker.allow_request(now=11)
+        assert not breaker.can_attempt(now=11)
+
+        assert breaker.record(False, now=12) is None
+        assert breaker.allow_request(now=12)
+        assert breaker.record(False, now=13) is CircuitState.CLOSED
+        assert breaker.allow_request(now=13)
+
+    def test_half_open_failure_doubles_timeout(self):
+        breaker = CircuitBreaker(consecutive_failure_threshold=1, open_timeout=10)
+        breaker.record(True, now=0)
+        assert breaker.allow_request(now=10)
+        assert breaker.record(True, now=10) is CircuitState.OPEN
+        assert not breaker.can_attempt(now=29)
+        assert breaker.can_attempt(now=30)
+
+    def test_unreported_trial_slot_is_reclaimed(self):
+        breaker = CircuitBreaker(
+            consecutive_failure_threshold=1, open_timeout=10, trial_timeout=60
+        )
+        breaker.record(True, now=0)
+        assert breaker.allow_request(now=10)
+        assert not breaker.allow_request(now=30)
+        assert breaker.allow_request(now=71)
+
+    def test_release_trial_returns_slot(self):
+        breaker = CircuitBreaker(consecutive_failure_threshold=1, open_timeout=10)
+        breaker.release_trial()  # 关闭状态下无操作
+        breaker.record(True, now=0)
+        assert breaker.allow_request(now=10)
+        assert not breaker.can_attempt(now=11)
+        breaker.release_trial()
+        assert breaker.state is CircuitState.HALF_OPEN
+        assert breaker.allow_request(now=11)
+
+
+class TestCircuitBreakerRegistry:
+    """按 (渠道, 模型) 隔离，请求级错误不计为失败"""
+
+    def test_per_channel_model_isolation(self):
+        registry = CircuitBreakerRegistry(
+            CircuitBreakerConfig(consecutive_failure_threshold=2)
+        )
+        for _ in range(2):
+            registry.record_outcome("ch1", "model-a", 503)
+        assert not registry.can_attempt("ch1", "model-a")
+        assert not registry.allow_request("ch1", "model-a")
+        assert registry.can_attempt("ch1", "model-b")
+        assert registry.can_attempt("ch2", "model-a")
+
+    def test_request_errors_and_disabled(self):
+        registry = CircuitBreakerRegistry(
+            CircuitBreakerConfig(consecutive_failure_threshold=1)
+        )
+        registry.record_outcome("ch", "m", 400)
+        assert registry.get_state("ch", "m") is CircuitState.CLOSED
+        registry.record_outcome("ch", "m", None)
+        assert registry.get_state("ch", "m") is CircuitState.OPEN
+
+        registry.configure(
+            CircuitBreakerConfig(enabled=False, consecutive_failure_threshold=1)
+        )
+        assert registry.can_attempt("ch", "m")
+
+
+class TestChannelCallOutcome:
+    """一次上游调用只记录一个结果"""
+
+    def test_body_read_failure_recorded_once(self, monkeypatch):
+        class Response:
+            status_code = 200
+            headers = httpx.Headers()
+
+            async def aread(self):
+                raise httpx.ReadTimeout("body timed out")
+
+        class Pool:
+            @contextlib.asynccontextmanager
+            async def stream(self, *args, **kwargs):
+                yield Response()
+
+        monkeypatch.setattr(chat_handler_module, "get_http_pool", lambda: Pool())
+        handler = chat_handler_module.ChatCompletionHandler.__new__(
+            chat_handler_module.ChatCompletionHandler
+        )
+        outcomes = []
+        handler._record_channel_outcome = lambda *args, **kwargs: outcomes.append(
+            args[2]
+        )
+
+        with pytest.raises(httpx.ReadTimeout):
+            asyncio.run(handler._call_channel_api("u", {}, {}, "c1", "m"))
+        assert outcomes == [None]
+
+
+@pytest.fixture
+def half_open_registry(monkeypatch):
+    """冷却已结束、下一次请求将成为半开试探的熔断器"""
+    registry = CircuitBreakerRegistry(
+        CircuitBreakerConfig(consecutive_failure_threshold=1, open_timeout=0.0)
+    )
+    registry.record_outcome("cb-ch", "m", 503)
+    monkeypatch.setattr(chat_handler_module, "get_circuit_breakers", lambda: registry)
+    return registry
+
+
+class TestHalfOpenTrialSlot:
+    """未发出或被取消的请求不占用半开试探名额"""
+
+    def test_rate_limit_skip_keeps_trial_slot(self, half_open_registry, monkeypatch):
+        limiter = SimpleNamespace(
+            estimate_wait=lambda channel, tokens: 0.0,
+            reserve=lambda channel, tokens, max_wait=0: None,
+        )
+        permit = SimpleNamespace(release=lambda: None)
+        monkeypatch.setattr(chat_handler_module, "get_rate_limiter", lambda: limiter)
+        monkeypatch.setattr(
+            chat_handler_module,
+            "get_concurrency_limiter",
+            lambda: SimpleNamespace(try_acquire=lambda channel_id: permit),
+        )
+        monkeypatch.setattr(
+            chat_handler_module,
+            "get_api_key_pool",
+            lambda: SimpleNamespace(select=lambda channel, tokens: channel),
+        )
+        handler = chat_handler_module.ChatCompletionHandler.__new__(
+            chat_handler_module.ChatCompletionHandler
+        )
+        handler.config = SimpleNamespace(get_provider=lambda name: SimpleNamespace())
+        request = chat_handler_module.ChatCompletionRequest(
+            model="m", messages=[{"role": "user", "content": "hi"}]
+        )
+        candidate = SimpleNamespace(
+            channel=SimpleNamespace(id="cb-ch", provider="p", model_name="m"),
+            matched_model="m",
+        )
+
+        # 限流额度不足跳过该渠道：试探名额仍可被其他请求使用
+        assert (
+            handler._select_hedge_candidate(request, [candidate], "other", set())
+            is None
+        )
+        assert half_open_registry.allow_request("cb-ch", "m")
+
+    def test_cancelled_call_releases_trial_slot(self, half_open_registry, monkeypatch):
+        class Pool:
+            @contextlib.asynccontextmanager
+            async def stream(self, *args, **kwargs):
+                await asyncio.sleep(10)
+                yield None
+
+        monkeypatch.setattr(chat_handler_module, "get_http_pool", lambda: Pool())
+        handler = chat_handler_module.ChatCompletionHandler.__new__(
+            chat_handler_module.ChatCompletionHandler
+        )
+
+        async def main():
+            assert half_open_registry.allow_request("cb-ch", "m")
+            call = asyncio.ensure_future(
+                handler._call_channel_api("u", {}, {}, "cb-ch", "m")
+            )
+            await asyncio.sleep(0.01)
+            assert not half_open_registry.can_attempt("cb-ch", "m")
+            call.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+
+        asyncio.run(main())
+        assert half_open_registry.allow_request("cb-ch", "m")
@@ -0,0 +1,103 @@
+"""客户端断开处理测试（取消上游请求、关闭流式生成器、节省token统计）"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.config_models import ClientDisconnectConfig
+    from core.utils.client_disconnect import (
+        ClientDisconnected,
+        DisconnectAwareStreamingResponse,
+        DisconnectMonitor,
+    )
+except ImportError as e:
+    pytest.skip(f"Client disconnect module not available: {e}", allow_module_level=True)
+
+
+class FakeRequest:
+    """第 disconnect_after 次检查时报告断开"""
+
+    def __init__(self, disconnect_after: int):
+        self.checks = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self) -> bool:
+        self.checks += 1
+        return self.checks >= self.disconnect_after
+
+
+def monitor() -> DisconnectMonitor:
+    return DisconnectMonitor(ClientDisconnectConfig(poll_interval=0.01))
+
+
+class TestDisconnectMonitor:
+    def test_result_returned_while_connected(self):
+        async def upstream():
+            await asyncio.sleep(0.03)
+            return "ok"
+
+        request = FakeRequest(disconnect_after=1000)
+        assert asyncio.run(monitor().run(upstream(), request)) == "ok"
+        assert request.checks >= 1
+
+    def test_disconnect_cancels_upstream(self):
+        state = {}
+
+        async def upstream():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                state["cancelled"] = True
+                raise
+
+        with pytest.raises(ClientDisconnected):
+            asyncio.run(monitor().run(upstream(), FakeRequest(disconnect_after=2)))
+        assert state == {"cancelled": True}
+
+    def test_record_cancelled_counts_saved_tokens(self):
+        disconnect_monitor = DisconnectMonitor(
+            ClientDisconnectConfig(default_completion_tokens=500)
+        )
+        assert disconnect_monitor.record_cancelled(True, 100, 30, max_tokens=200) == 170
+        assert disconnect_monitor.record_cancelled(False, 50, 0) == 500
+        stats = disconnect_monitor.get_stats()
+        assert stats["cancelled_streams"] == 1
+        assert stats["cancelled_requests"] == 1
+        assert stats["prompt_tokens"] == 150
+        assert stats["completion_tokens"] == 30
+        assert stats["completion_tokens_saved"] == 670
+
+
+class TestDisconnectAwareStreamingResponse:
+    def test_generator_closed_when_client_disconnects(self):
+        state = {"sent": 0}
+
+        async def body():
+            try:
+                while True:
+                    yield b"data: {}\n\n"
+                    await asyncio.sleep(0.01)
+            finally:
+                state["closed"] = True
+
+        async def receive():
+            await asyncio.sleep(0.05)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            state["sent"] += 1
+
+        async def main():
+            response = DisconnectAwareStreamingResponse(body())
+            await response({"type": "http"}, receive, send)
+
+        asyncio.run(main())
+        assert state["closed"] is True
+        assert state["sent"] > 1
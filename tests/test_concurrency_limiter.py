@@ -0,0 +1,95 @@
+"""自适应并发限制（AIMD）测试"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.config_models import ConcurrencyConfig
+    from core.utils.concurrency_limiter import AdaptiveConcurrencyLimiter
+except ImportError as e:
+    pytest.skip(
+        f"Concurrency limiter module not available: {e}", allow_module_level=True
+    )
+
+
+def make_limiter(**overrides) -> AdaptiveConcurrencyLimiter:
+    settings = {"initial_limit": 2, "decrease_cooldown": 0.0, **overrides}
+    return AdaptiveConcurrencyLimiter(ConcurrencyConfig(**settings))
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """名额占用、溢出与 AIMD 调整"""
+
+    def test_saturated_channel_rejects_without_waiting(self):
+        limiter = make_limiter()
+        first = limiter.try_acquire("ch1")
+        second = limiter.try_acquire("ch1")
+        assert first is not None and second is not None
+        assert limiter.try_acquire("ch1") is None
+        # 其他渠道不受影响
+        assert limiter.try_acquire("ch2") is not None
+
+        first.release()
+        first.release()  # 重复释放无副作用
+        assert limiter.get_channel_status("ch1")["in_flight"] == 1
+        assert limiter.try_acquire("ch1") is not None
+
+    def test_overload_status_halves_limit(self):
+        limiter = make_limiter(initial_limit=8)
+        limiter.on_outcome("ch1", 429, None)
+        assert limiter.get_channel_status("ch1")["limit"] == 4
+        limiter.on_outcome("ch1", 503, None)
+        assert limiter.get_channel_status("ch1")["limit"] == 2
+
+    def test_cooldown_collapses_burst_of_429s(self):
+        limiter = make_limiter(initial_limit=8, decrease_cooldown=60.0)
+        for _ in range(5):
+            limiter.on_outcome("ch1", 429, None)
+        assert limiter.get_channel_status("ch1")["limit"] == 4
+
+    def test_limit_grows_only_when_used(self):
+        limiter = make_limiter(initial_limit=2)
+        # 空闲渠道的成功不增加上限
+        for _ in range(10):
+            limiter.on_outcome("ch1", 200, 0.1)
+        assert limiter.get_channel_status("ch1")["limit"] == 2
+
+        permits = [limiter.try_acquire("ch1"), limiter.try_acquire("ch1")]
+        for _ in range(10):
+            limiter.on_outcome("ch1", 200, 0.1)
+        assert limiter.get_channel_status("ch1")["limit"] > 2
+        for permit in permits:
+            permit.release()
+
+    def test_sustained_latency_increase_decreases_limit(self):
+        limiter = make_limiter(initial_limit=10)
+        for _ in range(30):
+            limiter.on_outcome("ch1", 200, 0.5)
+        # 单次慢请求不触发
+        limiter.on_outcome("ch1", 200, 5.0)
+        assert limiter.get_channel_status("ch1")["limit"] == 10
+        for _ in range(5):
+            limiter.on_outcome("ch1", 200, 5.0)
+        assert limiter.get_channel_status("ch1")["limit"] < 10
+
+    def test_ttfb_variance_does_not_collapse_limit(self):
+        """TTFB 随提示词长度在 0.3-3s 间波动是常态，不应被当作过载"""
+        limiter = make_limiter(initial_limit=10)
+        rng = random.Random(13)
+        for _ in range(300):
+            limiter.on_outcome("ch1", 200, rng.uniform(0.3, 3.0))
+        status = limiter.get_channel_status("ch1")
+        assert status["decreases"] == 0
+        assert status["limit"] == 10
+
+    def test_disabled_limiter_never_rejects(self):
+        limiter = make_limiter(enabled=False, initial_limit=1)
+        assert limiter.try_acquire("ch1") is not None
+        assert limiter.try_acquire("ch1") is not None
@@ -0,0 +1,121 @@
+"""延迟分布草图测试"""
+
+import asyncio
+import contextlib
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import httpx
+
+    import core.handlers.chat_handler as chat_handler_module
+    from core.utils.latency_sketch import (
+        ALL_MODELS,
+        LatencyTracker,
+        QuantileSketch,
+        get_latency_tracker,
+    )
+except ImportError as e:
+    pytest.skip(f"Latency sketch module not available: {e}", allow_module_level=True)
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class TestQuantileSketch:
+    """分位数精度、合并与时间衰减"""
+
+    def test_relative_accuracy(self):
+        rng = random.Random(7)
+        values = [rng.lognormvariate(0, 1) for _ in range(5000)]
+        sketch = QuantileSketch(relative_accuracy=0.02, half_life=0)
+        for value in values:
+            sketch.add(value, now=0.0)
+        for q in (0.5, 0.95, 0.99):
+            expected = exact_quantile(values, q)
+            assert sketch.quantile(q) == pytest.approx(expected, rel=0.05)
+
+    def test_bucket_count_is_bounded(self):
+        sketch = QuantileSketch(max_buckets=32, half_life=0)
+        for exponent in range(-300, 300):
+            sketch.add(1.05**exponent, now=0.0)
+        assert len(sketch.buckets) <= 32
+        # 合并只影响低分位
+        assert sketch.quantile(0.99) == pytest.approx(1.05**294, rel=0.05)
+
+    def test_merge_matches_combined(self):
+        left = QuantileSketch(half_life=0)
+        right = QuantileSketch(half_life=0)
+        combined = QuantileSketch(half_life=0)
+        for value in range(1, 101):
+            (left if value % 2 else right).add(value / 10, now=0.0)
+            combined.add(value / 10, now=0.0)
+        left.merge(right)
+        assert left.count == combined.count
+        assert left.quantile(0.95) == combined.quantile(0.95)
+
+    def test_old_samples_decay(self):
+        sketch = QuantileSketch(half_life=10.0)
+        for _ in range(100):
+            sketch.add(5.0, now=0.0)
+        for _ in range(10):
+            sketch.add(0.5, now=100.0)
+        # 10个半衰期后旧样本权重约为1/1024，中位数由新样本决定
+        assert sketch.quantile(0.5) == pytest.approx(0.5, rel=0.05)
+        assert sketch.decayed_count(now=100.0) == pytest.approx(10.1, rel=0.01)
+
+
+class TestLatencyTracker:
+    def test_model_falls_back_to_channel_summary(self):
+        tracker = LatencyTracker(min_samples=3)
+        for ttfb in (0.2, 0.3, 0.4):
+            tracker.record("ch1", "model-a", ttfb=ttfb, total=ttfb * 5)
+        assert tracker.quantile("ch1", "model-a", 0.5) == pytest.approx(0.3, rel=0.05)
+        # 样本不足的模型回退到渠道级汇总
+        assert tracker.quantile("ch1", "model-b", 0.5) == pytest.approx(0.3, rel=0.05)
+        assert tracker.quantile("ch2", None, 0.5) is None
+
+        summary = tracker.get_channel_summary("ch1")
+        assert set(summary) == {"model-a", ALL_MODELS}
+        assert summary["model-a"]["total"]["p99"] == pytest.approx(2.0, rel=0.05)
+
+
+class TestNonStreamingLatency:
+    def test_non_streaming_call_records_total_only(self, monkeypatch):
+        """非流式的响应头时间约等于整个生成耗时，不能混入流式首字节分布"""
+
+        class Response:
+            status_code = 200
+            headers = httpx.Headers()
+
+            async def aread(self):
+                return b"{}"
+
+            def json(self):
+                return {}
+
+        class Pool:
+            @contextlib.asynccontextmanager
+            async def stream(self, *args, **kwargs):
+                yield Response()
+
+        monkeypatch.setattr(chat_handler_module, "get_http_pool", lambda: Pool())
+        handler = chat_handler_module.ChatCompletionHandler.__new__(
+            chat_handler_module.ChatCompletionHandler
+        )
+        handler._record_channel_outcome = lambda *args, **kwargs: False
+
+        for _ in range(get_latency_tracker().min_samples):
+            asyncio.run(handler._call_channel_api("u", {}, {}, "latency-ns", "m"))
+        tracker = get_latency_tracker()
+        assert tracker.quantile("latency-ns", "m", 0.5, metric="total") is not None
+        assert tracker.quantile("latency-ns", "m", 0.5) is None
@@ -0,0 +1,68 @@
+"""近似等价候选的负载分摊（二选一）测试"""
+
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.config_models import LoadBalancingConfig
+    from core.router.load_balancing import LoadBalancer, equivalent_group_size
+    from core.utils.concurrency_limiter import get_concurrency_limiter
+except ImportError as e:
+    pytest.skip(f"Load balancing module not available: {e}", allow_module_level=True)
+
+
+def make_score(channel_id, total_score):
+    return SimpleNamespace(
+        channel=SimpleNamespace(id=channel_id, name=channel_id),
+        total_score=total_score,
+        matched_model=None,
+    )
+
+
+class TestLoadBalancer:
+    def test_group_is_leading_run_within_epsilon(self):
+        scores = [make_score(f"lb-{i}", s) for i, s in enumerate([0.9, 0.89, 0.8])]
+        assert equivalent_group_size(scores, epsilon=0.02, max_size=6) == 2
+        assert equivalent_group_size(scores, epsilon=0.2, max_size=2) == 2
+        assert equivalent_group_size([], epsilon=0.02, max_size=6) == 0
+
+    def test_traffic_spreads_across_group(self):
+        balancer = LoadBalancer(LoadBalancingConfig(), rng=random.Random(1))
+        picks = Counter()
+        for _ in range(300):
+            scores = [make_score(f"lb-spread-{i}", 0.9) for i in range(3)]
+            scores.append(make_score("lb-spread-worse", 0.5))
+            group_size = balancer.group_size(scores)
+            assert group_size == 3
+            ranked = balancer.spread(scores, group_size)
+            picks[ranked[0].channel.id] += 1
+            # 组外候选保持在最后
+            assert ranked[-1].channel.id == "lb-spread-worse"
+        assert set(picks) == {"lb-spread-0", "lb-spread-1", "lb-spread-2"}
+
+    def test_prefers_less_loaded_channel(self):
+        limiter = get_concurrency_limiter()
+        permits = [limiter.try_acquire("lb-busy") for _ in range(3)]
+        try:
+            balancer = LoadBalancer(LoadBalancingConfig(), rng=random.Random(2))
+            for _ in range(20):
+                scores = [make_score("lb-busy", 0.9), make_score("lb-idle", 0.9)]
+                ranked = balancer.spread(scores, 2)
+                assert ranked[0].channel.id == "lb-idle"
+        finally:
+            for permit in permits:
+                permit.release()
+
+    def test_disabled_keeps_single_primary(self):
+        balancer = LoadBalancer(LoadBalancingConfig(enabled=False))
+        scores = [make_score("lb-a", 0.9), make_score("lb-b", 0.9)]
+        assert balancer.group_size(scores) == 1
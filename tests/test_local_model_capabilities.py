@@ -0,0 +1,120 @@
+"""本地模型能力检测测试（并发请求共享探测与负缓存过期）"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import core.utils.local_model_capabilities as capabilities_module
+    from core.utils.local_model_capabilities import LocalModelCapabilityDetector
+except ImportError as e:
+    pytest.skip(f"Capability detector not available: {e}", allow_module_level=True)
+
+LOCAL_URL = "http://localhost:11434"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """替换进程内缓存使用的时钟，并禁用持久化缓存"""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        capabilities_module, "time", SimpleNamespace(time=lambda: clock.now)
+    )
+
+    async def cache_get(cache_type, key):
+        return None
+
+    async def cache_set(cache_type, key, value):
+        return None
+
+    monkeypatch.setattr(capabilities_module, "cache_get", cache_get)
+    monkeypatch.setattr(capabilities_module, "cache_set", cache_set)
+    return clock
+
+
+def detector(supported, negative_cache_ttl=60):
+    """构造探测结果固定的检测器，记录每项探测的调用次数"""
+    detector = LocalModelCapabilityDetector(
+        cache_ttl=3600, negative_cache_ttl=negative_cache_ttl
+    )
+    detector.probes = []
+
+    def probe(name, result):
+        async def run(base_url, api_key, model_name):
+            detector.probes.append((name, model_name))
+            await asyncio.sleep(0.01)
+            return result
+
+        return run
+
+    detector._test_vision_capability = probe("vision", supported)
+    detector._test_function_calling_capability = probe("function_calling", supported)
+    detector._test_basic_capabilities = probe("basic", {})
+    return detector
+
+
+def detect(detector, model_name="qwen3:8b"):
+    return detector.detect_model_capabilities(model_name, "ollama", LOCAL_URL, "")
+
+
+class TestCapabilityDetection:
+    def test_concurrent_detections_share_one_probe(self, clock):
+        local = detector(supported=True)
+
+        async def main():
+            return await asyncio.gather(*(detect(local) for _ in range(5)))
+
+        results = asyncio.run(main())
+        assert all(result is results[0] for result in results)
+        assert results[0].supports_vision and results[0].supports_function_calling
+        assert sorted(name for name, _ in local.probes) == [
+            "basic",
+            "function_calling",
+            "vision",
+        ]
+        assert local._inflight == {}
+
+    def test_different_models_probe_separately(self, clock):
+        local = detector(supported=True)
+
+        async def main():
+            await asyncio.gather(detect(local, "a"), detect(local, "b"))
+
+        asyncio.run(main())
+        assert {model for _, model in local.probes} == {"a", "b"}
+        assert len(local.probes) == 6
+
+    def test_negative_result_expires_after_negative_ttl(self, clock):
+        local = detector(supported=False, negative_cache_ttl=60)
+
+        capabilities = asyncio.run(detect(local))
+        assert not capabilities.supports_vision
+        assert local.get_cache_ttl(capabilities) == 60
+        assert local.get_cached_capabilities("qwen3:8b", "ollama", LOCAL_URL)
+
+        # 负缓存有效期内不再探测
+        clock.now += 59
+        asyncio.run(detect(local))
+        assert len(local.probes) == 3
+
+        clock.now += 2
+        assert local.get_cached_capabilities("qwen3:8b", "ollama", LOCAL_URL) is None
+        asyncio.run(detect(local))
+        assert len(local.probes) == 6
+
+    def test_positive_result_uses_full_ttl(self, clock):
+        local = detector(supported=True, negative_cache_ttl=60)
+
+        capabilities = asyncio.run(detect(local))
+        assert local.get_cache_ttl(capabilities) == 3600
+
+        clock.now += 61
+        asyncio.run(detect(local))
+        assert len(local.probes) == 3
@@ -0,0 +1,133 @@
+"""路由标签倒排索引测试 - 与逐个扫描模型的匹配结果一致"""
+
+import random
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.services.tag_processor import (
+        extract_tags_from_model_name,
+        extract_tags_with_aliases,
+    )
+    from core.utils.memory_index import MemoryModelIndex
+except ImportError as e:
+    pytest.skip(f"Memory index modules not available: {e}", allow_module_level=True)
+
+VENDORS = ["openai", "qwen", "meta-llama", "deepseek"]
+FAMILIES = ["gpt-4o", "qwen3", "llama-3.1", "deepseek-chat"]
+SIZES = ["8b", "70b", "mini", "32b"]
+
+
+def _channel(channel_id, tags=()):
+    return SimpleNamespace(id=channel_id, tags=list(tags), model_aliases=None)
+
+
+def _random_cache(seed):
+    """随机生成多渠道模型缓存，部分渠道带多个API Key条目"""
+    rng = random.Random(seed)
+    channels = [
+        _channel(f"mi-{i}", rng.sample(["free", "local", "fast"], rng.randint(0, 2)))
+        for i in range(6)
+    ]
+    model_cache = {}
+    for channel in channels:
+        models = sorted(
+            {
+                f"{rng.choice(VENDORS)}/{rng.choice(FAMILIES)}-{rng.choice(SIZES)}"
+                + rng.choice(["", ":free"])
+                for _ in range(12)
+            }
+        )
+        model_cache[channel.id] = {"models": models}
+        if rng.random() < 0.5:
+            # API Key级别缓存键（渠道ID + 8位哈希），内容重复只应索引一次
+            model_cache[f"{channel.id}_0a1b2c3d"] = {"models": models[:4]}
+    return channels, model_cache
+
+
+def _scan(channels, model_cache, include_tags, exclude_tags):
+    """逐个扫描：索引替代前的匹配语义"""
+    channel_map = {channel.id: channel for channel in channels}
+    seen = set()
+    matches = []
+    for cache_key, cache_data in model_cache.items():
+        channel = channel_map[cache_key.split("_")[0]]
+        for model_name in cache_data["models"]:
+            if (channel.id, model_name) in seen:
+                continue
+            seen.add((channel.id, model_name))
+            tags = {
+                tag.lower() for tag in extract_tags_with_aliases(model_name, channel)
+            }
+            tags |= {tag.lower() for tag in channel.tags}
+            if all(tag in tags for tag in include_tags) and not any(
+                tag in tags for tag in exclude_tags
+            ):
+                matches.append((channel.id, model_name, model_name))
+    return matches
+
+
+class TestRoutingIndex:
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    @pytest.mark.parametrize(
+        "include_tags,exclude_tags",
+        [
+            (["qwen3"], []),
+            (["free"], ["local"]),
+            (["8b", "free"], []),
+            ([], ["free"]),
+            (["missing-tag"], []),
+        ],
+    )
+    def test_matches_linear_scan(self, seed, include_tags, exclude_tags):
+        channels, model_cache = _random_cache(seed)
+        index = MemoryModelIndex()
+        index.build_routing_index(model_cache, channels, signature=("s", seed))
+
+        assert index.find_routing_models(include_tags, exclude_tags) == _scan(
+            channels, model_cache, include_tags, exclude_tags
+        )
+
+    def test_model_id_and_unknown_channels(self):
+        channels = [_channel("mi-a", ["free"])]
+        model_cache = {
+            "mi-a": {
+                "models": ["qwen/qwen3-8b"],
+                "models_data": {"qwen/qwen3-8b": {"id": "Qwen/Qwen3-8B"}},
+            },
+            # 未配置的渠道不进入索引
+            "mi-gone": {"models": ["qwen/qwen3-8b"]},
+        }
+        index = MemoryModelIndex()
+        assert index.build_routing_index(model_cache, channels, ("v", 1)) == 1
+        assert index.find_routing_models(["qwen3", "free"]) == [
+            ("mi-a", "qwen/qwen3-8b", "Qwen/Qwen3-8B")
+        ]
+
+    def test_signature_tracks_rebuilds(self):
+        channels, model_cache = _random_cache(4)
+        index = MemoryModelIndex()
+        assert not index.is_routing_index_current(("v", 1))
+        index.build_routing_index(model_cache, channels, ("v", 1))
+        assert index.is_routing_index_current(("v", 1))
+        assert not index.is_routing_index_current(("v", 2))
+
+    def test_segments_return_first_match_per_channel(self):
+        channels = [_channel("mi-a"), _channel("mi-b")]
+        model_cache = {
+            "mi-a": {"models": ["qwen/qwen3-8b", "qwen/qwen3-32b"]},
+            "mi-b": {"models": ["openai/gpt-4o"]},
+        }
+        index = MemoryModelIndex()
+        index.build_routing_index(model_cache, channels)
+        assert "qwen3" in extract_tags_from_model_name("qwen/qwen3-32b")
+        assert index.find_routing_models_by_segments(["qwen3"]) == [
+            ("mi-a", "qwen/qwen3-8b", "qwen/qwen3-8b")
+        ]
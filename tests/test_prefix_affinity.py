@@ -0,0 +1,146 @@
+"""前缀亲和路由测试"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import core.json_router as json_router_module
+    from core.config_models import PrefixAffinityConfig
+    from core.json_router import JSONRouter
+    from core.router.load_balancing import LoadBalancer
+    from core.router.prefix_affinity import PrefixAffinity, cached_prompt_tokens
+    from core.router.query_plan import compile_query_plan
+    from core.router.types import RoutingRequest
+    from core.utils.request_cache import RequestFingerprint, RequestModelCache
+except ImportError as e:
+    pytest.skip(f"Prefix affinity module not available: {e}", allow_module_level=True)
+
+SYSTEM = "You are a meticulous reviewer. " * 200
+
+
+def make_score(channel_id, total_score):
+    return SimpleNamespace(
+        channel=SimpleNamespace(id=channel_id, name=channel_id),
+        total_score=total_score,
+    )
+
+
+def conversation(turns):
+    messages = [{"role": "system", "content": SYSTEM}]
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"question {turn}"})
+        messages.append({"role": "assistant", "content": f"answer {turn}"})
+    return messages[:-1]
+
+
+class TestPrefixAffinity:
+    def test_key_is_stable_across_turns(self):
+        affinity = PrefixAffinity(PrefixAffinityConfig())
+        first = affinity.prefix_key(conversation(1))
+        assert first is not None
+        assert affinity.prefix_key(conversation(3)) == first
+        other = [{"role": "system", "content": SYSTEM + "!"}] + conversation(1)[1:]
+        assert affinity.prefix_key(other) != first
+        # 短提示词低于上游缓存阈值，不参与亲和
+        assert affinity.prefix_key([{"role": "user", "content": "hi"}]) is None
+
+    def test_prefers_affine_channel_within_tolerance(self):
+        affinity = PrefixAffinity(PrefixAffinityConfig(score_tolerance=0.05))
+        key = affinity.prefix_key(conversation(1))
+        affinity.record_success(key, "pa-b")
+
+        scores = [make_score("pa-a", 0.90), make_score("pa-b", 0.87)]
+        assert affinity.apply(scores, key)[0].channel.id == "pa-b"
+
+        scores = [make_score("pa-a", 0.90), make_score("pa-b", 0.70)]
+        assert affinity.apply(scores, key)[0].channel.id == "pa-a"
+        stats = affinity.get_stats()
+        assert (stats["affinity_hits"], stats["out_of_tolerance"]) == (1, 1)
+
+    def test_table_is_bounded(self):
+        affinity = PrefixAffinity(PrefixAffinityConfig(max_entries=2))
+        for index in range(3):
+            affinity.record_success(f"key-{index}", "pa-a")
+        assert affinity.get_stats()["entries"] == 2
+        scores = [make_score("pa-b", 0.9), make_score("pa-a", 0.9)]
+        assert affinity.apply(scores, "key-0")[0].channel.id == "pa-b"
+
+    def test_cached_token_ratio(self):
+        assert cached_prompt_tokens(
+            {"prompt_tokens": 100, "prompt_tokens_details": {"cached_tokens": 80}}
+        ) == (100, 80)
+        assert cached_prompt_tokens(
+            {"prompt_tokens": 100, "prompt_cache_hit_tokens": 64}
+        ) == (100, 64)
+        assert cached_prompt_tokens(
+            {
+                "input_tokens": 10,
+                "cache_read_input_tokens": 70,
+                "cache_creation_input_tokens": 20,
+            }
+        ) == (100, 70)
+
+        affinity = PrefixAffinity(PrefixAffinityConfig())
+        affinity.record_success(None, "pa-a", {"prompt_tokens": 100})
+        affinity.record_success(
+            None,
+            "pa-a",
+            {"prompt_tokens": 100, "prompt_tokens_details": {"cached_tokens": 100}},
+        )
+        assert affinity.get_stats()["channels"]["pa-a"]["cached_token_ratio"] == 0.5
+
+
+class TestCachedRouteAffinity:
+    """命中路由缓存时按计算时的真实评分判断亲和容差"""
+
+    def _route(self, monkeypatch, backup_scores):
+        affinity = PrefixAffinity(PrefixAffinityConfig(score_tolerance=0.05))
+        cache = RequestModelCache(default_ttl_seconds=3600)
+        monkeypatch.setattr(json_router_module, "get_prefix_affinity", lambda: affinity)
+        monkeypatch.setattr(json_router_module, "get_request_cache", lambda: cache)
+
+        router = JSONRouter.__new__(JSONRouter)
+        router.load_balancer = LoadBalancer()
+        request = RoutingRequest(
+            model="pa-cached", messages=conversation(1), strategy="cost_first"
+        )
+        request.prefix_key = affinity.prefix_key(request.messages)
+        affinity.record_success(request.prefix_key, "pa-c")
+
+        def channel(channel_id):
+            return SimpleNamespace(id=channel_id, name=channel_id, enabled=True)
+
+        async def main():
+            await cache.cache_selection(
+                fingerprint=RequestFingerprint(
+                    model=request.model,
+                    query_plan=compile_query_plan(request.model),
+                    routing_strategy="cost_first",
+                ),
+                primary_channel=channel("pa-a"),
+                backup_channels=[channel("pa-b"), channel("pa-c")],
+                selection_reason="test",
+                cost_estimate=0.0,
+                primary_score=0.90,
+                backup_scores=backup_scores,
+            )
+            return await router.route_request(request)
+
+        return asyncio.run(main())
+
+    def test_affine_backup_within_tolerance(self, monkeypatch):
+        scores = self._route(monkeypatch, [0.80, 0.88])
+        assert scores[0].channel.id == "pa-c"
+        assert scores[0].total_score == 0.88
+
+    def test_affine_backup_out_of_tolerance(self, monkeypatch):
+        scores = self._route(monkeypatch, [0.88, 0.60])
+        assert [score.channel.id for score in scores] == ["pa-a", "pa-b", "pa-c"]
@@ -0,0 +1,123 @@
+"""价格表测试（缓存、失效与按匹配模型计算成本评分）"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import core.router.mixins.scoring as scoring_module
+    import core.yaml_config as yaml_config_module
+    from core.router.mixins.scoring import ScoringMixin
+    from core.router.types import RoutingRequest
+    from core.utils.price_table import PriceTable
+except ImportError as e:
+    pytest.skip(f"Price table modules not available: {e}", allow_module_level=True)
+
+
+class _Estimator:
+    """按 (channel_id, model) 返回每token定价，记录解析次数"""
+
+    def __init__(self, pricing):
+        self.pricing = pricing
+        self.calls = []
+
+    def _get_model_pricing(self, channel_id, model_name):
+        self.calls.append((channel_id, model_name))
+        return self.pricing.get((channel_id, model_name))
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    loader = SimpleNamespace(generation=(1, 1, 0))
+    loader.get_cache_generation = lambda: loader.generation
+    monkeypatch.setattr(yaml_config_module, "get_yaml_config_loader", lambda: loader)
+    return loader
+
+
+def price_table(pricing):
+    table = PriceTable(file_check_interval=3600)
+    table._last_file_check = float("inf")  # 测试中不检查定价文件
+    table._estimator = _Estimator(pricing)
+    return table
+
+
+class TestPriceTable:
+    def test_prices_resolved_once(self, loader):
+        table = price_table({("pt-a", "m"): {"input": 1e-6, "output": 2e-6}})
+        assert table.get_prices("pt-a", "m") == (1e-6, 2e-6)
+        assert table.get_prices("pt-a", "m") == (1e-6, 2e-6)
+        # 无定价同样缓存，不重复遍历定价源
+        assert table.get_prices("pt-a", "missing") is None
+        assert table.get_prices("pt-a", "missing") is None
+        assert table._estimator.calls == [("pt-a", "m"), ("pt-a", "missing")]
+        assert table.get_stats() == {
+            "entries": 2,
+            "hits": 2,
+            "misses": 2,
+            "invalidations": 1,
+        }
+
+    def test_generation_change_invalidates(self, loader):
+        table = price_table({("pt-a", "m"): {"input": 1e-6, "output": 2e-6}})
+        table.get_prices("pt-a", "m")
+        loader.generation = (1, 2, 0)
+        table.get_prices("pt-a", "m")
+        assert len(table._estimator.calls) == 2
+
+    def test_cost_and_pricing_format(self, loader):
+        table = price_table({("pt-a", "m"): {"input": 1e-6, "output": 2e-6}})
+        assert table.estimate_cost("pt-a", "m", 1000, 500) == pytest.approx(2e-3)
+        assert table.get_pricing("pt-a", "m") == {
+            "input": 1e-6,
+            "output": 2e-6,
+            "unit": "per_token",
+        }
+        assert table.estimate_cost("pt-a", "other", 1000, 500) is None
+
+    def test_channel_invalidation(self, loader):
+        table = price_table({})
+        table.get_prices("pt-a", "m")
+        table.get_prices("pt-b", "m")
+        table.invalidate("pt-a")
+        assert table.get_stats()["entries"] == 1
+
+
+class _Router(ScoringMixin):
+    pass
+
+
+class TestCostScore:
+    def test_price_keyed_by_matched_model(self, loader, monkeypatch):
+        table = price_table({("pt-c", "qwen3-8b"): {"input": 1e-5, "output": 1e-5}})
+        monkeypatch.setattr(scoring_module, "get_price_table", lambda: table)
+        router = _Router()
+        channel = SimpleNamespace(id="pt-c", name="pt-c")
+        request = RoutingRequest(model="tag:free", messages=[])
+        token_stats = {"prompt_tokens": 1000, "estimated_completion_tokens": 1500}
+
+        score = router._calculate_cost_score(channel, request, "qwen3-8b", token_stats)
+        # (1000 + 1500) * 1e-5 = $0.025，相对 $0.05 上限得 0.5
+        assert score == pytest.approx(0.5)
+        assert table._estimator.calls == [("pt-c", "qwen3-8b")]
+
+    def test_token_stats_not_memoized_on_router(self):
+        router = _Router()
+        first = RoutingRequest(
+            model="m", messages=[{"role": "user", "content": "hi"}], max_tokens=10
+        )
+        second = RoutingRequest(
+            model="m",
+            messages=[{"role": "user", "content": "hello there " * 50}],
+            max_tokens=10,
+        )
+        assert (
+            router._get_request_token_stats(first)["prompt_tokens"]
+            < router._get_request_token_stats(second)["prompt_tokens"]
+        )
+        assert not hasattr(router, "_token_stats_memo")
@@ -0,0 +1,130 @@
+"""查询计划测试（编译结果与精确模型名索引）"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.router.mixins.candidate import CandidateDiscoveryMixin
+    from core.router.query_plan import (
+        PLAN_KIND_MODEL,
+        PLAN_KIND_PARAMETER,
+        PLAN_KIND_TAG,
+        compile_query_plan,
+    )
+    from core.router.types import RoutingRequest
+except ImportError as e:
+    pytest.skip(f"Query plan modules not available: {e}", allow_module_level=True)
+
+
+class _Loader:
+    """按渠道返回发现的模型，统计缓存读取次数"""
+
+    def __init__(self, channels, discovered):
+        self.channels = channels
+        self.discovered = discovered
+        self.generation = (1, 1, len(discovered))
+        self.cache_reads = 0
+
+    def get_cache_generation(self):
+        return self.generation
+
+    def get_enabled_channels(self):
+        return self.channels
+
+    def get_model_cache_by_channel(self, channel_id):
+        self.cache_reads += 1
+        return self.discovered.get(channel_id, {})
+
+
+class _Router(CandidateDiscoveryMixin):
+    def __init__(self, loader):
+        super().__init__()
+        self.config_loader = loader
+
+    def _get_candidate_channels_by_complete_segment(self, segments):
+        return []
+
+
+def _channel(channel_id):
+    return SimpleNamespace(id=channel_id, name=channel_id)
+
+
+class TestCompileQueryPlan:
+    def test_plan_kinds(self):
+        assert compile_query_plan("gpt-4o-mini").kind == PLAN_KIND_MODEL
+        assert compile_query_plan("tag:free,!local").kind == PLAN_KIND_TAG
+        assert compile_query_plan("qwen,free").kind == PLAN_KIND_TAG
+        assert compile_query_plan("qwen3->8b").kind == PLAN_KIND_PARAMETER
+
+    def test_tag_cache_key_is_canonical(self):
+        first = compile_query_plan("tag:qwen,free,!local")
+        second = compile_query_plan("tag:free,!local,qwen")
+        assert first.cache_key == second.cache_key == "tag:free,qwen,!local"
+        assert first.positive_tags == ("qwen", "free")
+        assert first.negative_tags == ("local",)
+
+    def test_exact_model_and_plan_cache(self):
+        plan = compile_query_plan("Qwen/Qwen3-8B")
+        assert plan.exact_model == "Qwen/Qwen3-8B"
+        assert plan.cache_key == "qwen/qwen3-8b"
+        assert compile_query_plan("Qwen/Qwen3-8B") is plan
+
+
+class TestExactModelIndex:
+    def _setup(self):
+        a, b, c = _channel("qp-a"), _channel("qp-b"), _channel("qp-c")
+        loader = _Loader(
+            [a, b, c],
+            {
+                "qp-a": {"models": ["gpt-4o", "qwen3-8b"]},
+                "qp-b": {
+                    "models": ["qwen3-8b"],
+                    "models_data": {"qwen3-8b": {"id": "Qwen/Qwen3-8B"}},
+                },
+                "qp-c": {"models": ["gpt-4o"]},
+            },
+        )
+        return _Router(loader), loader
+
+    def test_lookup_matches_channel_scan(self):
+        router, _ = self._setup()
+        candidates = router._get_candidate_channels(
+            RoutingRequest(model="qwen3-8b", messages=[])
+        )
+        assert [(c.channel.id, c.matched_model) for c in candidates] == [
+            ("qp-a", "qwen3-8b"),
+            ("qp-b", "Qwen/Qwen3-8B"),
+        ]
+
+    def test_index_reused_until_generation_changes(self):
+        router, loader = self._setup()
+        router._get_exact_model_index()
+        reads = loader.cache_reads
+        index = router._get_exact_model_index()
+        assert [channel.id for channel, _ in index["gpt-4o"]] == ["qp-a", "qp-c"]
+        assert loader.cache_reads == reads
+
+        loader.discovered["qp-b"]["models"].append("gpt-4o")
+        loader.generation = (1, 2, 3)
+        index = router._get_exact_model_index()
+        assert loader.cache_reads > reads
+        assert [channel.id for channel, _ in index["gpt-4o"]] == [
+            "qp-a",
+            "qp-b",
+            "qp-c",
+        ]
+
+    def test_unknown_model_has_no_physical_candidates(self):
+        router, _ = self._setup()
+        router._lookup_configured_channels = lambda request: None
+        assert (
+            router._get_candidate_channels(RoutingRequest(model="missing", messages=[]))
+            == []
+        )
@@ -0,0 +1,94 @@
+"""路由缓存代数失效测试"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.utils.model_channel_blacklist import ModelChannelBlacklistManager
+    from core.utils.request_cache import RequestFingerprint, RequestModelCache
+    from core.utils.routing_generations import get_routing_generations, health_band
+except ImportError as e:
+    pytest.skip(f"Request cache modules not available: {e}", allow_module_level=True)
+
+
+class _Loader:
+    def __init__(self):
+        self.generation = (1, 1, 0)
+
+    def get_cache_generation(self):
+        return self.generation
+
+
+def _channel(channel_id):
+    return SimpleNamespace(id=channel_id, name=channel_id, enabled=True)
+
+
+async def _cache_and_get(cache, loader, fingerprint, primary, backups):
+    snapshot = get_routing_generations().snapshot(
+        loader, [primary.id] + [c.id for c in backups]
+    )
+    await cache.cache_selection(
+        fingerprint=fingerprint,
+        primary_channel=primary,
+        backup_channels=backups,
+        selection_reason="test",
+        cost_estimate=0.0,
+        ttl_seconds=3600,
+        generations=snapshot,
+    )
+    return await cache.get_cached_selection(fingerprint)
+
+
+class TestGenerationInvalidation:
+    """缓存的路由决策在相关代数变化后立即失效"""
+
+    def _setup(self, suffix):
+        cache = RequestModelCache(default_ttl_seconds=3600)
+        loader = _Loader()
+        fingerprint = RequestFingerprint(model=f"gen-test-{suffix}")
+        primary, backup = _channel(f"p-{suffix}"), _channel(f"b-{suffix}")
+        return cache, loader, fingerprint, primary, backup
+
+    def test_unrelated_changes_keep_entry(self):
+        cache, loader, fingerprint, primary, backup = self._setup("keep")
+
+        async def run():
+            assert await _cache_and_get(cache, loader, fingerprint, primary, [backup])
+            get_routing_generations().bump_health("some-other-channel")
+            get_routing_generations().bump_blacklist("some-other-channel")
+            return await cache.get_cached_selection(fingerprint)
+
+        assert asyncio.run(run()) is not None
+
+    @pytest.mark.parametrize("event", ["health", "blacklist", "config"])
+    def test_relevant_change_invalidates(self, event):
+        cache, loader, fingerprint, primary, backup = self._setup(event)
+
+        async def run():
+            assert await _cache_and_get(cache, loader, fingerprint, primary, [backup])
+            if event == "health":
+                get_routing_generations().bump_health(backup.id)
+            elif event == "blacklist":
+                await ModelChannelBlacklistManager().add_blacklist_entry(
+                    primary.id, "some-model", 429, "rate limit"
+                )
+            else:
+                loader.generation = (2, 1, 0)
+            return await cache.get_cached_selection(fingerprint)
+
+        assert asyncio.run(run()) is None
+        assert cache.get_stats()["generation_invalidations"] == 1
+
+    def test_health_band(self):
+        assert health_band(0.1) == 0
+        assert health_band(0.3) == 1
+        assert health_band(0.69) == 1
+        assert health_band(1.0) == 2
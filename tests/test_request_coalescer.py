@@ -0,0 +1,92 @@
+"""相同在途请求合并（single-flight）测试"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.config_models import CoalescingConfig
+    from core.utils.request_coalescer import RequestCoalescer
+except ImportError as e:
+    pytest.skip(f"Request coalescer module not available: {e}", allow_module_level=True)
+
+
+class TestRequestCoalescer:
+    def test_key_ignores_field_order(self):
+        left = {"model": "gpt", "messages": [{"role": "user", "content": "hi"}]}
+        right = {"messages": [{"content": "hi", "role": "user"}], "model": "gpt"}
+        assert RequestCoalescer.request_key(left) == RequestCoalescer.request_key(right)
+        assert RequestCoalescer.request_key(left) != RequestCoalescer.request_key(
+            {**left, "temperature": 0.5}
+        )
+
+    def test_eligibility(self):
+        coalescer = RequestCoalescer(CoalescingConfig(enabled=True))
+        assert coalescer.is_eligible(0)
+        assert not coalescer.is_eligible(0.7)
+        assert coalescer.is_eligible(0.7, force=True)
+        assert not coalescer.is_eligible(0, force=False)
+        assert not RequestCoalescer(CoalescingConfig()).is_eligible(0, force=True)
+
+    def test_duplicates_share_one_call(self):
+        coalescer = RequestCoalescer(CoalescingConfig(enabled=True))
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"id": "resp-1"}
+
+        async def main():
+            return await asyncio.gather(
+                *(coalescer.run("same", upstream) for _ in range(5))
+            )
+
+        results = asyncio.run(main())
+        assert len(calls) == 1
+        assert [result for result, _executed in results] == [{"id": "resp-1"}] * 5
+        assert sum(executed for _result, executed in results) == 1
+        assert coalescer.get_stats()["in_flight"] == 0
+
+    def test_failure_propagates_to_followers(self):
+        coalescer = RequestCoalescer(CoalescingConfig(enabled=True))
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failed")
+
+        async def main():
+            return await asyncio.gather(
+                *(coalescer.run("fail", upstream) for _ in range(3)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(main())
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    def test_cancelled_leader_hands_over(self):
+        coalescer = RequestCoalescer(CoalescingConfig(enabled=True))
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        async def main():
+            leader = asyncio.ensure_future(coalescer.run("cancel", upstream))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(coalescer.run("cancel", upstream))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        result, executed = asyncio.run(main())
+        # 首个请求被取消后，等待者自行发起请求
+        assert (result, executed) == (2, True)
@@ -0,0 +1,119 @@
+"""响应缓存（内存LRU + 磁盘层）测试"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.config_models import ResponseCacheConfig
+    from core.utils.response_cache import ResponseCache
+    from core.utils.usage_tracker import (
+        CACHE_HIT_STATUS,
+        UsageTracker,
+        create_usage_record,
+    )
+except ImportError as e:
+    pytest.skip(f"Response cache module not available: {e}", allow_module_level=True)
+
+CHANNEL = SimpleNamespace(id="rc-channel", name="rc-channel", provider="openai")
+
+
+def store(cache, key, content="ok", ttl=60.0, cost=0.01):
+    asyncio.run(
+        cache.store(
+            key, {"choices": [content]}, CHANNEL, "gpt-4o-mini", 10, 5, cost, ttl
+        )
+    )
+
+
+class TestResponseCache:
+    def test_hit_after_store(self):
+        cache = ResponseCache(ResponseCacheConfig(enabled=True))
+        assert asyncio.run(cache.get("k1")) is None
+        store(cache, "k1")
+        entry = asyncio.run(cache.get("k1"))
+        assert entry.response == {"choices": ["ok"]}
+        assert entry.channel_id == "rc-channel"
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+        assert stats["saved_cost"] == pytest.approx(0.01)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(ResponseCacheConfig(enabled=True, max_entries=2))
+        store(cache, "a")
+        store(cache, "b")
+        asyncio.run(cache.get("a"))  # a 成为最近使用
+        store(cache, "c")
+        assert asyncio.run(cache.get("b")) is None
+        assert asyncio.run(cache.get("a")) is not None
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_expired_entry_is_miss(self):
+        cache = ResponseCache(ResponseCacheConfig(enabled=True))
+        store(cache, "old", ttl=0.01)
+        cache._entries["old"].expires_at = 0.0
+        assert asyncio.run(cache.get("old")) is None
+        assert cache.get_stats()["entries"] == 0
+
+    def test_ttl_by_model_and_tag(self):
+        cache = ResponseCache(
+            ResponseCacheConfig(
+                enabled=True,
+                default_ttl=100,
+                ttl_by_model={"gpt-4o": 0},
+                ttl_by_tag={"free": 30, "eval": 10},
+            )
+        )
+        assert cache.ttl_for("gpt-4o") == 0
+        assert cache.ttl_for("tag:free,eval", ["free", "eval"]) == 10
+        assert cache.ttl_for("other") == 100
+        # TTL为0的模型不缓存，即使请求头显式开启
+        assert not cache.is_cacheable(0, cache.ttl_for("gpt-4o"), force=True)
+        assert cache.is_cacheable(0, 100)
+        assert not cache.is_cacheable(0.7, 100)
+        assert cache.is_cacheable(0.7, 100, force=True)
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        settings = ResponseCacheConfig(
+            enabled=True, disk_enabled=True, disk_dir=str(tmp_path)
+        )
+        store(ResponseCache(settings), "persisted", content="from disk")
+        restarted = ResponseCache(settings)
+        entry = asyncio.run(restarted.get("persisted"))
+        assert entry.response == {"choices": ["from disk"]}
+        assert restarted.get_stats()["disk_hits"] == 1
+
+
+class TestCacheHitUsageStats:
+    def test_hit_ratio_and_saved_cost(self, tmp_path):
+        tracker = UsageTracker(logs_dir=str(tmp_path))
+        for status, cost, saved in (
+            ("success", 0.02, 0.0),
+            (CACHE_HIT_STATUS, 0.0, 0.02),
+        ):
+            tracker.record_usage(
+                create_usage_record(
+                    model="gpt-4o-mini",
+                    channel_id="rc-channel",
+                    channel_name="rc-channel",
+                    provider="openai",
+                    input_tokens=10,
+                    output_tokens=5,
+                    input_cost=cost,
+                    output_cost=0.0,
+                    status=status,
+                    saved_cost=saved,
+                )
+            )
+        stats = tracker.get_daily_stats()
+        assert stats["cache_hits"] == 1
+        assert stats["cache_hit_ratio"] == 0.5
+        assert stats["saved_cost"] == pytest.approx(0.02)
+        assert stats["successful_requests"] == 2
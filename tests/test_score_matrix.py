@@ -0,0 +1,315 @@
+"""列式评分引擎测试 - 与逐个评分路径的排序结果一致"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import core.json_router as json_router_module
+    from core.json_router import JSONRouter
+    from core.router.load_balancing import LoadBalancer
+    from core.router.mixins.scoring import ScoringMixin
+    from core.router.ranking import DEFAULT_TOP_K, RankedCandidates
+    from core.router.types import ChannelCandidate, RoutingRequest, RoutingScore
+    from core.utils.batch_scorer import BatchedScoreComponents, BatchScorer
+    from core.utils.score_matrix import NUMPY_AVAILABLE, SCORE_FIELDS, ScoreMatrix
+except ImportError as e:
+    pytest.skip(f"Scoring modules not available: {e}", allow_module_level=True)
+
+BACKENDS = [
+    False,
+    pytest.param(
+        True,
+        marks=pytest.mark.skipif(not NUMPY_AVAILABLE, reason="numpy not installed"),
+    ),
+]
+
+STRATEGIES = [
+    [
+        {"field": "cost_score", "order": "desc", "weight": 0.4},
+        {"field": "parameter_score", "order": "desc", "weight": 0.25},
+        {"field": "context_score", "order": "desc", "weight": 0.2},
+        {"field": "speed_score", "order": "desc", "weight": 0.15},
+    ],
+    [
+        {"field": "free_score", "order": "desc", "weight": 0.5},
+        {"field": "cost_score", "order": "asc", "weight": 0.3},
+        {"field": "local_score", "order": "desc", "weight": 0.15},
+        {"field": "unknown_score", "order": "desc", "weight": 0.05},
+    ],
+    [{"field": "cost_score", "order": "desc", "weight": 0.0}],
+]
+
+
+class _Router(ScoringMixin):
+    pass
+
+
+def _random_rows(count, seed):
+    """生成评分行，使用粗粒度取值以制造分层评分并列"""
+    rng = random.Random(seed)
+    steps = [0.0, 0.1, 0.3, 0.5, 0.55, 0.8, 0.9, 0.95, 1.0]
+    rows = [[rng.choice(steps) for _ in SCORE_FIELDS] for _ in range(count)]
+    names = [f"channel-{rng.randint(0, count // 3)}" for _ in range(count)]
+    return rows, names
+
+
+def _routing_scores(rows, names):
+    return [
+        RoutingScore(
+            channel=SimpleNamespace(name=name, id=f"id-{index}"),
+            total_score=0.0,
+            cost_score=row[0],
+            speed_score=row[1],
+            quality_score=row[2],
+            reliability_score=row[3],
+            reason="",
+            parameter_score=row[4],
+            context_score=row[5],
+            free_score=row[6],
+        )
+        for index, (row, name) in enumerate(zip(rows, names))
+    ]
+
+
+def _async_return(value):
+    async def call(*args, **kwargs):
+        return value
+
+    return call
+
+
+class TestScoreMatrix:
+    """ScoreMatrix 与 _calculate_total_score / _hierarchical_sort 对比"""
+
+    @pytest.mark.parametrize("use_numpy", BACKENDS)
+    @pytest.mark.parametrize("strategy", STRATEGIES)
+    def test_total_scores_match_router(self, use_numpy, strategy):
+        router = _Router()
+        rows, names = _random_rows(200, seed=1)
+        matrix = ScoreMatrix(rows, names, use_numpy=use_numpy)
+        assert matrix.backend == ("numpy" if use_numpy else "python")
+
+        expected = [router._calculate_total_score(strategy, *row) for row in rows]
+        assert matrix.total_scores(strategy) == pytest.approx(expected, abs=1e-12)
+
+    @pytest.mark.parametrize("use_numpy", BACKENDS)
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_hierarchical_order_matches_router(self, use_numpy, seed):
+        router = _Router()
+        rows, names = _random_rows(300, seed=seed)
+        scores = _routing_scores(rows, names)
+
+        expected = router._hierarchical_sort(scores).top(len(scores))
+        order = ScoreMatrix(rows, names, use_numpy=use_numpy).hierarchical_order()
+
+        # 按对象身份比较，同时验证并列时的稳定顺序
+        assert [scores[i] for i in order] == expected
+        assert all(scores[i] is item for i, item in zip(order, expected))
+
+    def test_batch_scorer_matrix_matches_individual_path(self):
+        router = _Router()
+        rows, names = _random_rows(60, seed=7)
+        candidates = [
+            ChannelCandidate(
+                channel=SimpleNamespace(id=f"ch{i}", name=name),
+                matched_model=f"model-{i}" if i % 4 else None,
+            )
+            for i, name in enumerate(names)
+        ]
+        keys = [
+            f"{c.channel.id}_{c.matched_model}" if c.matched_model else c.channel.id
+            for c in candidates
+        ]
+        # 最后一个候选缺失全部评分，应使用默认值
+        columns = {
+            field: {key: row[column] for key, row in zip(keys[:-1], rows)}
+            for column, field in enumerate(SCORE_FIELDS)
+        }
+        batch_result = BatchedScoreComponents(
+            **{f"{field}s": columns[field] for field in SCORE_FIELDS},
+            computation_time_ms=0.0,
+        )
+        scorer = BatchScorer(router)
+        strategy = STRATEGIES[0]
+
+        individual = []
+        for candidate in candidates:
+            scores = scorer.get_score_for_channel(batch_result, candidate)
+            individual.append(
+                RoutingScore(
+                    channel=candidate.channel,
+                    total_score=router._calculate_total_score(
+                        strategy, *(scores[field] for field in SCORE_FIELDS)
+                    ),
+                    cost_score=scores["cost_score"],
+                    speed_score=scores["speed_score"],
+                    quality_score=scores["quality_score"],
+                    reliability_score=scores["reliability_score"],
+                    reason="",
+                    matched_model=candidate.matched_model,
+                    parameter_score=scores["parameter_score"],
+                    context_score=scores["context_score"],
+                    free_score=scores["free_score"],
+                )
+            )
+        expected = router._hierarchical_sort(individual).top(len(individual))
+
+        for use_numpy in (False, True) if NUMPY_AVAILABLE else (False,):
+            matrix = scorer.build_score_matrix(batch_result, candidates, use_numpy)
+            totals = matrix.total_scores(strategy)
+            ranked = [
+                (candidates[i].channel.id, totals[i])
+                for i in matrix.hierarchical_order()
+            ]
+            assert [channel_id for channel_id, _ in ranked] == [
+                item.channel.id for item in expected
+            ]
+            assert [total for _, total in ranked] == pytest.approx(
+                [item.total_score for item in expected], abs=1e-12
+            )
+
+
+class TestTopKRanking:
+    """Top-k 选择与完整分层排序对比"""
+
+    @pytest.mark.parametrize("use_numpy", BACKENDS)
+    @pytest.mark.parametrize("k", [1, 6, 50, 400])
+    def test_matrix_top_k_matches_full_order(self, use_numpy, k):
+        rows, names = _random_rows(300, seed=5)
+        matrix = ScoreMatrix(rows, names, use_numpy=use_numpy)
+        full_order = matrix.hierarchical_order()
+
+        head, tail = matrix.hierarchical_top_k(k)
+        assert head == full_order[:k]
+        assert tail == sorted(tail)
+        assert sorted(head + tail) == list(range(300))
+
+    @pytest.mark.parametrize("seed", [1, 2])
+    def test_hierarchical_sort_top_k_is_lazy_and_exact(self, seed):
+        router = _Router()
+        rows, names = _random_rows(300, seed=seed)
+        scores = _routing_scores(rows, names)
+        expected = router._hierarchical_sort(scores).top(len(scores))
+
+        ranked = router._hierarchical_sort(scores, top_k=6)
+        assert isinstance(ranked, RankedCandidates)
+        assert len(ranked) == len(expected)
+        assert ranked.head_size == 6
+        assert all(a is b for a, b in zip(ranked.top(6), expected[:6]))
+        assert not ranked.is_fully_ranked
+
+        # 取尾部时才完成排序，结果与完整排序一致
+        rest = list(ranked.iter_rest())
+        assert ranked.is_fully_ranked
+        assert all(a is b for a, b in zip(ranked.top(6) + rest, expected))
+        assert all(a is b for a, b in zip(ranked.top(10), expected[:10]))
+
+    def test_top_returns_copy_of_head(self):
+        router = _Router()
+        rows, names = _random_rows(100, seed=3)
+        scores = _routing_scores(rows, names)
+        expected = router._hierarchical_sort(scores).top(len(scores))
+
+        ranked = router._hierarchical_sort(scores, top_k=3)
+        head = ranked.top(3)
+        # 与 ChatHandler 快速预检相同的头部重排不影响排序结果，也不触发尾部排序
+        head.insert(0, head.pop(2))
+        assert not ranked.is_fully_ranked
+        assert all(a is b for a, b in zip(ranked.top(3), expected[:3]))
+        assert all(a is b for a, b in zip(ranked.iter_rest(), expected[3:]))
+
+    def test_rest_is_built_on_demand(self):
+        built = []
+
+        def rank_rest():
+            built.append(True)
+            return ["c", "d"]
+
+        ranked = RankedCandidates(["a", "b"], rank_rest, 2)
+        assert len(ranked) == 4
+        assert ranked.top(2) == ["a", "b"]
+        assert built == []
+        assert ranked.top(3) == ["a", "b", "c"]
+        assert list(ranked.iter_rest()) == ["c", "d"]
+        assert built == [True]
+        assert list(RankedCandidates(["a"]).iter_rest()) == []
+
+    def test_iteration_ranks_rest_only_past_head(self):
+        built = []
+
+        def rank_rest():
+            built.append(True)
+            return ["c", "d"]
+
+        ranked = RankedCandidates(["a", "b"], rank_rest, 2)
+        reordered = ranked.with_head(["b", "a"])
+        iterator = iter(reordered)
+        assert [next(iterator), next(iterator)] == ["b", "a"]
+        assert built == []
+        assert list(iterator) == ["c", "d"]
+        # 重排后的头部与原排序共享同一次尾部排序
+        assert list(ranked) == ["a", "b", "c", "d"]
+        assert built == [True]
+        assert list(RankedCandidates(["a"])) == ["a"]
+
+    def test_with_head_past_head_size(self):
+        ranked = RankedCandidates(["a", "b"], lambda: ["c", "d", "e"], 3)
+        reordered = ranked.with_head(["c", "a", "b"])
+        assert len(reordered) == 5
+        assert list(reordered) == ["c", "a", "b", "d", "e"]
+
+
+class TestLazyRoutingTail:
+    """路由返回已排序头部，尾部留给故障转移按需排序"""
+
+    def test_route_request_ranked_leaves_tail_unranked(self, monkeypatch):
+        monkeypatch.setattr(
+            json_router_module,
+            "get_request_cache",
+            lambda: SimpleNamespace(
+                get_cached_selection=_async_return(None),
+                cache_selection=_async_return(None),
+            ),
+        )
+        monkeypatch.setattr(
+            json_router_module,
+            "get_routing_generations",
+            lambda: SimpleNamespace(snapshot=lambda *args: None),
+        )
+        rows = [[1.0 - index * 0.1] * 7 for index in range(DEFAULT_TOP_K + 2)]
+        scores = _routing_scores(rows, [f"lazy-{i}" for i in range(len(rows))])
+        for score in scores:
+            score.total_score = score.cost_score
+        built = []
+
+        def rank_rest():
+            built.append(True)
+            return scores[DEFAULT_TOP_K:]
+
+        router = JSONRouter.__new__(JSONRouter)
+        router.load_balancer = LoadBalancer()
+        router._get_candidate_channels = lambda request: scores
+        router._filter_channels = lambda candidates, request: candidates
+        router._filter_by_capabilities = _async_return(scores)
+        router._score_channels = _async_return(
+            RankedCandidates(scores[:DEFAULT_TOP_K], rank_rest, 2)
+        )
+        router._estimate_cost_for_channel = lambda *args: 0.0
+        request = RoutingRequest(model="lazy-tail", messages=[])
+
+        # 首个候选即成功时，故障转移尾部从不排序
+        ranked = asyncio.run(router.route_request_ranked(request))
+        assert len(ranked) == len(scores)
+        assert next(iter(ranked)) is scores[0]
+        assert built == []
+        assert list(ranked) == scores
+        assert built == [True]
@@ -0,0 +1,72 @@
+"""增量SSE解析器测试（跨块边界、CRLF、多行data）"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.utils.sse_parser import SSEParser
+except ImportError as e:
+    pytest.skip(f"SSE parser module not available: {e}", allow_module_level=True)
+
+USAGE = {"prompt_tokens": 12, "completion_tokens": 34, "total_tokens": 46}
+
+
+def openai_stream(newline: bytes = b"\n") -> bytes:
+    events = [
+        {"choices": [{"delta": {"content": f"token {i} 你好"}}], "usage": None}
+        for i in range(50)
+    ]
+    events.append({"choices": [], "usage": USAGE})
+    body = b"".join(
+        b"data: " + json.dumps(event).encode("utf-8") + newline * 2 for event in events
+    )
+    return body + b"data: [DONE]" + newline * 2
+
+
+def feed_in_chunks(data: bytes, size: int) -> list:
+    parser = SSEParser()
+    events = []
+    for start in range(0, len(data), size):
+        events.extend(parser.feed(data[start : start + size]))
+    return events + parser.flush()
+
+
+class TestSSEParser:
+    @pytest.mark.parametrize("newline", [b"\n", b"\r\n", b"\r"])
+    @pytest.mark.parametrize("size", [1, 3, 7, 64, 8192])
+    def test_events_split_across_chunks(self, newline, size):
+        events = feed_in_chunks(openai_stream(newline), size)
+        assert len(events) == 52
+        assert events[-1].is_done
+        assert events[-2].json()["usage"] == USAGE
+        assert events[0].json()["choices"][0]["delta"]["content"] == "token 0 你好"
+
+    def test_multiline_data_event_and_comments(self):
+        parser = SSEParser()
+        events = parser.feed(
+            b': keep-alive\n\nevent: message_delta\ndata: {"a":\ndata: 1}\n\n'
+        )
+        assert len(events) == 1
+        assert events[0].event == "message_delta"
+        assert events[0].data == b'{"a":\n1}'
+        assert events[0].json() == {"a": 1}
+
+    def test_flush_emits_unterminated_event(self):
+        parser = SSEParser()
+        assert parser.feed(b'data: {"usage": {"total_tokens": 3}}') == []
+        (event,) = parser.flush()
+        assert event.json() == {"usage": {"total_tokens": 3}}
+        assert event.event == "message"
+
+    def test_oversized_event_is_dropped(self):
+        parser = SSEParser(max_event_bytes=16)
+        events = parser.feed(b"data: " + b"x" * 40 + b"\n\ndata: ok\n\n")
+        assert [event.data for event in events] == [b"ok"]
+        assert parser.dropped_events == 1
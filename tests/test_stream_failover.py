@@ -0,0 +1,230 @@
+"""流式故障转移策略测试（TTFB截止时间与统计）"""
+
+import asyncio
+import contextlib
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import httpx
+
+    import core.handlers.chat_handler as chat_handler_module
+    from core.config_models import StreamFailoverConfig
+    from core.handlers.chat_handler import (
+        ChannelRequestInfo,
+        ChatCompletionHandler,
+        ChatCompletionRequest,
+        RoutingResult,
+    )
+    from core.router.ranking import RankedCandidates
+    from core.router.types import RoutingScore
+    from core.utils.latency_sketch import get_latency_tracker
+    from core.utils.stream_failover import StreamFailoverPolicy
+except ImportError as e:
+    pytest.skip(f"Stream failover module not available: {e}", allow_module_level=True)
+
+
+def channel(channel_id: str, ttfb_timeout=None) -> SimpleNamespace:
+    return SimpleNamespace(id=channel_id, ttfb_timeout=ttfb_timeout)
+
+
+class TestStreamFailoverPolicy:
+    def test_deadline_without_history_uses_ceiling(self):
+        policy = StreamFailoverPolicy(StreamFailoverConfig(ttfb_timeout=20.0))
+        assert policy.ttfb_deadline(channel("failover-empty"), "m") == 20.0
+
+    def test_deadline_follows_ttfb_quantile(self):
+        tracker = get_latency_tracker()
+        for _ in range(tracker.min_samples + 20):
+            tracker.record("failover-fast", "m", ttfb=0.5)
+            tracker.record("failover-slow", "m", ttfb=12.0)
+        policy = StreamFailoverPolicy(
+            StreamFailoverConfig(ttfb_timeout=30.0, min_ttfb_timeout=5.0)
+        )
+        # 0.5s * 3 低于下限，12s * 3 超过上限
+        assert policy.ttfb_deadline(channel("failover-fast"), "m") == 5.0
+        assert policy.ttfb_deadline(channel("failover-slow"), "m") == 30.0
+
+    def test_channel_override_and_disabled(self):
+        policy = StreamFailoverPolicy(StreamFailoverConfig())
+        assert policy.ttfb_deadline(channel("failover-x", ttfb_timeout=2.5)) == 2.5
+        policy.configure(StreamFailoverConfig(enabled=False))
+        assert policy.ttfb_deadline(channel("failover-x", ttfb_timeout=2.5)) is None
+
+    def test_stats(self):
+        policy = StreamFailoverPolicy()
+        policy.record_failover("ttfb_timeouts")
+        policy.record_failover("error_status")
+        stats = policy.get_stats()
+        assert stats["failovers"] == 2
+        assert stats["ttfb_timeouts"] == 1
+        assert stats["error_status"] == 1
+
+
+class UpstreamResponse:
+    def __init__(self, status_code, parts):
+        self.status_code = status_code
+        self.headers = httpx.Headers()
+        self.parts = parts
+
+    async def aread(self):
+        return b"upstream unavailable"
+
+    async def aiter_bytes(self, chunk_size=8192):
+        for delay, part in self.parts:
+            await asyncio.sleep(delay)
+            yield part
+
+
+class FakePool:
+    """按URL返回预设的上游流：[(延迟秒数, 字节)]"""
+
+    def __init__(self, upstreams):
+        self.upstreams = upstreams
+        self.calls = []
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        self.calls.append(url)
+        status_code, parts = self.upstreams[url]
+        yield UpstreamResponse(status_code, parts)
+
+
+def stream_handler(monkeypatch, upstreams, ttfb_timeout=None, head_size=None):
+    """head_size 非空时只有前 head_size 个候选已排序，其余在故障转移越过头部时排序"""
+    pool = FakePool(upstreams)
+    pool.rest_ranked = 0
+    monkeypatch.setattr(chat_handler_module, "get_http_pool", lambda: pool)
+    handler = ChatCompletionHandler.__new__(ChatCompletionHandler)
+    handler.config = SimpleNamespace(get_provider=lambda name: SimpleNamespace())
+    handler.router = SimpleNamespace(update_channel_health=lambda *args: None)
+    handler._record_channel_outcome = lambda *args, **kwargs: False
+
+    candidates = [
+        RoutingScore(
+            channel=SimpleNamespace(
+                id=url,
+                name=url,
+                provider="p",
+                model_name="m",
+                api_key="k",
+                ttfb_timeout=ttfb_timeout,
+            ),
+            total_score=1.0,
+            cost_score=1.0,
+            speed_score=1.0,
+            quality_score=1.0,
+            reliability_score=1.0,
+            reason="test",
+            matched_model="m",
+        )
+        for url in upstreams
+    ]
+
+    def rank_rest():
+        pool.rest_ranked += 1
+        return candidates[head_size:]
+
+    async def route(request, start_time):
+        if head_size is None:
+            ranked = RankedCandidates(candidates)
+        else:
+            ranked = RankedCandidates(
+                candidates[:head_size], rank_rest, len(candidates) - head_size
+            )
+        return RoutingResult(ranked, 0.0, len(ranked))
+
+    async def estimate(request, candidates, request_id):
+        return None
+
+    def prepare(channel, provider, request, matched_model):
+        return ChannelRequestInfo(
+            channel.id, {}, {"model": "m", "messages": []}, channel, provider, "m"
+        )
+
+    handler._route_request_with_fallback = route
+    handler._perform_cost_estimation = estimate
+    handler._prepare_channel_request_info = prepare
+    return handler, pool
+
+
+def read_stream(handler):
+    async def main():
+        request = ChatCompletionRequest(
+            model="m", messages=[{"role": "user", "content": "hi"}], stream=True
+        )
+        response = await handler.handle_request(request)
+        body = []
+        async for chunk in response.body_iterator:
+            body.append(chunk if isinstance(chunk, str) else chunk.decode())
+        return "".join(body)
+
+    return asyncio.run(main())
+
+
+DATA = b'data: {"choices":[{"delta":{"content":"ok"}}]}\n\n'
+
+
+class TestChatCompletionStreamFailover:
+    """POST /v1/chat/completions 的流式请求在首字节前切换渠道"""
+
+    def test_error_status_fails_over(self, monkeypatch):
+        handler, pool = stream_handler(
+            monkeypatch, {"sf-bad": (503, []), "sf-good": (200, [(0, DATA)])}
+        )
+        body = read_stream(handler)
+        assert pool.calls == ["sf-bad", "sf-good"]
+        assert '"content":"ok"' in body
+        assert "upstream unavailable" not in body
+
+    def test_silent_upstream_fails_over_after_deadline(self, monkeypatch):
+        handler, pool = stream_handler(
+            monkeypatch,
+            {"sf-silent": (200, [(1.0, DATA)]), "sf-fast": (200, [(0, DATA)])},
+            ttfb_timeout=0.05,
+        )
+        assert '"content":"ok"' in read_stream(handler)
+        assert pool.calls == ["sf-silent", "sf-fast"]
+
+    def test_keepalive_comments_count_as_liveness(self, monkeypatch):
+        keepalive = [(0.03, b": OPENROUTER PROCESSING\n\n")] * 4
+        handler, pool = stream_handler(
+            monkeypatch,
+            {"sf-thinking": (200, keepalive + [(0, DATA)]), "sf-other": (200, [])},
+            ttfb_timeout=0.05,
+        )
+        body = read_stream(handler)
+        assert pool.calls == ["sf-thinking"]
+        assert body.startswith(": OPENROUTER PROCESSING")
+        assert '"content":"ok"' in body
+
+
+class TestLazyFailoverTail:
+    """故障转移用尽已排序头部后才排序其余候选"""
+
+    def test_first_success_never_ranks_tail(self, monkeypatch):
+        handler, pool = stream_handler(
+            monkeypatch,
+            {"lt-a": (200, [(0, DATA)]), "lt-b": (200, []), "lt-c": (200, [])},
+            head_size=1,
+        )
+        assert '"content":"ok"' in read_stream(handler)
+        assert pool.calls == ["lt-a"]
+        assert pool.rest_ranked == 0
+
+    def test_tail_ranked_once_head_is_exhausted(self, monkeypatch):
+        handler, pool = stream_handler(
+            monkeypatch,
+            {"lt-bad": (503, []), "lt-good": (200, [(0, DATA)]), "lt-c": (200, [])},
+            head_size=1,
+        )
+        assert '"content":"ok"' in read_stream(handler)
+        assert pool.calls == ["lt-bad", "lt-good"]
+        assert pool.rest_ranked == 1
@@ -0,0 +1,199 @@
+"""流式协议转换测试（OpenAI SSE -> Anthropic Messages / Gemini 流）"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.utils.sse_parser import SSEParser
+    from core.utils.stream_translator import (
+        AnthropicStreamTranslator,
+        GeminiStreamTranslator,
+    )
+except ImportError as e:
+    pytest.skip(f"Stream translator module not available: {e}", allow_module_level=True)
+
+
+def sse(payload) -> bytes:
+    body = payload if isinstance(payload, str) else json.dumps(payload)
+    return f"data: {body}\n\n".encode()
+
+
+def delta(**fields) -> dict:
+    return {"choices": [{"index": 0, "delta": fields, "finish_reason": None}]}
+
+
+def decode(frames: list[bytes]) -> list[tuple[str, dict]]:
+    parser = SSEParser()
+    events = parser.feed(b"".join(frames)) + parser.flush()
+    return [(event.event, event.json()) for event in events]
+
+
+def run(chunks) -> list[tuple[str, dict]]:
+    translator = AnthropicStreamTranslator("msg_test", "claude-test")
+    frames = []
+    for chunk in chunks:
+        frames.extend(translator.feed(chunk))
+    return decode(frames + translator.finish())
+
+
+class TestAnthropicStreamTranslator:
+    def test_text_and_usage(self):
+        stream = b"".join(
+            [
+                sse(delta(role="assistant", content="")),
+                sse(delta(content="Hello")),
+                sse(delta(content=" world")),
+                sse(
+                    {"choices": [{"index": 0, "delta": {}, "finish_reason": "length"}]}
+                ),
+                sse(
+                    {
+                        "choices": [],
+                        "usage": {"prompt_tokens": 9, "completion_tokens": 2},
+                    }
+                ),
+                sse("[DONE]"),
+            ]
+        )
+        # 按3字节切块，事件跨越块边界
+        chunks = [stream[i : i + 3] for i in range(0, len(stream), 3)]
+        events = run(chunks + ['data: {"smart_ai_router": {}}\n\n'])
+
+        assert [name for name, _ in events] == [
+            "message_start",
+            "content_block_start",
+            "content_block_delta",
+            "content_block_delta",
+            "content_block_stop",
+            "message_delta",
+            "message_stop",
+        ]
+        assert events[0][1]["message"]["id"] == "msg_test"
+        assert events[2][1]["delta"] == {"type": "text_delta", "text": "Hello"}
+        assert events[5][1]["delta"]["stop_reason"] == "max_tokens"
+        assert events[5][1]["usage"] == {"input_tokens": 9, "output_tokens": 2}
+
+    def test_tool_call_deltas(self):
+        first = {"index": 0, "id": "call_1", "function": {"name": "get_weather"}}
+        events = run(
+            [
+                sse(delta(content="Checking")),
+                sse(delta(tool_calls=[first])),
+                sse(
+                    delta(tool_calls=[{"index": 0, "function": {"arguments": '{"ci'}}])
+                ),
+                sse(
+                    delta(
+                        tool_calls=[{"index": 0, "function": {"arguments": 'ty":1}'}}]
+                    )
+                ),
+                sse(
+                    {
+                        "choices": [
+                            {"index": 0, "delta": {}, "finish_reason": "tool_calls"}
+                        ]
+                    }
+                ),
+            ]
+        )
+        starts = [data for name, data in events if name == "content_block_start"]
+        assert [start["content_block"]["type"] for start in starts] == [
+            "text",
+            "tool_use",
+        ]
+        assert starts[1]["index"] == 1
+        assert starts[1]["content_block"]["name"] == "get_weather"
+        partial = [
+            data["delta"]["partial_json"]
+            for name, data in events
+            if name == "content_block_delta" and data["index"] == 1
+        ]
+        assert "".join(partial) == '{"city":1}'
+        assert events[-2][1]["delta"]["stop_reason"] == "tool_use"
+
+    def test_anthropic_upstream_passes_through(self):
+        upstream = (
+            b'event: message_start\ndata: {"type":"message_start","message":{}}\n\n'
+            b'event: message_stop\ndata: {"type":"message_stop"}\n\n'
+        )
+        translator = AnthropicStreamTranslator("msg_test", "claude-test")
+        frames = translator.feed(upstream[:20]) + translator.feed(upstream[20:])
+        frames += translator.feed("data: [DONE]\n\n") + translator.finish()
+        assert translator.passthrough
+        assert frames == [upstream[:20], upstream[20:]]
+
+    def test_router_error_becomes_anthropic_error(self):
+        error = {"error": {"message": "Rate limited", "code": 429}}
+        events = run([f"data: {json.dumps(error)}\n\n"])
+        assert events == [
+            (
+                "error",
+                {
+                    "type": "error",
+                    "error": {"type": "rate_limit_error", "message": "Rate limited"},
+                },
+            )
+        ]
+
+
+class TestGeminiStreamTranslator:
+    STREAM = [
+        sse(delta(content="Hel")),
+        sse(delta(content="lo")),
+        sse({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}),
+        sse({"choices": [], "usage": {"prompt_tokens": 4, "completion_tokens": 2}}),
+        "data: [DONE]\n\n",
+    ]
+
+    def translate(self, sse_mode: bool) -> list[bytes]:
+        translator = GeminiStreamTranslator("gemini-test", sse=sse_mode)
+        frames = []
+        for chunk in self.STREAM:
+            frames.extend(translator.feed(chunk))
+        return frames + translator.finish()
+
+    def test_sse_mode(self):
+        frames = self.translate(True)
+        # 每个文本增量到达即输出一帧
+        assert len(frames) == 3
+        events = decode(frames)
+        assert events[0][1]["candidates"][0]["content"]["parts"] == [{"text": "Hel"}]
+        final = events[-1][1]
+        assert final["candidates"][0]["finishReason"] == "STOP"
+        assert final["usageMetadata"] == {
+            "promptTokenCount": 4,
+            "candidatesTokenCount": 2,
+            "totalTokenCount": 6,
+        }
+
+    def test_json_array_mode(self):
+        body = json.loads(b"".join(self.translate(False)))
+        assert isinstance(body, list) and len(body) == 3
+        assert body[1]["candidates"][0]["content"]["parts"] == [{"text": "lo"}]
+
+    def test_tool_call_becomes_function_call(self):
+        translator = GeminiStreamTranslator("gemini-test", sse=False)
+        call = {"index": 0, "id": "c1", "function": {"name": "f", "arguments": '{"a"'}}
+        rest = {"index": 0, "function": {"arguments": ": 1}"}}
+        frames = translator.feed(sse(delta(tool_calls=[call])))
+        frames += translator.feed(sse(delta(tool_calls=[rest])))
+        body = json.loads(b"".join(frames + translator.finish()))
+        parts = body[-1]["candidates"][0]["content"]["parts"]
+        assert parts == [{"functionCall": {"name": "f", "args": {"a": 1}}}]
+
+    def test_error_closes_json_array(self):
+        translator = GeminiStreamTranslator("gemini-test", sse=False)
+        frames = translator.feed(
+            'data: {"error": {"message": "busy", "code": 429}}\n\n'
+        )
+        body = json.loads(b"".join(frames + translator.finish()))
+        assert body == [
+            {"error": {"code": 429, "message": "busy", "status": "RESOURCE_EXHAUSTED"}}
+        ]
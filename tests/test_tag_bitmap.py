@@ -0,0 +1,97 @@
+"""标签位图索引测试 - 与集合实现的包含/排除结果一致"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.utils.tag_bitmap import TagBitmapIndex
+except ImportError as e:
+    pytest.skip(f"Tag bitmap module not available: {e}", allow_module_level=True)
+
+TAGS = [f"tag{i}" for i in range(12)]
+
+
+def _random_postings(seed, models, density):
+    """随机生成 标签->模型键集合，density 控制结果稀疏/稠密"""
+    rng = random.Random(seed)
+    keys = [(f"ch{i % 7}", f"model-{i}") for i in range(models)]
+    postings = {tag: {key for key in keys if rng.random() < density} for tag in TAGS}
+    return keys, postings
+
+
+def _set_query(keys, postings, include_tags, exclude_tags):
+    """集合实现：位图索引替代前的查询语义，结果按发现顺序"""
+    result = set(keys)
+    for tag in include_tags:
+        result &= postings.get(tag, set())
+    for tag in exclude_tags:
+        result -= postings.get(tag, set())
+    return [key for key in keys if key in result]
+
+
+def _random_queries(seed, count=50):
+    rng = random.Random(seed)
+    for _ in range(count):
+        include_tags = rng.sample(TAGS + ["missing"], rng.randint(0, 3))
+        exclude_tags = rng.sample(TAGS + ["missing"], rng.randint(0, 2))
+        yield include_tags, exclude_tags
+
+
+class TestTagBitmapEquivalence:
+    @pytest.mark.parametrize("density", [0.02, 0.5, 0.95])
+    @pytest.mark.parametrize("seed", [1, 2])
+    def test_query_matches_set_path(self, seed, density):
+        keys, postings = _random_postings(seed, 400, density)
+        index = TagBitmapIndex.from_postings(postings, order=keys)
+
+        for include_tags, exclude_tags in _random_queries(seed):
+            bitmap = index.query(include_tags, exclude_tags)
+            assert index.decode(bitmap) == _set_query(
+                keys, postings, include_tags, exclude_tags
+            )
+
+    def test_counts_and_union(self):
+        keys, postings = _random_postings(3, 200, 0.3)
+        index = TagBitmapIndex.from_postings(postings, order=keys)
+
+        for tag in TAGS:
+            assert index.count(tag) == len(postings[tag])
+        union = set().union(*(postings[tag] for tag in TAGS[:3]))
+        assert index.decode(index.union(TAGS[:3])) == [k for k in keys if k in union]
+
+    def test_incremental_updates_match_set_path(self):
+        keys, postings = _random_postings(4, 150, 0.3)
+        index = TagBitmapIndex()
+        for key in keys:
+            index.intern(key)
+        for tag, tagged in postings.items():
+            for key in tagged:
+                index.add(tag, key)
+
+        # 移除部分模型：位图与集合同时删除
+        rng = random.Random(4)
+        for key in rng.sample(keys, 40):
+            tags = [tag for tag in TAGS if key in postings[tag]]
+            index.remove_key(key, tags)
+            for tag in tags:
+                postings[tag].discard(key)
+            keys.remove(key)
+
+        for include_tags, exclude_tags in _random_queries(4):
+            assert index.decode(index.query(include_tags, exclude_tags)) == (
+                _set_query(keys, postings, include_tags, exclude_tags)
+            )
+
+    def test_empty_results(self):
+        index = TagBitmapIndex.from_postings({"a": {"k1"}, "b": {"k2"}})
+        assert index.query(["a", "b"]) == 0
+        assert index.query(["a"], ["a"]) == 0
+        assert index.decode(0) == []
+        assert index.decode(index.query([], ["a", "b"])) == []
@@ -0,0 +1,92 @@
+"""配置加载器缓存键索引测试（代数变化使 渠道→缓存键 索引与合并视图失效）"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from core.utils.api_key_cache import ApiKeyCacheManager
+    from core.yaml_config import YAMLConfigLoader
+except ImportError as e:
+    pytest.skip(f"YAML config modules not available: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def loader():
+    """跳过配置文件读取，仅初始化缓存键索引相关状态"""
+    loader = YAMLConfigLoader.__new__(YAMLConfigLoader)
+    loader.api_key_cache_manager = ApiKeyCacheManager()
+    loader.config = SimpleNamespace(
+        channels=[
+            SimpleNamespace(id="yc_multi", enabled=True),
+            SimpleNamespace(id="yc_single", enabled=False),
+        ]
+    )
+    loader.model_cache = {
+        "yc_multi_0a1b2c3d": {"models": ["m-b", "m-a"], "last_updated": "1"},
+        "yc_multi_4e5f6a7b": {"models": ["m-c", "m-a"], "last_updated": "2"},
+        "yc_single_8c9d0e1f": {"models": ["m-z"]},
+    }
+    return loader
+
+
+class TestCacheKeyIndex:
+    def test_index_groups_keys_by_channel(self, loader):
+        channel_index, _ = loader._get_cache_key_index()
+        assert channel_index == {
+            "yc_multi": ["yc_multi_0a1b2c3d", "yc_multi_4e5f6a7b"],
+            "yc_single": ["yc_single_8c9d0e1f"],
+        }
+        assert [ch.id for ch in loader.get_enabled_channels()] == ["yc_multi"]
+
+    def test_enabled_channels_mutation_does_not_leak(self, loader):
+        channels = loader.get_enabled_channels()
+        channels.append(SimpleNamespace(id="yc_extra", enabled=True))
+        channels.clear()
+        assert [ch.id for ch in loader.get_enabled_channels()] == ["yc_multi"]
+
+    def test_merged_view_reused_until_cache_changes(self, loader):
+        merged = loader.get_model_cache_by_channel("yc_multi")
+        assert merged["models"] == ["m-a", "m-b", "m-c"]
+        assert loader.get_model_cache_by_channel("yc_multi") is merged
+
+        generation = loader.get_cache_generation()
+        loader.update_model_cache_for_channel_and_key(
+            "yc_multi", "sk-new", {"models": ["m-d"]}
+        )
+        assert loader.get_cache_generation() != generation
+
+        rebuilt = loader.get_model_cache_by_channel("yc_multi")
+        assert rebuilt is not merged
+        assert rebuilt["models"] == ["m-a", "m-b", "m-c", "m-d"]
+        assert rebuilt["merged_from_keys"] == 3
+
+    def test_assignment_bumps_generation(self, loader):
+        config_gen, cache_gen, _ = loader.get_cache_generation()
+        loader.model_cache = {"yc_single": {"models": ["legacy"]}}
+        generation = loader.get_cache_generation()
+        assert generation[0] == config_gen
+        assert generation[1] > cache_gen
+        assert generation[2] == 1
+        assert loader.get_model_cache_by_channel("yc_multi") == {}
+        assert loader.get_model_cache_by_channel("yc_single") == {"models": ["legacy"]}
+
+        loader.config = SimpleNamespace(channels=[])
+        assert loader.get_cache_generation()[0] > config_gen
+
+    def test_entry_count_change_triggers_rebuild(self, loader):
+        merged = loader.get_model_cache_by_channel("yc_multi")
+        generation = loader.get_cache_generation()
+
+        # 绕过失效钩子直接修改字典：条目数变化仍需重建索引
+        del loader.model_cache["yc_multi_4e5f6a7b"]
+        assert loader.get_cache_generation() != generation
+        single = loader.get_model_cache_by_channel("yc_multi")
+        assert single is not merged
+        assert single["models"] == ["m-b", "m-a"]